@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+分塊器基準測試 (Chunker Benchmark)
+=============================================================================
+
+比較 OffsetTextSplitter（單次掃描、偏移量父子分塊）與
+LangChain RecursiveCharacterTextSplitter（父塊字串 → 子塊字串兩次分割）
+在多 MB 文檔上的耗時與記憶體峰值。
+
+使用方法：
+-----------
+python Scripts/benchmarks/bench_chunker.py
+python Scripts/benchmarks/bench_chunker.py --sizes 1 5 20 --repeat 3
+
+=============================================================================
+"""
+
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+
+# 添加項目根目錄到 path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vectordb.chunker import OffsetTextSplitter, split_parent_child
+
+try:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+except ImportError:
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        RecursiveCharacterTextSplitter = None
+
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 400
+PARENT_CHUNK_SIZE = 6000
+PARENT_OVERLAP = 400
+
+_WORDS = (
+    "accounting regulation section clause asset liability revenue expense "
+    "SolidWorks sketch feature extrude assembly drawing dimension "
+    "會計 準則 資產 負債 收入 費用 條款 規定"
+).split()
+
+
+def make_document(size_mb: float, seed: int = 42) -> str:
+    """產生混合中英文、段落長短不一的測試文檔"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1_000_000)
+    paragraphs = []
+    total = 0
+    while total < target:
+        lines = []
+        for _ in range(rng.randint(1, 12)):
+            lines.append(" ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 40))))
+        para = "\n".join(lines)
+        paragraphs.append(para)
+        total += len(para) + 2
+    return "\n\n".join(paragraphs)
+
+
+def run_offset(text: str):
+    parent = OffsetTextSplitter(PARENT_CHUNK_SIZE, PARENT_OVERLAP)
+    child = OffsetTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+    tree = split_parent_child(text, parent, child)
+    return sum(len(children) for _, children in tree)
+
+
+def run_langchain(text: str):
+    parent = RecursiveCharacterTextSplitter(chunk_size=PARENT_CHUNK_SIZE, chunk_overlap=PARENT_OVERLAP)
+    child = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    count = 0
+    for parent_text in parent.split_text(text):
+        count += len(child.split_text(parent_text))
+    return count
+
+
+def measure(fn, text: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = fn(text)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offset chunker vs LangChain splitter")
+    parser.add_argument("--sizes", nargs="*", type=float, default=[1, 5, 20], help="Document sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    runners = [("offset", run_offset)]
+    if RecursiveCharacterTextSplitter is not None:
+        runners.append(("langchain", run_langchain))
+    else:
+        print("⚠️  LangChain text splitter not installed — benchmarking offset chunker only")
+
+    print(f"{'size':>8} {'splitter':>10} {'time_s':>9} {'MB/s':>8} {'peak_MB':>9} {'chunks':>8}")
+    for size_mb in args.sizes:
+        text = make_document(size_mb)
+        results = {}
+        for name, fn in runners:
+            seconds, peak, chunks = measure(fn, text, args.repeat)
+            results[name] = seconds
+            print(f"{size_mb:>7.1f}M {name:>10} {seconds:>9.3f} {len(text) / 1e6 / seconds:>8.1f} "
+                  f"{peak / 1e6:>9.1f} {chunks:>8}")
+        if "langchain" in results:
+            print(f"{'':>8} {'speedup':>10} {results['langchain'] / results['offset']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
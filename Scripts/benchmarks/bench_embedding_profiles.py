@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+嵌入降維基準測試 (Recall vs Latency vs Size per embedding profile)
+=============================================================================
+
+比較完整維度與各種降維設定檔（PCA / 隨機投影 / OpenAI 原生縮短輸出）：
+
+- recall@k  - 以完整維度暴力搜尋的 top-k 為基準
+- latency   - 每個查詢的搜尋延遲（numpy 暴力搜尋；有 chromadb 時另測 HNSW）
+- size      - 每個向量與整個索引的 float32 位元組數
+
+查詢取自保留的分塊向量（不需呼叫嵌入 API）；--native 會以 OpenAI dimensions
+參數重新嵌入文件與查詢（需要 OPENAI_API_KEY，會產生費用）。
+
+使用方法：
+-----------
+# 合成資料（20000 × 1536，有低秩結構）
+python Scripts/benchmarks/bench_embedding_profiles.py
+python Scripts/benchmarks/bench_embedding_profiles.py --dims 128 256 512 --k 10
+
+# 實際資料庫的向量
+python Scripts/benchmarks/bench_embedding_profiles.py --db my-docs --limit 20000
+python Scripts/benchmarks/bench_embedding_profiles.py --db my-docs --native
+
+=============================================================================
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目根目錄到 path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vectordb.embedding_profile import Projector
+
+
+def synthetic_corpus(n: int, dim: int, rank: int = 64, seed: int = 7) -> np.ndarray:
+    """低秩結構 + 雜訊，近似真實嵌入的變異分佈"""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dim))
+    x = rng.standard_normal((n, rank)) @ basis + 0.3 * rng.standard_normal((n, dim))
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def load_db_vectors(db_name: str, limit: int):
+    from services.vectordb_manager import vectordb_manager
+    collection = vectordb_manager._get_collection(db_name)
+    page = collection.get(limit=limit, include=["embeddings", "documents"])
+    return np.asarray(page["embeddings"], dtype=np.float32), page.get("documents") or []
+
+
+def exact_topk(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    # L2 on unit vectors ranks like cosine similarity
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def timed_topk(corpus: np.ndarray, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    result = exact_topk(corpus, queries, k)
+    return result, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def hnsw_latency_ms(corpus: np.ndarray, queries: np.ndarray, k: int):
+    try:
+        import chromadb
+    except ImportError:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=tmp)
+        collection = client.create_collection("bench")
+        for start in range(0, len(corpus), 2000):
+            chunk = corpus[start:start + 2000]
+            collection.add(ids=[str(start + i) for i in range(len(chunk))], embeddings=chunk.tolist())
+        collection.query(query_embeddings=queries[:1].tolist(), n_results=k)  # load index
+        start = time.perf_counter()
+        for q in queries:
+            collection.query(query_embeddings=[q.tolist()], n_results=k)
+        return round((time.perf_counter() - start) * 1000 / len(queries), 3)
+
+
+def recall(truth: np.ndarray, found: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall / latency / size of reduced embedding profiles")
+    parser.add_argument("--db", help="Use a database's stored vectors instead of synthetic data")
+    parser.add_argument("--limit", type=int, default=20000, help="Vectors to load / generate")
+    parser.add_argument("--dim", type=int, default=1536, help="Synthetic vector dimension")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512, 768])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--native", action="store_true", help="Also re-embed with OpenAI native dimensions")
+    parser.add_argument("--hnsw", action="store_true", help="Also time Chroma HNSW queries")
+    args = parser.parse_args()
+
+    documents = []
+    if args.db:
+        vectors, documents = load_db_vectors(args.db, args.limit)
+    else:
+        vectors = synthetic_corpus(args.limit, args.dim)
+    if len(vectors) <= args.queries:
+        sys.exit(f"Need more than {args.queries} vectors (got {len(vectors)})")
+
+    # 保留最後 N 筆作為查詢
+    corpus, queries = vectors[:-args.queries], vectors[-args.queries:]
+    truth, full_ms = timed_topk(corpus, queries, args.k)
+    full_dim = corpus.shape[1]
+    rows = [{
+        "profile": f"full-{full_dim}",
+        "recall": 1.0,
+        "latency_ms": round(full_ms, 3),
+        "hnsw_ms": hnsw_latency_ms(corpus, queries, args.k) if args.hnsw else None,
+        "bytes_per_vector": full_dim * 4,
+        "index_mb": round(corpus.nbytes / 1024 ** 2, 1)
+    }]
+
+    for dims in args.dims:
+        if dims >= full_dim:
+            continue
+        for name, projector in (
+            ("pca", Projector.fit_pca(corpus[:min(len(corpus), 5000)], dims)),
+            ("random_projection", Projector.random(full_dim, dims)),
+        ):
+            reduced = np.asarray(projector.transform(corpus), dtype=np.float32)
+            reduced_q = np.asarray(projector.transform(queries), dtype=np.float32)
+            found, ms = timed_topk(reduced, reduced_q, args.k)
+            rows.append({
+                "profile": f"{name}-{dims}",
+                "recall": round(recall(truth, found), 4),
+                "latency_ms": round(ms, 3),
+                "hnsw_ms": hnsw_latency_ms(reduced, reduced_q, args.k) if args.hnsw else None,
+                "bytes_per_vector": dims * 4,
+                "index_mb": round(reduced.nbytes / 1024 ** 2, 1)
+            })
+
+        if args.native and documents:
+            from services.vectordb.embeddings import OpenAIEmbeddingProvider
+            from config.config import Config
+            provider = OpenAIEmbeddingProvider(Config.EMBEDDING_MODEL, Config.OPENAI_API_KEY, dimensions=dims)
+            native = np.asarray(provider.embed_documents(documents[:len(vectors)]), dtype=np.float32)
+            found, ms = timed_topk(native[:-args.queries], native[-args.queries:], args.k)
+            rows.append({
+                "profile": f"native-{dims}",
+                "recall": round(recall(truth, found), 4),
+                "latency_ms": round(ms, 3),
+                "hnsw_ms": None,
+                "bytes_per_vector": dims * 4,
+                "index_mb": round(native[:-args.queries].nbytes / 1024 ** 2, 1)
+            })
+
+    print(f"\n{len(corpus)} vectors, {len(queries)} queries, recall@{args.k} vs full-{full_dim} exact search\n")
+    print(f"{'profile':<24} {'recall':>7} {'ms/query':>9} {'hnsw ms':>8} {'B/vector':>9} {'index MB':>9} {'saved':>6}")
+    for r in rows:
+        saved = 1 - r["bytes_per_vector"] / rows[0]["bytes_per_vector"]
+        print(f"{r['profile']:<24} {r['recall']:>7} {r['latency_ms']:>9} {str(r['hnsw_ms'] or '-'):>8} "
+              f"{r['bytes_per_vector']:>9} {r['index_mb']:>9} {saved:>6.0%}")
+    print("\n" + json.dumps(rows))
+
+
+if __name__ == "__main__":
+    main()
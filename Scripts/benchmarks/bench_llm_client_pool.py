@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+LLM 客戶端池基準測試 (Per-call overhead: fresh ChatOpenAI vs pooled clients)
+=============================================================================
+
+啟動一個本機 OpenAI 相容的 stub 伺服器（/v1/chat/completions 固定回應，可加
+模擬延遲），比較兩種呼叫方式的每次呼叫延遲與新建 TCP 連線數：
+
+- fresh   - 每次呼叫建立新的 ChatOpenAI（舊版 LLMService 傳入參數時的行為）
+- pooled  - LLMClientPool.get(model, temperature, max_tokens)，共用 keep-alive 連線池
+
+呼叫參數在數組 (temperature, max_tokens) 之間輪替，模擬不同 agent 的呼叫。
+較新的 langchain-openai 未指定 http_client 時會共用一個行程層級的預設 httpx
+客戶端，此時兩者 TCP 連線數相同，差距主要是每次建構 ChatOpenAI / openai 客戶端
+的成本；較舊版本每個實例各自建立連線池，fresh 的連線數會隨呼叫數增加。
+stub 為純 HTTP；正式環境新連線還需要 TLS 握手，差距更大。
+
+使用方法：
+-----------
+python Scripts/benchmarks/bench_llm_client_pool.py
+python Scripts/benchmarks/bench_llm_client_pool.py --calls 500 --concurrency 8 --latency-ms 20
+
+=============================================================================
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加項目根目錄到 path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage
+
+from services.llm_client_pool import LLMClientPool
+
+PARAM_SETS = [(0.1, 500), (0.3, 1000), (0.7, 2000), (0.0, 200)]
+
+
+class StubState:
+    connections = 0
+    requests = 0
+    latency_s = 0.0
+    latency_fn = None  # 每個請求的延遲（秒）；設定時取代 latency_s
+    lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """最小的 OpenAI chat.completions 相容回應（HTTP/1.1 keep-alive）"""
+
+    protocol_version = "HTTP/1.1"
+    wbufsize = 65536  # 標頭與內容一次送出（避免 Nagle + delayed ACK 的 40ms 延遲）
+
+    def setup(self):
+        super().setup()
+        with StubState.lock:
+            StubState.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with StubState.lock:
+            StubState.requests += 1
+        delay = StubState.latency_fn() if StubState.latency_fn else StubState.latency_s
+        if delay:
+            time.sleep(delay)
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "ok"}}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def run_mode(mode: str, base_url: str, calls: int, concurrency: int, model: str) -> dict:
+    pool = LLMClientPool(api_key="sk-stub", base_url=base_url) if mode == "pooled" else None
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    messages = [HumanMessage(content="ping")]
+
+    async def one(i: int):
+        temperature, max_tokens = PARAM_SETS[i % len(PARAM_SETS)]
+        async with semaphore:
+            start = time.perf_counter()
+            if pool is not None:
+                llm = pool.get(model, temperature, max_tokens)
+            else:
+                llm = ChatOpenAI(model=model, temperature=temperature, max_tokens=max_tokens,
+                                 api_key="sk-stub", base_url=base_url)
+            await llm.ainvoke(messages)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    StubState.connections = 0
+    StubState.requests = 0
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    wall = time.perf_counter() - wall
+    report = {
+        "mode": mode,
+        "calls": calls,
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "calls_per_s": round(calls / wall, 1),
+        "tcp_connections": StubState.connections
+    }
+    if pool is not None:
+        report["pool"] = pool.get_stats()
+        await pool.aclose()
+    return report
+
+
+async def main_async(args):
+    server = start_stub()
+    StubState.latency_s = args.latency_ms / 1000
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        # 預熱（import、事件迴圈、JIT 快取）
+        await run_mode("pooled", base_url, 10, 1, args.model)
+        return [await run_mode(mode, base_url, args.calls, args.concurrency, args.model)
+                for mode in ("fresh", "pooled")]
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call overhead of fresh vs pooled ChatOpenAI clients")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated server latency")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args()
+
+    rows = asyncio.run(main_async(args))
+    print(f"\n{args.calls} calls, concurrency {args.concurrency}, stub latency {args.latency_ms} ms\n")
+    print(f"{'mode':<8} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'calls/s':>9} {'TCP conns':>10}")
+    for r in rows:
+        print(f"{r['mode']:<8} {r['mean_ms']:>9} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['calls_per_s']:>9} {r['tcp_connections']:>10}")
+    print("\n" + json.dumps(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+對沖請求基準測試 (Tail latency: no hedging vs hedged requests)
+=============================================================================
+
+以本機 OpenAI 相容 stub（見 bench_llm_client_pool.py）模擬長尾延遲：
+大部分請求在 base 毫秒附近完成，--tail-rate 比例的請求慢 --tail-factor 倍。
+
+兩種模式各跑相同呼叫數，報告 p50 / p95 / p99 / max 與對沖比例：
+
+- off     - 直接 await（舊版 LLMService 行為）
+- hedged  - LLMHedger（p95 門檻、對沖上限 --max-ratio）
+
+使用方法：
+-----------
+python Scripts/benchmarks/bench_llm_hedging.py
+python Scripts/benchmarks/bench_llm_hedging.py --calls 1000 --tail-rate 0.03 --tail-factor 20
+
+=============================================================================
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+# 添加項目根目錄到 path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.messages import HumanMessage
+
+from bench_llm_client_pool import StubState, start_stub, percentile
+from services.llm_client_pool import LLMClientPool
+from services.llm_hedging import LLMHedger
+
+
+async def run_mode(hedged: bool, base_url: str, args) -> dict:
+    pool = LLMClientPool(api_key="sk-stub", base_url=base_url)
+    llm = pool.get(args.model, 0.1, 200)
+    hedger = LLMHedger(
+        enabled=hedged, percentile=args.percentile, max_ratio=args.max_ratio,
+        min_delay_ms=args.min_delay_ms, min_samples=20
+    )
+    messages = [HumanMessage(content="ping")]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await hedger.run(lambda: llm.ainvoke(messages), key=f"{args.model}:bench")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    StubState.requests = 0
+    await asyncio.gather(*(one() for _ in range(args.calls)))
+    await pool.aclose()
+    stats = hedger.get_stats()
+    return {
+        "mode": "hedged" if hedged else "off",
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies), 1),
+        "upstream_requests": StubState.requests,
+        "hedged": stats["hedged"],
+        "hedge_wins": stats["hedge_wins"]
+    }
+
+
+async def main_async(args):
+    rng = random.Random(args.seed)
+
+    def latency() -> float:
+        base = rng.gauss(args.base_ms, args.base_ms * 0.2)
+        if rng.random() < args.tail_rate:
+            base *= args.tail_factor
+        return max(base, 1.0) / 1000
+
+    server = start_stub()
+    StubState.latency_fn = latency
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        return [await run_mode(hedged, base_url, args) for hedged in (False, True)]
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p50 / p99 latency with and without hedged LLM requests")
+    parser.add_argument("--calls", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--base-ms", type=float, default=40.0, help="Typical stub latency")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="Fraction of slow responses")
+    parser.add_argument("--tail-factor", type=float, default=15.0, help="Slow-response multiplier")
+    parser.add_argument("--percentile", type=float, default=0.95)
+    parser.add_argument("--max-ratio", type=float, default=0.1)
+    parser.add_argument("--min-delay-ms", type=float, default=0.0)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = asyncio.run(main_async(args))
+    print(f"\n{args.calls} calls, concurrency {args.concurrency}, base {args.base_ms} ms, "
+          f"{args.tail_rate:.0%} of calls x{args.tail_factor:g}\n")
+    print(f"{'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'requests':>9} {'hedged':>7} {'wins':>5}")
+    for r in rows:
+        print(f"{r['mode']:<8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>8} "
+              f"{r['upstream_requests']:>9} {r['hedged']:>7} {r['hedge_wins']:>5}")
+    print("\n" + json.dumps(rows))
+
+
+if __name__ == "__main__":
+    main()
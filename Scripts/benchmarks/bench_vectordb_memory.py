@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+向量資料庫記憶體基準測試 (Memory per KB: dedicated vs shared)
+=============================================================================
+
+量測開啟 N 個知識庫並各查詢一次後，每個 KB 增加的常駐記憶體（RSS）、
+檔案描述符與執行緒數：
+
+- dedicated - 每個 KB 一個目錄 + 一個 PersistentClient（舊版）
+- shared    - 一個共用 PersistentClient，每個 KB 一個集合（新版）
+
+每種模式都在獨立子行程中量測，避免互相干擾。
+
+使用方法：
+-----------
+# 合成資料（預設 20 個 KB × 2000 個 384 維向量）
+python Scripts/benchmarks/bench_vectordb_memory.py
+python Scripts/benchmarks/bench_vectordb_memory.py --kbs 50 --chunks 5000 --dim 1536
+
+# 實際資料：以 VectorDBManager 開啟 CHROMA_DB_PATH 中所有 DB（遷移前後各跑一次）
+python Scripts/benchmarks/bench_vectordb_memory.py --real
+
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# 添加項目根目錄到 path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def _rss_bytes() -> int:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    return 0
+
+
+def _open_files() -> int:
+    try:
+        import psutil
+        proc = psutil.Process()
+        return proc.num_handles() if os.name == "nt" else proc.num_fds()
+    except ImportError:
+        return len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else -1
+
+
+def _snapshot() -> dict:
+    return {"rss": _rss_bytes(), "files": _open_files(), "threads": threading.active_count()}
+
+
+def _delta(before: dict, after: dict, kbs: int) -> dict:
+    return {
+        "kbs": kbs,
+        "rss_mb": round((after["rss"] - before["rss"]) / 1024 ** 2, 1),
+        "rss_mb_per_kb": round((after["rss"] - before["rss"]) / 1024 ** 2 / max(kbs, 1), 2),
+        "files_per_kb": round((after["files"] - before["files"]) / max(kbs, 1), 2),
+        "threads_added": after["threads"] - before["threads"],
+    }
+
+
+# ── 合成資料 ────────────────────────────────────────────────────
+
+def build_dataset(root: Path, kbs: int, chunks: int, dim: int):
+    import chromadb
+    from chromadb.config import Settings
+
+    rng = random.Random(42)
+    settings = Settings(anonymized_telemetry=False)
+    shared = chromadb.PersistentClient(path=str(root / "shared"), settings=settings)
+    for kb in range(kbs):
+        dedicated = chromadb.PersistentClient(path=str(root / f"kb-{kb}"), settings=settings)
+        targets = [
+            dedicated.get_or_create_collection("documents"),
+            shared.get_or_create_collection(f"kb_kb-{kb}"),
+        ]
+        for start in range(0, chunks, 1000):
+            n = min(1000, chunks - start)
+            ids = [f"{kb}-{start + i}" for i in range(n)]
+            vectors = [[rng.random() for _ in range(dim)] for _ in range(n)]
+            docs = [f"chunk {kb}-{start + i}" for i in range(n)]
+            for collection in targets:
+                collection.add(ids=ids, embeddings=vectors, documents=docs)
+        print(f"  built kb-{kb}", file=sys.stderr)
+
+
+def measure_synthetic(root: Path, mode: str, kbs: int, dim: int) -> dict:
+    import chromadb
+    from chromadb.config import Settings
+
+    settings = Settings(anonymized_telemetry=False)
+    probe = [[0.5] * dim]
+    before = _snapshot()
+    handles = []
+    if mode == "shared":
+        client = chromadb.PersistentClient(path=str(root / "shared"), settings=settings)
+        for kb in range(kbs):
+            collection = client.get_collection(f"kb_kb-{kb}")
+            collection.query(query_embeddings=probe, n_results=5)
+            handles.append(collection)
+    else:
+        for kb in range(kbs):
+            client = chromadb.PersistentClient(path=str(root / f"kb-{kb}"), settings=settings)
+            collection = client.get_collection("documents")
+            collection.query(query_embeddings=probe, n_results=5)
+            handles.append((client, collection))
+    return {"mode": mode, **_delta(before, _snapshot(), kbs)}
+
+
+# ── 實際資料 ────────────────────────────────────────────────────
+
+def measure_real() -> dict:
+    before = _snapshot()
+    from services.vectordb_manager import vectordb_manager
+
+    opened = 0
+    for db_name, info in vectordb_manager._metadata.get("databases", {}).items():
+        if info.get("document_count", 0) == 0:
+            continue
+        try:
+            vectordb_manager._warm_database_sync(db_name)
+            opened += 1
+        except Exception as e:
+            print(f"  {db_name}: {e}", file=sys.stderr)
+    return {
+        "mode": "real",
+        "storage": vectordb_manager.get_storage_stats(),
+        **_delta(before, _snapshot(), opened)
+    }
+
+
+def _run_child(args: list) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, *args], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per KB: dedicated vs shared Chroma clients")
+    parser.add_argument("--kbs", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--real", action="store_true", help="Measure the configured CHROMA_DB_PATH")
+    parser.add_argument("--child", choices=["dedicated", "shared", "real"], help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "real":
+        print(json.dumps(measure_real()))
+        return
+    if args.child:
+        print(json.dumps(measure_synthetic(Path(args.root), args.child, args.kbs, args.dim)))
+        return
+
+    if args.real:
+        result = _run_child(["--child", "real"])
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        print(f"Building {args.kbs} KBs × {args.chunks} chunks (dim={args.dim})...")
+        build_dataset(root, args.kbs, args.chunks, args.dim)
+        common = ["--root", str(root), "--kbs", str(args.kbs), "--dim", str(args.dim)]
+        results = [_run_child(["--child", mode, *common]) for mode in ("dedicated", "shared")]
+
+    print(f"\n{'mode':<10} {'RSS MB':>8} {'MB/KB':>8} {'files/KB':>9} {'threads':>8}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['rss_mb']:>8} {r['rss_mb_per_kb']:>8} {r['files_per_kb']:>9} {r['threads_added']:>8}")
+
+
+if __name__ == "__main__":
+    main()
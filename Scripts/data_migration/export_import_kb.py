@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+知識庫欄式匯出 / 匯入 / 複製 (Columnar KB Export / Import / Clone)
+=============================================================================
+
+在環境之間搬移或複製知識庫，不重新嵌入：
+
+- export - 串流寫出 chunks.parquet（或 chunks.arrow）+ embeddings.npy + manifest.json
+- import - 以集合的最大批次大小批次寫入（向量以 memory-map 讀取）
+- clone  - export 後立即以新名稱 import（同一環境內複製）
+
+輸出目錄可直接以 rsync / scp 搬到另一個環境，再以 import 載入。
+
+使用方法：
+-----------
+python Scripts/data_migration/export_import_kb.py export my-docs --out /tmp/my-docs
+python Scripts/data_migration/export_import_kb.py export my-docs --format arrow --dtype float16
+python Scripts/data_migration/export_import_kb.py import /tmp/my-docs --db my-docs-copy
+python Scripts/data_migration/export_import_kb.py clone my-docs my-docs-staging
+
+=============================================================================
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+# 添加項目根目錄到 path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+
+async def run(args) -> dict:
+    from services.vectordb_manager import vectordb_manager
+
+    if args.command == "export":
+        return await vectordb_manager.export_database(
+            args.db,
+            Path(args.out) if args.out else None,
+            table_format=args.format,
+            dtype=args.dtype,
+            include_deleted=args.include_deleted,
+            page_size=args.page_size
+        )
+    if args.command == "import":
+        return await vectordb_manager.import_database(
+            Path(args.path), db_name=args.db, batch_size=args.batch_size
+        )
+    # clone
+    with tempfile.TemporaryDirectory(prefix="kb-clone-") as tmp:
+        exported = await vectordb_manager.export_database(
+            args.source, Path(tmp) / "export", table_format="arrow", page_size=args.page_size
+        )
+        imported = await vectordb_manager.import_database(
+            Path(tmp) / "export", db_name=args.target, batch_size=args.batch_size
+        )
+    return {"export": exported, "import": imported}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar export / import of vector databases (no re-embedding)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Export a database")
+    p_export.add_argument("db")
+    p_export.add_argument("--out", help="Output directory (default: VECTORDB_EXPORT_PATH/<db>-<timestamp>)")
+    p_export.add_argument("--format", choices=["parquet", "arrow"], default=None)
+    p_export.add_argument("--dtype", choices=["float32", "float16"], default=None)
+    p_export.add_argument("--include-deleted", action="store_true")
+    p_export.add_argument("--page-size", type=int, default=2000)
+
+    p_import = sub.add_parser("import", help="Import an export directory")
+    p_import.add_argument("path")
+    p_import.add_argument("--db", help="Target database (default: exported name)")
+    p_import.add_argument("--batch-size", type=int, default=None)
+
+    p_clone = sub.add_parser("clone", help="Copy a database under a new name")
+    p_clone.add_argument("source")
+    p_clone.add_argument("target")
+    p_clone.add_argument("--page-size", type=int, default=2000)
+    p_clone.add_argument("--batch-size", type=int, default=None)
+
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
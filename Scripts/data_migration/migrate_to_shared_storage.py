@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+遷移至共用 Chroma 客戶端 (Dedicated → Shared Storage Migration)
+=============================================================================
+
+把舊版「每個資料庫一個目錄 + 一個客戶端」的知識庫搬到共用客戶端
+（<CHROMA_DB_PATH>/_shared）中，每個資料庫成為一個集合 kb_<db_name>。
+
+- 直接複製 embeddings，不重新嵌入
+- 複製數量核對一致後才切換 db_metadata.json
+- 預設保留舊檔案；確認無誤後再以 --remove-old 刪除
+- --measure 在遷移前後各量測一次每個 KB 的記憶體（bench_vectordb_memory.py --real）
+
+使用方法：
+-----------
+python Scripts/data_migration/migrate_to_shared_storage.py --dry-run
+python Scripts/data_migration/migrate_to_shared_storage.py --measure
+python Scripts/data_migration/migrate_to_shared_storage.py --db my-docs --remove-old
+
+=============================================================================
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+# 添加項目根目錄到 path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+BENCH_SCRIPT = project_root / "Scripts" / "benchmarks" / "bench_vectordb_memory.py"
+
+
+def measure() -> dict:
+    """在獨立子行程中量測（避免本行程已開啟的客戶端影響結果）"""
+    out = subprocess.run(
+        [sys.executable, str(BENCH_SCRIPT), "--real"], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate per-directory vector DBs into the shared Chroma client")
+    parser.add_argument("--db", action="append", help="Database to migrate (repeatable, default: all dedicated)")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--remove-old", action="store_true", help="Delete old chroma files after a verified copy")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--measure", action="store_true", help="Measure memory per KB before and after")
+    args = parser.parse_args()
+
+    before = measure() if args.measure and not args.dry_run else None
+
+    from services.vectordb_manager import vectordb_manager
+    report = vectordb_manager.migrate_to_shared_storage(
+        db_names=args.db,
+        page_size=args.page_size,
+        remove_old=args.remove_old,
+        dry_run=args.dry_run
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if before is not None:
+        after = measure()
+        print("\nMemory per KB (opened + queried once):")
+        print(f"{'':<8} {'KBs':>5} {'RSS MB':>8} {'MB/KB':>8} {'files/KB':>9} {'threads':>8}")
+        for label, r in (("before", before), ("after", after)):
+            print(f"{label:<8} {r['kbs']:>5} {r['rss_mb']:>8} {r['rss_mb_per_kb']:>8} "
+                  f"{r['files_per_kb']:>9} {r['threads_added']:>8}")
+
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
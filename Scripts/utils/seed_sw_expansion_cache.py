@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+SolidWorks 查詢擴展快取預熱腳本
+=============================================================================
+
+功能說明：
+-----------
+從 SolidWorks API 文檔庫（namespaces / api_members 表）與
+config/sw_query_aliases.yaml 建立本地詞彙索引，讓 SWAgent 大多數查詢
+不需要呼叫 LLM 做語意擴展。
+
+使用方法：
+-----------
+python Scripts/utils/seed_sw_expansion_cache.py
+python Scripts/utils/seed_sw_expansion_cache.py --doc-db data/solidworks_db/sw_api_doc.db
+python Scripts/utils/seed_sw_expansion_cache.py --check "怎麼畫圓" "OpenDoc6 參數"
+
+=============================================================================
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# 添加項目根目錄到 path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.config import Config
+from agents.auxiliary.sw_expansion_cache import SWExpansionCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the SolidWorks query expansion cache")
+    parser.add_argument("--doc-db", default="data/solidworks_db/sw_api_doc.db",
+                        help="SolidWorks API document database")
+    parser.add_argument("--cache-db", default=Config.SW_EXPANSION_CACHE_PATH,
+                        help="Expansion cache database")
+    parser.add_argument("--check", nargs="*", default=[],
+                        help="Queries to look up after seeding")
+    args = parser.parse_args()
+
+    doc_db = Path(args.doc_db)
+    if not doc_db.exists():
+        print(f"❌ SolidWorks DB not found: {doc_db}")
+        sys.exit(1)
+
+    cache = SWExpansionCache(
+        cache_path=Path(args.cache_db),
+        ttl_seconds=Config.SW_EXPANSION_CACHE_TTL,
+        max_entries=Config.SW_EXPANSION_CACHE_MAX_ENTRIES
+    )
+    result = cache.seed_from_db(doc_db)
+    print("✅ Seeded expansion cache")
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    for query in args.check:
+        terms, source = cache.lookup(query)
+        print(f"  {query!r:30} [{source:5}] -> {terms}")
+
+    if args.check:
+        stats = cache.get_stats()
+        print(f"\nHit rate: {stats['hit_rate']:.0%} ({stats['lookups']} lookups)")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ SolidWorks API Agent
 功能：
 -----------
 1. 關鍵字搜索 - 使用 SQLite FTS5 全文檢索
-2. 語意擴展 - 使用 LLM 擴展查詢詞，找到相似概念
+2. 語意擴展 - 使用 LLM 擴展查詢詞，找到相似概念（持久化快取 + 本地別名表優先）
 3. 代碼範例 - 返回相關的 VBA/C# 代碼範例
 4. API 成員查詢 - 查詢特定 Interface 的方法和屬性
 
@@ -23,11 +23,14 @@ data/solidworks_db/sw_api_doc.db
 import asyncio
 import logging
 import sqlite3
-from typing import Dict, Any, List, Optional
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 
 from agents.shared_services.base_agent import BaseAgent
 from agents.shared_services.message_protocol import TaskAssignment
+from agents.auxiliary.sw_expansion_cache import SWExpansionCache
+from config.config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +58,14 @@ class SWAgent(BaseAgent):
         else:
             logger.info(f"SolidWorks DB loaded from {self.db_path}")
         
+        # 查詢擴展快取（離線預熱：Scripts/utils/seed_sw_expansion_cache.py）
+        config = Config()
+        self.expansion_cache = SWExpansionCache(
+            cache_path=Path(config.SW_EXPANSION_CACHE_PATH),
+            ttl_seconds=config.SW_EXPANSION_CACHE_TTL,
+            max_entries=config.SW_EXPANSION_CACHE_MAX_ENTRIES
+        )
+        
         logger.info("SWAgent initialized")
     
     def _get_connection(self) -> sqlite3.Connection:
@@ -78,14 +89,15 @@ class SWAgent(BaseAgent):
         Returns:
             包含文檔、代碼範例、API 成員的結果
         """
-        # Step 1: 用 LLM 擴展查詢詞（找同義詞和相關概念）
-        expanded_terms = await self._expand_query(query)
-        logger.info(f"[SWAgent] Query expanded: {query} -> {expanded_terms}")
+        # Step 1: 擴展查詢詞（快取 → 本地別名 → LLM）
+        expanded_terms, expansion = await self._expand_query(query)
+        logger.info(f"[SWAgent] Query expanded ({expansion['source']}): {query} -> {expanded_terms}")
         
         # Step 2: 執行多維度搜索
         results = {
             "query": query,
             "expanded_terms": expanded_terms,
+            "expansion": expansion,
             "documents": [],
             "code_examples": [],
             "api_members": []
@@ -110,7 +122,37 @@ class SWAgent(BaseAgent):
         
         return results
     
-    async def _expand_query(self, query: str) -> List[str]:
+    async def _expand_query(self, query: str) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        擴展查詢詞，找到 SolidWorks API 中的相關術語
+        
+        先查持久化快取與本地詞彙索引，都沒命中才呼叫 LLM。
+        
+        Returns:
+            (terms, expansion_info)；expansion_info 含 source / latency_ms / time_saved_ms
+        """
+        started = time.perf_counter()
+        terms, source = self.expansion_cache.lookup(query)
+        if terms is not None:
+            latency_ms = (time.perf_counter() - started) * 1000
+            return terms, {
+                "source": source,
+                "latency_ms": round(latency_ms, 2),
+                "time_saved_ms": round(max(self.expansion_cache.llm_latency_ms - latency_ms, 0.0), 1)
+            }
+        
+        terms = await self._expand_query_with_llm(query)
+        latency_ms = (time.perf_counter() - started) * 1000
+        if terms:
+            self.expansion_cache.put(query, terms, source="llm")
+            self.expansion_cache.record_llm_expansion(latency_ms)
+        return terms, {"source": "llm", "latency_ms": round(latency_ms, 2), "time_saved_ms": 0.0}
+    
+    def get_expansion_stats(self) -> Dict[str, Any]:
+        """查詢擴展快取命中率與節省時間"""
+        return self.expansion_cache.get_stats()
+    
+    async def _expand_query_with_llm(self, query: str) -> List[str]:
         """
         使用 LLM 擴展查詢詞，找到 SolidWorks API 中的相關術語
         """
@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+SolidWorks Query Expansion Cache
+=============================================================================
+
+SWAgent 查詢擴展的持久化快取。
+
+SolidWorks API 詞彙量小且穩定，同樣的查詢（"OpenDoc6"、"怎麼畫圓"）
+每次都呼叫 LLM 做同義詞擴展很浪費。本模組提供三層查找：
+
+1. 精確命中 - 以正規化查詢為 key 的持久化快取（TTL + 容量上限，LRU 淘汰）
+2. 本地擴展 - 離線從 namespaces / api_members 表與別名表預先建立的詞彙索引
+3. LLM 擴展 - 前兩層都沒命中才呼叫 LLM，結果寫回快取
+
+存儲：
+-----------
+SQLite（data/solidworks_db/sw_expansion_cache.db）
+- expansion_cache : 查詢 → 擴展詞（source = local / llm）
+- seed_terms      : API 名稱 / 別名 → 擴展詞（離線預熱，不過期）
+- cache_meta      : 預熱時間、LLM 平均延遲等
+
+離線預熱：
+-----------
+python Scripts/utils/seed_sw_expansion_cache.py
+
+=============================================================================
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path("data/solidworks_db/sw_expansion_cache.db")
+DEFAULT_ALIASES_PATH = Path(__file__).parent.parent.parent / "config" / "sw_query_aliases.yaml"
+
+# 尚未量測到 LLM 延遲前，用來估算「節省時間」的基準值（毫秒）
+DEFAULT_LLM_EXPANSION_MS = 800.0
+
+MAX_TERMS = 5
+
+_TRAILING_PUNCT = "?？!！。.,，;；:："
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*")
+_VERSION_SUFFIX_RE = re.compile(r"\d+$")
+
+
+def normalize_query(query: str) -> str:
+    """正規化查詢：NFKC、小寫、合併空白、去除結尾標點"""
+    text = unicodedata.normalize("NFKC", query or "").lower()
+    text = " ".join(text.split())
+    return text.strip(_TRAILING_PUNCT + " ")
+
+
+def _merge_terms(*groups: List[str], limit: int = MAX_TERMS) -> List[str]:
+    """合併多組詞彙，保持順序並去重（大小寫不敏感）"""
+    seen = set()
+    merged = []
+    for group in groups:
+        for term in group:
+            key = term.lower()
+            if term and key not in seen:
+                seen.add(key)
+                merged.append(term)
+                if len(merged) >= limit:
+                    return merged
+    return merged
+
+
+class SWExpansionCache:
+    """
+    SolidWorks 查詢擴展快取
+
+    線程安全：單一 SQLite 連接 + 鎖。所有操作都是主鍵查找，耗時為微秒級，
+    直接在事件迴圈中呼叫即可。
+    """
+
+    def __init__(
+        self,
+        cache_path: Path = DEFAULT_CACHE_PATH,
+        ttl_seconds: int = 30 * 86400,
+        max_entries: int = 5000,
+        aliases_path: Path = DEFAULT_ALIASES_PATH
+    ):
+        self.cache_path = Path(cache_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.aliases_path = Path(aliases_path)
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_db()
+
+        # 別名表（小，常駐記憶體；長短語優先匹配）
+        self._aliases: List[Tuple[str, List[str]]] = self._load_aliases()
+        # 英文別名按單詞邊界匹配（避免 "sketch" 命中 "isketchmanager"），中文別名按子字串匹配
+        self._alias_patterns = {
+            phrase: re.compile(rf"(?<![a-z0-9_]){re.escape(phrase)}(?![a-z0-9_])")
+            for phrase, _ in self._aliases if phrase.isascii()
+        }
+
+        # 統計
+        self._stats = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "local_hits": 0,
+            "misses": 0,
+            "time_saved_ms": 0.0,
+        }
+        self._llm_latency_ms = float(self._get_meta("llm_latency_ms") or DEFAULT_LLM_EXPANSION_MS)
+        self._llm_latency_measured = self._get_meta("llm_latency_ms") is not None
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS expansion_cache (
+                    query_key TEXT PRIMARY KEY,
+                    terms TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hit_count INTEGER DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_expansion_last_used
+                    ON expansion_cache(last_used);
+
+                CREATE TABLE IF NOT EXISTS seed_terms (
+                    term_key TEXT PRIMARY KEY,
+                    terms TEXT NOT NULL,
+                    origin TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS cache_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+            self._conn.commit()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache_meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_meta (key, value) VALUES (?, ?)",
+                (key, str(value))
+            )
+            self._conn.commit()
+
+    def _load_aliases(self) -> List[Tuple[str, List[str]]]:
+        """載入 config/sw_query_aliases.yaml"""
+        if not self.aliases_path.exists():
+            logger.warning(f"[SWExpansionCache] Alias file not found: {self.aliases_path}")
+            return []
+        try:
+            with open(self.aliases_path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+        except Exception as e:
+            logger.warning(f"[SWExpansionCache] Failed to load aliases: {e}")
+            return []
+
+        aliases = []
+        for phrase, terms in (data.get("aliases") or {}).items():
+            key = normalize_query(str(phrase))
+            if key and terms:
+                aliases.append((key, [str(t) for t in terms]))
+        aliases.sort(key=lambda item: len(item[0]), reverse=True)
+        return aliases
+
+    # =========================================================================
+    # 查找
+    # =========================================================================
+
+    def lookup(self, query: str) -> Tuple[Optional[List[str]], str]:
+        """
+        查找查詢的擴展詞（不呼叫 LLM）
+
+        Returns:
+            (terms, source)；source 為 "cache" / "local"，未命中時為 (None, "miss")
+        """
+        started = time.perf_counter()
+        key = normalize_query(query)
+        self._stats["lookups"] += 1
+
+        terms = self._get_cached(key)
+        source = "cache"
+        if terms is None:
+            terms = self._expand_locally(key)
+            source = "local"
+            if terms:
+                self.put(query, terms, source="local")
+            else:
+                terms = None
+
+        if terms is None:
+            self._stats["misses"] += 1
+            return None, "miss"
+
+        self._stats["exact_hits" if source == "cache" else "local_hits"] += 1
+        lookup_ms = (time.perf_counter() - started) * 1000
+        self._stats["time_saved_ms"] += max(self._llm_latency_ms - lookup_ms, 0.0)
+        return terms, source
+
+    def _get_cached(self, key: str) -> Optional[List[str]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT terms, created_at FROM expansion_cache WHERE query_key = ?",
+                (key,)
+            ).fetchone()
+            if not row:
+                return None
+            if now - row["created_at"] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM expansion_cache WHERE query_key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE expansion_cache SET last_used = ?, hit_count = hit_count + 1 WHERE query_key = ?",
+                (now, key)
+            )
+            self._conn.commit()
+        return json.loads(row["terms"])
+
+    def _expand_locally(self, key: str) -> List[str]:
+        """用別名表 + 預熱的 API 詞彙索引擴展查詢"""
+        alias_terms: List[str] = []
+        matched: List[str] = []
+        for phrase, terms in self._aliases:
+            # 已被更長的別名覆蓋（例如 "畫圓" 已命中就跳過 "圓"）
+            pattern = self._alias_patterns.get(phrase)
+            found = pattern.search(key) is not None if pattern else phrase in key
+            if found and not any(phrase in m for m in matched):
+                matched.append(phrase)
+                alias_terms.extend(terms)
+
+        seed_terms: List[str] = []
+        identifiers = [t.lower() for t in _IDENTIFIER_RE.findall(key)]
+        if identifiers:
+            placeholders = ",".join("?" * len(identifiers))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT term_key, terms FROM seed_terms WHERE term_key IN ({placeholders})",
+                    identifiers
+                ).fetchall()
+            by_key = {row["term_key"]: json.loads(row["terms"]) for row in rows}
+            for ident in identifiers:
+                seed_terms.extend(by_key.get(ident, []))
+
+        return _merge_terms(seed_terms, alias_terms)
+
+    def put(self, query: str, terms: List[str], source: str = "llm"):
+        """寫入快取，超過容量時按 LRU 淘汰"""
+        key = normalize_query(query)
+        if not key:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO expansion_cache
+                   (query_key, terms, source, created_at, last_used, hit_count)
+                   VALUES (?, ?, ?, ?, ?, 0)""",
+                (key, json.dumps(terms, ensure_ascii=False), source, now, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM expansion_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    """DELETE FROM expansion_cache WHERE query_key IN (
+                           SELECT query_key FROM expansion_cache
+                           ORDER BY last_used ASC LIMIT ?
+                       )""",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    @property
+    def llm_latency_ms(self) -> float:
+        """LLM 擴展的平均延遲（未量測前為預設估計值）"""
+        return self._llm_latency_ms
+
+    def record_llm_expansion(self, latency_ms: float):
+        """記錄一次 LLM 擴展的延遲（指數移動平均），用於估算節省時間"""
+        if self._llm_latency_measured:
+            self._llm_latency_ms = 0.8 * self._llm_latency_ms + 0.2 * latency_ms
+        else:
+            self._llm_latency_ms = latency_ms
+            self._llm_latency_measured = True
+        self._set_meta("llm_latency_ms", round(self._llm_latency_ms, 2))
+
+    # =========================================================================
+    # 離線預熱
+    # =========================================================================
+
+    def seed_from_db(self, doc_db_path: Path) -> Dict[str, Any]:
+        """
+        從 SolidWorks API 文檔庫的 namespaces / api_members 表建立詞彙索引
+
+        - 方法族：OpenDoc / OpenDoc6 / OpenDoc7 互為擴展詞，並附上所屬 Interface
+        - Interface：IModelDoc2 ↔ ModelDoc2
+        - Namespace：名稱 + API 分類
+        - 別名表：整句別名同時寫入 seed_terms，供精確 token 匹配
+        """
+        started = time.perf_counter()
+        doc_conn = sqlite3.connect(str(doc_db_path))
+        doc_conn.row_factory = sqlite3.Row
+        try:
+            members = doc_conn.execute(
+                "SELECT DISTINCT name, interface_name FROM api_members WHERE name IS NOT NULL AND name != ''"
+            ).fetchall()
+            try:
+                namespaces = doc_conn.execute(
+                    "SELECT name, api_category FROM namespaces WHERE name IS NOT NULL"
+                ).fetchall()
+            except sqlite3.OperationalError:
+                namespaces = []
+        finally:
+            doc_conn.close()
+
+        # 方法族：base name → {版本化名稱}, {interface}
+        families: Dict[str, Dict[str, set]] = {}
+        interfaces = set()
+        for row in members:
+            name = row["name"].strip()
+            base = _VERSION_SUFFIX_RE.sub("", name) or name
+            family = families.setdefault(base.lower(), {"names": set(), "interfaces": set()})
+            family["names"].add(name)
+            if row["interface_name"]:
+                family["interfaces"].add(row["interface_name"].strip())
+                interfaces.add(row["interface_name"].strip())
+
+        seeds: Dict[str, Tuple[List[str], str]] = {}
+
+        def _version_key(n: str) -> int:
+            m = _VERSION_SUFFIX_RE.search(n)
+            return int(m.group()) if m else 0
+
+        for base_key, family in families.items():
+            # 最新版本在前（OpenDoc7, OpenDoc6, OpenDoc）
+            names = sorted(family["names"], key=_version_key, reverse=True)
+            terms = _merge_terms(names[:3], sorted(family["interfaces"])[:2])
+            seeds[base_key] = (terms, "api_members")
+            for name in family["names"]:
+                seeds.setdefault(name.lower(), (_merge_terms([name], terms), "api_members"))
+
+        for iface in interfaces:
+            bare = iface[1:] if len(iface) > 1 and iface[0] == "I" and iface[1].isupper() else iface
+            seeds.setdefault(iface.lower(), (_merge_terms([iface, bare]), "interface"))
+            seeds.setdefault(bare.lower(), (_merge_terms([bare, iface]), "interface"))
+
+        for row in namespaces:
+            terms = _merge_terms([row["name"]], [row["api_category"]] if row["api_category"] else [])
+            seeds.setdefault(row["name"].lower(), (terms, "namespaces"))
+
+        for phrase, terms in self._aliases:
+            seeds[phrase] = (_merge_terms(terms), "alias")
+
+        with self._lock:
+            self._conn.execute("DELETE FROM seed_terms")
+            self._conn.executemany(
+                "INSERT INTO seed_terms (term_key, terms, origin) VALUES (?, ?, ?)",
+                [(k, json.dumps(t, ensure_ascii=False), o) for k, (t, o) in seeds.items()]
+            )
+            # 別名 / 詞彙變了，舊的本地擴展結果作廢
+            self._conn.execute("DELETE FROM expansion_cache WHERE source = 'local'")
+            self._conn.commit()
+
+        self._set_meta("seeded_at", time.time())
+        self._set_meta("seeded_from", str(doc_db_path))
+
+        result = {
+            "seed_terms": len(seeds),
+            "api_member_families": len(families),
+            "interfaces": len(interfaces),
+            "namespaces": len(namespaces),
+            "aliases": len(self._aliases),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        logger.info(f"[SWExpansionCache] Seeded: {result}")
+        return result
+
+    def is_seeded(self) -> bool:
+        return self._get_meta("seeded_at") is not None
+
+    # =========================================================================
+    # 統計
+    # =========================================================================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """快取命中率與節省時間"""
+        lookups = self._stats["lookups"]
+        hits = self._stats["exact_hits"] + self._stats["local_hits"]
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM expansion_cache").fetchone()[0]
+            seeds = self._conn.execute("SELECT COUNT(*) FROM seed_terms").fetchone()[0]
+        return {
+            **self._stats,
+            "time_saved_ms": round(self._stats["time_saved_ms"], 1),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "avg_time_saved_per_search_ms": round(self._stats["time_saved_ms"] / lookups, 1) if lookups else 0.0,
+            "llm_latency_ms": round(self._llm_latency_ms, 1),
+            "llm_latency_measured": self._llm_latency_measured,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "seed_terms": seeds,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+    def clear(self):
+        """清空查詢快取（保留預熱詞彙）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM expansion_cache")
+            self._conn.commit()
@@ -169,30 +169,40 @@ Language:"""
         text = task.input_data.get("text", task.description)
         target_languages = task.input_data.get("target_languages", ["English", "Chinese"])
         
-        translations = {}
-        
-        for lang in target_languages:
-            prompt = f"""Translate the following text to {lang}.
+        prompts = [
+            f"""Translate the following text to {lang}.
 Provide only the translation.
 
 Text:
 {text}
 
 Translation:"""
-            
-            result_text = await self.llm_service.generate(
-                prompt=prompt,
-                system_message=self.prompt_template.system_prompt,
-                temperature=self.prompt_template.temperature,
-                session_id=task.task_id
-            )
-            
-            translations[lang] = result_text
+            for lang in target_languages
+        ]
+        
+        # One call per language, run concurrently (wall time ≈ slowest language)
+        results = await self.llm_service.generate_many(
+            prompts,
+            system_message=self.prompt_template.system_prompt,
+            temperature=self.prompt_template.temperature,
+            session_id=task.task_id,
+            return_exceptions=True
+        )
+        
+        translations = {}
+        failed = {}
+        for lang, result in zip(target_languages, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Translation to {lang} failed: {result}")
+                failed[lang] = str(result)
+            else:
+                translations[lang] = result.content
         
         return {
-            "success": True,
+            "success": bool(translations) or not failed,
             "original_text": text,
-            "translations": translations
+            "translations": translations,
+            "failed_languages": failed
         }
     
     async def _localize(self, task: TaskAssignment) -> Dict[str, Any]:
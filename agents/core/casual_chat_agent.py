@@ -230,7 +230,9 @@ User: "What can you do?"
             response = await self.llm_service.generate(
                 prompt=user_message,
                 system_message=system_with_memory,
-                temperature=0.7
+                temperature=0.7,
+                cache_family="answer",
+                stream=True
             )
             response_text = response.content
             
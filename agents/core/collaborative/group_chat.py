@@ -238,26 +238,32 @@ Keep the discussion on track and ensure all perspectives are heard."""
         
         Good for getting diverse perspectives without full discussion.
         """
-        perspectives = {}
+        participants = self.participants[:num_perspectives]
         
-        for participant in self.participants[:num_perspectives]:
-            response = await self._get_participant_response(
-                participant=participant,
-                topic=question,
-                history=[]
-            )
-            perspectives[participant.name] = response
+        # Perspectives are independent (no shared history): ask everyone at once
+        requests = []
+        for participant in participants:
+            prompt, system_message = self._participant_prompt(participant, question, [])
+            requests.append({"prompt": prompt, "system_message": system_message})
+        results = await self.llm_service.generate_many(requests, temperature=0.7, return_exceptions=True)
+        
+        perspectives = {}
+        for participant, result in zip(participants, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Participant {participant.name} failed: {result}")
+                perspectives[participant.name] = f"[{participant.name} could not respond]"
+            else:
+                perspectives[participant.name] = result.content
         
         return perspectives
     
-    async def _get_participant_response(
+    def _participant_prompt(
         self,
         participant: ParticipantConfig,
         topic: str,
         history: List[ChatMessage]
-    ) -> str:
-        """Get response from a participant"""
-        # Build history text
+    ) -> Tuple[str, str]:
+        """Build (prompt, system_message) for a participant"""
         history_text = self._format_history(history)
         
         system_message = self.participant_system_template.format(
@@ -273,6 +279,16 @@ Discussion so far:
 {history_text if history_text else "No discussion yet. You speak first."}
 
 Share your perspective on this topic, considering what others have said."""
+        return prompt, system_message
+    
+    async def _get_participant_response(
+        self,
+        participant: ParticipantConfig,
+        topic: str,
+        history: List[ChatMessage]
+    ) -> str:
+        """Get response from a participant"""
+        prompt, system_message = self._participant_prompt(participant, topic, history)
         
         try:
             result = await self.llm_service.generate(
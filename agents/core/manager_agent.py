@@ -29,6 +29,7 @@ from agents.shared_services.message_protocol import (
 )
 from agents.shared_services.websocket_manager import WebSocketManager
 from agents.shared_services.agent_registry import AgentRegistry
+from services.prompt_budget import PromptSection
 
 # Import EventBus
 try:
@@ -85,6 +86,16 @@ class TaskRoutingDecision(BaseModel):
     requires_rag: bool = Field(default=False, description="Whether the task needs RAG retrieval")
 
 
+def _format_exchange(exchange: Dict[str, Any]) -> str:
+    """對話輪次的文字（與 ThinkingAgent 組裝歷史的格式一致，用於 token 計數）"""
+    parts = []
+    if "human" in exchange:
+        parts.append(f"User: {exchange['human']}")
+    if "assistant" in exchange:
+        parts.append(f"Assistant: {exchange['assistant']}")
+    return "\n".join(parts)
+
+
 class ManagerAgent(BaseAgent):
     """
     Central Manager Agent for the multi-agent system.
@@ -624,7 +635,7 @@ Guidelines:
                 session_id=session_id or ""
             )
         
-        llm_result = await self.llm_service.generate(prompt=prompt)
+        llm_result = await self.llm_service.generate(prompt=prompt, cache_family="answer", stream=True)
         response_text = llm_result.content if hasattr(llm_result, 'content') else str(llm_result)
         
         # Debug trace: record output
@@ -856,7 +867,9 @@ If there was an error, explain it helpfully."""
                 "Be concise. Use bullet points or tables when appropriate."
             ),
             temperature=0.3,
-            session_id=session_id or self.agent_name
+            session_id=session_id or self.agent_name,
+            cache_family="answer",
+            stream=True
         )
         response_text = formatted.content if hasattr(formatted, "content") else str(formatted)
 
@@ -1662,6 +1675,22 @@ If there was an error, explain it helpfully."""
             except Exception as e:
                 logger.debug(f"[Manager] Memory injection skipped for complex query: {e}")
             
+            # Token 預算：依序裁剪較早的對話、記憶、RAG 上下文（ThinkingAgent 只使用最近 5 輪）
+            budget = self.llm_service.budget
+            fitted = budget.fit(
+                [
+                    PromptSection("chat_history", priority=0, keep="end",
+                                  units=(chat_history or [])[-5:], formatter=_format_exchange),
+                    PromptSection("memory", memory_context, priority=1),
+                    PromptSection("rag", rag_context, priority=2),
+                ],
+                reserved_tokens=budget.count(query)
+            )
+            if fitted.trimmed:
+                logger.info(f"[Manager] Prompt trimmed {fitted.tokens_before} → {fitted.tokens_after} tokens: {fitted.trimmed}")
+            chat_history = fitted.units["chat_history"]
+            rag_context, memory_context = fitted["rag"], fitted["memory"]
+            
             # Combine RAG context with memory context
             combined_context = rag_context
             if memory_context:
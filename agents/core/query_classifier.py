@@ -102,7 +102,7 @@ Respond with ONLY the category name and a brief reason.
 Format: category|reason"""
 
         result = await self.llm_service.generate(
-            prompt=classification_prompt, temperature=0.1
+            prompt=classification_prompt, temperature=0.1, cache_family="classification"
         )
         response = result.content if hasattr(result, "content") else str(result)
 
@@ -268,12 +268,11 @@ Respond with your decision as JSON with these fields: should_use_rag, confidence
         
         Pipeline:
         1. Use KB Skills to identify relevant databases (instead of ALL DBs)
-        2. Query only targeted DBs with more candidates
+        2. Query only targeted DBs with more candidates (all sub-queries batched)
         3. Rerank results with cross-encoder
         4. Return top_k most relevant results
         """
         all_docs = []
-        seen_ids = set()
         
         try:
             # Phase 1: Skills-based DB routing
@@ -290,37 +289,29 @@ Respond with your decision as JSON with these fields: should_use_rag, confidence
             
             logger.info(f"[RAG] Querying targeted DBs: {targeted_dbs} (instead of all)")
             
-            # Phase 1: Use query_targeted_dbs with reranking
-            for query in queries:
-                try:
-                    result = await self.vectordb.query_targeted_dbs(
-                        query=query,
-                        db_names=targeted_dbs,
-                        top_k=top_k
-                    )
-                    
-                    for doc in result.get("results", []):
-                        doc_id = doc.get("id", doc.get("content", "")[:50])
-                        if doc_id not in seen_ids:
-                            seen_ids.add(doc_id)
-                            
-                            if "metadata" not in doc:
-                                doc["metadata"] = {}
-                            
-                            # Use rerank_score if available, else similarity
-                            if "rerank_score" in doc:
-                                doc["similarity_score"] = max(0, min(1, (doc["rerank_score"] + 5) / 10))
-                            elif "similarity" in doc:
-                                doc["similarity_score"] = doc["similarity"]
-                            elif "distance" in doc:
-                                doc["similarity_score"] = 1.0 / (1.0 + doc["distance"])
-                            else:
-                                doc["similarity_score"] = 0.5
-                            
-                            all_docs.append(doc)
-                except Exception as e:
-                    logger.warning(f"Error in targeted retrieval: {e}")
-                    continue
+            # Phase 1: All sub-queries in one batched pass (one embed batch,
+            # concurrent per-DB searches, one rerank call, dedup by chunk id)
+            result = await self.vectordb.query_multi(
+                queries=queries,
+                db_names=targeted_dbs,
+                top_k=top_k
+            )
+            
+            for doc in result.get("results", []):
+                if "metadata" not in doc:
+                    doc["metadata"] = {}
+                
+                # Use rerank_score if available, else similarity
+                if "rerank_score" in doc:
+                    doc["similarity_score"] = max(0, min(1, (doc["rerank_score"] + 5) / 10))
+                elif "similarity" in doc:
+                    doc["similarity_score"] = doc["similarity"]
+                elif "distance" in doc:
+                    doc["similarity_score"] = 1.0 / (1.0 + doc["distance"])
+                else:
+                    doc["similarity_score"] = 0.5
+                
+                all_docs.append(doc)
                     
         except Exception as e:
             logger.error(f"Error in retrieval pipeline: {e}")
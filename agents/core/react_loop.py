@@ -24,6 +24,7 @@ from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 
 from services.llm_service import LLMService
+from services.prompt_budget import PromptSection
 
 logger = logging.getLogger(__name__)
 
@@ -314,16 +315,17 @@ Respond in JSON:
         
         增強：加入 Metacognitive 自我評估
         """
-        # 構建歷史軌跡
-        history = ""
+        # 構建歷史軌跡（每個步驟為一個裁剪單位）
+        step_texts = []
         for step in previous_steps:
-            history += f"\nStep {step.step_number}:\n"
-            history += f"  Thought: {step.thought}\n"
-            history += f"  Action: {step.action.value}({step.action_input})\n"
+            step_text = f"\nStep {step.step_number}:\n"
+            step_text += f"  Thought: {step.thought}\n"
+            step_text += f"  Action: {step.action.value}({step.action_input})\n"
             if step.observation:
-                history += f"  Observation: {step.observation[:500]}...\n"
+                step_text += f"  Observation: {step.observation[:500]}...\n"
             if step.verification:
-                history += f"  Verification: valid={step.verification.is_valid}, score={step.verification.quality_score}\n"
+                step_text += f"  Verification: valid={step.verification.is_valid}, score={step.verification.quality_score}\n"
+            step_texts.append(step_text)
         
         # 構建失敗記錄
         failed_info = ""
@@ -390,12 +392,13 @@ Respond in this exact JSON format:
         
         system_message = "You are a reasoning agent with self-awareness. Analyze questions and decide actions step by step."
         
-        user_prompt = f"""Analyze the question and decide your next action.
+        def render(context: str, history: str) -> str:
+            return f"""Analyze the question and decide your next action.
 
 Question: {query}
 
 Current Knowledge Context:
-{context[:16000] if context else "No context yet."}
+{context if context else "No context yet."}
 
 Previous Steps:
 {history if history else "No previous steps."}
@@ -432,6 +435,17 @@ Respond in this exact JSON format:
 }}
 """
         
+        # Token 預算：先丟棄較早的步驟，再截斷知識上下文（保留開頭、相關度最高的部分）
+        budget = self.llm_service.budget
+        fitted = budget.fit(
+            [
+                PromptSection("history", priority=0, keep="end", units=step_texts, formatter=str, separator=""),
+                PromptSection("context", context or "", priority=1),
+            ],
+            reserved_tokens=budget.count_messages([render("", ""), system_message])
+        )
+        user_prompt = render(fitted["context"], fitted["history"])
+        
         try:
             result = await self.llm_service.generate(
                 prompt=user_prompt,
@@ -712,7 +726,9 @@ Provide a comprehensive answer based on available information. If information is
         result = await self.llm_service.generate(
             prompt=final_prompt,
             system_message=system_message,
-            temperature=0.3
+            temperature=0.3,
+            cache_family="answer",
+            stream=True
         )
         
         final_answer = result.content
@@ -149,12 +149,18 @@ class ThinkingAgent(BaseAgent):
             11
         )
         
-        reasonings = []
-        for i, comp in enumerate(components):
-            reasoning = await self._step_reason(comp, full_context)
-            reasonings.append(reasoning)
+        # Components are independent: reason about them concurrently and stream
+        # each one as soon as it finishes
+        reasonings = [""] * len(components)
+        async for i, result in self.llm_service.generate_as_completed(
+            [self._reason_prompt(comp, full_context) for comp in components],
+            system_message="You are a reasoning specialist.",
+            temperature=0.4,
+            session_id=self.agent_name
+        ):
+            reasonings[i] = result.content.strip()
             await self.stream_to_frontend(
-                f"   Component {i+1}: {reasoning[:200]}...\n",
+                f"   Component {i+1}: {reasonings[i][:200]}...\n",
                 12 + i
             )
         
@@ -222,9 +228,10 @@ List 2-4 key components (one per line):"""
         lines = result.content.strip().split("\n")
         return [line.strip().lstrip("0123456789.-) ") for line in lines if line.strip()]
     
-    async def _step_reason(self, component: str, context: str) -> str:
-        """Reason about a component"""
-        prompt = f"""Reason about this component/sub-question.
+    @staticmethod
+    def _reason_prompt(component: str, context: str) -> str:
+        """Prompt for reasoning about one component"""
+        return f"""Reason about this component/sub-question.
 
 Component: {component}
 
@@ -232,14 +239,6 @@ Available Context:
 {context[:2000] if context else "No additional context"}
 
 Your reasoning (2-4 sentences):"""
-        
-        result = await self.llm_service.generate(
-            prompt=prompt,
-            system_message="You are a reasoning specialist.",
-            temperature=0.4,
-            session_id=self.agent_name
-        )
-        return result.content.strip()
     
     async def _step_conclude(self, query: str, reasonings: List[str], history_context: str = "") -> str:
         """Synthesize final conclusion"""
@@ -257,11 +256,14 @@ Component Reasonings:
 Provide a comprehensive, well-reasoned answer that takes into account the conversation context.
 IMPORTANT: Respond in the SAME LANGUAGE as the original question above."""
         
+        # 最終答案：有 TokenSink 時逐 token 推送給客戶端
         result = await self.llm_service.generate(
             prompt=prompt,
             system_message=self.prompt_template.system_prompt,
             temperature=self.prompt_template.temperature,
-            session_id=self.agent_name
+            session_id=self.agent_name,
+            cache_family="answer",
+            stream=True
         )
         return result.content.strip()
     
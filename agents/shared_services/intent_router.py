@@ -174,7 +174,8 @@ class IntentRouter:
         result = await self.llm_service.generate(
             prompt=prompt, 
             system_message=system_message, 
-            temperature=0
+            temperature=0,
+            cache_family="intent"
         )
         intent_name = result.content.strip().lower().replace(" ", "_")
         
@@ -43,11 +43,49 @@ class Config:
     DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")  # 預設模型名稱
     TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))  # 溫度（隨機性）
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", "2000"))  # 最大回應 token 數
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # OpenAI 相容 API 位址（代理 / 本機服務，留空使用官方）
+    LLM_CLIENT_POOL_SIZE = int(os.getenv("LLM_CLIENT_POOL_SIZE", "32"))  # 依參數快取的 ChatOpenAI 實例上限
+    LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))  # 共用 HTTP 連線池最大連線數
+    LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))  # 保持 keep-alive 的閒置連線數
+    LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))  # 閒置連線保留秒數
+    LLM_RATE_LIMIT_RPM = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))  # 每分鐘請求上限（0 = 不限制；依帳號實際額度設定）
+    LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))  # 每分鐘 token 上限（prompt + max_tokens，0 = 不限制）
+    LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "6000"))  # 單次 prompt token 預算（超出時裁剪歷史 / 記憶 / RAG 段落，0 = 不限制）
+    LLM_BATCH_MAX_CONCURRENCY = int(os.getenv("LLM_BATCH_MAX_CONCURRENCY", "8"))  # generate_many 每批最大並行呼叫數
+    LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "0"))  # 單次 LLM 呼叫期限（秒，串流為第一個 token；0 = 不限制，預設關閉，可逐次以 timeout 指定）
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"  # 逾延遲門檻未完成時送出對沖請求（會增加供應商用量，預設關閉）
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))  # 對沖門檻 = 近期延遲的此分位數
+    LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))  # 對沖請求佔總呼叫數上限
+    LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "500"))  # 對沖門檻下限（毫秒）
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # 每個 (模型, prompt 家族) 需要的延遲樣本數
+    PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live").lower()  # LLM / 嵌入後端模式：live / record（錄製真實回應）/ replay（離線重播）
+    PROVIDER_RECORDINGS_DIR = os.getenv("PROVIDER_RECORDINGS_DIR", "./data/recordings")  # 錄製檔目錄（llm.jsonl / embeddings.jsonl）
+    PROVIDER_REPLAY_LATENCY = os.getenv("PROVIDER_REPLAY_LATENCY", "recorded")  # 重播 LLM 延遲：recorded / none / fixed:ms / uniform:lo,hi / normal:mean,sd / lognormal:median,sigma
+    PROVIDER_REPLAY_EMBEDDING_LATENCY = os.getenv("PROVIDER_REPLAY_EMBEDDING_LATENCY", "recorded")  # 重播嵌入延遲（格式同上）
+    PROVIDER_REPLAY_TOKEN_MS = float(os.getenv("PROVIDER_REPLAY_TOKEN_MS", "0"))  # 重播串流每個 chunk 的間隔（毫秒）
+    PROVIDER_REPLAY_SEED = int(os.getenv("PROVIDER_REPLAY_SEED", "0"))  # 合成延遲與假回應的隨機種子
+    PROVIDER_REPLAY_STRICT = os.getenv("PROVIDER_REPLAY_STRICT", "false").lower() == "true"  # 無錄製時報錯（否則產生確定性的假回應 / 向量）
+    PROVIDER_REPLAY_EMBEDDING_DIMS = int(os.getenv("PROVIDER_REPLAY_EMBEDDING_DIMS", "1536"))  # 無錄製時假向量的維度
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))  # LLM 快取記憶體層最大筆數
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 ** 2)))  # 記憶體層最大位元組數
+    LLM_CACHE_DEFAULT_TTL = int(os.getenv("LLM_CACHE_DEFAULT_TTL", "3600"))  # 預設 TTL（秒）
+    LLM_CACHE_TTLS = os.getenv("LLM_CACHE_TTLS", "classification=259200,intent=259200,structured=86400,answer=300")  # 各 prompt 家族 TTL（秒）
+    LLM_CACHE_PERSIST = os.getenv("LLM_CACHE_PERSIST", "true").lower() == "true"  # 啟用 SQLite 持久層（跨 worker 共用）
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./data/llm_cache.sqlite")  # 持久層檔案路徑
+    LLM_CACHE_DISK_MAX_BYTES = int(os.getenv("LLM_CACHE_DISK_MAX_BYTES", str(512 * 1024 ** 2)))  # 持久層最大位元組數
     
     # Vector Database Settings - 向量資料庫設定
     CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./rag-database/vectordb")  # Chroma DB 路徑
     MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", "./rag-database/memory")  # 記憶資料庫路徑
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")  # 嵌入模型名稱
+    EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()  # 嵌入後端：openai / local
+    LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")  # 本機嵌入模型
+    LOCAL_EMBEDDING_BACKEND = os.getenv("LOCAL_EMBEDDING_BACKEND", "torch").lower()  # 本機推論後端：torch / onnx
+    LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))  # 本機嵌入每批最大文本數
+    LOCAL_EMBEDDING_MAX_WAIT_MS = float(os.getenv("LOCAL_EMBEDDING_MAX_WAIT_MS", "5"))  # 本機嵌入收集批次等待時間（毫秒）
+    EMBEDDING_BATCHING_ENABLED = os.getenv("EMBEDDING_BATCHING_ENABLED", "true").lower() == "true"  # 跨請求合併嵌入呼叫
+    EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))  # 合併窗口（毫秒）
+    EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))  # 每批最大文本數（湊滿立即送出）
     
     # RAG Settings - RAG 相關設定
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "2000"))  # 分塊大小 (Phase 2: 1000→2000)
@@ -60,9 +98,49 @@ class Config:
     RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"  # 是否啟用 Cross-Encoder Reranking
     RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-12-v2")  # Reranking 模型
     MIN_SIMILARITY = float(os.getenv("MIN_SIMILARITY", "0.25"))  # 最低相似度門檻
+    RAG_FUSION_METHOD = os.getenv("RAG_FUSION_METHOD", "rrf").lower()  # 多資料庫合併：rrf / zscore / raw（舊版原始分數排序）
+    RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))  # RRF 平滑常數 k
+    RAG_FUSION_RERANK_POOL = int(os.getenv("RAG_FUSION_RERANK_POOL", "3"))  # 合併後送入 reranker 的候選數 = top_k × 此倍數
+    
+    # Storage layout - 向量資料庫存儲方式
+    VECTORDB_STORAGE_MODE = os.getenv("VECTORDB_STORAGE_MODE", "shared").lower()  # 新 DB：shared（共用客戶端中的集合）/ dedicated（每個 DB 一個目錄）
+    VECTORDB_MAX_OPEN_CLIENTS = int(os.getenv("VECTORDB_MAX_OPEN_CLIENTS", "8"))  # 舊版專屬客戶端同時開啟上限
+    VECTORDB_CLIENT_IDLE_SECONDS = float(os.getenv("VECTORDB_CLIENT_IDLE_SECONDS", "60"))  # 專屬客戶端閒置多久後可被釋放
+    VECTORDB_SEGMENT_CACHE_BYTES = int(os.getenv("VECTORDB_SEGMENT_CACHE_BYTES", str(2 * 1024 ** 3)))  # 共用客戶端 HNSW 分段 LRU 快取上限（0 = 不限制）
+    VECTORDB_CATALOG_VERIFY_SECONDS = float(os.getenv("VECTORDB_CATALOG_VERIFY_SECONDS", "300"))  # 列表目錄與集合的 id 指紋比對間隔（0 = 只比對筆數）
+    
+    # Lifecycle - TTL / 軟刪除 / 壓縮
+    VECTORDB_COMPACTION_INTERVAL_SECONDS = float(os.getenv("VECTORDB_COMPACTION_INTERVAL_SECONDS", "3600"))  # 背景壓縮間隔（0 = 停用）
+    VECTORDB_TOMBSTONE_REBUILD_RATIO = float(os.getenv("VECTORDB_TOMBSTONE_REBUILD_RATIO", "0.2"))  # 自上次重建以來刪除比例超過此值時重建索引
+    
+    # Metadata pre-filter index - 過濾查詢的次要索引
+    VECTORDB_FILTER_FIELDS = os.getenv("VECTORDB_FILTER_FIELDS", "document_type,category,source,tags,chunk_type")  # 建立倒排索引的 metadata 欄位（tags 為多值欄位）
+    VECTORDB_PREFILTER_EXACT_MAX = int(os.getenv("VECTORDB_PREFILTER_EXACT_MAX", "2000"))  # 符合分塊數不超過此值時改用精確搜尋
+    VECTORDB_FILTER_OVERSAMPLE_MAX = float(os.getenv("VECTORDB_FILTER_OVERSAMPLE_MAX", "8"))  # HNSW 過濾查詢的最大放大倍數
+    
+    # Columnar export / import - 欄式匯出 / 匯入
+    VECTORDB_EXPORT_PATH = os.getenv("VECTORDB_EXPORT_PATH", "./rag-database/exports")  # 匯出目錄（Parquet / Arrow + embeddings.npy）
+    VECTORDB_EXPORT_FORMAT = os.getenv("VECTORDB_EXPORT_FORMAT", "parquet").lower()  # 表格格式：parquet / arrow
+    
+    # Startup warm-up - 啟動預熱
+    VECTORDB_WARMUP_ENABLED = os.getenv("VECTORDB_WARMUP_ENABLED", "true").lower() == "true"  # 啟動時預熱向量資料庫
+    VECTORDB_WARMUP_DBS = os.getenv("VECTORDB_WARMUP_DBS", "")  # 預熱目標：空 = 目前啟用的 DB，* = 全部非空 DB，或逗號分隔名稱
+    VECTORDB_WARMUP_RERANKER = os.getenv("VECTORDB_WARMUP_RERANKER", "true").lower() == "true"  # 啟動時載入 reranker
+    
+    # Near-duplicate suppression - 近似重複分塊抑制
+    DEDUP_MODE = os.getenv("DEDUP_MODE", "link").lower()  # link（略過並在既有分塊記錄來源）/ skip / off
+    DEDUP_HAMMING_THRESHOLD = int(os.getenv("DEDUP_HAMMING_THRESHOLD", "3"))  # SimHash 漢明距離門檻（最大 3）
+    DEDUP_MIN_CHARS = int(os.getenv("DEDUP_MIN_CHARS", "100"))  # 短於此長度的分塊不做去重
     
     # Context Window - 上下文限制 (Phase 3)
     MAX_CONTEXT_CHARS = int(os.getenv("MAX_CONTEXT_CHARS", "16000"))  # 最大上下文字元數 (Phase 3: 3000→16000)
+    RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "4000"))  # 打包後上下文 token 上限
+    RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))  # MMR 相關性權重（1.0 = 不考慮多樣性）
+    
+    # SolidWorks Agent - SolidWorks 查詢擴展快取
+    SW_EXPANSION_CACHE_PATH = os.getenv("SW_EXPANSION_CACHE_PATH", "./data/solidworks_db/sw_expansion_cache.db")  # 擴展快取路徑
+    SW_EXPANSION_CACHE_TTL = int(os.getenv("SW_EXPANSION_CACHE_TTL", str(30 * 86400)))  # 擴展快取 TTL（秒）
+    SW_EXPANSION_CACHE_MAX_ENTRIES = int(os.getenv("SW_EXPANSION_CACHE_MAX_ENTRIES", "5000"))  # 擴展快取容量上限
     
     # Agent Settings - 智能體設定
     MAX_ITERATIONS = int(os.getenv("MAX_ITERATIONS", "10"))  # 最大迭代次數
@@ -164,6 +242,8 @@ class Config:
             "max_tokens": cls.MAX_TOKENS,
             "chroma_db_path": cls.CHROMA_DB_PATH,
             "embedding_model": cls.EMBEDDING_MODEL,
+            "embedding_provider": cls.EMBEDDING_PROVIDER,
+            "provider_mode": cls.PROVIDER_MODE,
             "chunk_size": cls.CHUNK_SIZE,
             "chunk_overlap": cls.CHUNK_OVERLAP,
             "top_k_retrieval": cls.TOP_K_RETRIEVAL,
@@ -12,9 +12,12 @@ FastAPI application that provides:
 import logging
 import asyncio
 import os
+import time
 from contextlib import asynccontextmanager
 from typing import Dict, Any
 
+_APP_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -46,6 +49,8 @@ from fast_api.middleware.auth import (
     get_request_logger
 )
 
+_APP_IMPORT_MS = round((time.perf_counter() - _APP_IMPORT_STARTED) * 1000, 1)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -69,20 +74,41 @@ async def create_agents():
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     logger.info("Starting API server...")
+    phases: Dict[str, Any] = {"app_import_ms": _APP_IMPORT_MS}
+    started = time.perf_counter()
 
     # Bootstrap the DI container (register interface → implementation mappings)
     _bootstrap_container()
 
     # Create and start agents
+    t0 = time.perf_counter()
     registry = await create_agents()
     await registry.start_all_agents()
+    phases["agents_ms"] = round((time.perf_counter() - t0) * 1000, 1)
     
     logger.info("All agents started")
     
+    # Pre-warm vector DBs, embedding backend and reranker so the first request doesn't pay for it
+    from services.vectordb_manager import vectordb_manager
+    if _AppConfig.VECTORDB_WARMUP_ENABLED:
+        await vectordb_manager.warm_up()
+    # Background TTL / soft-delete compaction (VECTORDB_COMPACTION_INTERVAL_SECONDS, 0 = off)
+    vectordb_manager.start_compaction_scheduler()
+    phases["vectordb"] = vectordb_manager.get_startup_report()
+    phases["lifespan_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    app.state.startup_report = phases
+    logger.info(
+        f"[Startup] import={_APP_IMPORT_MS}ms "
+        f"(vectordb module {phases['vectordb']['import_ms']}ms, init {phases['vectordb']['init_ms']}ms), "
+        f"agents={phases['agents_ms']}ms, "
+        f"warm-up={(phases['vectordb']['warm_up'] or {}).get('total_ms')}ms"
+    )
+    
     yield
     
     # Shutdown
     logger.info("Shutting down API server...")
+    await vectordb_manager.stop_compaction_scheduler()
     await registry.stop_all_agents()
     logger.info("All agents stopped")
 
@@ -246,6 +272,12 @@ async def health_check():
     return health
 
 
+@app.get("/api/startup")
+async def startup_report():
+    """Startup timing report: import, init and warm-up phases (ms)"""
+    return getattr(app.state, "startup_report", {"status": "starting"})
+
+
 @app.get("/api/stats")
 async def api_stats():
     """Get API usage statistics"""
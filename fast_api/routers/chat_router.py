@@ -20,6 +20,7 @@ Chat Router (Refactored)
 import logging
 import asyncio
 import json
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
@@ -31,6 +32,7 @@ from services.chat_service import ChatMode
 from fast_api.dependencies import get_chat, get_llm, get_rag
 from services.chat_service import ChatService
 from services.interfaces import ILLMService, IRAGService
+from services.llm_streaming import TokenSink, record_ttft
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +52,7 @@ class ChatRequest(BaseModel):
     use_rag: bool = Field(default=True, description="Whether to use RAG for context")
     async_mode: bool = Field(default=False, description="If True, returns task_id immediately and processes in background")
     enable_memory: bool = Field(default=True, description="Enable personalized memory capture")
+    stream: bool = Field(default=False, description="If True, /chat/send streams the final answer tokens as SSE")
 
 
 class ChatResponse(BaseModel):
@@ -96,9 +99,22 @@ async def send_message(request: ChatRequest, chat_service: ChatService = Depends
     模式：
     - async_mode=False（默認）：等待完整響應（20-60秒）
     - async_mode=True：立即返回 task_id，後台處理
+    - stream=True：SSE，經完整 agent 流程，最終答案 token 到達即推送
     
     異步模式：輪詢 /chat/task/{task_id} 獲取狀態，或通過 WebSocket 監聽更新
     """
+    started = time.perf_counter()
+    
+    if request.stream and not request.async_mode:
+        return StreamingResponse(
+            _send_stream(request, chat_service, started),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no"
+            }
+        )
     
     try:
         # ============================================
@@ -138,6 +154,7 @@ async def send_message(request: ChatRequest, chat_service: ChatService = Depends
             context=request.context,
             mode=ChatMode.SYNC
         )
+        record_ttft("/chat/send", (time.perf_counter() - started) * 1000, streamed=False)
         
         return ChatResponse(
             message_id=result.task_uid,
@@ -153,6 +170,58 @@ async def send_message(request: ChatRequest, chat_service: ChatService = Depends
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _send_stream(request: ChatRequest, chat_service: ChatService, started: float):
+    """/chat/send 的 SSE 串流：token 事件 → result（完整 ChatResponse）→ done"""
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    
+    async def on_token(token: str):
+        await queue.put(token)
+    
+    sink = TokenSink(on_token, route="/chat/send (sse)", started=started)
+    
+    async def run():
+        try:
+            return await chat_service.process_message(
+                message=request.message,
+                conversation_id=request.conversation_id,
+                user_id=request.user_id,
+                use_rag=request.use_rag,
+                enable_memory=request.enable_memory,
+                context=request.context,
+                mode=ChatMode.STREAM,
+                token_sink=sink
+            )
+        finally:
+            await queue.put(done)
+    
+    task = asyncio.create_task(run())
+    try:
+        while (token := await queue.get()) is not done:
+            yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+        
+        result = await task
+        sink.finish()
+        response = ChatResponse(
+            message_id=result.task_uid,
+            response=result.response,
+            conversation_id=result.conversation_id,
+            agents_involved=result.agents_involved,
+            sources=result.sources,
+            timestamp=result.timestamp
+        )
+        # 最終答案可能經驗證重試而與串流內容不同，以 result 為準
+        yield f"data: {json.dumps({'type': 'result', **response.model_dump(), 'streamed': sink.streamed, 'ttft_ms': round(sink.first_token_ms, 1)})}\n\n"
+        yield f"data: {json.dumps({'type': 'done', 'conversation_id': result.conversation_id})}\n\n"
+    except Exception as e:
+        logger.error(f"[Router] Streaming send error: {e}", exc_info=True)
+        yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+    finally:
+        # 客戶端中斷時取消流程
+        if not task.done():
+            task.cancel()
+
+
 # ========================================
 # Architecture V2: Agentic Loop Endpoint
 # ========================================
@@ -236,6 +305,8 @@ async def stream_message(
     使用 LLM provider 的原生串流 API，逐 token 返回。
     如果需要 RAG 上下文，先獲取上下文再串流 LLM 回應。
     """
+    started = time.perf_counter()
+    
     async def generate_stream():
         """生成 SSE 串流"""
         try:
@@ -269,6 +340,8 @@ async def stream_message(
                 system_message=system_message,
                 session_id=conversation_id
             ):
+                if not full_response and token:
+                    record_ttft("/chat/stream", (time.perf_counter() - started) * 1000)
                 full_response += token
                 yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
             
@@ -145,3 +145,32 @@ async def get_api_key_status():
             "partial_key": Config.GOOGLE_API_KEY[-8:] if Config.GOOGLE_API_KEY else None
         }
     }
+
+
+@router.get("/llm-stats")
+async def get_llm_stats():
+    """
+    LLM service statistics: token usage / cost, response-cache hit rates
+    (memory / persistent tiers, per prompt family), single-flight coalescing,
+    the pooled ChatOpenAI clients, rate-limit budgets per priority lane and
+    hedged-request / deadline stats with p50 / p95 / p99 latency, and the
+    provider mode (live / record / replay) with recording / replay counts,
+    the prompt token budget with per-section trimming counts, and
+    time-to-first-token per chat route.
+    """
+    from services.llm_service import get_llm_service
+    from services.llm_streaming import get_ttft_stats
+
+    llm_service = get_llm_service()
+    return {
+        "success": True,
+        "usage": llm_service.tracker.get_stats() if llm_service.tracker else None,
+        "cache": llm_service.get_cache_stats(),
+        "single_flight": llm_service.get_singleflight_stats(),
+        "clients": llm_service.clients.get_stats(),
+        "rate_limit": llm_service.get_rate_limit_budgets(),
+        "hedging": llm_service.get_hedging_stats(),
+        "provider": llm_service.get_provider_stats(),
+        "prompt_budget": llm_service.get_prompt_budget_stats(),
+        "ttft": get_ttft_stats()
+    }
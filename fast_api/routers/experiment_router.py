@@ -22,6 +22,8 @@ from pydantic import BaseModel, Field
 
 from fast_api.dependencies import get_llm, get_vdb
 from services.interfaces import ILLMService, IVectorDBService
+from services.context_packer import ContextPacker
+from config.config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -113,7 +115,8 @@ async def fast_rag_query(
             query=request.query,
             db_names=targeted_dbs,
             top_k=request.top_k,
-            min_similarity=request.min_similarity
+            min_similarity=request.min_similarity,
+            include_embeddings=True
         )
         
         docs = result.get("results", [])
@@ -128,13 +131,19 @@ async def fast_rag_query(
                 metadata={"dbs_searched": targeted_dbs}
             )
         
-        # Build context from retrieved docs
-        context_parts = []
+        # Build context from retrieved docs: merge overlapping chunks, MMR, token budget
+        docs = docs[:request.top_k]
+        packed = ContextPacker(
+            token_budget=Config.RAG_CONTEXT_TOKEN_BUDGET,
+            mmr_lambda=Config.RAG_MMR_LAMBDA,
+            formatter=lambda i, unit: f"[Source {i}] ({unit.database or 'unknown'}):\n{unit.content}"
+        ).pack(docs, query_embedding=result.get("query_embedding"))
+        context = packed.text
+        
         sources = []
-        for i, doc in enumerate(docs[:request.top_k]):
-            content = doc.get("content", "")[:3000]
+        for i, doc in enumerate(docs):
+            content = doc.get("content", "")
             meta = doc.get("metadata", {})
-            context_parts.append(f"[Source {i+1}] ({meta.get('source_db', 'unknown')}):\n{content}")
             sources.append({
                 "title": meta.get("title", meta.get("source", f"Doc {i+1}")),
                 "database": meta.get("source_db", ""),
@@ -143,15 +152,13 @@ async def fast_rag_query(
                 "snippet": content[:200]
             })
         
-        context = "\n\n".join(context_parts)
-        
         # === LLM Call 2: Generate final answer ===
         answer_prompt = f"""Answer the user's question based on the following knowledge base context.
 If the context doesn't contain enough information, say so honestly.
 Match the language of the user's question.
 
 Context:
-{context[:16000]}
+{context}
 
 Question: {request.query}
 
@@ -178,7 +185,10 @@ Answer:"""
                 "dbs_searched": targeted_dbs,
                 "docs_retrieved": len(docs),
                 "reranked": result.get("reranked", False),
-                "context_chars": len(context)
+                "context_chars": len(context),
+                "context_tokens": packed.tokens_used,
+                "context_tokens_raw": packed.tokens_raw,
+                "context_chunks_merged": packed.chunks_merged
             }
         )
         
@@ -8,6 +8,7 @@ REST API endpoints for RAG operations:
 - Vector database management (create, switch, list)
 """
 
+import asyncio
 import logging
 import json
 from typing import Dict, Any, List, Optional
@@ -143,7 +144,7 @@ async def smart_query(request: SmartQueryRequest, vectordb_manager: IVectorDBSer
 async def _multi_database_search(request: SmartQueryRequest, vectordb_manager: IVectorDBService) -> Dict[str, Any]:
     """Search across all databases and merge results"""
     databases = vectordb_manager.list_databases()
-    all_results = []
+    per_db = {}
     database_counts = {}
     databases_searched = []
     
@@ -167,29 +168,36 @@ async def _multi_database_search(request: SmartQueryRequest, vectordb_manager: I
             for r in results:
                 r["source_database"] = db_name
                 r["database_description"] = db_info.get("description", "")
-                all_results.append(r)
             
+            # Filter by threshold if specified (distance converted to similarity)
+            if request.threshold > 0:
+                results = [r for r in results if (1 - r.get("distance", 1) / 2) >= request.threshold]
+            
+            per_db[db_name] = results
             database_counts[db_name] = len(results)
         except Exception as e:
             logger.warning(f"Error searching {db_name}: {e}")
             continue
     
-    # Sort by relevance score (lower distance = better)
-    all_results.sort(key=lambda x: x.get("distance", 999))
-    
-    # Filter by threshold if specified
-    if request.threshold > 0:
-        # Convert distance to similarity for threshold comparison
-        all_results = [r for r in all_results if (1 - r.get("distance", 1) / 2) >= request.threshold]
-    
-    # Limit total results
-    all_results = all_results[:request.top_k * 3]
+    # Merge on per-DB normalized scores (raw L2 distances are not comparable across collections)
+    from config.config import Config
+    from services.vectordb.fusion import fuse_results
+    config = Config()
+    all_results = fuse_results(
+        per_db,
+        top_k=request.top_k * 3,
+        method=config.RAG_FUSION_METHOD,
+        score_key="distance",
+        higher_is_better=False,
+        rrf_k=config.RAG_RRF_K
+    )
     
     return {
         "query": request.query,
         "mode": "multi",
         "databases_searched": databases_searched,
         "database_counts": database_counts,
+        "fusion": config.RAG_FUSION_METHOD,
         "results": all_results,
         "total_results": len(all_results)
     }
@@ -471,6 +479,37 @@ class InsertDocumentRequest(BaseModel):
     category: str = Field(default="general", description="Document category")
     tags: List[str] = Field(default_factory=list, description="Document tags")
     summarize: bool = Field(default=True, description="Summarize before insertion")
+    ttl_seconds: Optional[float] = Field(default=None, description="Expire the document after this many seconds")
+
+
+class DeleteDocumentsRequest(BaseModel):
+    """Request to delete documents in bulk"""
+    ids: List[str] = Field(description="Chunk ids to delete")
+    hard: bool = Field(default=False, description="Remove now instead of soft delete + compaction")
+
+
+class MigrateEmbeddingProfileRequest(BaseModel):
+    """Request to migrate a database to a new embedding profile"""
+    dimensions: Optional[int] = Field(default=None, description="Target dimensions (None restores native output)")
+    method: str = Field(default="auto", description="auto / full / native / pca / random_projection")
+    dtype: str = Field(default="float32", description="Recorded vector dtype")
+    sample_size: int = Field(default=5000, description="Vectors sampled to fit PCA")
+    dry_run: bool = Field(default=False, description="Only report the size estimate")
+
+
+class ExportDatabaseRequest(BaseModel):
+    """Request to export a database in columnar format"""
+    export_name: Optional[str] = Field(default=None, description="Export name (default: <db>-<timestamp>)")
+    table_format: Optional[str] = Field(default=None, description="parquet / arrow")
+    dtype: Optional[str] = Field(default=None, description="Embedding dtype in embeddings.npy: float32 / float16")
+    include_deleted: bool = Field(default=False, description="Keep soft-deleted and expired chunks")
+
+
+class ImportDatabaseRequest(BaseModel):
+    """Request to bulk-load a columnar export"""
+    export_name: str = Field(description="Export name in the export directory")
+    db_name: Optional[str] = Field(default=None, description="Target database (default: exported name)")
+    description: Optional[str] = Field(default=None, description="Description for a new database")
 
 
 class QueryDatabaseRequest(BaseModel):
@@ -516,6 +555,12 @@ async def list_databases(vectordb_manager: IVectorDBService = Depends(get_vdb)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/embeddings/stats")
+async def get_embedding_stats(vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """Embedding backend stats: batch fill, batch / wait latency histograms, in-flight dedup hits"""
+    return {"success": True, "stats": vectordb_manager.get_embedding_stats()}
+
+
 # ============== Knowledge Base Skills ==============
 # NOTE: These fixed-path routes MUST come before /databases/{db_name}
 
@@ -708,6 +753,69 @@ async def consolidate_databases(vectordb_manager: IVectorDBService = Depends(get
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/databases/compact")
+async def compact_all_databases(dry_run: bool = False, vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """Run the TTL / soft-delete compaction job on every database"""
+    try:
+        result = await vectordb_manager.compact_all_databases(dry_run=dry_run)
+        return {
+            "success": True,
+            **result
+        }
+    except Exception as e:
+        logger.error(f"Compaction error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/databases/exports")
+async def list_exports(vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """List columnar exports (Parquet / Arrow + embeddings.npy)"""
+    try:
+        exports = vectordb_manager.list_exports()
+        return {
+            "success": True,
+            "exports": exports,
+            "count": len(exports)
+        }
+    except Exception as e:
+        logger.error(f"List exports error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/databases/import")
+async def import_database(request: ImportDatabaseRequest, vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """Bulk-load a columnar export without re-embedding"""
+    export_name = _require_safe_db(request.export_name)
+    db_name = _require_safe_db(request.db_name) if request.db_name else None
+    try:
+        result = await vectordb_manager.import_database(
+            export_name, db_name=db_name, description=request.description
+        )
+        return {
+            "success": True,
+            **result
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Import error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/databases/dedup")
+async def dedup_all_databases(dry_run: bool = False, vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """Remove near-duplicate chunks from every database. Reports vectors and bytes saved."""
+    try:
+        result = await vectordb_manager.dedup_all_databases(dry_run=dry_run)
+        return {
+            "success": True,
+            **result
+        }
+    except Exception as e:
+        logger.error(f"Dedup error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/databases/backup/download/{backup_filename}")
 async def download_backup(backup_filename: str, vectordb_manager: IVectorDBService = Depends(get_vdb)):
     """Download a backup file"""
@@ -798,7 +906,8 @@ async def insert_document_to_db(request: InsertDocumentRequest, vectordb_manager
                 title=request.title,
                 source=request.source,
                 category=request.category,
-                tags=request.tags
+                tags=request.tags,
+                ttl_seconds=request.ttl_seconds
             )
         else:
             result = await vectordb_manager.insert_full_text(
@@ -807,7 +916,8 @@ async def insert_document_to_db(request: InsertDocumentRequest, vectordb_manager
                 title=request.title,
                 source=request.source,
                 category=request.category,
-                tags=request.tags
+                tags=request.tags,
+                ttl_seconds=request.ttl_seconds
             )
         
         return result
@@ -908,49 +1018,52 @@ async def upload_to_database(
 # ============== Document Management ==============
 
 @router.get("/databases/{db_name}/documents")
-async def list_database_documents(db_name: str, limit: int = 100, offset: int = 0, vectordb_manager: IVectorDBService = Depends(get_vdb)):
-    """List all documents in a database with their content preview"""
+async def list_database_documents(
+    db_name: str,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: str = "full",
+    metadata_fields: Optional[str] = None,
+    group_by: Optional[str] = None,
+    source: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    vectordb_manager: IVectorDBService = Depends(get_vdb)
+):
+    """
+    List documents in a database.
+    
+    Pass `next_cursor` back as `cursor` for constant-time paging at any depth.
+    `fields`: ids | preview | metadata | full (default, includes content).
+    `metadata_fields`: comma-separated metadata keys to return.
+    `group_by`: source | content_hash lists documents instead of chunks;
+    `source` / `content_hash` then list one document's chunks.
+    """
     db_name = _require_safe_db(db_name)
     try:
         info = vectordb_manager.get_database_info(db_name)
         if not info:
             raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
         
-        # Get documents from the collection
-        collection = vectordb_manager._get_collection(db_name)
-        if not collection:
-            return {
-                "success": True,
-                "database": db_name,
-                "documents": [],
-                "total": 0
-            }
-        
-        # Get all documents
-        result = collection.get(
-            limit=limit,
-            offset=offset,
-            include=["documents", "metadatas"]
-        )
-        
-        documents = []
-        if result and result.get("ids"):
-            for i, doc_id in enumerate(result["ids"]):
-                doc = {
-                    "id": doc_id,
-                    "content": result["documents"][i] if result.get("documents") else "",
-                    "metadata": result["metadatas"][i] if result.get("metadatas") else {}
-                }
-                # Add preview
-                content = doc["content"] or ""
-                doc["preview"] = content[:200] + "..." if len(content) > 200 else content
-                documents.append(doc)
+        where = {k: v for k, v in (("source", source), ("content_hash", content_hash)) if v is not None}
+        try:
+            result = await vectordb_manager.list_documents(
+                db_name,
+                cursor=cursor,
+                limit=max(1, min(limit, 1000)),
+                offset=offset,
+                fields=fields,
+                metadata_fields=[f.strip() for f in metadata_fields.split(",") if f.strip()] if metadata_fields else None,
+                group_by=group_by,
+                where=where or None
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
-            "database": db_name,
-            "documents": documents,
-            "total": len(documents),
+            **result,
+            "total": len(result.get("groups", result.get("documents", []))),
             "limit": limit,
             "offset": offset
         }
@@ -962,22 +1075,42 @@ async def list_database_documents(db_name: str, limit: int = 100, offset: int =
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/databases/{db_name}/dedup")
+async def dedup_database(db_name: str, dry_run: bool = False, vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """Remove near-duplicate chunks from a database"""
+    db_name = _require_safe_db(db_name)
+    try:
+        if not vectordb_manager.get_database_info(db_name):
+            raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
+        result = await vectordb_manager.dedup_database(db_name, dry_run=dry_run)
+        return {
+            "success": True,
+            **result
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Dedup error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/databases/{db_name}/documents/{doc_id}")
-async def delete_document(db_name: str, doc_id: str, vectordb_manager: IVectorDBService = Depends(get_vdb)):
-    """Delete a specific document from a database"""
+async def delete_document(db_name: str, doc_id: str, hard: bool = False, vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """Delete a specific document (soft delete by default; removed by the next compaction)"""
     db_name = _require_safe_db(db_name)
     try:
-        collection = vectordb_manager._get_collection(db_name)
-        if not collection:
+        if not vectordb_manager.get_database_info(db_name):
             raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
         
-        # Delete the document
-        collection.delete(ids=[doc_id])
+        result = await vectordb_manager.delete_documents(db_name, [doc_id], hard=hard)
+        if not result["deleted"]:
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found")
         
         return {
             "success": True,
             "deleted": doc_id,
-            "database": db_name
+            "database": db_name,
+            "hard": hard
         }
         
     except HTTPException:
@@ -987,6 +1120,155 @@ async def delete_document(db_name: str, doc_id: str, vectordb_manager: IVectorDB
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/databases/{db_name}/documents/delete")
+async def delete_documents(db_name: str, request: DeleteDocumentsRequest, vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """Bulk delete documents (soft delete by default)"""
+    db_name = _require_safe_db(db_name)
+    try:
+        if not vectordb_manager.get_database_info(db_name):
+            raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
+        result = await vectordb_manager.delete_documents(db_name, request.ids, hard=request.hard)
+        return {
+            "success": True,
+            **result
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk delete error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/databases/{db_name}/compact")
+async def compact_database(
+    db_name: str,
+    dry_run: bool = False,
+    force_rebuild: bool = False,
+    vectordb_manager: IVectorDBService = Depends(get_vdb)
+):
+    """Remove expired / soft-deleted chunks and rebuild the index when the tombstone ratio is high"""
+    db_name = _require_safe_db(db_name)
+    try:
+        if not vectordb_manager.get_database_info(db_name):
+            raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
+        result = await vectordb_manager.compact_database(db_name, force_rebuild=force_rebuild, dry_run=dry_run)
+        return {
+            "success": True,
+            **result
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Compaction error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/databases/{db_name}/filters")
+async def get_filter_values(
+    db_name: str,
+    field: str = "tags",
+    limit: int = 50,
+    vectordb_manager: IVectorDBService = Depends(get_vdb)
+):
+    """Most common values of an indexed metadata field (for building query filters)"""
+    db_name = _require_safe_db(db_name)
+    try:
+        if not vectordb_manager.get_database_info(db_name):
+            raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
+        values = await asyncio.to_thread(vectordb_manager.get_filter_values, db_name, field, min(limit, 500))
+        return {
+            "success": True,
+            "database": db_name,
+            "field": field,
+            "values": values
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Filter values error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/databases/{db_name}/export")
+async def export_database(
+    db_name: str,
+    request: ExportDatabaseRequest = None,
+    vectordb_manager: IVectorDBService = Depends(get_vdb)
+):
+    """Export a database as Parquet / Arrow + embeddings.npy (streamed page by page)"""
+    db_name = _require_safe_db(db_name)
+    request = request or ExportDatabaseRequest()
+    export_name = _require_safe_db(request.export_name) if request.export_name else None
+    try:
+        if not vectordb_manager.get_database_info(db_name):
+            raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
+        result = await vectordb_manager.export_database(
+            db_name,
+            export_name,
+            table_format=request.table_format,
+            dtype=request.dtype,
+            include_deleted=request.include_deleted
+        )
+        return {
+            "success": True,
+            **result
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Export error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/databases/{db_name}/embedding-profile")
+async def get_embedding_profile(db_name: str, vectordb_manager: IVectorDBService = Depends(get_vdb)):
+    """Get the stored vector format (model, dimensions, dtype, reduction method) of a database"""
+    db_name = _require_safe_db(db_name)
+    if not vectordb_manager.get_database_info(db_name):
+        raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
+    return {
+        "success": True,
+        "database": db_name,
+        "profile": vectordb_manager.get_embedding_profile(db_name).to_dict()
+    }
+
+
+@router.post("/databases/{db_name}/embedding-profile/migrate")
+async def migrate_embedding_profile(
+    db_name: str,
+    request: MigrateEmbeddingProfileRequest,
+    vectordb_manager: IVectorDBService = Depends(get_vdb)
+):
+    """Re-project or re-embed a database into a new embedding profile (reads stay on the old one until swap)"""
+    db_name = _require_safe_db(db_name)
+    try:
+        if not vectordb_manager.get_database_info(db_name):
+            raise HTTPException(status_code=404, detail=f"Database '{db_name}' not found")
+        result = await vectordb_manager.migrate_embedding_profile(
+            db_name,
+            dimensions=request.dimensions,
+            method=request.method,
+            dtype=request.dtype,
+            sample_size=request.sample_size,
+            dry_run=request.dry_run
+        )
+        return {
+            "success": True,
+            **result
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Embedding profile migration error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============== Per-Database Skills (parameterized routes) ==============
 
 @router.get("/databases/{db_name}/skills")
@@ -37,6 +37,7 @@ from services.chat_service import ChatMode
 from fast_api.dependencies import get_chat
 from services.chat_service import ChatService
 from agents.shared_services.websocket_manager import WebSocketManager
+from services.llm_streaming import TokenSink
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +60,7 @@ class WSMessageType(str, Enum):
     THINKING = "thinking"
     SEARCHING = "searching"
     STEP = "step"
+    TOKEN = "token"
     SOURCES = "sources"
     FINAL_ANSWER = "final_answer"
     ERROR = "error"
@@ -85,7 +87,7 @@ async def websocket_chat(websocket: WebSocket, chat_service: ChatService = Depen
     WebSocket 聊天端點
     
     支持：
-    - 實時串流響應
+    - 實時串流響應（最終答案逐 token 推送：type="token"，最後仍發送完整 final_answer）
     - 思考過程推送
     - 任務取消
     - 心跳保持
@@ -154,6 +156,14 @@ async def websocket_chat(websocket: WebSocket, chat_service: ChatService = Depen
                         "timestamp": datetime.now().isoformat()
                     })
                 
+                # 最終答案 token（首個 token 延遲計入 /ws/chat 的 TTFT）
+                task_id = current_task_id
+                
+                async def on_token(token: str):
+                    await stream_callback(WSMessageType.TOKEN, {"token": token, "task_id": task_id})
+                
+                sink = TokenSink(on_token, route="/ws/chat")
+                
                 try:
                     # 發送思考中狀態
                     await stream_callback(
@@ -170,8 +180,10 @@ async def websocket_chat(websocket: WebSocket, chat_service: ChatService = Depen
                         use_rag=chat_msg.use_rag,
                         enable_memory=chat_msg.use_memory,
                         mode=ChatMode.STREAM,
-                        stream_callback=stream_callback
+                        stream_callback=stream_callback,
+                        token_sink=sink
                     )
+                    sink.finish()
                     
                     # 發送來源（如果有）
                     if result.sources:
@@ -190,7 +202,9 @@ async def websocket_chat(websocket: WebSocket, chat_service: ChatService = Depen
                             "response": result.response,
                             "agents_involved": result.agents_involved,
                             "conversation_id": result.conversation_id,
-                            "task_id": current_task_id
+                            "task_id": current_task_id,
+                            "streamed": sink.streamed,
+                            "ttft_ms": round(sink.first_token_ms, 1)
                         },
                         "timestamp": result.timestamp
                     })
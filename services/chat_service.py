@@ -35,6 +35,9 @@ from agents.shared_services.message_protocol import TaskAssignment
 from agents.core.entry_classifier import get_entry_classifier
 from config.config import Config
 from services.vectordb_manager import vectordb_manager
+from services.context_packer import ContextPacker
+from services.llm_rate_limiter import Priority, with_priority
+from services.llm_streaming import TokenSink, token_sink_scope
 from services.task_manager import task_manager, TaskStatus
 from services.session_db import session_db, TaskStatus as DBTaskStatus, StepType
 from services.cerebro_memory import get_cerebro, MemoryType, MemoryImportance
@@ -311,44 +314,51 @@ class ChatService:
                     results = await vectordb_manager.query(
                         query=query,
                         db_name=db_name,
-                        n_results=3
+                        n_results=3,
+                        include_embeddings=True
                     )
-                    if results and "documents" in results and results["documents"]:
-                        docs = results["documents"][0]
-                        metadatas = results.get("metadatas", [[]])[0]
-                        distances = results.get("distances", [[]])[0]
-                        items = []
-                        for doc, meta, dist in zip(docs, metadatas, distances):
-                            items.append((db_name, doc, meta, dist))
-                        return items
-                    return []
+                    items = results.get("results", []) if results else []
+                    for item in items:
+                        item["database"] = db_name
+                    return items, results.get("query_embedding") if results else None
                 except Exception as db_error:
                     logger.error(f"Error querying database {db_name}: {db_error}")
-                    return []
+                    return [], None
 
             # 所有 DB 同時查詢
             per_db_results = await asyncio.gather(
                 *[_query_one_db(db) for db in active_dbs]
             )
 
+            all_items = []
             all_sources = []
-            all_contexts = []
-            for db_items in per_db_results:
-                for (db_name, doc, meta, dist) in db_items:
-                    all_contexts.append(doc)
+            query_embedding = None
+            for db_items, db_query_embedding in per_db_results:
+                query_embedding = query_embedding or db_query_embedding
+                for item in db_items:
+                    dist = item.get("distance")
+                    all_items.append(item)
                     all_sources.append({
-                        "database": db_name,
-                        "content": doc[:300],
-                        "metadata": meta,
+                        "database": item["database"],
+                        "content": item["content"][:300],
+                        "metadata": item.get("metadata", {}),
                         "relevance_score": float(1 - dist) if dist else 0.0,
                         "rank": len(all_sources) + 1
                     })
 
-            # 合併上下文
-            if all_contexts:
-                combined_context = "\n\n---\n\n".join(all_contexts[:10])
-                logger.info(f"Retrieved {len(all_contexts)} contexts from {len(active_dbs)} databases")
-                return combined_context, all_sources
+            # 合併上下文（去除重疊、MMR 多樣性、token 預算）
+            if all_items:
+                packed = ContextPacker(
+                    token_budget=Config.RAG_CONTEXT_TOKEN_BUDGET,
+                    mmr_lambda=Config.RAG_MMR_LAMBDA,
+                    formatter=lambda i, unit: unit.content,
+                    separator="\n\n---\n\n"
+                ).pack(all_items, query_embedding=query_embedding)
+                logger.info(
+                    f"Retrieved {len(all_items)} contexts from {len(active_dbs)} databases "
+                    f"(packed {packed.tokens_raw} → {packed.tokens_used} tokens)"
+                )
+                return packed.text, all_sources
             else:
                 return "", []
                 
@@ -380,6 +390,7 @@ class ChatService:
         
         return ""
     
+    @with_priority(Priority.BACKGROUND)
     async def capture_memory(
         self,
         user_id: str,
@@ -416,6 +427,7 @@ class ChatService:
     # 核心處理邏輯
     # ========================================
     
+    @with_priority(Priority.INTERACTIVE)
     async def process_message(
         self,
         message: str,
@@ -425,7 +437,8 @@ class ChatService:
         enable_memory: bool = True,
         context: Dict[str, Any] = None,
         mode: ChatMode = ChatMode.SYNC,
-        stream_callback: Optional[Callable] = None
+        stream_callback: Optional[Callable] = None,
+        token_sink: Optional[TokenSink] = None
     ) -> ProcessingResult:
         """
         處理聊天消息的核心方法
@@ -439,12 +452,29 @@ class ChatService:
             context: 額外上下文
             mode: 處理模式（sync/async/stream）
             stream_callback: 串流回調函數（僅 stream 模式）
+            token_sink: 最終答案的 token 接收端（SSE / WebSocket 逐 token 推送，記錄 TTFT）
         
         Returns:
             ProcessingResult: 處理結果
         """
-        context = context or {}
-        
+        with token_sink_scope(token_sink):
+            return await self._process_message(
+                message, conversation_id, user_id, use_rag, enable_memory,
+                context or {}, mode, stream_callback
+            )
+    
+    async def _process_message(
+        self,
+        message: str,
+        conversation_id: Optional[str],
+        user_id: str,
+        use_rag: bool,
+        enable_memory: bool,
+        context: Dict[str, Any],
+        mode: ChatMode,
+        stream_callback: Optional[Callable]
+    ) -> ProcessingResult:
+        """process_message 的主體（在 token_sink_scope 內執行）"""
         # 確保 Redis 已初始化
         await self._ensure_redis()
         
@@ -616,6 +646,7 @@ class ChatService:
     # Architecture V2: Agentic Loop 處理
     # ========================================
     
+    @with_priority(Priority.INTERACTIVE)
     async def process_message_agentic(
         self,
         message: str,
@@ -0,0 +1,329 @@
+"""
+Context Packer - Token 預算內的 RAG 上下文打包
+
+檢索結果直接串接會重複送出大量相同文字：
+- 相鄰子塊之間有 CHUNK_OVERLAP（400 字元）重疊
+- 父塊展開後，同一父塊的多個子塊會得到完全相同的 parent_content
+
+打包流程：
+1. 合併 - 同一來源的重疊 / 相鄰分塊合併為一段（有 char_start/char_end
+   或 parent_start 偏移量時按區間合併，否則按文字首尾重疊合併）
+2. 多樣性 - 用檢索時已取得的 embeddings 做向量化 MMR 排序
+3. 預算 - 以 tokenizer 計算 token，依 MMR 順序填入 token 預算
+
+使用範例:
+    packer = ContextPacker(token_budget=4000)
+    packed = packer.pack(results, query_embedding=result.get("query_embedding"))
+    prompt = f"Context:\\n{packed.text}"
+    logger.info(packed.stats())
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.token_counter import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Optional numpy for vectorized MMR
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+# 預算剩餘少於此值時不再截斷塞入半段內容
+MIN_TRUNCATED_TOKENS = 80
+
+# 無偏移量時，首尾重疊的最短長度（同時作為搜尋探針）
+_MIN_OVERLAP_CHARS = 32
+
+
+@dataclass
+class ContextUnit:
+    """合併後的一段上下文"""
+    content: str
+    score: float
+    database: str
+    title: str
+    doc_key: Tuple[str, str]
+    span: Optional[Tuple[int, int]] = None
+    embeddings: List[Any] = field(default_factory=list)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    merged_count: int = 1
+    truncated: bool = False
+
+
+@dataclass
+class PackedContext:
+    """打包結果"""
+    text: str
+    units: List[ContextUnit]
+    tokens_used: int
+    tokens_raw: int
+    chunks_in: int
+    chunks_merged: int
+    units_dropped: int
+    token_budget: int
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "chunks_in": self.chunks_in,
+            "chunks_merged": self.chunks_merged,
+            "units_packed": len(self.units),
+            "units_dropped": self.units_dropped,
+            "tokens_raw": self.tokens_raw,
+            "tokens_used": self.tokens_used,
+            "tokens_saved": max(self.tokens_raw - self.tokens_used, 0),
+            "token_budget": self.token_budget
+        }
+
+
+def default_formatter(index: int, unit: ContextUnit) -> str:
+    label = f"{unit.database} · {unit.title}" if unit.title else unit.database
+    return f"[Source {index}] ({label}):\n{unit.content}"
+
+
+def _item_score(item: Dict[str, Any]) -> float:
+    if item.get("rerank_score") is not None:
+        return float(item["rerank_score"])
+    if item.get("similarity") is not None:
+        return float(item["similarity"])
+    if item.get("relevance") is not None:
+        return float(item["relevance"])
+    distance = item.get("distance")
+    return 1.0 / (1.0 + distance) if distance is not None else 0.0
+
+
+def _item_span(content: str, meta: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """分塊在原文中的區間（只在內容與偏移量一致時使用）"""
+    try:
+        if meta.get("context_expanded") and meta.get("parent_start") not in (None, ""):
+            start = int(meta["parent_start"])
+            return start, start + len(content)
+        if meta.get("char_start") not in (None, "") and meta.get("char_end") not in (None, ""):
+            start, end = int(meta["char_start"]), int(meta["char_end"])
+            if end - start == len(content):
+                return start, end
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _merge_text_overlap(a: str, b: str) -> Optional[str]:
+    """a 的結尾與 b 的開頭重疊時回傳合併文字；b 被 a 包含時回傳 a"""
+    if b in a:
+        return a
+    probe = b[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return None
+    pos = a.find(probe, max(len(a) - len(b), 0))
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return a + b[len(a) - pos:]
+        pos = a.find(probe, pos + 1)
+    return None
+
+
+class ContextPacker:
+    """
+    RAG 上下文打包器
+
+    Args:
+        token_budget: 上下文 token 上限（含來源標籤）
+        mmr_lambda: MMR 相關性權重（1.0 = 只看相關性，0.0 = 只看多樣性）
+        model: tokenizer 對應的模型
+        formatter: (index, unit) -> str，控制每段的標籤格式
+        separator: 段落之間的分隔字串
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 4000,
+        mmr_lambda: float = 0.7,
+        model: Optional[str] = None,
+        formatter: Callable[[int, ContextUnit], str] = default_formatter,
+        separator: str = "\n\n"
+    ):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.model = model
+        self.formatter = formatter
+        self.separator = separator
+
+    # =========================================================================
+    # 公開介面
+    # =========================================================================
+
+    def pack(
+        self,
+        items: List[Dict[str, Any]],
+        query_embedding: Optional[List[float]] = None
+    ) -> PackedContext:
+        """
+        打包檢索結果
+
+        Args:
+            items: 檢索結果（content / metadata / similarity|rerank_score|distance /
+                   可選 embedding / 可選 database）
+            query_embedding: 查詢向量（無分數時用於計算相關性）
+        """
+        items = [it for it in items if (it.get("content") or "").strip()]
+        tokens_raw = sum(count_tokens(it["content"], self.model) for it in items)
+
+        units = self._merge(items)
+        chunks_merged = len(items) - len(units)
+        ordered = self._mmr_order(units, query_embedding)
+
+        packed: List[ContextUnit] = []
+        parts: List[str] = []
+        used = 0
+        sep_tokens = count_tokens(self.separator, self.model)
+        for unit in ordered:
+            text = self.formatter(len(packed) + 1, unit)
+            cost = count_tokens(text, self.model) + (sep_tokens if parts else 0)
+            remaining = self.token_budget - used
+            if cost <= remaining:
+                packed.append(unit)
+                parts.append(text)
+                used += cost
+                continue
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                # 先用空內容量出標籤成本，再把內容截斷到剩餘預算
+                header_cost = count_tokens(self.formatter(len(packed) + 1, ContextUnit(
+                    content="", score=unit.score, database=unit.database,
+                    title=unit.title, doc_key=unit.doc_key
+                )), self.model) + (sep_tokens if parts else 0)
+                unit.content = truncate_to_tokens(unit.content, remaining - header_cost - 1, self.model)
+                unit.truncated = True
+                if unit.content:
+                    text = self.formatter(len(packed) + 1, unit)
+                    packed.append(unit)
+                    parts.append(text)
+                    used += count_tokens(text, self.model) + (sep_tokens if len(parts) > 1 else 0)
+            break
+
+        result = PackedContext(
+            text=self.separator.join(parts),
+            units=packed,
+            tokens_used=used,
+            tokens_raw=tokens_raw,
+            chunks_in=len(items),
+            chunks_merged=chunks_merged,
+            units_dropped=len(ordered) - len(packed),
+            token_budget=self.token_budget
+        )
+        logger.debug(f"[ContextPacker] {result.stats()}")
+        return result
+
+    # =========================================================================
+    # 合併
+    # =========================================================================
+
+    def _to_unit(self, item: Dict[str, Any]) -> ContextUnit:
+        meta = item.get("metadata") or {}
+        content = item["content"]
+        database = meta.get("source_db") or item.get("database") or ""
+        doc_id = str(meta.get("content_hash") or meta.get("source") or meta.get("title") or item.get("id") or "")
+        embedding = item.get("embedding")
+        return ContextUnit(
+            content=content,
+            score=_item_score(item),
+            database=database,
+            title=str(meta.get("title") or meta.get("source") or ""),
+            doc_key=(database, doc_id),
+            span=_item_span(content, meta),
+            embeddings=[embedding] if embedding is not None else [],
+            metadata=meta
+        )
+
+    def _absorb(self, keep: ContextUnit, other: ContextUnit, content: str, span=None):
+        keep.content = content
+        keep.span = span
+        keep.score = max(keep.score, other.score)
+        keep.embeddings.extend(other.embeddings)
+        keep.merged_count += other.merged_count
+
+    def _merge(self, items: List[Dict[str, Any]]) -> List[ContextUnit]:
+        groups: Dict[Tuple[str, str], List[ContextUnit]] = {}
+        for item in items:
+            unit = self._to_unit(item)
+            groups.setdefault(unit.doc_key, []).append(unit)
+
+        merged: List[ContextUnit] = []
+        for units in groups.values():
+            # 1) 有偏移量：區間合併（重疊或相鄰）
+            spanned = sorted((u for u in units if u.span), key=lambda u: u.span)
+            current = None
+            for unit in spanned:
+                if current and unit.span[0] <= current.span[1]:
+                    if unit.span[1] > current.span[1]:
+                        tail = unit.content[current.span[1] - unit.span[0]:]
+                        self._absorb(current, unit, current.content + tail,
+                                     (current.span[0], unit.span[1]))
+                    else:
+                        self._absorb(current, unit, current.content, current.span)
+                else:
+                    current = unit
+                    merged.append(current)
+
+            # 2) 無偏移量：完全重複 / 包含 / 首尾重疊
+            loose: List[ContextUnit] = []
+            for unit in (u for u in units if not u.span):
+                for existing in loose:
+                    combined = (_merge_text_overlap(existing.content, unit.content)
+                                or _merge_text_overlap(unit.content, existing.content))
+                    if combined is not None:
+                        self._absorb(existing, unit, combined)
+                        break
+                else:
+                    loose.append(unit)
+            merged.extend(loose)
+        return merged
+
+    # =========================================================================
+    # MMR
+    # =========================================================================
+
+    def _mmr_order(
+        self,
+        units: List[ContextUnit],
+        query_embedding: Optional[List[float]]
+    ) -> List[ContextUnit]:
+        by_score = sorted(units, key=lambda u: u.score, reverse=True)
+        if (not HAS_NUMPY or len(units) < 3 or self.mmr_lambda >= 1.0
+                or any(not u.embeddings for u in units)):
+            return by_score
+
+        try:
+            vectors = np.stack([np.mean(np.asarray(u.embeddings, dtype=np.float32), axis=0)
+                                for u in units])
+        except ValueError:
+            # 不同維度的向量（混用嵌入模型）— 只按分數排序
+            return by_score
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+
+        scores = np.asarray([u.score for u in units], dtype=np.float32)
+        if np.ptp(scores) > 1e-9:
+            relevance = (scores - scores.min()) / np.ptp(scores)
+        elif query_embedding is not None:
+            q = np.asarray(query_embedding, dtype=np.float32)
+            relevance = vectors @ (q / (np.linalg.norm(q) + 1e-12))
+        else:
+            relevance = np.ones(len(units), dtype=np.float32)
+
+        similarity = vectors @ vectors.T
+        lam = self.mmr_lambda
+        max_sim = np.zeros(len(units), dtype=np.float32)
+        chosen = np.zeros(len(units), dtype=bool)
+        order = []
+        for _ in range(len(units)):
+            mmr = lam * relevance - (1 - lam) * max_sim
+            mmr[chosen] = -np.inf
+            j = int(np.argmax(mmr))
+            order.append(units[j])
+            chosen[j] = True
+            np.maximum(max_sim, similarity[j], out=max_sim)
+        return order
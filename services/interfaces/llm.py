@@ -29,15 +29,52 @@ class ILLMService(Protocol):
         system_message: Optional[str] = None,
         session_id: str = "default",
         use_cache: bool = True,
+        cache_family: str = "default",
+        priority: Optional[str] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
     ) -> Any:
         """
         Generate a complete LLM response.
 
+        ``cache_family`` selects the cache TTL (e.g. ``classification`` prompts
+        are cached for days, ``answer`` prompts for minutes). ``priority``
+        selects the rate-limit lane (``interactive`` / ``agent`` /
+        ``background``); it defaults to the lane of the current context.
+        ``timeout`` is a per-call deadline in seconds. ``stream=True`` marks a
+        final-answer call: when a ``TokenSink`` is active in the current context
+        (see ``services.llm_streaming``) tokens are pushed to it as they arrive.
+
         Returns an object with at minimum a ``.content: str`` attribute
         (``LLMResponse`` in the concrete implementation).
         """
         ...
 
+    async def generate_many(
+        self,
+        requests: List[Union[str, Dict[str, Any]]],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+        **defaults: Any,
+    ) -> List[Any]:
+        """
+        Run independent prompts concurrently and return the responses in input order.
+
+        Each request is a prompt string or a dict of ``generate()`` keyword
+        arguments; ``defaults`` apply to every request.
+        """
+        ...
+
+    def generate_as_completed(
+        self,
+        requests: List[Union[str, Dict[str, Any]]],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+        **defaults: Any,
+    ) -> AsyncIterator[Any]:
+        """Like ``generate_many`` but yield ``(index, response)`` as each call finishes."""
+        ...
+
     async def astream(
         self,
         prompt: Union[str, List[Dict[str, str]]],
@@ -46,14 +83,45 @@ class ILLMService(Protocol):
         model: Optional[str] = None,
         system_message: Optional[str] = None,
         session_id: str = "default",
+        priority: Optional[str] = None,
+        timeout: Optional[float] = None,
     ) -> AsyncIterator[str]:
-        """Stream response tokens one-by-one."""
+        """
+        Stream response tokens one-by-one (``timeout`` bounds the first token).
+
+        Usage is recorded from the provider's final usage chunk, or counted
+        with the tokenizer when the provider does not report it.
+        """
         ...
 
     def get_usage_stats(self) -> Dict[str, Any]:
         """Return current token-usage and cost statistics."""
         ...
 
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return response-cache hit rates, tier sizes and per-family counters."""
+        ...
+
+    def get_singleflight_stats(self) -> Dict[str, Any]:
+        """Return upstream-call / coalesced-duplicate counters."""
+        ...
+
+    def get_hedging_stats(self) -> Dict[str, Any]:
+        """Return hedged-request counts, deadline misses and latency percentiles."""
+        ...
+
+    def get_provider_stats(self) -> Dict[str, Any]:
+        """Return the provider mode (live / record / replay) and recording / replay counts."""
+        ...
+
+    def get_prompt_budget_stats(self) -> Dict[str, Any]:
+        """Return the prompt token budget and how many tokens were trimmed per section."""
+        ...
+
+    def get_rate_limit_budgets(self) -> Dict[str, Any]:
+        """Return RPM / TPM budgets, the adaptive factor and per-lane stats."""
+        ...
+
     def clear_cache(self) -> None:
         """Invalidate the response cache."""
         ...
@@ -42,10 +42,100 @@ class IVectorDBService(Protocol):
         query: str,
         db_name: str,
         n_results: int = 5,
+        include_embeddings: bool = False,
     ) -> Dict[str, Any]:
         """Query a database and return raw ChromaDB results."""
         ...
 
+    async def query_multi(
+        self,
+        queries: List[str],
+        db_names: List[str],
+        top_k: int = 5,
+        min_similarity: Optional[float] = None,
+        rerank: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """Batched retrieval for the sub-queries of one decomposed question."""
+        ...
+
+    async def list_documents(
+        self,
+        db_name: str,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        fields: str = "preview",
+        metadata_fields: Optional[List[str]] = None,
+        group_by: Optional[str] = None,
+        where: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Keyset-paginated chunk / document listing with a selectable projection."""
+        ...
+
+    async def delete_documents(
+        self, db_name: str, ids: List[str], hard: bool = False
+    ) -> Dict[str, Any]:
+        """Bulk delete chunks (soft delete unless hard=True)."""
+        ...
+
+    async def dedup_database(
+        self, db_name: str, dry_run: bool = False, page_size: int = 1000
+    ) -> Dict[str, Any]:
+        """Remove near-duplicate chunks from one database; reports vectors and bytes saved."""
+        ...
+
+    async def dedup_all_databases(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Run near-duplicate cleanup on every database."""
+        ...
+
+    def get_embedding_profile(self, db_name: str) -> Any:
+        """Stored vector format of a database (EmbeddingProfile)."""
+        ...
+
+    async def migrate_embedding_profile(
+        self,
+        db_name: str,
+        dimensions: Optional[int] = None,
+        method: str = "auto",
+        dtype: str = "float32",
+        sample_size: int = 5000,
+        page_size: int = 500,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        """Re-project / re-embed into a new profile, swapping atomically when done."""
+        ...
+
+    async def export_database(
+        self,
+        db_name: str,
+        export: Optional[str] = None,
+        table_format: Optional[str] = None,
+        dtype: Optional[str] = None,
+        include_deleted: bool = False,
+        page_size: int = 2000,
+    ) -> Dict[str, Any]:
+        """Stream a database to Parquet / Arrow + embeddings.npy."""
+        ...
+
+    async def import_database(
+        self,
+        export: str,
+        db_name: Optional[str] = None,
+        description: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        index_signatures: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """Bulk-load a columnar export without re-embedding."""
+        ...
+
+    def list_exports(self) -> List[Dict[str, Any]]:
+        """List columnar exports."""
+        ...
+
+    def get_filter_values(self, db_name: str, field: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most common values of an indexed metadata field."""
+        ...
+
     def get_skills_summary(self) -> List[Dict[str, Any]]:
         """Return KB skills summary used for LLM routing."""
         ...
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+LLM Response Cache (兩層 LLM 響應快取)
+=============================================================================
+
+舊的 LLMCache 以 min(timestamp) 淘汰（寫滿後每次寫入 O(n)），只存在單一
+行程記憶體、上限 1000 筆、重啟即失效，所有 prompt 共用一個 TTL。
+
+兩層快取：
+1. 記憶體 LRU  - OrderedDict，查找 / 寫入 / 淘汰皆 O(1)；同時限制筆數與位元組數
+2. SQLite 層   - 持久化、跨 uvicorn worker 共用（WAL + busy_timeout）；
+                 記憶體未命中時查詢，命中後提升回記憶體層；寫入交給背景執行緒
+                 批次提交，呼叫端（async generate 路徑）不等待磁碟或其他 worker 的鎖
+
+每個 prompt 家族（family）有自己的 TTL：分類 / 意圖判斷的 prompt 可以保存數天，
+一般回答只保存數分鐘。TTL 由 LLM_CACHE_TTLS 設定，例如：
+    LLM_CACHE_TTLS="classification=259200,intent=259200,answer=300"
+
+統計：各層命中 / 未命中、命中率、記憶體與磁碟位元組數、淘汰數、各家族命中率。
+
+使用方式：
+-----------
+cache = ResponseCache(max_entries=1000, max_bytes=64 * 1024 ** 2,
+                      disk_path=Path("data/llm_cache.sqlite"),
+                      family_ttls=parse_family_ttls("classification=259200"))
+cache.set(key, {"content": "..."}, family="classification")
+payload, tier = cache.get(key)          # tier: "memory" / "disk" / None
+
+# 結構化輸出：記憶體層保存已驗證的物件，磁碟層保存 JSON（提升時驗證一次）
+cache.set(key, plan.model_dump(mode="json"), family="structured", memory_value=plan)
+plan, tier = cache.get(key, "structured", decode=ExecutionPlan.model_validate)
+
+=============================================================================
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAMILY = "default"
+
+
+def parse_family_ttls(spec: str) -> Dict[str, int]:
+    """"classification=259200,answer=300" → {"classification": 259200, "answer": 300}"""
+    ttls = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        family, seconds = part.split("=", 1)
+        try:
+            ttls[family.strip()] = int(float(seconds))
+        except ValueError:
+            logger.warning(f"[LLMCache] Ignoring invalid TTL '{part}'")
+    return ttls
+
+
+class MemoryLRU:
+    """
+    記憶體 LRU（執行緒安全）
+
+    OrderedDict 依存取順序排列：命中時 move_to_end，淘汰時 popitem(last=False)，
+    皆為 O(1)。超過筆數或位元組上限時從最久未使用端淘汰。
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[Dict[str, Any], int, float, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            payload, size, expires_at, _ = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: Dict[str, Any], size: int, expires_at: float, family: str):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (payload, size, expires_at, family)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+
+class SQLiteCacheTier:
+    """
+    持久化快取層（多個 worker 共用同一檔案）
+
+    讀取為主鍵查找，每個執行緒使用自己的唯讀連線、不經過寫入鎖（WAL 下讀取不會
+    被寫入交易擋住；遇到鎖時視為未命中，不等待）；寫入（set / last_used 更新 /
+    clear）放進佇列，由背景執行緒每批一個交易寫入，呼叫端不會卡在 busy_timeout。每 prune_every 次寫入順便清除
+    過期項目，並在超過位元組上限時依最後使用時間淘汰。last_used 只在距上次更新
+    超過 60 秒時才寫回，避免每次命中都寫入。佇列已滿時丟棄寫入（只是少快取一筆）。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = 512 * 1024 ** 2,
+        prune_every: int = 200,
+        queue_size: int = 10000
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._writes = 0
+        self.dropped_writes = 0
+        self.write_errors = 0
+        self.read_errors = 0
+        self._readers = threading.local()
+        self._reader_conns = []
+        self._readers_lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    family TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at);
+                CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used);
+            """)
+            self._conn.commit()
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._write_loop, name="llm-cache-writer", daemon=True)
+        self._writer.start()
+
+    def _reader(self) -> sqlite3.Connection:
+        """本執行緒的讀取連線（busy 時 50ms 內放棄，不卡住事件循環）"""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=0.05)
+            conn.execute("PRAGMA query_only=ON")
+            self._readers.conn = conn
+            with self._readers_lock:
+                self._reader_conns.append(conn)
+        return conn
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[Dict[str, Any], int, float, str]]:
+        now = time.time() if now is None else now
+        try:
+            row = self._reader().execute(
+                "SELECT payload, size, expires_at, family, last_used FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.read_errors += 1
+            logger.debug(f"[LLMCache] Persistent tier read skipped: {e}")
+            return None
+        if not row:
+            return None
+        if now - row[4] > 60:
+            self._enqueue(("touch", key, now))
+        return json.loads(row[0]), row[1], row[2], row[3]
+
+    def set(self, key: str, payload_json: str, size: int, expires_at: float, family: str):
+        now = time.time()
+        self._enqueue(("set", key, family, payload_json, size, now, expires_at, now))
+
+    # ── 背景寫入 ──────────────────────────────────────────────
+
+    def _enqueue(self, op: tuple):
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            self.dropped_writes += 1
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # 佇列中已有的寫入併入同一個交易
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._apply(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _apply(self, batch) -> bool:
+        stop = False
+        with self._lock:
+            try:
+                for op in batch:
+                    if op[0] == "set":
+                        self._conn.execute(
+                            """INSERT OR REPLACE INTO llm_cache (key, family, payload, size, created_at, expires_at, last_used)
+                               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                            op[1:]
+                        )
+                        self._writes += 1
+                        if self._writes % self.prune_every == 0:
+                            self._prune(time.time())
+                    elif op[0] == "touch":
+                        self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (op[2], op[1]))
+                    elif op[0] == "clear":
+                        self._conn.execute("DELETE FROM llm_cache")
+                    elif op[0] == "stop":
+                        stop = True
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self.write_errors += 1
+                logger.warning(f"[LLMCache] Persistent tier write failed ({len(batch)} ops dropped): {e}")
+                try:
+                    self._conn.rollback()
+                except sqlite3.Error:
+                    pass
+        return stop
+
+    def flush(self):
+        """等待佇列中的寫入完成（測試 / 關閉前使用）"""
+        self._queue.join()
+
+    def _prune(self, now: float):
+        """清除過期項目；總大小超過上限時淘汰最久未使用的項目（呼叫端持有鎖）"""
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - int(self.max_bytes * 0.9)
+            self._conn.execute(
+                """DELETE FROM llm_cache WHERE key IN (
+                       SELECT key FROM (
+                           SELECT key, size, SUM(size) OVER (ORDER BY last_used ASC) AS running
+                           FROM llm_cache
+                       ) WHERE running - size < ?
+                   )""",
+                (excess,)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entries, size = self._reader().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache WHERE expires_at > ?", (time.time(),)
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "pending_writes": self._queue.qsize(),
+            "dropped_writes": self.dropped_writes,
+            "write_errors": self.write_errors,
+            "read_errors": self.read_errors,
+            "path": str(self.path)
+        }
+
+    def clear(self):
+        self._queue.put(("clear",))
+        self.flush()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(("stop",))
+            self._writer.join(timeout=5)
+        with self._readers_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """記憶體 LRU + SQLite 持久層 + 家族 TTL + 統計"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 ** 2,
+        default_ttl: int = 3600,
+        family_ttls: Optional[Dict[str, int]] = None,
+        disk_path: Optional[Path] = None,
+        disk_max_bytes: int = 512 * 1024 ** 2
+    ):
+        self.default_ttl = default_ttl
+        self.family_ttls = dict(family_ttls or {})
+        self.memory = MemoryLRU(max_entries=max_entries, max_bytes=max_bytes)
+        self.disk: Optional[SQLiteCacheTier] = None
+        if disk_path is not None:
+            try:
+                self.disk = SQLiteCacheTier(disk_path, max_bytes=disk_max_bytes)
+            except Exception as e:
+                logger.warning(f"[LLMCache] Persistent tier disabled ({disk_path}): {e}")
+        self._stats_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "disk_errors": 0}
+        self._families: Dict[str, Dict[str, int]] = {}
+
+    def ttl_for(self, family: Optional[str]) -> int:
+        return self.family_ttls.get(family or DEFAULT_FAMILY, self.default_ttl)
+
+    def _count(self, stat: str, family: Optional[str] = None):
+        with self._stats_lock:
+            self._stats[stat] += 1
+            if family is not None:
+                per_family = self._families.setdefault(family, {"hits": 0, "misses": 0, "sets": 0})
+                per_family["hits" if stat.endswith("_hits") else stat] += 1
+
+    def get(
+        self,
+        key: str,
+        family: str = DEFAULT_FAMILY,
+        decode: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Returns (payload, tier)；未命中為 (None, None)
+
+        decode: 磁碟層命中時先轉換（例如 Pydantic 驗證）再提升到記憶體層；
+                轉換失敗視為未命中
+        """
+        now = time.time()
+        payload = self.memory.get(key, now)
+        if payload is not None:
+            self._count("memory_hits", family)
+            return payload, "memory"
+        if self.disk is not None:
+            try:
+                found = self.disk.get(key, now)
+            except sqlite3.Error as e:
+                logger.warning(f"[LLMCache] Persistent tier read failed: {e}")
+                self._count("disk_errors")
+                found = None
+            if found is not None and decode is not None:
+                try:
+                    found = (decode(found[0]),) + found[1:]
+                except Exception as e:
+                    logger.debug(f"[LLMCache] Discarding undecodable entry {key[:12]}: {e}")
+                    found = None
+            if found is not None:
+                payload, size, expires_at, stored_family = found
+                self.memory.set(key, payload, size, expires_at, stored_family)
+                self._count("disk_hits", family)
+                return payload, "disk"
+        self._count("misses", family)
+        return None, None
+
+    def set(
+        self,
+        key: str,
+        payload: Dict[str, Any],
+        family: str = DEFAULT_FAMILY,
+        ttl: Optional[int] = None,
+        memory_value: Any = None
+    ):
+        """memory_value: 記憶體層改存此物件（例如已驗證的 Pydantic 實例）；磁碟層仍存 payload 的 JSON"""
+        ttl = self.ttl_for(family) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        payload_json = json.dumps(payload, ensure_ascii=False, default=str)
+        size = len(payload_json.encode("utf-8"))
+        expires_at = time.time() + ttl
+        self.memory.set(key, payload if memory_value is None else memory_value, size, expires_at, family)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, payload_json, size, expires_at, family)
+            except sqlite3.Error as e:
+                logger.warning(f"[LLMCache] Persistent tier write failed: {e}")
+                self._count("disk_errors")
+        self._count("sets", family)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            counts = dict(self._stats)
+            families = {
+                name: {**f, "hit_rate": round(f["hits"] / (f["hits"] + f["misses"]), 4) if f["hits"] + f["misses"] else 0.0}
+                for name, f in self._families.items()
+            }
+        hits = counts["memory_hits"] + counts["disk_hits"]
+        lookups = hits + counts["misses"]
+        return {
+            **counts,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory": {
+                "entries": len(self.memory),
+                "bytes": self.memory.bytes,
+                "max_entries": self.memory.max_entries,
+                "max_bytes": self.memory.max_bytes,
+                "evictions": self.memory.evictions
+            },
+            "disk": self.disk.stats() if self.disk is not None else None,
+            "ttls": {DEFAULT_FAMILY: self.default_ttl, **self.family_ttls},
+            "families": families
+        }
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+LLM Client Pool (ChatOpenAI 客戶端池)
+=============================================================================
+
+LLMService.generate / astream 只要傳入 temperature、max_tokens 或 model（幾乎
+每個 agent 呼叫都會傳）就建立一個新的 ChatOpenAI，連同新的 openai 客戶端與
+HTTP 連線池：每次呼叫都重新 TCP 連線 + TLS 握手，無法重用 keep-alive 連線。
+
+本模組：
+1. ChatOpenAI 實例依 (model, temperature, max_tokens, streaming, 事件迴圈) 快取，
+   LRU 上限 LLM_CLIENT_POOL_SIZE 個
+2. 所有實例共用同一個同步 httpx 連線池；非同步連線池每個事件迴圈一個，
+   keep-alive 連線在同一迴圈內跨模型 / 參數重用
+3. 非同步連線池綁定建立它的事件迴圈：多個迴圈同時執行（celery 執行緒池、
+   執行緒中的同步包裝）時各用各的，互不關閉對方進行中的連線；迴圈結束
+   （例如腳本多次 asyncio.run、celery 每個 task 一個迴圈）後，下次取用時
+   關閉其連線池並丟棄綁定它的客戶端，避免洩漏已關閉迴圈的連線
+4. 傳入 ProviderReplay 時：replay 模式以離線的 ReplayChatModel 取代 ChatOpenAI，
+   record 模式在 ChatOpenAI 上掛錄製 callback（見 services/provider_replay.py）
+
+使用方式：
+-----------
+pool = LLMClientPool(api_key=Config.OPENAI_API_KEY)
+llm = pool.get("gpt-4o-mini", temperature=0.2, max_tokens=800)
+result = await llm.ainvoke(messages)
+pool.get_stats()   # {"clients": 3, "hits": 120, "created": 3, ...}
+
+=============================================================================
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    httpx = None
+    HAS_HTTPX = False
+
+# (model, temperature, max_tokens, streaming, id(事件迴圈) / None)
+ClientKey = Tuple[str, float, int, bool, Optional[int]]
+
+
+class LLMClientPool:
+    """依生成參數與事件迴圈快取的 ChatOpenAI 實例，共用 keep-alive HTTP 連線池"""
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: Optional[str] = None,
+        max_clients: int = 32,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 120.0,
+        replay: Optional[Any] = None
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.replay = replay
+        self.max_clients = max_clients
+        self._limits = dict(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._timeout = timeout
+        self._clients: "OrderedDict[ClientKey, ChatOpenAI]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._http_client = None
+        # id(loop) / None（無執行中迴圈）→ (迴圈的弱參照, httpx.AsyncClient)
+        self._async_clients: Dict[Optional[int], Tuple[Optional[weakref.ref], Any]] = {}
+        self._stats = {"hits": 0, "created": 0, "evicted": 0, "loops_retired": 0}
+
+    # ── HTTP 連線池 ───────────────────────────────────────────
+
+    @staticmethod
+    def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    def _retire_finished_loops(self):
+        """關閉已結束迴圈的連線池並丟棄綁定它的客戶端；呼叫端持有鎖"""
+        for loop_id, (ref, client) in list(self._async_clients.items()):
+            if ref is None:
+                continue
+            loop = ref()
+            if loop is not None and not loop.is_closed():
+                continue
+            del self._async_clients[loop_id]
+            for key in [k for k in self._clients if k[4] == loop_id]:
+                del self._clients[key]
+            self._stats["loops_retired"] += 1
+            self._retire_async_client(client, loop)
+
+    def _http_clients(self, loop: Optional[asyncio.AbstractEventLoop]):
+        """共用的 httpx.Client 與 loop 專用的 httpx.AsyncClient；呼叫端持有鎖"""
+        if not HAS_HTTPX:
+            return None, None
+        if self._http_client is None:
+            self._http_client = httpx.Client(limits=httpx.Limits(**self._limits), timeout=self._timeout)
+        self._retire_finished_loops()
+        loop_id = id(loop) if loop is not None else None
+        entry = self._async_clients.get(loop_id)
+        if entry is None:
+            client = httpx.AsyncClient(limits=httpx.Limits(**self._limits), timeout=self._timeout)
+            entry = (weakref.ref(loop) if loop is not None else None, client)
+            self._async_clients[loop_id] = entry
+        return self._http_client, entry[1]
+
+    @staticmethod
+    def _retire_async_client(client, loop: Optional[asyncio.AbstractEventLoop]):
+        """
+        關閉綁定舊事件迴圈的 AsyncClient（celery 每個 task 一個新迴圈，不關閉會洩漏連線）
+
+        舊迴圈仍在執行（另一個執行緒）時在該迴圈上 aclose()；已結束時先直接關閉
+        連線池中的 socket，再於暫時的執行緒 + 迴圈中 aclose()（標記客戶端已關閉）。
+        """
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            try:
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+                return
+            except RuntimeError:
+                pass
+
+        # 舊迴圈已關閉，其 transport 無法再排程關閉：直接關閉 keep-alive socket
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        for connection in list(getattr(pool, "connections", None) or []):
+            stream = getattr(getattr(connection, "_connection", None), "_network_stream", None)
+            try:
+                sock = stream.get_extra_info("socket") if stream is not None else None
+                # asyncio 回傳 TransportSocket（不提供 close）；關閉其包裝的 socket
+                sock = getattr(sock, "_sock", sock)
+                if sock is not None:
+                    sock.close()
+            except Exception as e:
+                logger.debug(f"[LLMClientPool] Closing stale connection: {e}")
+
+        def _close():
+            try:
+                asyncio.run(client.aclose())
+            except Exception as e:
+                logger.debug(f"[LLMClientPool] Closing stale async HTTP client: {e}")
+
+        threading.Thread(target=_close, name="llm-pool-aclose", daemon=True).start()
+
+    # ── 客戶端 ────────────────────────────────────────────────
+
+    def get(self, model: str, temperature: float, max_tokens: int, streaming: bool = False) -> ChatOpenAI:
+        """取得（或建立）指定參數、綁定目前事件迴圈的 ChatOpenAI"""
+        loop = self._running_loop()
+        key: ClientKey = (model, float(temperature), int(max_tokens), bool(streaming),
+                          id(loop) if loop is not None else None)
+        with self._lock:
+            http_client, async_http_client = self._http_clients(loop)
+            llm = self._clients.get(key)
+            if llm is not None:
+                self._clients.move_to_end(key)
+                self._stats["hits"] += 1
+                return llm
+
+            if self.replay is not None and self.replay.mode == "replay":
+                llm = self.replay.chat_model(model, temperature, max_tokens, streaming)
+                self._store(key, llm)
+                return llm
+
+            kwargs: Dict[str, Any] = dict(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                api_key=self.api_key,
+                streaming=streaming
+            )
+            if streaming:
+                # 串流最後一個 chunk 帶實際 token 用量
+                kwargs["stream_usage"] = True
+            if self.base_url:
+                kwargs["base_url"] = self.base_url
+            if http_client is not None:
+                kwargs["http_client"] = http_client
+                kwargs["http_async_client"] = async_http_client
+            if self.replay is not None:
+                kwargs["callbacks"] = self.replay.callbacks()
+            llm = ChatOpenAI(**kwargs)
+            self._store(key, llm)
+            return llm
+
+    def _store(self, key: ClientKey, llm):
+        """加入快取並淘汰最久未用者；呼叫端持有鎖"""
+        self._clients[key] = llm
+        self._stats["created"] += 1
+        while len(self._clients) > self.max_clients:
+            self._clients.popitem(last=False)
+            self._stats["evicted"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["created"]
+            return {
+                **self._stats,
+                "clients": len(self._clients),
+                "max_clients": self.max_clients,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "shared_http_pool": HAS_HTTPX,
+                "async_http_pools": len(self._async_clients),
+                "provider_mode": self.replay.mode if self.replay is not None else "live",
+                "limits": dict(self._limits)
+            }
+
+    async def aclose(self):
+        """關閉所有連線池（API 金鑰更新、服務重建時）"""
+        current = self._running_loop()
+        with self._lock:
+            self._clients.clear()
+            http_client, self._http_client = self._http_client, None
+            async_clients, self._async_clients = self._async_clients, {}
+        if http_client is not None:
+            http_client.close()
+        for ref, client in async_clients.values():
+            loop = ref() if ref is not None else None
+            if loop is None or loop is current:
+                await client.aclose()
+            else:
+                # 綁定其他迴圈：在該迴圈上關閉（已結束則直接關閉 socket）
+                self._retire_async_client(client, loop)
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+LLM Hedged Requests (對沖請求與呼叫期限)
+=============================================================================
+
+LLMService.generate 直接 await llm.ainvoke，沒有期限：單一個慢回應（供應商
+尾端延遲可達中位數的 10 倍以上）會卡住整條 agent 流程。
+
+1. 呼叫期限（deadline）- 超過即取消並拋出 LLMDeadlineExceeded（TimeoutError 子類）；
+   串流呼叫的期限只作用於第一個 token
+2. 對沖（hedging）    - 第一次嘗試在門檻時間內未完成（串流：未收到第一個 token）
+   時再送出一個相同請求，先完成者勝出，另一個立即取消
+   - 門檻 = 該 (模型, prompt 家族, prompt 大小級距) 最近延遲的 p95（至少
+     min_delay_ms）；樣本數不足 min_samples 時不對沖。長 prompt 的延遲本來就較長，
+     與短 prompt 共用門檻會讓長 prompt 幾乎每次都被對沖（鍵由 hedge_key() 產生）
+   - 對沖次數上限為總呼叫數的 max_ratio（預設 10%），避免在供應商整體變慢時
+     把流量加倍
+   - 失敗的嘗試不會勝出：一個失敗時等待另一個
+
+統計：呼叫數、對沖數、對沖勝出數、期限逾時數，以及實際延遲的 p50 / p95 / p99
+（整體與各鍵）。對沖前後的 p50 / p99 比較見 Scripts/benchmarks/bench_llm_hedging.py。
+
+使用方式：
+-----------
+hedger = LLMHedger(percentile=0.95, max_ratio=0.1)
+key = hedge_key("gpt-4o-mini", "answer", prompt_tokens=1800)    # "gpt-4o-mini:answer:<=4096"
+result = await hedger.run(lambda: llm.ainvoke(messages), key=key, deadline=60)
+async for token in hedger.run_stream(lambda: llm.astream(messages), key=hedge_key("gpt-4o-mini", "ttft", 1800)):
+    ...
+
+=============================================================================
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.metrics import RollingWindow
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = object()
+
+# prompt token 數級距（延遲統計分桶）
+PROMPT_TOKEN_BUCKETS = (256, 1024, 4096, 16384)
+
+
+class LLMDeadlineExceeded(asyncio.TimeoutError):
+    """LLM 呼叫超過期限"""
+
+
+def hedge_key(model: str, family: str, prompt_tokens: int) -> str:
+    """延遲統計鍵：模型 + prompt 家族 + prompt token 數級距"""
+    for bound in PROMPT_TOKEN_BUCKETS:
+        if prompt_tokens <= bound:
+            return f"{model}:{family}:<={bound}"
+    return f"{model}:{family}:>{PROMPT_TOKEN_BUCKETS[-1]}"
+
+
+async def _cancel_all(tasks: List[asyncio.Task]):
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class LLMHedger:
+    """以近期延遲分位數為門檻的對沖執行器"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        percentile: float = 0.95,
+        max_ratio: float = 0.1,
+        min_delay_ms: float = 500.0,
+        min_samples: int = 20,
+        window: int = 500
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_delay_ms = min_delay_ms
+        self.min_samples = min_samples
+        self._window = window
+        self._attempt_latency: Dict[str, RollingWindow] = {}
+        self._observed_latency: Dict[str, RollingWindow] = {}
+        self._overall = RollingWindow(window * 4)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "hedge_skipped": 0, "deadline_exceeded": 0}
+
+    # ── 門檻與預算 ────────────────────────────────────────────
+
+    def _windows(self, key: str) -> Tuple[RollingWindow, RollingWindow]:
+        with self._lock:
+            if key not in self._attempt_latency:
+                self._attempt_latency[key] = RollingWindow(self._window)
+                self._observed_latency[key] = RollingWindow(self._window)
+            return self._attempt_latency[key], self._observed_latency[key]
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """對沖門檻（秒）；停用或樣本不足時為 None"""
+        if not self.enabled or self.max_ratio <= 0:
+            return None
+        attempts, _ = self._windows(key)
+        if attempts.count < self.min_samples:
+            return None
+        return max(attempts.percentile(self.percentile), self.min_delay_ms) / 1000
+
+    def _take_hedge_budget(self) -> bool:
+        with self._lock:
+            if self._stats["hedged"] + 1 > self.max_ratio * self._stats["calls"]:
+                self._stats["hedge_skipped"] += 1
+                return False
+            self._stats["hedged"] += 1
+            return True
+
+    def _record(self, key: str, started: float, attempt_started: float, hedge_won: bool):
+        now = time.monotonic()
+        attempts, observed = self._windows(key)
+        # 對沖勝出時第一次嘗試被取消，其延遲至少為目前經過時間（取下界）
+        attempts.observe((now - (started if hedge_won else attempt_started)) * 1000)
+        observed.observe((now - started) * 1000)
+        self._overall.observe((now - started) * 1000)
+        if hedge_won:
+            with self._lock:
+                self._stats["hedge_wins"] += 1
+
+    def _deadline_exceeded(self, key: str, deadline: float) -> LLMDeadlineExceeded:
+        with self._lock:
+            self._stats["deadline_exceeded"] += 1
+        return LLMDeadlineExceeded(f"LLM call '{key}' exceeded its {deadline:g}s deadline")
+
+    async def _race(
+        self,
+        start: Callable[[], asyncio.Task],
+        key: str,
+        can_hedge: Optional[Callable[[], bool]]
+    ) -> Tuple[Any, int, List[asyncio.Task]]:
+        """
+        執行第一次嘗試，逾門檻時對沖；回傳 (結果, 勝出嘗試序號, 所有嘗試)
+
+        失敗的嘗試不會勝出；全部失敗時拋出第一個錯誤。
+        """
+        attempts = [start()]
+        delay = self.hedge_delay(key)
+        if delay is not None:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and (can_hedge is None or can_hedge()) and self._take_hedge_budget():
+                logger.debug(f"[LLMHedger] Hedging '{key}' after {delay * 1000:.0f} ms")
+                attempts.append(start())
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=attempts.index):
+                if task.exception() is None:
+                    return task.result(), attempts.index(task), attempts
+                error = error or task.exception()
+        raise error
+
+    # ── 公開 API ──────────────────────────────────────────────
+
+    async def run(
+        self,
+        attempt: Callable[[], Awaitable[Any]],
+        key: str,
+        deadline: Optional[float] = None,
+        can_hedge: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """
+        執行一次 LLM 呼叫（必要時對沖）
+
+        Args:
+            attempt: 每次呼叫回傳新 awaitable 的函式（對沖時會再呼叫一次）
+            key: 延遲統計鍵（模型 + prompt 家族，輸出長度相近的呼叫放在一起）
+            deadline: 期限秒數（None = 不限制）
+            can_hedge: 對沖前的額外檢查（例如速率限制是否還有額度）
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+        started = time.monotonic()
+        attempt_started = {}
+
+        def start() -> asyncio.Task:
+            task = asyncio.ensure_future(attempt())
+            attempt_started[task] = time.monotonic()
+            return task
+
+        async def race():
+            try:
+                result, index, attempts = await self._race(start, key, can_hedge)
+            finally:
+                await _cancel_all(list(attempt_started))
+            self._record(key, started, attempt_started[attempts[0]], hedge_won=index > 0)
+            return result
+
+        if deadline is None:
+            return await race()
+        try:
+            return await asyncio.wait_for(race(), deadline)
+        except asyncio.TimeoutError:
+            raise self._deadline_exceeded(key, deadline) from None
+
+    async def run_stream(
+        self,
+        open_stream: Callable[[], AsyncIterator[Any]],
+        key: str,
+        deadline: Optional[float] = None,
+        can_hedge: Optional[Callable[[], bool]] = None
+    ) -> AsyncIterator[Any]:
+        """
+        串流呼叫：以第一個 token 的時間（TTFT）為對沖門檻與期限，之後從勝出的串流繼續輸出
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+        started = time.monotonic()
+        streams: Dict[asyncio.Task, AsyncIterator[Any]] = {}
+        attempt_started: Dict[asyncio.Task, float] = {}
+
+        async def first_item(stream: AsyncIterator[Any]):
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return _EMPTY
+
+        def start() -> asyncio.Task:
+            stream = open_stream()
+            task = asyncio.ensure_future(first_item(stream))
+            streams[task] = stream
+            attempt_started[task] = time.monotonic()
+            return task
+
+        async def race():
+            return await self._race(start, key, can_hedge)
+
+        try:
+            if deadline is None:
+                first, index, attempts = await race()
+            else:
+                try:
+                    first, index, attempts = await asyncio.wait_for(race(), deadline)
+                except asyncio.TimeoutError:
+                    raise self._deadline_exceeded(key, deadline) from None
+        except BaseException:
+            await _cancel_all(list(streams))
+            for stream in streams.values():
+                await _aclose(stream)
+            raise
+
+        winner = attempts[index]
+        losers = [task for task in streams if task is not winner]
+        await _cancel_all(losers)
+        for task in losers:
+            await _aclose(streams[task])
+        self._record(key, started, attempt_started[attempts[0]], hedge_won=index > 0)
+
+        stream = streams[winner]
+        try:
+            if first is _EMPTY:
+                return
+            yield first
+            async for item in stream:
+                yield item
+        finally:
+            await _aclose(stream)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            keys = list(self._observed_latency)
+        calls = stats["calls"]
+        return {
+            "enabled": self.enabled,
+            **stats,
+            "hedge_rate": round(stats["hedged"] / calls, 4) if calls else 0.0,
+            "hedge_win_rate": round(stats["hedge_wins"] / stats["hedged"], 4) if stats["hedged"] else 0.0,
+            "percentile": self.percentile,
+            "max_ratio": self.max_ratio,
+            "latency_ms": self._overall.snapshot(),
+            "by_key": {
+                key: {
+                    "latency_ms": self._observed_latency[key].snapshot(),
+                    "hedge_threshold_ms": round((self.hedge_delay(key) or 0) * 1000, 1) or None
+                }
+                for key in keys
+            }
+        }
+
+
+async def _aclose(stream: AsyncIterator[Any]):
+    aclose = getattr(stream, "aclose", None)
+    if aclose is None:
+        return
+    try:
+        await aclose()
+    except Exception as e:
+        logger.debug(f"[LLMHedger] Closing abandoned stream: {e}")
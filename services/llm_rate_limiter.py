@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+LLM Rate Limiter (自適應速率限制 + 優先級通道)
+=============================================================================
+
+所有 agent 共用 get_llm_service()，沒有任何准入控制：背景工作（記憶捕獲、
+技能生成、階層式摘要）與互動聊天平等競爭，一波背景工作就會觸發供應商 429。
+
+令牌桶（token bucket）兩個：
+- requests/min（RPM）- 每次呼叫 1
+- tokens/min（TPM）  - 估算值 = prompt token 數 + max_tokens（供應商也以 max_tokens
+                        計入配額）；呼叫完成後以實際用量退回差額
+
+優先級通道（數字越小越優先）：
+- INTERACTIVE (0) - 使用者正在等待的聊天回應
+- AGENT       (1) - agent 內部呼叫（預設）
+- BACKGROUND  (2) - 記憶捕獲、技能生成、摘要等
+
+等待者依優先級排隊，只有隊首可以取用配額；另外每個通道有保留比例：背景呼叫
+只在兩個桶都高於 50% 時放行、agent 呼叫高於 20%，互動呼叫可用到 0，因此配額
+吃緊時背景呼叫最先被限流。隊首依補充速率計算的時間睡眠；其餘等待者等待各自的
+asyncio.Event，隊首離開（放行或取消）或用量退回時才被喚醒，不做輪詢。
+
+預設停用（LLM_RATE_LIMIT_RPM / LLM_RATE_LIMIT_TPM 為 0）：請依供應商帳號的實際
+額度設定，設得比實際額度低只會無謂地限流。
+
+自適應（AIMD）：收到 429 時補充速率減半，並依 retry-after 暫停所有通道；
+之後每次成功呼叫逐步恢復，直到設定值。
+
+優先級以 contextvar 傳遞，不需修改每個呼叫點：
+    @with_priority(Priority.BACKGROUND)
+    async def capture_memory(...): ...   # 其中所有 llm_service.generate 皆為背景
+
+使用方式：
+-----------
+limiter = AdaptiveRateLimiter(rpm=500, tpm=200_000)
+await limiter.acquire(tokens=1200, priority=Priority.INTERACTIVE)
+limiter.record_usage(estimated=1200, actual=640)
+limiter.on_rate_limited(retry_after=2.0)      # 429
+limiter.get_budgets()
+
+=============================================================================
+"""
+
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """LLM 呼叫優先級（數字越小越優先）"""
+    INTERACTIVE = 0
+    AGENT = 1
+    BACKGROUND = 2
+
+
+# 各通道放行時桶內需保留的比例
+DEFAULT_LANE_RESERVES = {
+    Priority.INTERACTIVE: 0.0,
+    Priority.AGENT: 0.2,
+    Priority.BACKGROUND: 0.5,
+}
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "llm_priority", default=Priority.AGENT
+)
+
+
+def parse_priority(value: Union[str, int, Priority, None]) -> Priority:
+    """"interactive" / "agent" / "background" / 0-2 → Priority；None 取目前 context 的優先級"""
+    if value is None:
+        return _current_priority.get()
+    if isinstance(value, str):
+        try:
+            return Priority[value.strip().upper()]
+        except KeyError:
+            raise ValueError(f"Unknown LLM priority '{value}' {[p.name.lower() for p in Priority]}")
+    return Priority(value)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_scope(priority: Union[str, Priority]):
+    """區塊內（含其中建立的 task）的 LLM 呼叫使用指定優先級"""
+    token = _current_priority.set(parse_priority(priority))
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def with_priority(priority: Union[str, Priority]):
+    """async 函式裝飾器：整個呼叫期間使用指定優先級"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with priority_scope(priority):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """是否為供應商 429（openai.RateLimitError 或訊息含 429）"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    if type(error).__name__ == "RateLimitError":
+        return True
+    text = str(error).lower()
+    return "429" in text or "rate limit" in text
+
+
+def parse_retry_after(error: BaseException) -> Optional[float]:
+    """自 429 回應標頭取得 retry-after（秒）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class _Bucket:
+    """令牌桶：容量 = 每分鐘上限，補充速率 = 每分鐘上限 / 60 × 自適應係數"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+
+    def refill(self, elapsed: float, factor: float):
+        self.available = min(self.capacity, self.available + elapsed * self.capacity / 60 * factor)
+
+    def rate(self, factor: float) -> float:
+        return self.capacity / 60 * factor
+
+
+class AdaptiveRateLimiter:
+    """RPM / TPM 雙令牌桶 + 優先級等待佇列 + 429 自適應"""
+
+    def __init__(
+        self,
+        rpm: int = 500,
+        tpm: int = 200_000,
+        lane_reserves: Optional[Dict[Priority, float]] = None,
+        min_factor: float = 0.1,
+        increase_step: float = 0.02,
+        default_retry_after: float = 1.0
+    ):
+        self.enabled = rpm > 0 or tpm > 0
+        self._requests = _Bucket(rpm) if rpm > 0 else None
+        self._tokens = _Bucket(tpm) if tpm > 0 else None
+        self.lane_reserves = dict(lane_reserves or DEFAULT_LANE_RESERVES)
+        self.min_factor = min_factor
+        self.increase_step = increase_step
+        self.default_retry_after = default_retry_after
+        self.factor = 1.0
+        self._blocked_until = 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiters: list = []
+        self._events: Dict[tuple, tuple] = {}  # 等待者 → (事件迴圈, asyncio.Event)
+        self._seq = itertools.count()
+        self._stats = {
+            lane.name.lower(): {"admitted": 0, "throttled": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+            for lane in Priority
+        }
+        self._rate_limited = 0
+
+    # ── 內部 ──────────────────────────────────────────────────
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        for bucket in (self._requests, self._tokens):
+            if bucket is not None:
+                bucket.refill(elapsed, self.factor)
+
+    def _shortfall_seconds(self, tokens: float, priority: Priority) -> float:
+        """放行前還需等待的秒數（0 = 可立即放行）；呼叫端持有鎖"""
+        reserve = self.lane_reserves.get(priority, 0.0)
+        wait = 0.0
+        for bucket, cost in ((self._requests, 1.0), (self._tokens, tokens)):
+            if bucket is None:
+                continue
+            # 大於容量的請求只要求桶滿，避免永遠無法放行
+            needed = min(cost + reserve * bucket.capacity, bucket.capacity)
+            if bucket.available < needed:
+                wait = max(wait, (needed - bucket.available) / bucket.rate(self.factor))
+        return wait
+
+    def _wake_head(self):
+        """喚醒目前的隊首（隊首離開或額度退回時）；呼叫端持有鎖"""
+        if not self._waiters:
+            return
+        loop, event = self._events.get(self._waiters[0], (None, None))
+        if event is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
+
+    def _leave(self, entry: tuple):
+        """移除等待者；它若是隊首則喚醒下一位（呼叫端持有鎖）"""
+        was_head = bool(self._waiters) and self._waiters[0] == entry
+        self._events.pop(entry, None)
+        if was_head:
+            heapq.heappop(self._waiters)
+        elif entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+        if was_head:
+            self._wake_head()
+
+    # ── 公開 API ──────────────────────────────────────────────
+
+    async def acquire(self, tokens: int = 0, priority: Priority = Priority.AGENT) -> float:
+        """
+        等待配額並扣除（1 個請求 + tokens 個 token）
+
+        Returns:
+            等待秒數
+        """
+        if not self.enabled:
+            return 0.0
+        priority = parse_priority(priority)
+        lane = self._stats[priority.name.lower()]
+        entry = (int(priority), next(self._seq))
+        started = time.monotonic()
+        event = asyncio.Event()
+        with self._lock:
+            heapq.heappush(self._waiters, entry)
+            self._events[entry] = (asyncio.get_running_loop(), event)
+        throttled = False
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = max(0.0, self._blocked_until - now)
+                    if delay == 0.0:
+                        if self._waiters[0] != entry:
+                            # 前面有更優先（或較早）的等待者：等它離開時被喚醒
+                            # （1 秒逾時只是保險）
+                            delay = 1.0
+                        else:
+                            delay = self._shortfall_seconds(tokens, priority)
+                    if delay == 0.0:
+                        self._leave(entry)
+                        if self._requests is not None:
+                            self._requests.available -= 1
+                        if self._tokens is not None:
+                            self._tokens.available -= tokens
+                        waited = now - started
+                        lane["admitted"] += 1
+                        lane["throttled"] += int(throttled)
+                        lane["wait_ms_total"] += waited * 1000
+                        lane["wait_ms_max"] = max(lane["wait_ms_max"], waited * 1000)
+                        return waited
+                    # 在鎖內清除，之後的喚醒不會遺失
+                    event.clear()
+                throttled = True
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(max(delay, 0.005), 1.0))
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                self._leave(entry)
+            raise
+
+    def try_acquire(self, tokens: int = 0, priority: Priority = Priority.AGENT) -> bool:
+        """不等待的准入（例如對沖請求）：有人排隊、暫停中或額度不足時回傳 False"""
+        if not self.enabled:
+            return True
+        priority = parse_priority(priority)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._waiters or now < self._blocked_until or self._shortfall_seconds(tokens, priority) > 0:
+                return False
+            if self._requests is not None:
+                self._requests.available -= 1
+            if self._tokens is not None:
+                self._tokens.available -= tokens
+            return True
+
+    def record_usage(self, estimated: int, actual: int):
+        """以實際 token 用量修正估算（退回或追加扣除）"""
+        if self._tokens is None or actual <= 0:
+            return
+        with self._lock:
+            self._tokens.available = min(self._tokens.capacity, self._tokens.available + estimated - actual)
+            if estimated > actual:
+                self._wake_head()
+
+    def on_success(self):
+        """成功呼叫：逐步恢復補充速率（加法增加）"""
+        if self.factor < 1.0:
+            with self._lock:
+                self.factor = min(1.0, self.factor + self.increase_step)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """429：補充速率減半，並暫停所有通道 retry_after 秒"""
+        with self._lock:
+            self._rate_limited += 1
+            self.factor = max(self.min_factor, self.factor / 2)
+            pause = retry_after if retry_after is not None else self.default_retry_after
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+            # 清空目前的額度，避免暫停結束後立刻再次爆量
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None:
+                    bucket.available = min(bucket.available, 0.0)
+        logger.warning(f"[RateLimiter] 429 from provider: rate factor {self.factor:.2f}, "
+                       f"pausing {pause:.1f}s")
+
+    def get_budgets(self) -> Dict[str, Any]:
+        """目前額度、補充速率、自適應係數與各通道統計"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            buckets = {}
+            for name, bucket in (("requests_per_minute", self._requests), ("tokens_per_minute", self._tokens)):
+                if bucket is not None:
+                    buckets[name] = {
+                        "limit": int(bucket.capacity),
+                        "available": int(bucket.available),
+                        "effective_limit": int(bucket.capacity * self.factor)
+                    }
+            waiting = {lane.name.lower(): 0 for lane in Priority}
+            for priority, _ in self._waiters:
+                waiting[Priority(priority).name.lower()] += 1
+            lanes = {
+                name: {
+                    **{k: round(v, 1) if isinstance(v, float) else v for k, v in s.items()},
+                    "reserve": self.lane_reserves.get(Priority[name.upper()], 0.0),
+                    "waiting": waiting[name]
+                }
+                for name, s in self._stats.items()
+            }
+            return {
+                "enabled": self.enabled,
+                **buckets,
+                "rate_factor": round(self.factor, 3),
+                "paused_for_s": round(max(0.0, self._blocked_until - now), 2),
+                "rate_limited": self._rate_limited,
+                "lanes": lanes
+            }
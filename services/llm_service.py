@@ -11,15 +11,20 @@ LLM Service - 統一的 LLM 服務層
 使用範例:
     llm_service = get_llm_service()
     response = await llm_service.generate("Hello", temperature=0.7)
+    responses = await llm_service.generate_many(["Q1", "Q2"], system_message="...")
     stats = llm_service.get_usage_stats()
+    tokens = llm_service.budget.count_messages(messages)    # 以 tokenizer 計算 prompt
 """
 
+import asyncio
 import logging
 import hashlib
 import json
-from typing import Dict, Any, Optional, List, Union
-from datetime import datetime, timedelta
+from contextlib import aclosing, asynccontextmanager
+from typing import Dict, Any, Optional, List, Sequence, Tuple, Union
+from datetime import datetime
 from enum import Enum
+from pathlib import Path
 
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
@@ -27,6 +32,15 @@ from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
 from config.config import Config
+from services.llm_cache import ResponseCache, parse_family_ttls, DEFAULT_FAMILY
+from services.llm_client_pool import LLMClientPool
+from services.llm_rate_limiter import (
+    AdaptiveRateLimiter, Priority, parse_priority, is_rate_limit_error, parse_retry_after
+)
+from services.llm_hedging import LLMHedger, LLMDeadlineExceeded, hedge_key
+from services.provider_replay import get_provider_replay
+from services.prompt_budget import PromptBudget
+from services.llm_streaming import TokenSink, current_token_sink
 from services.domain_events import (
     domain_event_bus,
     LLMCallCompleted,
@@ -35,6 +49,8 @@ from services.domain_events import (
 
 logger = logging.getLogger(__name__)
 
+STRUCTURED_FAMILY = "structured"
+
 
 class LLMProvider(str, Enum):
     """支持的 LLM Provider"""
@@ -71,6 +87,15 @@ class LLMResponse(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
+class AdmissionTicket:
+    """admission() 的准入憑證：呼叫後填入實際 token 數，離開時校正 TPM 用量"""
+
+    def __init__(self, estimated: int, prompt_tokens: int):
+        self.estimated = estimated
+        self.prompt_tokens = prompt_tokens
+        self.actual_tokens: Optional[int] = None
+
+
 class TokenUsageTracker:
     """Token 使用追蹤器"""
     
@@ -153,14 +178,39 @@ class TokenUsageTracker:
 
 
 class LLMCache:
-    """LLM 響應快取"""
+    """
+    LLM 響應快取
+
+    鍵為 (prompt, temperature, model, system) 的雜湊；實際儲存交給
+    services.llm_cache.ResponseCache（O(1) LRU 記憶體層 + SQLite 持久層）。
+    存放 LLMResponse 的序列化內容，命中時回傳新的 LLMResponse(cached=True)，
+    不會修改快取中的物件。
+    """
     
-    def __init__(self, max_age_seconds: int = 3600, max_size: int = 1000):
-        self.cache: Dict[str, tuple[LLMResponse, datetime]] = {}
-        self.max_age = timedelta(seconds=max_age_seconds)
-        self.max_size = max_size
+    def __init__(
+        self,
+        max_age_seconds: Optional[int] = None,
+        max_size: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        family_ttls: Optional[Dict[str, int]] = None,
+        persist_path: Optional[str] = None
+    ):
+        # 持久層只在 live 模式啟用：replay 的假回應不可寫入 live 共用的快取檔，
+        # record 模式命中磁碟快取則會漏錄
+        persist_path = persist_path if persist_path is not None else (
+            Config.LLM_CACHE_PATH if Config.LLM_CACHE_PERSIST and Config.PROVIDER_MODE == "live" else None
+        )
+        self.store = ResponseCache(
+            max_entries=max_size or Config.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=max_bytes or Config.LLM_CACHE_MAX_BYTES,
+            default_ttl=max_age_seconds or Config.LLM_CACHE_DEFAULT_TTL,
+            family_ttls=family_ttls if family_ttls is not None else parse_family_ttls(Config.LLM_CACHE_TTLS),
+            disk_path=Path(persist_path) if persist_path else None,
+            disk_max_bytes=Config.LLM_CACHE_DISK_MAX_BYTES
+        )
     
-    def _generate_key(self, request: LLMRequest) -> str:
+    @staticmethod
+    def _generate_key(request: LLMRequest) -> str:
         """生成快取鍵"""
         data = {
             "prompt": request.prompt,
@@ -170,35 +220,36 @@ class LLMCache:
         }
         return hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest()
     
-    def get(self, request: LLMRequest) -> Optional[LLMResponse]:
+    def get(self, request: LLMRequest, family: str = DEFAULT_FAMILY) -> Optional[LLMResponse]:
         """獲取快取的響應"""
-        key = self._generate_key(request)
-        
-        if key in self.cache:
-            response, timestamp = self.cache[key]
-            
-            # 檢查是否過期
-            if datetime.now() - timestamp < self.max_age:
-                response.cached = True
-                return response
-            else:
-                del self.cache[key]
-        
-        return None
+        payload, tier = self.store.get(self._generate_key(request), family)
+        if payload is None:
+            return None
+        response = LLMResponse(**payload)
+        response.cached = True
+        response.metadata = {**response.metadata, "cache_tier": tier}
+        return response
     
-    def set(self, request: LLMRequest, response: LLMResponse):
+    def set(self, request: LLMRequest, response: LLMResponse, family: str = DEFAULT_FAMILY):
         """保存響應到快取"""
-        # 如果快取已滿，移除最舊的項目
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
-            del self.cache[oldest_key]
-        
-        key = self._generate_key(request)
-        self.cache[key] = (response, datetime.now())
+        self.store.set(self._generate_key(request), response.model_dump(exclude={"cached"}), family)
+    
+    def get_structured(self, key: str, schema: type, family: str = STRUCTURED_FAMILY) -> Optional[BaseModel]:
+        """獲取快取的結構化輸出（記憶體層為已驗證的實例；磁碟層命中時驗證一次）"""
+        result, _ = self.store.get(key, family, decode=schema.model_validate)
+        return result
+    
+    def set_structured(self, key: str, result: BaseModel, family: str = STRUCTURED_FAMILY):
+        """保存已驗證的結構化輸出"""
+        self.store.set(key, result.model_dump(mode="json"), family, memory_value=result)
     
     def clear(self):
         """清空快取"""
-        self.cache.clear()
+        self.store.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率、各層大小與各家族統計"""
+        return self.store.stats()
 
 
 class LLMService:
@@ -210,6 +261,8 @@ class LLMService:
     - Token 追蹤與成本計算
     - 自動重試與錯誤處理
     - 響應快取
+    - 相同請求並行時合併為單次上游呼叫（single-flight）
+    - 互不相依的 prompt 並行批次執行（generate_many）
     - 統一的接口
     """
     
@@ -223,6 +276,20 @@ class LLMService:
         self.config = config or Config()
         self.provider = provider
         
+        # 錄製 / 離線重播（PROVIDER_MODE；live 時為 None）
+        self.replay = get_provider_replay()
+        
+        # ChatOpenAI 客戶端池（依生成參數快取，共用 keep-alive 連線）
+        self.clients = LLMClientPool(
+            api_key=self.config.OPENAI_API_KEY,
+            base_url=self.config.OPENAI_BASE_URL,
+            max_clients=self.config.LLM_CLIENT_POOL_SIZE,
+            max_connections=self.config.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive=self.config.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=self.config.LLM_HTTP_KEEPALIVE_EXPIRY,
+            replay=self.replay
+        )
+        
         # 初始化 Provider
         self._llm = self._create_provider()
         
@@ -232,17 +299,41 @@ class LLMService:
         # 快取
         self.cache = LLMCache() if enable_cache else None
         
+        # 速率限制（RPM / TPM 令牌桶 + 優先級通道，429 時自適應降速）
+        self.limiter = AdaptiveRateLimiter(
+            rpm=self.config.LLM_RATE_LIMIT_RPM,
+            tpm=self.config.LLM_RATE_LIMIT_TPM
+        )
+        
+        # Prompt token 預算（tokenizer 計數，送出前量測 / 裁剪）
+        self.budget = PromptBudget(
+            max_prompt_tokens=self.config.LLM_PROMPT_TOKEN_BUDGET,
+            model=self.config.DEFAULT_MODEL
+        )
+        
+        # 呼叫期限與對沖請求（尾端延遲控制）
+        self.hedger = LLMHedger(
+            enabled=self.config.LLM_HEDGE_ENABLED,
+            percentile=self.config.LLM_HEDGE_PERCENTILE,
+            max_ratio=self.config.LLM_HEDGE_MAX_RATIO,
+            min_delay_ms=self.config.LLM_HEDGE_MIN_DELAY_MS,
+            min_samples=self.config.LLM_HEDGE_MIN_SAMPLES
+        )
+        
+        # 結構化輸出包裝（每個 schema / 模型 / 溫度建立一次）與 schema 識別
+        self._structured_llms: Dict[tuple, tuple] = {}
+        self._schema_ids: Dict[type, str] = {}
+        
+        # Single-flight：相同快取鍵的並行請求共用一次上游呼叫
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._singleflight_stats = {"upstream_calls": 0, "coalesced": 0}
+        
         logger.info(f"[LLMService] Initialized with provider: {provider}")
     
     def _create_provider(self):
         """根據配置創建 LLM Provider"""
         if self.provider == LLMProvider.OPENAI:
-            return ChatOpenAI(
-                model=self.config.DEFAULT_MODEL,
-                temperature=self.config.TEMPERATURE,
-                api_key=self.config.OPENAI_API_KEY,
-                max_tokens=self.config.MAX_TOKENS
-            )
+            return self._client_for()
         elif self.provider == LLMProvider.ANTHROPIC:
             # 未來支持
             try:
@@ -259,11 +350,21 @@ class LLMService:
     
     def _create_openai_provider(self):
         """創建 OpenAI Provider"""
-        return ChatOpenAI(
-            model=self.config.DEFAULT_MODEL,
-            temperature=self.config.TEMPERATURE,
-            api_key=self.config.OPENAI_API_KEY,
-            max_tokens=self.config.MAX_TOKENS
+        return self._client_for()
+    
+    def _client_for(
+        self,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        streaming: bool = False
+    ) -> ChatOpenAI:
+        """取得對應參數的 ChatOpenAI（來自客戶端池，不重建 HTTP 連線）"""
+        return self.clients.get(
+            model=model or self.config.DEFAULT_MODEL,
+            temperature=temperature or self.config.TEMPERATURE,
+            max_tokens=max_tokens or self.config.MAX_TOKENS,
+            streaming=streaming
         )
     
     async def generate(
@@ -274,7 +375,11 @@ class LLMService:
         model: Optional[str] = None,
         system_message: Optional[str] = None,
         session_id: str = "default",
-        use_cache: bool = True
+        use_cache: bool = True,
+        cache_family: str = DEFAULT_FAMILY,
+        priority: Optional[str] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False
     ) -> LLMResponse:
         """
         生成 LLM 響應
@@ -287,10 +392,19 @@ class LLMService:
             system_message: 系統消息
             session_id: Session ID（用於追蹤）
             use_cache: 是否使用快取
+            cache_family: Prompt 家族（決定快取 TTL，例如 classification / intent / answer）
+            priority: 速率限制通道 interactive / agent / background（預設取目前 context）
+            timeout: 呼叫期限秒數（預設 LLM_CALL_TIMEOUT，0 = 不限制）；逾時拋出 LLMDeadlineExceeded
+            stream: 最終答案呼叫：目前 context 有 TokenSink（見 llm_streaming）時，
+                token 到達即推送至 sink（timeout 限制首個 token），仍回傳完整 LLMResponse
         
         Returns:
             LLMResponse
         """
+        lane = parse_priority(priority)
+        deadline = self._deadline(timeout)
+        sink = current_token_sink() if stream else None
+        
         # 創建請求對象
         request = LLMRequest(
             prompt=prompt,
@@ -302,7 +416,7 @@ class LLMService:
         
         # 檢查快取
         if use_cache and self.cache:
-            cached_response = self.cache.get(request)
+            cached_response = self.cache.get(request, cache_family)
             if cached_response:
                 logger.debug("[LLMService] Cache hit")
                 domain_event_bus.publish(
@@ -316,24 +430,179 @@ class LLMService:
                         session_id=session_id,
                     )
                 )
+                if sink is not None:
+                    await sink.send(cached_response.content)
                 return cached_response
         
+        if sink is not None:
+            # 串流回應屬於單一客戶端，不與其他請求合併
+            return await self._invoke_streamed(request, prompt, system_message, temperature, max_tokens, model,
+                                               session_id, use_cache, cache_family, lane, timeout, sink)
+        
+        if not use_cache:
+            return await self._invoke(request, prompt, system_message, temperature, max_tokens, model,
+                                      session_id, use_cache, cache_family, lane, deadline)
+        
+        # Single-flight：已有相同請求在進行中則等待其結果
+        key = LLMCache._generate_key(request)
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is loop and not task.done():
+            self._singleflight_stats["coalesced"] += 1
+            # shield：此等待者被取消（或逾時）時不會取消共用的上游呼叫
+            shared = await self._await_shared(task, deadline, request.model)
+            response = shared.model_copy(deep=True)
+            response.metadata = {**response.metadata, "coalesced": True}
+            domain_event_bus.publish(
+                LLMCallCompleted(
+                    agent_name="llm_service",
+                    model=request.model,
+                    prompt_tokens=response.usage.prompt_tokens,
+                    completion_tokens=response.usage.completion_tokens,
+                    cost=response.usage.cost,
+                    cached=True,
+                    session_id=session_id,
+                )
+            )
+            return response
+        
+        task = loop.create_task(self._invoke(request, prompt, system_message, temperature, max_tokens, model,
+                                             session_id, use_cache, cache_family, lane, deadline))
+        self._inflight[key] = task
+        self._singleflight_stats["upstream_calls"] += 1
+        task.add_done_callback(lambda t: self._release_inflight(key, t))
+        return await self._await_shared(task, deadline, request.model)
+    
+    async def generate_many(
+        self,
+        requests: Sequence[Union[str, Dict[str, Any]]],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+        **defaults
+    ) -> List[Union[LLMResponse, BaseException]]:
+        """
+        並行執行多個互不相依的 prompt，依輸入順序回傳
+        
+        每個呼叫仍經過快取、single-flight、速率限制與對沖；總耗時約為最慢的一個，
+        而不是全部相加。
+        
+        Args:
+            requests: prompt 字串，或 generate() 參數的 dict（例如 {"prompt": ..., "temperature": 0.2}）
+            max_concurrency: 同時進行的呼叫數（預設 LLM_BATCH_MAX_CONCURRENCY）
+            return_exceptions: True 時失敗的位置放入例外；False 時第一個失敗即取消其餘並拋出
+            **defaults: 套用到每個請求的 generate() 參數（system_message、session_id 等）
+        
+        Returns:
+            與 requests 同順序的 LLMResponse 列表
+        """
+        results: List[Union[LLMResponse, BaseException, None]] = [None] * len(requests)
+        async for index, result in self.generate_as_completed(
+            requests, max_concurrency, return_exceptions, **defaults
+        ):
+            results[index] = result
+        return results
+    
+    async def generate_as_completed(
+        self,
+        requests: Sequence[Union[str, Dict[str, Any]]],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+        **defaults
+    ):
+        """
+        同 generate_many，但每完成一個就產出 (index, response)，可先顯示部分結果
+        
+        async for index, response in llm_service.generate_as_completed(prompts):
+            ...
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.config.LLM_BATCH_MAX_CONCURRENCY))
+        
+        async def run(index: int, request: Union[str, Dict[str, Any]]) -> Tuple[int, Any]:
+            kwargs = {**defaults, **(request if isinstance(request, dict) else {"prompt": request})}
+            async with semaphore:
+                try:
+                    return index, await self.generate(**kwargs)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    return index, e
+        
+        # 任務建立時複製目前 context：優先級通道沿用呼叫端的設定
+        tasks = [asyncio.ensure_future(run(i, request)) for i, request in enumerate(requests)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        """呼叫期限（秒）；None / 0 = 不限制"""
+        value = timeout if timeout is not None else self.config.LLM_CALL_TIMEOUT
+        return value if value and value > 0 else None
+    
+    async def _await_shared(self, task: asyncio.Task, deadline: Optional[float], model: str) -> LLMResponse:
+        """以自己的期限等待共用呼叫"""
+        if deadline is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), deadline)
+        except asyncio.TimeoutError:
+            if task.done() and not task.cancelled() and isinstance(task.exception(), LLMDeadlineExceeded):
+                raise task.exception()
+            raise LLMDeadlineExceeded(f"LLM call '{model}' exceeded its {deadline:g}s deadline") from None
+    
+    def _hedge_gate(self, messages: List, max_tokens: Optional[int], model: Optional[str], lane: Priority):
+        """對沖前檢查：背景通道不對沖；對沖請求也要取得速率限制額度（不等待）"""
+        def can_hedge() -> bool:
+            if lane == Priority.BACKGROUND:
+                return False
+            return self.limiter.try_acquire(self._estimate_tokens(messages, max_tokens, model), lane)
+        return can_hedge
+    
+    def _release_inflight(self, key: str, task: asyncio.Task):
+        """上游呼叫完成：移出進行中表；讀取例外避免所有等待者都取消時出現未取回警告"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+    
+    async def _invoke(
+        self,
+        request: LLMRequest,
+        prompt: Union[str, List[Dict[str, str]]],
+        system_message: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        model: Optional[str],
+        session_id: str,
+        use_cache: bool,
+        cache_family: str,
+        lane: Priority = Priority.AGENT,
+        deadline: Optional[float] = None
+    ) -> LLMResponse:
+        """實際呼叫上游 LLM、追蹤使用量並寫入快取"""
         # 準備消息
         messages = self._prepare_messages(prompt, system_message)
         
-        # 創建帶參數的 LLM
-        llm = self._llm
-        if temperature is not None or max_tokens is not None or model is not None:
-            llm = ChatOpenAI(
-                model=model or self.config.DEFAULT_MODEL,
-                temperature=temperature or self.config.TEMPERATURE,
-                max_tokens=max_tokens or self.config.MAX_TOKENS,
-                api_key=self.config.OPENAI_API_KEY
-            )
+        # 取得帶參數的 LLM（客戶端池）
+        llm = self._client_for(temperature, max_tokens, model)
+        
+        # 送出前量測 prompt；速率限制：等待 RPM / TPM 配額
+        prompt_tokens = self._measure_prompt(messages, request.model)
+        estimated = prompt_tokens + (request.max_tokens or self.config.MAX_TOKENS)
+        await self.limiter.acquire(estimated, lane)
         
         try:
-            # 調用 LLM
-            result = await llm.ainvoke(messages)
+            # 調用 LLM（期限 + 對沖：逾 p95 門檻未完成時送出第二個請求，先完成者勝出）
+            result = await self.hedger.run(
+                lambda: llm.ainvoke(messages),
+                key=hedge_key(request.model, cache_family, prompt_tokens),
+                deadline=deadline,
+                can_hedge=self._hedge_gate(messages, request.max_tokens, request.model, lane)
+            )
             
             # 提取內容
             content = result.content if hasattr(result, 'content') else str(result)
@@ -345,6 +614,13 @@ class LLMService:
                 usage.prompt_tokens = token_usage.get('prompt_tokens', 0)
                 usage.completion_tokens = token_usage.get('completion_tokens', 0)
                 usage.total_tokens = token_usage.get('total_tokens', 0)
+            if not usage.total_tokens:
+                # Provider 未回傳用量時以 tokenizer 計算
+                usage.prompt_tokens = prompt_tokens
+                usage.completion_tokens = self.budget.count(content, request.model)
+                usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+            self.limiter.record_usage(estimated, usage.total_tokens)
+            self.limiter.on_success()
             
             # 追蹤使用
             if self.tracker:
@@ -366,7 +642,7 @@ class LLMService:
             
             # 保存到快取
             if use_cache and self.cache:
-                self.cache.set(request, response)
+                self.cache.set(request, response, cache_family)
 
             # 發布領域事件
             domain_event_bus.publish(
@@ -385,6 +661,8 @@ class LLMService:
             
         except Exception as e:
             logger.error(f"[LLMService] Generation failed: {e}")
+            if is_rate_limit_error(e):
+                self.limiter.on_rate_limited(parse_retry_after(e))
             domain_event_bus.publish(
                 LLMCallFailed(
                     agent_name="llm_service",
@@ -415,6 +693,65 @@ class LLMService:
             
             raise
     
+    async def _invoke_streamed(
+        self,
+        request: LLMRequest,
+        prompt: Union[str, List[Dict[str, str]]],
+        system_message: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        model: Optional[str],
+        session_id: str,
+        use_cache: bool,
+        cache_family: str,
+        lane: Priority,
+        timeout: Optional[float],
+        sink: TokenSink
+    ) -> LLMResponse:
+        """以串流呼叫上游，token 推送至 sink，完成後組成 LLMResponse 並寫入快取"""
+        messages = self._prepare_messages(prompt, system_message)
+        usage = TokenUsage()
+        content = ""
+        try:
+            tokens = self._stream_tokens(messages, temperature, max_tokens, model, session_id, lane, timeout, usage)
+            async with aclosing(tokens):
+                async for token in tokens:
+                    content += token
+                    await sink.send(token)
+        except Exception as e:
+            logger.error(f"[LLMService] Streamed generation failed: {e}")
+            domain_event_bus.publish(
+                LLMCallFailed(
+                    agent_name="llm_service",
+                    model=request.model,
+                    error=str(e),
+                    session_id=session_id,
+                )
+            )
+            raise
+        
+        response = LLMResponse(
+            content=content,
+            usage=usage,
+            model=request.model,
+            cached=False,
+            metadata={"streamed": True}
+        )
+        if use_cache and self.cache:
+            self.cache.set(request, response, cache_family)
+        domain_event_bus.publish(
+            LLMCallCompleted(
+                agent_name="llm_service",
+                model=request.model,
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                cost=usage.cost,
+                cached=False,
+                session_id=session_id,
+            )
+        )
+        return response
+    
     async def astream(
         self,
         prompt: Union[str, List[Dict[str, str]]],
@@ -422,40 +759,134 @@ class LLMService:
         max_tokens: Optional[int] = None,
         model: Optional[str] = None,
         system_message: Optional[str] = None,
-        session_id: str = "default"
+        session_id: str = "default",
+        priority: Optional[str] = None,
+        timeout: Optional[float] = None
     ):
         """
         Stream LLM response token-by-token.
         
         Yields string chunks as they arrive from the LLM provider.
+        timeout / hedging apply to the first token (TTFT).
         """
         messages = self._prepare_messages(prompt, system_message)
-        
-        llm = self._llm
-        if temperature is not None or max_tokens is not None or model is not None:
-            llm = ChatOpenAI(
-                model=model or self.config.DEFAULT_MODEL,
-                temperature=temperature or self.config.TEMPERATURE,
-                max_tokens=max_tokens or self.config.MAX_TOKENS,
-                api_key=self.config.OPENAI_API_KEY,
-                streaming=True
-            )
-        
-        full_content = ""
-        async for chunk in llm.astream(messages):
-            token = chunk.content if hasattr(chunk, 'content') else str(chunk)
-            if token:
-                full_content += token
+        tokens = self._stream_tokens(messages, temperature, max_tokens, model, session_id,
+                                     parse_priority(priority), timeout, TokenUsage())
+        async with aclosing(tokens):
+            async for token in tokens:
                 yield token
+    
+    async def _stream_tokens(
+        self,
+        messages: List,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        model: Optional[str],
+        session_id: str,
+        lane: Priority,
+        timeout: Optional[float],
+        usage: TokenUsage
+    ):
+        """串流上游 LLM（速率限制 + TTFT 期限 / 對沖），完成後把實際用量寫入 usage"""
+        llm = self._client_for(temperature, max_tokens, model, streaming=True)
+        model = model or self.config.DEFAULT_MODEL
+        full_content = ""
+        usage_metadata = None
+        async with self.admission(messages, max_tokens, lane, model) as ticket:
+            stream = self.hedger.run_stream(
+                lambda: llm.astream(messages),
+                key=hedge_key(model, "ttft", ticket.prompt_tokens),
+                deadline=self._deadline(timeout),
+                can_hedge=self._hedge_gate(messages, max_tokens, model, lane)
+            )
+            async for chunk in stream:
+                # 最後一個 chunk 帶 provider 回報的實際用量（stream_usage）
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                token = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                if token:
+                    full_content += token
+                    yield token
+            
+            # Track usage：provider 用量優先，否則以 tokenizer 計算
+            if usage_metadata:
+                prompt_tokens = usage_metadata.get("input_tokens", 0)
+                completion_tokens = usage_metadata.get("output_tokens", 0)
+            else:
+                prompt_tokens = ticket.prompt_tokens
+                completion_tokens = self.budget.count(full_content, model)
+            ticket.actual_tokens = prompt_tokens + completion_tokens
         
-        # Track usage (estimated — streaming doesn't always return exact counts)
+        usage.prompt_tokens = prompt_tokens
+        usage.completion_tokens = completion_tokens
+        usage.total_tokens = prompt_tokens + completion_tokens
         if self.tracker:
             self.tracker.track(
-                model=model or self.config.DEFAULT_MODEL,
-                prompt_tokens=len(str(messages)) // 4,  # rough estimate
-                completion_tokens=len(full_content) // 4,
+                model=model,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
                 session_id=session_id
             )
+            usage.cost = self.tracker.session_usage.get(session_id, TokenUsage()).cost
+    
+    def _estimate_tokens(self, messages: Union[str, List], max_tokens: Optional[int], model: Optional[str]) -> int:
+        """TPM 估算：prompt token 數 + max_tokens（供應商以 max_tokens 計入配額）"""
+        return self.budget.count_messages(messages, model or self.config.DEFAULT_MODEL) + (max_tokens or self.config.MAX_TOKENS)
+    
+    def _measure_prompt(self, messages: Union[str, List], model: Optional[str]) -> int:
+        """送出前以 tokenizer 量測 prompt；超出預算時記錄警告（裁剪由呼叫端以 budget.fit 處理）"""
+        prompt_tokens = self.budget.count_messages(messages, model or self.config.DEFAULT_MODEL)
+        if not self.budget.check(prompt_tokens):
+            logger.warning(
+                f"[LLMService] Prompt of {prompt_tokens} tokens exceeds budget "
+                f"{self.budget.max_prompt_tokens} (model {model or self.config.DEFAULT_MODEL})"
+            )
+        return prompt_tokens
+    
+    @asynccontextmanager
+    async def admission(
+        self,
+        messages: Union[str, List],
+        max_tokens: Optional[int] = None,
+        priority: Optional[str] = None,
+        model: Optional[str] = None
+    ):
+        """
+        速率限制准入（供不經 generate() 的直接 LLM 呼叫使用）
+
+        async with llm_service.admission(prompt, priority="background") as ticket:
+            response = await llm.ainvoke(prompt)
+            ticket.actual_tokens = response.usage_metadata["total_tokens"]   # 可選
+        """
+        prompt_tokens = self._measure_prompt(messages, model)
+        ticket = AdmissionTicket(prompt_tokens + (max_tokens or self.config.MAX_TOKENS), prompt_tokens)
+        await self.limiter.acquire(ticket.estimated, parse_priority(priority))
+        try:
+            yield ticket
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.limiter.on_rate_limited(parse_retry_after(e))
+            raise
+        if ticket.actual_tokens is not None:
+            self.limiter.record_usage(ticket.estimated, ticket.actual_tokens)
+        self.limiter.on_success()
+    
+    def get_hedging_stats(self) -> Dict[str, Any]:
+        """對沖次數 / 勝出率、期限逾時數與實際延遲 p50 / p95 / p99"""
+        return self.hedger.get_stats()
+    
+    def get_provider_stats(self) -> Dict[str, Any]:
+        """Provider 模式（live / record / replay）與錄製、重播、合成次數"""
+        if self.replay is None:
+            return {"mode": "live"}
+        return self.replay.get_stats()
+    
+    def get_prompt_budget_stats(self) -> Dict[str, Any]:
+        """Prompt token 預算、裁剪次數與各段落裁剪的 token 數"""
+        return self.budget.get_stats()
+    
+    def get_rate_limit_budgets(self) -> Dict[str, Any]:
+        """目前 RPM / TPM 額度、自適應係數與各優先級通道統計"""
+        return self.limiter.get_budgets()
     
     def _prepare_messages(
         self,
@@ -496,7 +927,32 @@ class LLMService:
                 "session": self.tracker.session_usage.get(session_id, TokenUsage()).model_dump()
             }
         
-        return self.tracker.get_stats()
+        stats = self.tracker.get_stats()
+        if self.cache:
+            stats["cache"] = self.cache.get_stats()
+        stats["single_flight"] = self.get_singleflight_stats()
+        stats["clients"] = self.clients.get_stats()
+        stats["rate_limit"] = self.get_rate_limit_budgets()
+        stats["hedging"] = self.get_hedging_stats()
+        stats["provider"] = self.get_provider_stats()
+        stats["prompt_budget"] = self.get_prompt_budget_stats()
+        return stats
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """快取命中率與大小統計"""
+        if not self.cache:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_stats()}
+    
+    def get_singleflight_stats(self) -> Dict[str, Any]:
+        """上游呼叫數、被合併的重複請求數與目前進行中的請求數"""
+        stats = dict(self._singleflight_stats)
+        total = stats["upstream_calls"] + stats["coalesced"]
+        return {
+            **stats,
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": round(stats["coalesced"] / total, 4) if total else 0.0
+        }
     
     def reset_session_stats(self, session_id: str):
         """重置 Session 統計"""
@@ -515,35 +971,65 @@ class LLMService:
         output_schema: type,
         variables: Dict[str, Any] = None,
         user_input: str = "",
-        temperature: float = 0.1
+        temperature: float = 0.1,
+        use_cache: bool = True,
+        priority: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> Any:
         """
         生成結構化輸出（使用 LLM with_structured_output）
         
+        結果以 (schema 識別, 模型, 溫度, 渲染後的 prompt) 為鍵快取（"structured" 家族
+        TTL），相同請求並行時合併為一次上游呼叫。命中時回傳已驗證實例的淺複製，
+        不經網路也不重新驗證；巢狀欄位與快取共用，請勿就地修改。
+        
         Args:
-            prompt_key: Prompt 配置鍵
+            prompt_key: Prompt 配置鍵（其 system_prompt 以 variables 渲染後作為系統消息）
             output_schema: Pydantic 模型類
             variables: 插入 prompt 的變數
             user_input: 用戶輸入
             temperature: 溫度參數
+            use_cache: 是否使用快取
+            priority: 速率限制通道（預設取目前 context）
+            timeout: 呼叫期限秒數（預設 LLM_CALL_TIMEOUT）
         
         Returns:
             output_schema 實例
         """
         try:
-            # 創建結構化輸出的 LLM
-            structured_llm = self._llm.with_structured_output(output_schema)
+            messages = self._structured_messages(prompt_key, variables, user_input)
+            model = self.config.DEFAULT_MODEL
+            lane = parse_priority(priority)
+            deadline = self._deadline(timeout)
+            
+            cacheable = use_cache and self.cache is not None and hasattr(output_schema, "model_validate")
+            if not cacheable:
+                return await self._invoke_structured(output_schema, messages, temperature, model, lane, deadline)
             
-            # 構建 prompt
-            prompt = user_input
-            if variables:
-                for key, value in variables.items():
-                    prompt = prompt.replace(f"{{{key}}}", str(value))
+            key = self._structured_key(output_schema, messages, temperature, model)
+            cached = self.cache.get_structured(key, output_schema)
+            if cached is not None:
+                logger.debug(f"[LLMService] Structured cache hit ({output_schema.__name__})")
+                return cached.model_copy(deep=True)
             
-            # 調用 LLM
-            result = await structured_llm.ainvoke(prompt)
+            # Single-flight（與 generate 共用進行中表）
+            loop = asyncio.get_running_loop()
+            task = self._inflight.get(key)
+            if task is not None and task.get_loop() is loop and not task.done():
+                self._singleflight_stats["coalesced"] += 1
+                return (await self._await_shared(task, deadline, model)).model_copy(deep=True)
             
-            return result
+            async def invoke_and_store():
+                result = await self._invoke_structured(output_schema, messages, temperature, model, lane, deadline)
+                if isinstance(result, output_schema):
+                    self.cache.set_structured(key, result)
+                return result
+            
+            task = loop.create_task(invoke_and_store())
+            self._inflight[key] = task
+            self._singleflight_stats["upstream_calls"] += 1
+            task.add_done_callback(lambda t: self._release_inflight(key, t))
+            return (await self._await_shared(task, deadline, model)).model_copy(deep=True)
             
         except Exception as e:
             logger.error(f"[LLMService] Structured output generation failed: {e}")
@@ -552,6 +1038,74 @@ class LLMService:
                 return output_schema()
             raise
 
+    def _structured_messages(
+        self,
+        prompt_key: str,
+        variables: Optional[Dict[str, Any]],
+        user_input: str
+    ) -> List:
+        """渲染結構化呼叫的消息：prompt_key 的系統提示 + 代入變數的用戶輸入"""
+        from services.prompt_manager import get_prompt_manager
+        
+        prompt_manager = get_prompt_manager()
+        system_prompt = prompt_manager.render(prompt_manager.get_prompt(prompt_key), variables)
+        
+        prompt = user_input
+        if variables:
+            for key, value in variables.items():
+                prompt = prompt.replace(f"{{{key}}}", str(value))
+            if not prompt:
+                # 只傳變數時以 "key: value" 作為用戶輸入（避免送出空 prompt）
+                prompt = "\n".join(f"{key}: {value}" for key, value in variables.items())
+        return [SystemMessage(content=system_prompt), HumanMessage(content=prompt)]
+    
+    def _schema_identity(self, schema: type) -> str:
+        """schema 的模組路徑 + JSON Schema 雜湊（欄位改變時快取自然失效）"""
+        identity = self._schema_ids.get(schema)
+        if identity is None:
+            definition = json.dumps(schema.model_json_schema(), sort_keys=True, default=str)
+            identity = f"{schema.__module__}.{schema.__qualname__}:{hashlib.md5(definition.encode()).hexdigest()[:12]}"
+            self._schema_ids[schema] = identity
+        return identity
+    
+    def _structured_key(self, schema: type, messages: List, temperature: float, model: str) -> str:
+        data = {
+            "schema": self._schema_identity(schema),
+            "model": model,
+            "temperature": temperature,
+            "messages": [[m.type, m.content] for m in messages]
+        }
+        return "structured:" + hashlib.md5(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+    
+    def _structured_runnable(self, schema: type, temperature: float, model: str):
+        """with_structured_output 包裝：每個 (schema, 模型, 溫度) 建立一次；客戶端池重建客戶端時跟著重建"""
+        llm = self._client_for(temperature, None, model)
+        key = (schema, model, temperature)
+        entry = self._structured_llms.get(key)
+        if entry is None or entry[0] is not llm:
+            entry = (llm, llm.with_structured_output(schema))
+            self._structured_llms[key] = entry
+        return entry[1]
+    
+    async def _invoke_structured(
+        self,
+        schema: type,
+        messages: List,
+        temperature: float,
+        model: str,
+        lane: Priority,
+        deadline: Optional[float]
+    ) -> Any:
+        """結構化輸出的上游呼叫（速率限制 + 期限 / 對沖）"""
+        structured_llm = self._structured_runnable(schema, temperature, model)
+        async with self.admission(messages, None, lane, model) as ticket:
+            return await self.hedger.run(
+                lambda: structured_llm.ainvoke(messages),
+                key=hedge_key(model, STRUCTURED_FAMILY, ticket.prompt_tokens),
+                deadline=deadline,
+                can_hedge=self._hedge_gate(messages, None, model, lane)
+            )
+
 # 單例模式（線程安全）
 import threading
 
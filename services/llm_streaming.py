@@ -0,0 +1,143 @@
+"""
+LLM Streaming - 最終答案的 token 串流（token sink）
+
+/chat/send 與 /ws/chat 經過完整的 manager / agent 流程，過去要等整個流程完成
+才送出任何內容；只有繞過 agent 的 /chat/stream 能逐 token 串流。
+
+TokenSink 以 contextvar 傳遞（同 llm_rate_limiter 的優先級），不需修改每一層
+的簽名：Router 在 token_sink_scope 內呼叫 ChatService.process_message，流程中
+標記為最終答案的 LLM 呼叫（llm_service.generate(..., stream=True)）在 token
+到達時即推送給 SSE / WebSocket 客戶端；其餘呼叫（分類、規劃、驗證）不受影響。
+
+首個 token 延遲（TTFT）依路由記錄：流程沒有串流任何 token 時（例如快取命中、
+工具結果），以最終答案送出的時間計算並計入 unstreamed。
+
+使用範例:
+    async def on_token(token: str):
+        await websocket.send_json({"type": "token", "content": {"token": token}})
+
+    sink = TokenSink(on_token, route="/ws/chat")
+    with token_sink_scope(sink):
+        result = await chat_service.process_message(message)
+    sink.finish()
+    get_ttft_stats()   # {"/ws/chat": {"count": 12, "p50": 420.0, ...}}
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.metrics import RollingWindow
+
+logger = logging.getLogger(__name__)
+
+_current_sink: contextvars.ContextVar[Optional["TokenSink"]] = contextvars.ContextVar(
+    "llm_token_sink", default=None
+)
+
+
+class TTFTRecorder:
+    """各路由的首個 token 延遲（毫秒，最近 N 筆）"""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._routes: Dict[str, RollingWindow] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, ms: float, streamed: bool = True):
+        with self._lock:
+            if route not in self._routes:
+                self._routes[route] = RollingWindow(self.window)
+                self._counts[route] = {"streamed": 0, "unstreamed": 0}
+            self._counts[route]["streamed" if streamed else "unstreamed"] += 1
+            window = self._routes[route]
+        window.observe(ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = dict(self._routes)
+            counts = {route: dict(c) for route, c in self._counts.items()}
+        return {route: {**window.snapshot(), **counts[route]} for route, window in routes.items()}
+
+
+_ttft = TTFTRecorder()
+
+
+class TokenSink:
+    """
+    最終答案 token 的接收端
+
+    Args:
+        callback: async (token) -> None，推送單個 token
+        route: TTFT 統計使用的路由名稱
+        started: 請求開始時間（time.perf_counter()；預設為建立時）
+
+    callback 失敗（例如客戶端已斷線）時停止推送，流程照常完成。
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[str], Awaitable[None]],
+        route: str = "default",
+        started: Optional[float] = None
+    ):
+        self.callback = callback
+        self.route = route
+        self.started = started if started is not None else time.perf_counter()
+        self.first_token_ms: Optional[float] = None
+        self.tokens = 0
+        self.closed = False
+        self._recorded = False
+
+    def _record(self, streamed: bool):
+        if not self._recorded:
+            self._recorded = True
+            self.first_token_ms = (time.perf_counter() - self.started) * 1000
+            _ttft.observe(self.route, self.first_token_ms, streamed)
+
+    async def send(self, token: str):
+        if not token or self.closed:
+            return
+        self._record(streamed=True)
+        self.tokens += 1
+        try:
+            await self.callback(token)
+        except Exception as e:
+            logger.warning(f"[TokenSink] {self.route}: stop streaming ({e})")
+            self.closed = True
+
+    @property
+    def streamed(self) -> bool:
+        return self.tokens > 0
+
+    def finish(self):
+        """最終答案已送出；未串流任何 token 時以此刻記錄 TTFT"""
+        self._record(streamed=False)
+
+
+def current_token_sink() -> Optional[TokenSink]:
+    return _current_sink.get()
+
+
+@contextmanager
+def token_sink_scope(sink: Optional[TokenSink]):
+    """區塊內（含其中建立的 task）標記 stream=True 的 LLM 呼叫推送至 sink"""
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
+
+
+def record_ttft(route: str, ms: float, streamed: bool = True):
+    """不經 TokenSink 的路由（例如 /chat/stream）直接記錄 TTFT"""
+    _ttft.observe(route, ms, streamed)
+
+
+def get_ttft_stats() -> Dict[str, Any]:
+    """各路由 TTFT p50 / p95 / p99（毫秒）與串流 / 非串流次數"""
+    return _ttft.get_stats()
@@ -0,0 +1,125 @@
+"""
+Metrics - 輕量級行程內統計
+
+固定桶邊界的直方圖，供服務層的 get_stats() 匯出延遲 / 批次大小分佈，
+不引入 Prometheus 等外部依賴。
+
+使用範例:
+    latency = Histogram(LATENCY_BUCKETS_MS)
+    latency.observe(12.5)
+    latency.snapshot()   # {"count": 1, "mean": 12.5, "p50": ..., "buckets": {...}}
+
+    recent = RollingWindow(500)
+    recent.observe(812.0)
+    recent.percentile(0.95)
+"""
+
+import bisect
+import threading
+from collections import deque
+from typing import Dict, Sequence
+
+# 毫秒延遲的預設桶邊界
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class Histogram:
+    """
+    固定桶直方圖（執行緒安全）
+
+    Args:
+        buckets: 遞增的桶上界；超出最後一個上界的值計入 "+Inf"
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def percentile(self, q: float) -> float:
+        """近似分位數（以所在桶的上界表示，不超過觀測最大值；0 <= q <= 1）"""
+        with self._lock:
+            if self._count == 0:
+                return 0.0
+            target = q * self._count
+            running = 0
+            for idx, n in enumerate(self._counts):
+                running += n
+                if running >= target and n:
+                    return min(self.bounds[idx], self._max) if idx < len(self.bounds) else self._max
+            return self._max
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts = list(self._counts)
+            count, total, maximum = self._count, self._sum, self._max
+        labels = [f"<={b:g}" for b in self.bounds] + ["+Inf"]
+        return {
+            "count": count,
+            "mean": round(total / count, 3) if count else 0.0,
+            "max": round(maximum, 3),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": {label: n for label, n in zip(labels, counts) if n}
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.bounds) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+
+
+class RollingWindow:
+    """
+    最近 N 筆觀測值（執行緒安全）
+
+    Histogram 的桶邊界對門檻判斷太粗（500 → 1000 → 2000 ms）；需要精確分位數
+    且只關心近期分佈時（例如對沖延遲門檻）使用。
+    """
+
+    def __init__(self, size: int = 500):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._values.append(value)
+
+    @property
+    def count(self) -> int:
+        return len(self._values)
+
+    def percentile(self, q: float) -> float:
+        """最近 N 筆的分位數（0 <= q <= 1）；無資料時為 0"""
+        with self._lock:
+            ordered = sorted(self._values)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "p50": round(self.percentile(0.5), 3),
+            "p95": round(self.percentile(0.95), 3),
+            "p99": round(self.percentile(0.99), 3)
+        }
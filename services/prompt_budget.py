@@ -0,0 +1,200 @@
+"""
+Prompt Budget - 送出前的 prompt token 預算
+
+Agent 直接把對話歷史、記憶與 RAG 上下文串進 prompt，沒有任何大小限制
+（ReActLoop.think 只以字元數截斷上下文、歷史步驟不設上限），常常送出遠大於
+需要的 prompt：成本與延遲都隨 prompt token 數增加，也更容易觸發 TPM 限制。
+
+PromptBudget 以 tokenizer（services.token_counter，編碼器按模型快取）計算
+token，在送出前把各段落裁剪到預算內：
+- 每個段落有優先級，數字越小越先被裁剪（例如 歷史 0 < 記憶 1 < RAG 2）
+- keep="start" 保留開頭（RAG / 記憶依相關度排序）；keep="end" 保留結尾
+  （對話歷史保留最近的內容）
+- 傳入 units（例如對話輪次）時以整段為單位丟棄，不會切斷半句
+- reserved_tokens 為不可裁剪部分（指示、問題、系統消息）的 token 數
+
+預算由 LLM_PROMPT_TOKEN_BUDGET 設定（0 = 不限制），也可逐次指定。
+
+使用範例:
+    budget = PromptBudget(max_prompt_tokens=6000)
+    fitted = budget.fit(
+        [PromptSection("history", history_text, priority=0, keep="end"),
+         PromptSection("rag", rag_context, priority=2)],
+        reserved_tokens=budget.count(instructions)
+    )
+    prompt = instructions + fitted["history"] + fitted["rag"]
+    budget.get_stats()   # {"prompts_trimmed": 3, "tokens_trimmed": 5120, ...}
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from services.token_counter import count_tokens, truncate_to_tokens, tail_tokens
+
+logger = logging.getLogger(__name__)
+
+# 每則消息的格式開銷（role / 分隔符）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@dataclass
+class PromptSection:
+    """可裁剪的 prompt 段落"""
+    name: str
+    text: str = ""
+    priority: int = 0                      # 越小越先被裁剪
+    keep: str = "start"                    # "start" 保留開頭 / "end" 保留結尾
+    min_tokens: int = 0                    # 裁剪下限（0 = 可整段移除）
+    units: Optional[List[Any]] = None      # 以整段為單位裁剪（text 預設為其格式化結果）
+    formatter: Callable[[Any], str] = str
+    separator: str = "\n"
+
+    def __post_init__(self):
+        if self.units is not None and not self.text:
+            self.text = self.separator.join(self.formatter(u) for u in self.units)
+
+
+@dataclass
+class FittedPrompt:
+    """裁剪結果"""
+    sections: Dict[str, str]
+    units: Dict[str, List[Any]]
+    budget: int
+    tokens_before: int
+    tokens_after: int
+    trimmed: Dict[str, int] = field(default_factory=dict)   # 段落 → 移除的 token 數
+
+    def __getitem__(self, name: str) -> str:
+        return self.sections[name]
+
+    @property
+    def over_budget(self) -> bool:
+        """不可裁剪部分（或 min_tokens）本身已超出預算"""
+        return self.budget > 0 and self.tokens_after > self.budget
+
+
+class PromptBudget:
+    """
+    以 tokenizer 計算並裁剪 prompt（執行緒安全的統計）
+
+    Args:
+        max_prompt_tokens: 預設預算（prompt token 數；0 = 不限制）
+        model: 預設 tokenizer 模型
+    """
+
+    def __init__(self, max_prompt_tokens: int = 6000, model: Optional[str] = None):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.model = model
+        self._lock = threading.Lock()
+        self._stats = {"prompts_fitted": 0, "prompts_trimmed": 0, "tokens_trimmed": 0, "over_budget": 0}
+        self._by_section: Dict[str, int] = {}
+
+    # ── 計數 ──────────────────────────────────────────────────
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        return count_tokens(text, model or self.model)
+
+    def count_messages(self, messages: Union[str, Sequence[Any]], model: Optional[str] = None) -> int:
+        """prompt token 數：字串、LangChain 消息或 {"role", "content"} dict 列表"""
+        if isinstance(messages, str):
+            return self.count(messages, model)
+        total = 0
+        for message in messages:
+            content = message.get("content", "") if isinstance(message, dict) else getattr(message, "content", message)
+            total += self.count(content if isinstance(content, str) else str(content), model) + MESSAGE_OVERHEAD_TOKENS
+        return total
+
+    # ── 裁剪 ──────────────────────────────────────────────────
+
+    def _trim(self, section: PromptSection, allowed: int, model: Optional[str]) -> Tuple[str, Optional[List[Any]]]:
+        if section.units is None:
+            cut = tail_tokens if section.keep == "end" else truncate_to_tokens
+            return cut(section.text, allowed, model or self.model), None
+
+        units = list(reversed(section.units)) if section.keep == "end" else list(section.units)
+        kept, used = [], 0
+        separator_tokens = self.count(section.separator, model)
+        for unit in units:
+            cost = self.count(section.formatter(unit), model) + (separator_tokens if kept else 0)
+            if used + cost > allowed:
+                break
+            kept.append(unit)
+            used += cost
+        if section.keep == "end":
+            kept.reverse()
+        return section.separator.join(section.formatter(u) for u in kept), kept
+
+    def fit(
+        self,
+        sections: Sequence[PromptSection],
+        reserved_tokens: int = 0,
+        budget: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> FittedPrompt:
+        """
+        把段落裁剪到 budget 內（依優先級由低到高，每段只裁到剛好夠用）
+
+        Args:
+            sections: 可裁剪段落
+            reserved_tokens: 不可裁剪部分的 token 數
+            budget: 預算（預設 max_prompt_tokens；0 = 不限制）
+            model: tokenizer 模型
+        """
+        budget = self.max_prompt_tokens if budget is None else budget
+        tokens = {s.name: self.count(s.text, model) for s in sections}
+        texts = {s.name: s.text for s in sections}
+        units = {s.name: list(s.units) for s in sections if s.units is not None}
+        before = reserved_tokens + sum(tokens.values())
+        trimmed: Dict[str, int] = {}
+
+        overflow = before - budget if budget > 0 else 0
+        # sorted 為穩定排序：同優先級依傳入順序裁剪
+        for section in sorted(sections, key=lambda s: s.priority):
+            if overflow <= 0:
+                break
+            current = tokens[section.name]
+            allowed = max(section.min_tokens, current - overflow)
+            if allowed >= current:
+                continue
+            text, kept = self._trim(section, allowed, model)
+            new_tokens = self.count(text, model)
+            texts[section.name] = text
+            if kept is not None:
+                units[section.name] = kept
+            trimmed[section.name] = current - new_tokens
+            overflow -= current - new_tokens
+            tokens[section.name] = new_tokens
+
+        after = reserved_tokens + sum(tokens.values())
+        fitted = FittedPrompt(texts, units, budget, before, after, trimmed)
+        with self._lock:
+            self._stats["prompts_fitted"] += 1
+            if trimmed:
+                self._stats["prompts_trimmed"] += 1
+                self._stats["tokens_trimmed"] += before - after
+                for name, n in trimmed.items():
+                    self._by_section[name] = self._by_section.get(name, 0) + n
+            if fitted.over_budget:
+                self._stats["over_budget"] += 1
+        if trimmed:
+            logger.debug(f"[PromptBudget] {before} → {after} tokens (budget {budget}): {trimmed}")
+        return fitted
+
+    def check(self, prompt_tokens: int, budget: Optional[int] = None) -> bool:
+        """送出前檢查（不裁剪）；超出預算時記錄並回傳 False"""
+        budget = self.max_prompt_tokens if budget is None else budget
+        if budget > 0 and prompt_tokens > budget:
+            with self._lock:
+                self._stats["over_budget"] += 1
+            return False
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget": self.max_prompt_tokens,
+                **self._stats,
+                "tokens_trimmed_by_section": dict(self._by_section)
+            }
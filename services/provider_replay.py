@@ -0,0 +1,649 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Provider Record / Replay (LLM 與嵌入的錄製 / 離線重播)
+=============================================================================
+
+壓力測試一定會打到 OpenAI：無法把我們自己的開銷（路由、檢索、事件、DB 寫入）
+和模型延遲分開量測，CI 也無法離線執行。
+
+PROVIDER_MODE：
+- live    - 正常呼叫（預設）
+- record  - 正常呼叫，並把每組 請求 / 回應（含延遲、TTFT、token 用量）追加到
+            PROVIDER_RECORDINGS_DIR/llm.jsonl 與 embeddings.jsonl
+- replay  - 完全離線：有錄製就回放錄製的內容，沒有則產生確定性的假回應 /
+            假向量（PROVIDER_REPLAY_STRICT=true 時改為拋出 ReplayMissError）
+
+請求鍵 = sha256(模型 + 訊息 (type, content))；嵌入鍵 = sha256(model_id + 文本)。
+
+重播延遲（PROVIDER_REPLAY_LATENCY / PROVIDER_REPLAY_EMBEDDING_LATENCY）：
+- recorded               - 錄製時的實際延遲（無錄製時為 0）
+- none                   - 不等待
+- fixed:ms               - 固定延遲
+- uniform:lo,hi          - 均勻分佈
+- normal:mean,sd         - 常態分佈（下限 0）
+- lognormal:median,sigma - 對數常態（長尾，最接近供應商實際分佈）
+串流時上述延遲作用於第一個 chunk，之後每個 chunk 間隔 PROVIDER_REPLAY_TOKEN_MS。
+取樣以 (seed, 請求鍵, 第 n 次) 決定，與並發順序無關，結果可重現。
+
+假向量以特徵雜湊（feature hashing）產生：共用詞彙的文本向量相近，離線時
+檢索排序仍有意義。
+
+LLM 端由 LLMClientPool 接入（replay 時以 ReplayChatModel 取代 ChatOpenAI，
+record 時掛上錄製 callback）；嵌入端由 get_embedding_provider 接入。
+非 live 模式不使用 LLM 快取的 SQLite 持久層（LLM_CACHE_PATH），假回應不會
+在切回 live 後被當成真實回應，跨次執行的磁碟命中也不會繞過重播 / 錄製。
+
+使用方式：
+-----------
+PROVIDER_MODE=record python main.py          # 以真實流量錄製
+PROVIDER_MODE=replay PROVIDER_REPLAY_LATENCY=lognormal:800,0.6 python main.py
+
+replay = get_provider_replay()                # live 模式為 None
+llm = replay.chat_model("gpt-4o-mini", temperature=0.2, max_tokens=800)
+replay.get_stats()
+
+=============================================================================
+"""
+
+import asyncio
+import atexit
+import enum
+import hashlib
+import json
+import logging
+import math
+import queue
+import random
+import re
+import threading
+import time
+import types
+import typing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import Field
+
+from config.config import Config
+from services.token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_MODES = ("live", "record", "replay")
+
+_FAKE_WORDS = (
+    "the", "system", "returns", "a", "concise", "answer", "based", "on", "retrieved", "context",
+    "documents", "show", "that", "result", "is", "consistent", "with", "query", "and", "data",
+    "analysis", "suggests", "relevant", "information", "summary", "of", "key", "points", "for", "user"
+)
+_TOKEN_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]|[^\W_]+", re.UNICODE)
+
+
+class ReplayMissError(LookupError):
+    """重播模式下找不到錄製（PROVIDER_REPLAY_STRICT=true）"""
+
+
+# ── 鍵與確定性假資料 ─────────────────────────────────────────
+
+def _message_content(message: BaseMessage) -> str:
+    content = message.content
+    return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False, sort_keys=True)
+
+
+def serialize_messages(messages: Sequence[BaseMessage]) -> List[Dict[str, str]]:
+    return [{"role": m.type, "content": _message_content(m)} for m in messages]
+
+
+def request_key(model: str, messages: Sequence[BaseMessage]) -> str:
+    """LLM 請求鍵：模型 + 訊息（不含 temperature / max_tokens）"""
+    data = {"model": model, "messages": [[m.type, _message_content(m)] for m in messages]}
+    return hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+
+def embedding_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\n{text}".encode()).hexdigest()
+
+
+def fake_text(key: str, max_tokens: Optional[int] = None, seed: int = 0) -> str:
+    """確定性的假回應（20-60 個詞，不超過 max_tokens）"""
+    rng = random.Random(f"{seed}:{key}")
+    words = rng.randint(20, 60)
+    if max_tokens:
+        words = max(1, min(words, max_tokens))
+    body = " ".join(rng.choice(_FAKE_WORDS) for _ in range(words))
+    return f"[replay {key[:8]}] {body[0].upper()}{body[1:]}."
+
+
+def placeholder_value(annotation: Any) -> Any:
+    """型別的最小合法值（重播未命中時組出可通過 schema 驗證的結構化輸出）"""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Literal:
+        return args[0]
+    if origin in (typing.Union, types.UnionType):
+        # Optional[X] → None；其他 Union 取第一個型別
+        return None if type(None) in args else placeholder_value(args[0])
+    if origin is typing.Annotated:
+        return placeholder_value(args[0])
+    if origin in (list, set, frozenset, tuple) or annotation in (list, set, frozenset, tuple):
+        return []
+    if origin is dict or annotation is dict:
+        return {}
+    if isinstance(annotation, type):
+        if issubclass(annotation, enum.Enum):
+            return next(iter(annotation)).value
+        if issubclass(annotation, bool):
+            return False
+        if issubclass(annotation, (int, float)):
+            return annotation()
+        if issubclass(annotation, str):
+            return ""
+        if hasattr(annotation, "model_fields"):
+            return placeholder_data(annotation)
+    return None
+
+
+def placeholder_data(schema: Any) -> Dict[str, Any]:
+    """pydantic schema 的佔位資料：必填欄位填最小合法值，其餘使用預設值"""
+    fields = getattr(schema, "model_fields", None) or {}
+    return {
+        name: placeholder_value(info.annotation)
+        for name, info in fields.items() if info.is_required()
+    }
+
+
+def fake_embedding(text: str, dims: int) -> List[float]:
+    """特徵雜湊向量（L2 正規化）：共用詞彙的文本彼此相近"""
+    vector = [0.0] * dims
+    for token in _TOKEN_RE.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dims] += 1.0 if value >> 63 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0.0:
+        vector[int(hashlib.blake2b(text.encode(), digest_size=8).hexdigest(), 16) % dims] = 1.0
+        return vector
+    return [v / norm for v in vector]
+
+
+# ── 延遲模型 ─────────────────────────────────────────────────
+
+class LatencyModel:
+    """
+    重播延遲分佈（見模組說明的格式）
+
+    每次取樣以 (seed, key, 該鍵第 n 次取樣) 建立亂數，並發順序不影響結果。
+    """
+
+    KINDS = ("recorded", "none", "fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec: str = "recorded", seed: int = 0):
+        kind, _, args = (spec or "recorded").strip().lower().partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown replay latency '{spec}' {list(self.KINDS)}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(x) for x in args.split(",") if x.strip()]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}.get(kind, 0)
+        if len(self.params) != expected:
+            raise ValueError(f"Replay latency '{spec}' needs {expected} parameter(s)")
+        self.seed = seed
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def sample_ms(self, key: str, recorded_ms: Optional[float] = None) -> float:
+        if self.kind == "recorded":
+            return float(recorded_ms or 0.0)
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "fixed":
+            return self.params[0]
+        with self._lock:
+            n = self._counts.get(key, 0)
+            self._counts[key] = n + 1
+        rng = random.Random(f"{self.seed}:{key}:{n}")
+        a, b = self.params
+        if self.kind == "uniform":
+            return rng.uniform(a, b)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(a, b))
+        return a * math.exp(rng.gauss(0.0, b))
+
+
+# ── 錄製檔 ───────────────────────────────────────────────────
+
+class RecordingStore:
+    """
+    JSONL 錄製檔：啟動時載入為 鍵 → 最新一筆，錄製時追加一行
+
+    錄製 callback 在事件循環上同步執行，append 只更新記憶體並把行放入佇列，
+    由背景執行緒寫檔（同 llm_cache 的 SQLite 寫入執行緒）；flush() 等待寫完，
+    程序結束時自動 flush。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self.write_errors = 0
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        self._records[record["key"]] = record
+                    except (ValueError, KeyError):
+                        logger.warning(f"[ProviderReplay] Skipping bad line {line_no} in {self.path}")
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(key)
+
+    def append(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            for record in records:
+                self._records[record["key"]] = record
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="replay-recorder", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+        self._queue.put(lines)
+
+    def _write_loop(self):
+        while True:
+            chunks = [self._queue.get()]
+            while True:
+                try:
+                    chunks.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(chunks))
+            except OSError as e:
+                self.write_errors += 1
+                logger.warning(f"[ProviderReplay] Failed to write {self.path}: {e}")
+            finally:
+                for _ in chunks:
+                    self._queue.task_done()
+
+    def flush(self):
+        """等待佇列中的錄製寫入檔案"""
+        if self._writer is not None:
+            self._queue.join()
+
+
+# ── LLM：錄製 callback ───────────────────────────────────────
+
+class RecordingCallbackHandler(BaseCallbackHandler):
+    """掛在 ChatOpenAI 上，錄製每次呼叫的訊息、回應、延遲與 token 用量"""
+
+    run_inline = True
+
+    def __init__(self, replay: "ProviderReplay"):
+        self.replay = replay
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        metadata = kwargs.get("metadata") or {}
+        model = params.get("model") or params.get("model_name") or metadata.get("ls_model_name") or ""
+        self._runs[run_id] = {"model": model, "messages": messages[0], "started": time.monotonic(), "ttft": None}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run["ttft"] is None:
+            run["ttft"] = time.monotonic()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None or not response.generations or not response.generations[0]:
+            return
+        generation = response.generations[0][0]
+        message = getattr(generation, "message", None)
+        content = message.content if message is not None else generation.text
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        usage_metadata = getattr(message, "usage_metadata", None)
+        if not usage and usage_metadata:
+            usage = {
+                "prompt_tokens": usage_metadata.get("input_tokens", 0),
+                "completion_tokens": usage_metadata.get("output_tokens", 0),
+                "total_tokens": usage_metadata.get("total_tokens", 0)
+            }
+        now = time.monotonic()
+        self.replay.record_llm(
+            model=run["model"],
+            messages=run["messages"],
+            content=content if isinstance(content, str) else json.dumps(content, ensure_ascii=False),
+            tool_calls=list(getattr(message, "tool_calls", None) or []),
+            usage={k: usage.get(k, 0) for k in ("prompt_tokens", "completion_tokens", "total_tokens")},
+            latency_ms=(now - run["started"]) * 1000,
+            ttft_ms=(run["ttft"] - run["started"]) * 1000 if run["ttft"] else None
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+
+# ── LLM：重播模型 ────────────────────────────────────────────
+
+class ReplayChatModel(BaseChatModel):
+    """離線 ChatModel：回放錄製或產生確定性的假回應，並模擬延遲"""
+
+    model_name: str = "replay"
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    streaming: bool = False
+    replay: Any = Field(default=None, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+    def _message(self, messages: List[BaseMessage]) -> Tuple[AIMessage, str, Optional[Dict[str, Any]]]:
+        key = request_key(self.model_name, messages)
+        record = self.replay.lookup_llm(key)
+        if record is not None:
+            content, tool_calls, usage = record["content"], record.get("tool_calls") or [], record.get("usage") or {}
+        else:
+            content, tool_calls = fake_text(key, self.max_tokens, self.replay.seed), []
+            prompt_tokens = sum(count_tokens(_message_content(m), self.model_name) + 4 for m in messages)
+            completion_tokens = count_tokens(content, self.model_name)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+        message = AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            response_metadata={"token_usage": usage, "model_name": self.model_name, "replayed": record is not None},
+            usage_metadata={"input_tokens": usage.get("prompt_tokens", 0),
+                            "output_tokens": usage.get("completion_tokens", 0),
+                            "total_tokens": usage.get("total_tokens", 0)}
+        )
+        return message, key, record
+
+    def _result(self, message: AIMessage) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=message)],
+                          llm_output={"token_usage": message.response_metadata["token_usage"],
+                                      "model_name": self.model_name})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message, key, record = self._message(messages)
+        time.sleep(self.replay.llm_delay(key, record) / 1000)
+        return self._result(message)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message, key, record = self._message(messages)
+        await asyncio.sleep(self.replay.llm_delay(key, record) / 1000)
+        return self._result(message)
+
+    @staticmethod
+    def _chunks(message: AIMessage) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", message.content) or [""]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message, key, record = self._message(messages)
+        time.sleep(self.replay.llm_delay(key, record, first_token=True) / 1000)
+        for i, piece in enumerate(self._chunks(message)):
+            if i:
+                time.sleep(self.replay.token_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield self._usage_chunk(message)
+
+    @staticmethod
+    def _usage_chunk(message: AIMessage) -> ChatGenerationChunk:
+        """最後一個 chunk 帶 usage（同 OpenAI stream_usage）"""
+        return ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=message.usage_metadata))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message, key, record = self._message(messages)
+        await asyncio.sleep(self.replay.llm_delay(key, record, first_token=True) / 1000)
+        for i, piece in enumerate(self._chunks(message)):
+            if i:
+                await asyncio.sleep(self.replay.token_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield self._usage_chunk(message)
+
+    def bind_tools(self, tools, **kwargs):
+        # 工具定義不影響重播；錄製的 tool_calls 原樣回傳
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        """
+        錄製的 tool_calls 參數或 JSON 內容 → schema 實例
+
+        未命中錄製（假文字不是 JSON）時回傳依 schema 組出的佔位實例：
+        必填欄位為最小合法值，其餘為預設值。
+        """
+        is_model = isinstance(schema, type) and hasattr(schema, "model_validate")
+
+        def placeholder():
+            if not is_model:
+                return {}
+            data = placeholder_data(schema)
+            try:
+                return schema.model_validate(data)
+            except ValueError:
+                # 帶自訂驗證器的 schema：略過驗證
+                return schema.model_construct(**data)
+
+        def parse(message: AIMessage):
+            if message.tool_calls:
+                data = message.tool_calls[0]["args"]
+            elif not message.response_metadata.get("replayed"):
+                return placeholder()
+            else:
+                try:
+                    data = json.loads(message.content)
+                except ValueError:
+                    return placeholder()
+            if is_model:
+                return schema.model_validate(data)
+            return data
+        return self | RunnableLambda(parse)
+
+
+# ── 門面 ─────────────────────────────────────────────────────
+
+class ProviderReplay:
+    """
+    錄製 / 重播狀態：錄製檔、延遲模型與統計
+
+    Args:
+        mode: "record" 或 "replay"
+        directory: 錄製檔目錄
+        latency / embedding_latency: 重播延遲規格
+        token_ms: 重播串流 chunk 間隔
+        seed: 合成延遲與假回應的種子
+        strict: 重播時無錄製即拋出 ReplayMissError
+        embedding_dims: 無錄製時假向量的維度
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        directory: str = "./data/recordings",
+        latency: str = "recorded",
+        embedding_latency: str = "recorded",
+        token_ms: float = 0.0,
+        seed: int = 0,
+        strict: bool = False,
+        embedding_dims: int = 1536
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown provider mode '{mode}' {list(PROVIDER_MODES)}")
+        self.mode = mode
+        self.directory = Path(directory)
+        self.llm_store = RecordingStore(self.directory / "llm.jsonl")
+        self.embedding_store = RecordingStore(self.directory / "embeddings.jsonl")
+        self.latency = LatencyModel(latency, seed)
+        self.embedding_latency = LatencyModel(embedding_latency, seed)
+        self.token_ms = token_ms
+        self.seed = seed
+        self.strict = strict
+        self.embedding_dims = embedding_dims
+        self.recorder = RecordingCallbackHandler(self)
+        self._lock = threading.Lock()
+        self._stats = {
+            "llm": {"recorded": 0, "replayed": 0, "synthesized": 0},
+            "embeddings": {"recorded": 0, "replayed": 0, "synthesized": 0}
+        }
+        logger.info(f"[ProviderReplay] mode={mode} dir={self.directory} "
+                    f"({len(self.llm_store)} LLM / {len(self.embedding_store)} embedding recordings)")
+
+    def _count(self, kind: str, field: str, n: int = 1):
+        with self._lock:
+            self._stats[kind][field] += n
+
+    # ── LLM ──────────────────────────────────────────────────
+
+    def chat_model(
+        self,
+        model: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        streaming: bool = False
+    ) -> ReplayChatModel:
+        return ReplayChatModel(model_name=model, temperature=temperature, max_tokens=max_tokens,
+                               streaming=streaming, replay=self)
+
+    def callbacks(self) -> list:
+        """錄製模式掛在真實客戶端上的 callbacks"""
+        return [self.recorder] if self.mode == "record" else []
+
+    def record_llm(self, model: str, messages: Sequence[BaseMessage], content: str, tool_calls: list,
+                   usage: Dict[str, int], latency_ms: float, ttft_ms: Optional[float]):
+        self.llm_store.append([{
+            "key": request_key(model, messages),
+            "model": model,
+            "messages": serialize_messages(messages),
+            "content": content,
+            "tool_calls": tool_calls,
+            "usage": usage,
+            "latency_ms": round(latency_ms, 1),
+            "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+            "recorded_at": datetime.now().isoformat(timespec="seconds")
+        }])
+        self._count("llm", "recorded")
+
+    def lookup_llm(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self.llm_store.get(key)
+        if record is None:
+            if self.strict:
+                raise ReplayMissError(f"No LLM recording for request {key[:12]} in {self.llm_store.path}")
+            self._count("llm", "synthesized")
+        else:
+            self._count("llm", "replayed")
+        return record
+
+    def llm_delay(self, key: str, record: Optional[Dict[str, Any]], first_token: bool = False) -> float:
+        """重播延遲（毫秒）；串流時為 TTFT"""
+        recorded = None
+        if record is not None:
+            recorded = record.get("ttft_ms") if first_token and record.get("ttft_ms") else record.get("latency_ms")
+        return self.latency.sample_ms(key, recorded)
+
+    # ── 嵌入 ─────────────────────────────────────────────────
+
+    def record_embeddings(self, model_id: str, texts: Sequence[str], vectors: Sequence[Sequence[float]],
+                          latency_ms: float):
+        self.embedding_store.append([
+            {"key": embedding_key(model_id, text), "model": model_id,
+             "vector": [round(float(v), 7) for v in vector], "latency_ms": round(latency_ms, 1),
+             "batch": len(texts)}
+            for text, vector in zip(texts, vectors)
+        ])
+        self._count("embeddings", "recorded", len(texts))
+
+    def replay_embeddings(
+        self,
+        model_id: str,
+        texts: Sequence[str],
+        dimensions: Optional[int] = None
+    ) -> Tuple[List[List[float]], float]:
+        """(向量, 重播延遲毫秒)；整批只等待一次（錄製時的批次延遲取最大值）"""
+        vectors, recorded_ms, replayed = [], 0.0, 0
+        dims = dimensions or self.embedding_dims
+        for text in texts:
+            record = self.embedding_store.get(embedding_key(model_id, text))
+            if record is not None:
+                vectors.append(record["vector"])
+                recorded_ms = max(recorded_ms, record.get("latency_ms") or 0.0)
+                dims = len(record["vector"])
+                replayed += 1
+            elif self.strict:
+                raise ReplayMissError(f"No embedding recording for '{text[:40]}' ({model_id})")
+            else:
+                vectors.append(None)
+        # 假向量與同批錄製向量維度一致
+        vectors = [v if v is not None else fake_embedding(text, dims) for v, text in zip(vectors, texts)]
+        self._count("embeddings", "replayed", replayed)
+        self._count("embeddings", "synthesized", len(texts) - replayed)
+        key = embedding_key(model_id, "\n".join(texts))
+        return vectors, self.embedding_latency.sample_ms(key, recorded_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {kind: dict(values) for kind, values in self._stats.items()}
+        stats["llm"]["recordings"] = len(self.llm_store)
+        stats["embeddings"]["recordings"] = len(self.embedding_store)
+        return {
+            "mode": self.mode,
+            "directory": str(self.directory),
+            "latency": self.latency.spec,
+            "embedding_latency": self.embedding_latency.spec,
+            "strict": self.strict,
+            **stats
+        }
+
+
+_provider_replay: Optional[ProviderReplay] = None
+_provider_replay_lock = threading.Lock()
+
+
+def get_provider_replay() -> Optional[ProviderReplay]:
+    """依 Config.PROVIDER_MODE 建立的單例；live 模式回傳 None"""
+    global _provider_replay
+    mode = (Config.PROVIDER_MODE or "live").lower()
+    if mode == "live":
+        return None
+    if mode not in PROVIDER_MODES:
+        logger.warning(f"Unknown PROVIDER_MODE '{mode}', using live")
+        return None
+    if _provider_replay is None:
+        with _provider_replay_lock:
+            if _provider_replay is None:
+                _provider_replay = ProviderReplay(
+                    mode=mode,
+                    directory=Config.PROVIDER_RECORDINGS_DIR,
+                    latency=Config.PROVIDER_REPLAY_LATENCY,
+                    embedding_latency=Config.PROVIDER_REPLAY_EMBEDDING_LATENCY,
+                    token_ms=Config.PROVIDER_REPLAY_TOKEN_MS,
+                    seed=Config.PROVIDER_REPLAY_SEED,
+                    strict=Config.PROVIDER_REPLAY_STRICT,
+                    embedding_dims=Config.PROVIDER_REPLAY_EMBEDDING_DIMS
+                )
+    return _provider_replay
@@ -21,7 +21,9 @@ from enum import Enum
 
 from pydantic import BaseModel, Field
 
+from config.config import Config
 from services.vectordb_manager import vectordb_manager
+from services.context_packer import ContextPacker
 from services.domain_events import (
     domain_event_bus,
     RAGQueryCompleted,
@@ -257,10 +259,13 @@ class RAGService:
     ) -> RAGResult:
         """單一數據庫查詢"""
         try:
-            result = await self.db_manager.query(query, database, n_results=top_k)
-            sources = self._extract_sources(result, database, threshold)
+            result = await self.db_manager.query(
+                query, database, n_results=top_k, include_embeddings=True
+            )
+            raw_items = []
+            sources = self._extract_sources(result, database, threshold, raw_items)
             
-            context = self._build_context(sources)
+            context = self._build_context(raw_items, result.get("query_embedding"))
             
             return RAGResult(
                 query=query,
@@ -292,11 +297,14 @@ class RAGService:
         """
 
         async def _query_single(db_name: str):
-            """查詢單一 DB，返回 (db_name, sources) 或 None（失敗時）"""
+            """查詢單一 DB，返回 (db_name, sources, raw_items, query_embedding) 或 None（失敗時）"""
             try:
-                result = await self.db_manager.query(query, db_name, n_results=top_k)
-                sources = self._extract_sources(result, db_name, threshold)
-                return db_name, sources
+                result = await self.db_manager.query(
+                    query, db_name, n_results=top_k, include_embeddings=True
+                )
+                raw_items = []
+                sources = self._extract_sources(result, db_name, threshold, raw_items)
+                return db_name, sources, raw_items, result.get("query_embedding")
             except Exception as e:
                 logger.warning(f"[RAGService] Error querying {db_name}: {e}")
                 return None
@@ -308,12 +316,16 @@ class RAGService:
         )
 
         all_sources = []
+        all_items = []
         queried_dbs = []
+        query_embedding = None
         for item in raw_results:
             if item is not None:
-                db_name, sources = item
+                db_name, sources, raw_items, db_query_embedding = item
+                query_embedding = query_embedding or db_query_embedding
                 if sources:
                     all_sources.extend(sources)
+                    all_items.extend(raw_items)
                     queried_dbs.append(db_name)
 
         # 去重與排序
@@ -323,7 +335,8 @@ class RAGService:
         # 限制總結果數量
         all_sources = all_sources[:top_k * 2]
         
-        context = self._build_context(all_sources)
+        # 上下文由完整內容打包（合併重疊、MMR、token 預算），不受 Source 截斷影響
+        context = self._build_context(all_items, query_embedding)
         
         return RAGResult(
             query=query,
@@ -357,9 +370,10 @@ class RAGService:
         self,
         result: Dict[str, Any],
         database: str,
-        threshold: float
+        threshold: float,
+        raw_items: Optional[List[Dict[str, Any]]] = None
     ) -> List[Source]:
-        """從查詢結果中提取 Sources"""
+        """從查詢結果中提取 Sources（raw_items 另外收集通過門檻的完整結果）"""
         sources = []
         db_results = result.get("results", [])
         
@@ -392,20 +406,28 @@ class RAGService:
                 relevance=round(similarity, 2),
                 metadata=metadata
             ))
+            if raw_items is not None:
+                raw_items.append({**item, "content": content, "database": database, "relevance": similarity})
         
         return sources
     
-    def _build_context(self, sources: List[Source]) -> str:
-        """從 Sources 構建上下文字符串"""
-        if not sources:
+    def _build_context(
+        self,
+        items: List[Dict[str, Any]],
+        query_embedding: Optional[List[float]] = None
+    ) -> str:
+        """從檢索結果打包上下文字符串（token 預算內）"""
+        if not items:
             return ""
         
-        context_parts = [
-            f"[From {s.database}]: {s.content}"
-            for s in sources
-        ]
+        packed = ContextPacker(
+            token_budget=Config.RAG_CONTEXT_TOKEN_BUDGET,
+            mmr_lambda=Config.RAG_MMR_LAMBDA,
+            formatter=lambda i, unit: f"[From {unit.database}]: {unit.content}"
+        ).pack(items, query_embedding=query_embedding)
+        logger.debug(f"[RAGService] Context packed: {packed.stats()}")
         
-        return "\n\n".join(context_parts)
+        return packed.text
     
     def _deduplicate_sources(self, sources: List[Source]) -> List[Source]:
         """去重 Sources（基於內容相似度）"""
@@ -0,0 +1,108 @@
+"""
+Token Counter - Tokenizer 計數工具
+
+以 tiktoken 精確計算 token 數，編碼器按模型快取（載入一次約數十毫秒）。
+未安裝 tiktoken 或模型未知時，退回以字元數估算（中日韓字元約 1 token/字，
+其餘約 4 字元/token）。
+
+使用範例:
+    from services.token_counter import count_tokens, truncate_to_tokens, tail_tokens
+    n = count_tokens("Hello 世界", model="gpt-4o-mini")
+    text = truncate_to_tokens(long_text, 500)
+    recent = tail_tokens(history_text, 500)      # 保留結尾
+"""
+
+import logging
+import re
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Optional tiktoken
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    tiktoken = None
+    HAS_TIKTOKEN = False
+
+DEFAULT_ENCODING = "o200k_base"
+
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+
+
+@lru_cache(maxsize=16)
+def get_encoding(model: Optional[str] = None):
+    """取得模型對應的 tiktoken 編碼器（按模型快取），不可用時回傳 None"""
+    if not HAS_TIKTOKEN:
+        return None
+    try:
+        if model:
+            return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logger.debug(f"[TokenCounter] Unknown model '{model}', using {DEFAULT_ENCODING}")
+    except Exception as e:
+        # 編碼檔需下載，離線（CI / PROVIDER_MODE=replay）時退回估算
+        logger.warning(f"[TokenCounter] Failed to load tokenizer for '{model}': {e}")
+        return None
+    try:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning(f"[TokenCounter] Failed to load tokenizer: {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """無 tokenizer 時的估算"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """計算文本 token 數"""
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """截斷文本至 max_tokens 以內"""
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = get_encoding(model)
+    if encoding is None:
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        # 按比例截斷後再微調
+        cut = int(len(text) * max_tokens / estimate_tokens(text))
+        while cut > 0 and estimate_tokens(text[:cut]) > max_tokens:
+            cut = int(cut * 0.95)
+        return text[:cut]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def tail_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """保留文本最後 max_tokens 個 token（對話歷史等保留最近的內容）"""
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = get_encoding(model)
+    if encoding is None:
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        start = len(text) - int(len(text) * max_tokens / estimate_tokens(text))
+        while start < len(text) and estimate_tokens(text[start:]) > max_tokens:
+            start += max(1, (len(text) - start) // 20)
+        return text[start:]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[-max_tokens:])
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+VectorDB 子模組 (VectorDB Sub-modules)
+=============================================================================
+
+從 VectorDBManager（God Class）拆分出來的子模組。
+
+為避免循環導入，此處不做 eager import，請直接導入子模組：
+
+    from services.vectordb.catalog import ChunkCatalog
+    from services.vectordb.chunker import OffsetTextSplitter
+    from services.vectordb.columnar import ColumnarReader, ColumnarWriter
+    from services.vectordb.dedup import SimHashIndex, simhash64
+    from services.vectordb.embedding_profile import EmbeddingProfile, Projector
+    from services.vectordb.embeddings import get_embedding_provider
+    from services.vectordb.filter_index import FilterIndex, split_filter
+    from services.vectordb.fusion import fuse_results
+    from services.vectordb.lifecycle import apply_lifecycle_defaults, live_filter
+    from services.vectordb.storage import ChromaClientPool
+
+=============================================================================
+"""
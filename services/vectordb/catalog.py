@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Chunk Catalog (文件列表索引)
+=============================================================================
+
+列出資料庫文件時，collection.get(limit, offset) 會傳回完整分塊文字與重複的
+parent_content，只為了產生 200 字元的預覽；offset 分頁越往後越慢。
+
+每個資料庫一個緊湊的 SQLite 目錄（<db_path>/chunk_catalog.sqlite）：
+- 每個分塊一列：插入序號（seq）、chunk_id、來源 / 標題 / content_hash、
+  分塊類型、字元數、伺服器端預先計算的預覽
+- 以 seq 做 keyset 分頁（WHERE seq > ? LIMIT ?），任何深度每頁都是常數時間
+- 以 (source | content_hash, seq) 索引做文件層級分組
+- 軟刪除與已過期（expires_at）的分塊不列出
+- id_checksum()：所有 chunk_id 雜湊的 XOR（與順序無關），與集合的 id 指紋
+  比對即可發現筆數相同但內容已變（刪除與新增數量相等）的漂移
+- reconcile()：以集合內容就地更新目錄（保留 seq，最後移除不存在的列），
+  重建期間列表照常可讀
+
+完整內容 / 完整 metadata 只對當頁的 ids 以 collection.get(ids=...) 取得。
+
+使用方式：
+-----------
+catalog = ChunkCatalog(db_path / CATALOG_FILENAME)
+catalog.add_many([entry_row(chunk_id, metadata, text), ...])
+rows, next_key = catalog.page(after=None, limit=100)
+groups, next_key = catalog.groups("source", after=None, limit=50)
+
+=============================================================================
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = "chunk_catalog.sqlite"
+PREVIEW_CHARS = 200
+GROUP_FIELDS = ("source", "content_hash")
+
+_COLUMNS = (
+    "chunk_id", "source", "title", "content_hash", "chunk_type", "char_len", "preview",
+    "expires_at", "deleted"
+)
+# 後續版本新增的欄位（舊目錄檔以 ALTER TABLE 補上）
+_ADDED_COLUMNS = {
+    "expires_at": "INTEGER NOT NULL DEFAULT 0",
+    "deleted": "INTEGER NOT NULL DEFAULT 0",
+}
+_LIVE = "deleted = 0 AND (expires_at = 0 OR expires_at > ?)"
+
+
+def make_preview(text: str, max_chars: int = PREVIEW_CHARS) -> str:
+    text = text or ""
+    return text[:max_chars] + "..." if len(text) > max_chars else text
+
+
+def encode_cursor(key: Any) -> str:
+    """不透明游標（URL 安全）"""
+    return base64.urlsafe_b64encode(json.dumps({"k": key}).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Any:
+    if not cursor:
+        return None
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["k"]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def id_checksum(chunk_ids: Iterable[str]) -> str:
+    """與順序無關的 id 指紋（每個 id 取 blake2b 64 位元後 XOR）"""
+    acc = 0
+    for chunk_id in chunk_ids:
+        acc ^= int.from_bytes(hashlib.blake2b(str(chunk_id).encode("utf-8"), digest_size=8).digest(), "big")
+    return f"{acc:016x}"
+
+
+def entry_row(chunk_id: str, metadata: Optional[Dict[str, Any]], text: str) -> Tuple:
+    meta = metadata or {}
+    return (
+        chunk_id,
+        str(meta.get("source") or ""),
+        str(meta.get("title") or ""),
+        str(meta.get("content_hash") or ""),
+        str(meta.get("chunk_type") or ""),
+        len(text or ""),
+        make_preview(text),
+        int(meta.get("expires_at") or 0),
+        1 if meta.get("deleted") else 0,
+    )
+
+
+class ChunkCatalog:
+    """每個資料庫的分塊目錄（SQLite，keyset 分頁 + 文件分組）"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chunk_id TEXT NOT NULL UNIQUE,
+                    source TEXT NOT NULL DEFAULT '',
+                    title TEXT NOT NULL DEFAULT '',
+                    content_hash TEXT NOT NULL DEFAULT '',
+                    chunk_type TEXT NOT NULL DEFAULT '',
+                    char_len INTEGER NOT NULL DEFAULT 0,
+                    preview TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            existing = {r[1] for r in self._conn.execute("PRAGMA table_info(chunks)").fetchall()}
+            for column, ddl in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} {ddl}")
+            for field in GROUP_FIELDS:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_chunks_{field} ON chunks({field}, seq)"
+                )
+            self._conn.commit()
+
+    # ── 寫入 ──────────────────────────────────────────────────
+
+    def add_many(self, rows: Iterable[Tuple]):
+        """rows 由 entry_row() 產生"""
+        rows = list(rows)
+        if not rows:
+            return
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO chunks ({', '.join(_COLUMNS)}) VALUES ({placeholders})", rows
+            )
+            self._conn.commit()
+
+    def remove(self, chunk_ids: Sequence[str]):
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.commit()
+
+    def mark_deleted(self, chunk_ids: Sequence[str]):
+        """軟刪除（列表立即隱藏；列仍保留，使目錄筆數與集合一致）"""
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE chunks SET deleted = 1 WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def reconcile(self, pages: Iterable[Iterable[Tuple]]) -> Dict[str, int]:
+        """
+        以集合內容就地更新目錄（每頁一個交易，讀取者不會看到空目錄）
+
+        已存在的列保留 seq（游標仍有效）；掃描開始時已存在、但集合中沒有的列
+        最後才刪除。掃描期間新寫入的列 seq 較大，不會被誤刪。
+
+        Returns:
+            {"upserted": n, "removed": n}
+        """
+        columns = ", ".join(_COLUMNS)
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        updates = ", ".join(f"{c} = excluded.{c}" for c in _COLUMNS[1:])
+        with self._lock:
+            high_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM chunks").fetchone()[0]
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS reconcile_seen (chunk_id TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM reconcile_seen")
+            self._conn.commit()
+        upserted = 0
+        for rows in pages:
+            rows = list(rows)
+            if not rows:
+                continue
+            with self._lock:
+                self._conn.executemany(
+                    f"INSERT INTO chunks ({columns}) VALUES ({placeholders}) "
+                    f"ON CONFLICT(chunk_id) DO UPDATE SET {updates}", rows
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO reconcile_seen (chunk_id) VALUES (?)", [(r[0],) for r in rows]
+                )
+                self._conn.commit()
+            upserted += len(rows)
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM chunks WHERE seq <= ? AND chunk_id NOT IN (SELECT chunk_id FROM reconcile_seen)",
+                (high_seq,)
+            ).rowcount
+            self._conn.execute("DELETE FROM reconcile_seen")
+            self._conn.commit()
+        return {"upserted": upserted, "removed": removed}
+
+    # ── 讀取 ──────────────────────────────────────────────────
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def id_checksum(self) -> str:
+        """目錄中所有 chunk_id 的指紋（見模組函式 id_checksum）"""
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute("SELECT chunk_id FROM chunks").fetchall()]
+        return id_checksum(ids)
+
+    def page(
+        self,
+        after: Optional[int] = None,
+        limit: int = 100,
+        offset: int = 0,
+        where: Optional[Dict[str, str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        依插入順序取一頁分塊
+
+        Args:
+            after: 上一頁最後的 seq（keyset 游標）
+            limit: 每頁筆數
+            offset: 相容舊介面的位移（僅在沒有游標時使用）
+            where: 等值過濾（source / content_hash / chunk_type）
+
+        Returns:
+            (rows, next_seq)；沒有下一頁時 next_seq 為 None
+        """
+        clauses, params = [_LIVE], [int(time.time())]
+        if after is not None:
+            clauses.append("seq > ?")
+            params.append(int(after))
+        for field, value in (where or {}).items():
+            if field in ("source", "content_hash", "chunk_type"):
+                clauses.append(f"{field} = ?")
+                params.append(value)
+        sql = "SELECT * FROM chunks WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY seq LIMIT ?"
+        params.append(limit + 1)
+        if after is None and offset:
+            sql += " OFFSET ?"
+            params.append(offset)
+        with self._lock:
+            rows = [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, (rows[-1]["seq"] if has_more and rows else None)
+
+    def groups(
+        self,
+        field: str,
+        after: Optional[str] = None,
+        limit: int = 50
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        文件層級分組（依 source 或 content_hash），以分組鍵做 keyset 分頁
+
+        Returns:
+            (groups, next_key)
+        """
+        if field not in GROUP_FIELDS:
+            raise ValueError(f"group_by must be one of {GROUP_FIELDS}")
+        params: List[Any] = [int(time.time())]
+        where = f"WHERE {_LIVE}"
+        if after is not None:
+            where += f" AND {field} > ?"
+            params.append(after)
+        params.append(limit + 1)
+        sql = f"""
+            SELECT {field} AS key, COUNT(*) AS chunks, MIN(seq) AS first_seq,
+                   SUM(char_len) AS total_chars
+            FROM chunks {where}
+            GROUP BY {field}
+            ORDER BY {field}
+            LIMIT ?
+        """
+        with self._lock:
+            groups = [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+            has_more = len(groups) > limit
+            groups = groups[:limit]
+            # 每組第一個分塊的標題 / 來源 / 預覽（主鍵查找）
+            firsts = {}
+            seqs = [g["first_seq"] for g in groups]
+            if seqs:
+                marks = ", ".join("?" * len(seqs))
+                for r in self._conn.execute(
+                    f"SELECT seq, chunk_id, source, title, content_hash, preview FROM chunks WHERE seq IN ({marks})",
+                    seqs
+                ).fetchall():
+                    firsts[r["seq"]] = dict(r)
+        for g in groups:
+            first = firsts.get(g.pop("first_seq"), {})
+            g.update({
+                "first_chunk_id": first.get("chunk_id"),
+                "source": first.get("source", ""),
+                "title": first.get("title", ""),
+                "content_hash": first.get("content_hash", ""),
+                "preview": first.get("preview", "")
+            })
+        return groups, (groups[-1]["key"] if has_more and groups else None)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
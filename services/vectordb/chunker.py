@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Offset-based Text Chunker
+=============================================================================
+
+以 (start, end) 偏移量表示分塊，一次掃描文檔即可算出所有邊界。
+
+與 LangChain RecursiveCharacterTextSplitter 的差異：
+-----------
+- 不產生中間字串：先拆成小片段再合併的做法每一層都會複製文本，
+  這裡只在窗口內用 str.rfind 找分隔符（C 層實作），輸出的是偏移量
+- 父子分塊共用同一份偏移：子塊直接在父塊區間 [ps, pe) 內計算，
+  不需要先切出父塊字串再切一次
+- 真正的字串切片延後到嵌入 / 寫入時（text[start:end]）
+
+分隔符優先級與 LangChain 相同（段落 → 換行 → 空白 → 任意字元）。
+若高優先級分隔符讓分塊過短（低於 min_fill），改用下一級分隔符，
+行為接近 LangChain「合併到接近 chunk_size」的效果。
+
+使用方式：
+-----------
+splitter = OffsetTextSplitter(chunk_size=2000, chunk_overlap=400)
+spans = splitter.split_offsets(text)              # [(0, 1987), (1602, 3590), ...]
+chunks = splitter.split_text(text)                # 相容 LangChain 介面
+
+tree = split_parent_child(text, parent_splitter, child_splitter)
+for (ps, pe), children in tree:
+    for cs, ce in children:
+        embed(text[cs:ce])
+
+=============================================================================
+"""
+
+import re
+from typing import List, Optional, Sequence, Tuple
+
+Span = Tuple[int, int]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ")
+
+
+class OffsetTextSplitter:
+    """
+    單次掃描、以偏移量輸出的遞歸字元分割器
+
+    保證每個分塊長度 <= chunk_size；相鄰分塊重疊約 chunk_overlap 字元，
+    重疊起點會對齊到分隔符之後，避免從單詞中間開始。
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        separators: Sequence[str] = DEFAULT_SEPARATORS,
+        min_fill: float = 0.5,
+        strip_whitespace: bool = True
+    ):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be > 0")
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = max(chunk_overlap, 0)
+        self.separators = tuple(s for s in separators if s)
+        self.min_fill = min_fill
+        self.strip_whitespace = strip_whitespace
+
+    def _find_cut(self, text: str, pos: int, window_end: int) -> int:
+        """在 [pos, window_end) 內找最佳切點（分隔符之後）"""
+        min_cut = pos + int(self.chunk_size * self.min_fill)
+        fallback = -1
+        for sep in self.separators:
+            idx = text.rfind(sep, pos + 1, window_end)
+            if idx == -1:
+                continue
+            cut = idx + len(sep)
+            if cut > window_end:
+                continue
+            if cut >= min_cut:
+                return cut
+            if fallback == -1:
+                fallback = cut
+        return fallback if fallback > pos else window_end
+
+    def _overlap_start(self, text: str, pos: int, cut: int) -> int:
+        """下一塊的起點：cut 往回 chunk_overlap，並對齊到分隔符之後"""
+        if self.chunk_overlap == 0:
+            return cut
+        lo = max(cut - self.chunk_overlap, pos + 1)
+        if lo >= cut:
+            return cut
+        for sep in self.separators:
+            idx = text.find(sep, lo, cut)
+            if idx != -1 and idx + len(sep) < cut:
+                return idx + len(sep)
+        # 沒有分隔符：退到 lo 之後的第一個空白；仍沒有則不重疊，避免從單詞中間開始
+        match = _WHITESPACE_RE.search(text, lo, cut)
+        if match and match.end() < cut:
+            return match.end()
+        return cut
+
+    def split_offsets(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Span]:
+        """
+        計算 text[start:end] 的分塊偏移量（絕對位置，不複製文本）
+
+        Args:
+            text: 完整文檔
+            start: 區間起點
+            end: 區間終點（預設為文檔結尾）
+
+        Returns:
+            [(start, end), ...]
+        """
+        end = len(text) if end is None else min(end, len(text))
+        spans: List[Span] = []
+        pos = start
+        last_cut = start
+        size = self.chunk_size
+        strip = self.strip_whitespace
+
+        while pos < end:
+            window_end = pos + size
+            if window_end >= end:
+                cut = end
+            else:
+                cut = self._find_cut(text, pos, window_end)
+                # 切點必須前進，否則重疊區會反覆產生同一個短塊
+                if cut <= last_cut:
+                    cut = window_end
+
+            s, e = pos, cut
+            if strip:
+                while s < e and text[s].isspace():
+                    s += 1
+                while e > s and text[e - 1].isspace():
+                    e -= 1
+            if e > s and not (spans and e <= spans[-1][1]):
+                # 完全被上一塊包含（只多了空白）的分塊直接略過
+                if spans and s <= spans[-1][0]:
+                    # 起點落在同一段空白後，合併成較長的那一塊
+                    spans[-1] = (spans[-1][0], max(e, spans[-1][1]))
+                else:
+                    spans.append((s, e))
+
+            if cut >= end:
+                break
+            last_cut = cut
+            next_pos = self._overlap_start(text, pos, cut)
+            pos = next_pos if next_pos > pos else cut
+
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        """相容 LangChain 的介面：回傳字串列表"""
+        return [text[s:e] for s, e in self.split_offsets(text)]
+
+
+def split_parent_child(
+    text: str,
+    parent_splitter: OffsetTextSplitter,
+    child_splitter: OffsetTextSplitter
+) -> List[Tuple[Span, List[Span]]]:
+    """
+    父子分塊：父塊偏移 + 每個父塊內的子塊偏移（皆為絕對位置）
+
+    Returns:
+        [((parent_start, parent_end), [(child_start, child_end), ...]), ...]
+    """
+    return [
+        ((ps, pe), child_splitter.split_offsets(text, ps, pe))
+        for ps, pe in parent_splitter.split_offsets(text)
+    ]
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Columnar Export / Import (知識庫欄式匯出 / 匯入)
+=============================================================================
+
+zip 備份（VectorDBBackupManager）與 Scripts/data_migration 的遷移腳本不是
+複製 Chroma 的內部檔案，就是逐筆重新加入文件；大型知識庫搬移要好幾個小時。
+
+匯出格式（一個目錄）：
+- manifest.json    - 格式版本、資料庫描述、嵌入模型 / 嵌入設定檔、筆數、維度
+- chunks.parquet   - id / document / metadata（JSON 字串）三欄，每頁一個 row group
+  或 chunks.arrow    （Arrow IPC 檔案格式，可 memory-map 零複製讀取）
+- embeddings.npy   - (筆數, 維度) 的 float32 / float16 矩陣，可 np.load(mmap_mode="r")
+- projection_*.npz - 嵌入設定檔使用 PCA / 隨機投影時的投影矩陣
+
+寫入與讀取都是逐頁串流：匯出時一次只有一頁在記憶體中，匯入時表格以 record
+batch 讀取、向量以 memory-map 切片，直接批次寫入集合，不重新嵌入。
+
+使用方式：
+-----------
+with ColumnarWriter(out_dir, total=collection.count(), table_format="parquet") as writer:
+    writer.write_page(ids, documents, metadatas, embeddings)
+writer.write_manifest({"database": {...}})
+
+reader = ColumnarReader(out_dir)
+for ids, documents, metadatas, embeddings in reader.iter_pages(5000):
+    collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+=============================================================================
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    pa = None
+    pq = None
+    HAS_PYARROW = False
+
+EXPORT_FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+EMBEDDINGS_FILENAME = "embeddings.npy"
+TABLE_FILENAMES = {"parquet": "chunks.parquet", "arrow": "chunks.arrow"}
+EXPORT_DTYPES = ("float32", "float16")
+
+
+def _require_deps():
+    if not HAS_NUMPY or not HAS_PYARROW:
+        raise RuntimeError("Columnar export / import needs numpy and pyarrow (pip install pyarrow)")
+
+
+def _schema():
+    return pa.schema([
+        ("id", pa.string()),
+        ("document", pa.string()),
+        ("metadata", pa.string()),
+    ])
+
+
+class ColumnarWriter:
+    """
+    串流寫入匯出目錄
+
+    total 為匯出開始時的筆數（快照）；向量檔預先配置 (total, dims)，
+    若實際寫入較少（匯出期間有刪除）在 close() 時截短。
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        total: int,
+        table_format: str = "parquet",
+        dtype: str = "float32",
+        compression: str = "zstd"
+    ):
+        _require_deps()
+        if table_format not in TABLE_FILENAMES:
+            raise ValueError(f"Unknown table format '{table_format}' {tuple(TABLE_FILENAMES)}")
+        if dtype not in EXPORT_DTYPES:
+            raise ValueError(f"Unknown export dtype '{dtype}' {EXPORT_DTYPES}")
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.total = total
+        self.table_format = table_format
+        self.dtype = dtype
+        self.rows = 0
+        self.dimensions: Optional[int] = None
+        self._embeddings = None
+
+        table_path = self.out_dir / TABLE_FILENAMES[table_format]
+        if table_format == "parquet":
+            self._table = pq.ParquetWriter(str(table_path), _schema(), compression=compression)
+        else:
+            self._sink = pa.OSFile(str(table_path), "wb")
+            self._table = pa.ipc.new_file(self._sink, _schema())
+
+    def write_page(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[Optional[str]],
+        metadatas: Sequence[Optional[Dict[str, Any]]],
+        embeddings: Any
+    ) -> int:
+        """寫入一頁；超出快照筆數的部分（匯出期間新增）會被忽略。回傳寫入筆數"""
+        n = min(len(ids), self.total - self.rows)
+        if n <= 0:
+            return 0
+        vectors = np.asarray(embeddings[:n], dtype=np.float32)
+        if self._embeddings is None:
+            self.dimensions = int(vectors.shape[1])
+            self._embeddings = np.lib.format.open_memmap(
+                str(self.out_dir / EMBEDDINGS_FILENAME), mode="w+",
+                dtype=np.dtype(self.dtype), shape=(self.total, self.dimensions)
+            )
+        self._embeddings[self.rows:self.rows + n] = vectors
+
+        batch = pa.record_batch([
+            pa.array(list(ids[:n]), pa.string()),
+            pa.array([d or "" for d in documents[:n]], pa.string()),
+            pa.array([json.dumps(m or {}, ensure_ascii=False) for m in metadatas[:n]], pa.string()),
+        ], schema=_schema())
+        if self.table_format == "parquet":
+            self._table.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._table.write_batch(batch)
+        self.rows += n
+        return n
+
+    def close(self):
+        self._table.close()
+        if self.table_format == "arrow":
+            self._sink.close()
+        if self._embeddings is not None:
+            self._embeddings.flush()
+            del self._embeddings
+            self._embeddings = None
+            if self.rows < self.total:
+                _truncate_npy(self.out_dir / EMBEDDINGS_FILENAME, self.rows)
+        elif self.rows == 0:
+            # 空資料庫：仍寫出 (0, dims) 的向量檔
+            np.save(str(self.out_dir / EMBEDDINGS_FILENAME), np.zeros((0, self.dimensions or 0), dtype=self.dtype))
+
+    def write_manifest(self, extra: Dict[str, Any]) -> Dict[str, Any]:
+        manifest = {
+            "format_version": EXPORT_FORMAT_VERSION,
+            "exported_at": datetime.now().isoformat(),
+            "count": self.rows,
+            "dimensions": self.dimensions,
+            "dtype": self.dtype,
+            "table_format": self.table_format,
+            "table_file": TABLE_FILENAMES[self.table_format],
+            "embeddings_file": EMBEDDINGS_FILENAME,
+            **extra
+        }
+        with open(self.out_dir / MANIFEST_FILENAME, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _truncate_npy(path: Path, rows: int):
+    """將預先配置的向量檔截短為 rows 列（重寫標頭 + 複製）"""
+    source = np.load(str(path), mmap_mode="r")
+    tmp = path.with_suffix(".tmp.npy")
+    target = np.lib.format.open_memmap(str(tmp), mode="w+", dtype=source.dtype, shape=(rows, source.shape[1]))
+    step = 65536
+    for start in range(0, rows, step):
+        target[start:start + step] = source[start:min(rows, start + step)]
+    target.flush()
+    del target, source
+    os.replace(tmp, path)
+
+
+class ColumnarReader:
+    """讀取匯出目錄（表格逐 batch、向量 memory-map）"""
+
+    def __init__(self, export_dir: Path):
+        _require_deps()
+        self.export_dir = Path(export_dir)
+        manifest_path = self.export_dir / MANIFEST_FILENAME
+        if not manifest_path.exists():
+            raise ValueError(f"Not a columnar export (missing {MANIFEST_FILENAME}): {self.export_dir}")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        if self.manifest.get("format_version", 0) > EXPORT_FORMAT_VERSION:
+            raise ValueError(f"Export format v{self.manifest.get('format_version')} is newer than supported "
+                             f"v{EXPORT_FORMAT_VERSION}")
+        self.embeddings = np.load(str(self.export_dir / self.manifest["embeddings_file"]), mmap_mode="r")
+        if len(self.embeddings) != self.manifest["count"]:
+            raise ValueError(f"Export is inconsistent: {len(self.embeddings)} vectors for "
+                             f"{self.manifest['count']} chunks")
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    def _iter_batches(self, batch_size: int):
+        table_path = self.export_dir / self.manifest["table_file"]
+        if self.manifest["table_format"] == "parquet":
+            yield from pq.ParquetFile(str(table_path)).iter_batches(batch_size=batch_size)
+        else:
+            with pa.memory_map(str(table_path), "r") as source:
+                for batch in pa.ipc.open_file(source).read_all().to_batches(max_chunksize=batch_size):
+                    yield batch
+
+    def iter_pages(
+        self, batch_size: int = 5000
+    ) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]], List[List[float]]]]:
+        """逐頁產生 (ids, documents, metadatas, embeddings)，向量轉為 float32"""
+        offset = 0
+        for batch in self._iter_batches(batch_size):
+            columns = batch.to_pydict()
+            n = len(columns["id"])
+            vectors = np.asarray(self.embeddings[offset:offset + n], dtype=np.float32)
+            offset += n
+            yield (
+                columns["id"],
+                columns["document"],
+                [json.loads(m) if m else {} for m in columns["metadata"]],
+                vectors.tolist()
+            )
+        if offset != self.count:
+            raise ValueError(f"Export table has {offset} rows, manifest says {self.count}")
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Near-Duplicate Chunk Detection (SimHash)
+=============================================================================
+
+同一份法規 / 手冊的多個版本、以及 consolidate_databases 合併後的重疊資料庫，
+會產生大量幾乎相同的分塊：索引變大，查詢時也會擠掉其他多樣的結果。
+
+做法：
+-----------
+- 每個分塊計算 64-bit SimHash（Unicode 單詞 + 中日韓單字，含相鄰特徵二元組）；
+  沒有任何特徵的文本不計算簽名，也不參與去重
+- 每個資料庫一個緊湊的簽名索引（<db_path>/dedup_index.sqlite）
+- 簽名切成 4 段 16-bit band 並建索引：漢明距離 <= 3 的兩個簽名
+  至少有一段 band 完全相同（鴿籠原理），查找只需 4 次索引查詢
+
+使用方式：
+-----------
+sig = simhash64(text)                                     # 沒有特徵時為 None（不去重）
+index = SimHashIndex(db_path / "dedup_index.sqlite")
+match = index.find_near_duplicate(sig, max_distance=3)   # (chunk_id, distance) or None
+index.add(chunk_id, sig)
+
+=============================================================================
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Optional numpy for vectorized bit accumulation
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+INDEX_FILENAME = "dedup_index.sqlite"
+
+NUM_BANDS = 4
+BAND_BITS = 64 // NUM_BANDS
+MAX_SUPPORTED_DISTANCE = NUM_BANDS - 1
+
+# 中日韓文字（假名、漢字、諺文）逐字切分，其他文字以 Unicode 單詞切分
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"[{_CJK_CHARS}]|[^\W{_CJK_CHARS}]+")
+_MASK64 = (1 << 64) - 1
+
+
+def _features(text: str) -> Counter:
+    """特徵：Unicode 單詞 / 中日韓單字，加上相鄰 token 二元組（保留詞序資訊）"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash64(text: str) -> Optional[int]:
+    """
+    計算文本的 64-bit SimHash（無符號整數）
+
+    沒有特徵時回傳 None：若以 0 代替，所有這類文本都會互為距離 0 的「重複」
+    """
+    features = _features(text)
+    if not features:
+        return None
+
+    if HAS_NUMPY:
+        hashes = np.fromiter((_hash64(f) for f in features), dtype=np.uint64, count=len(features))
+        weights = np.fromiter(features.values(), dtype=np.int64, count=len(features))
+        bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        votes = (bits.astype(np.int64) * 2 - 1).T @ weights
+        result = 0
+        for i in np.nonzero(votes > 0)[0]:
+            result |= 1 << int(i)
+        return result
+
+    votes = [0] * 64
+    for feature, weight in features.items():
+        h = _hash64(feature)
+        for i in range(64):
+            votes[i] += weight if (h >> i) & 1 else -weight
+    result = 0
+    for i, v in enumerate(votes):
+        if v > 0:
+            result |= 1 << i
+    return result
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & _MASK64).count("1")
+
+
+def _to_signed(value: int) -> int:
+    """SQLite INTEGER 為有號 64-bit"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def _bands(signature: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(signature >> (i * BAND_BITS)) & mask for i in range(NUM_BANDS)]
+
+
+class SimHashIndex:
+    """
+    每個資料庫的 SimHash 簽名索引（SQLite，每個分塊約 50 bytes）
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        band_columns = ", ".join(f"b{i} INTEGER NOT NULL" for i in range(NUM_BANDS))
+        with self._lock:
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS chunk_signatures (
+                    chunk_id TEXT PRIMARY KEY,
+                    simhash INTEGER NOT NULL,
+                    {band_columns}
+                )
+            """)
+            for i in range(NUM_BANDS):
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_band{i} ON chunk_signatures(b{i})"
+                )
+            # 舊版以 0 表示「沒有特徵」的文本，這些簽名會讓非拉丁文本互相誤判為重複
+            self._conn.execute("DELETE FROM chunk_signatures WHERE simhash = 0")
+            self._conn.commit()
+
+    def find_near_duplicate(
+        self,
+        signature: int,
+        max_distance: int = 3,
+        exclude: Iterable[str] = ()
+    ) -> Optional[Tuple[str, int]]:
+        """
+        找出漢明距離 <= max_distance 的最近簽名
+
+        Returns:
+            (chunk_id, distance)，沒有則為 None
+        """
+        max_distance = min(max_distance, MAX_SUPPORTED_DISTANCE)
+        bands = _bands(signature)
+        where = " OR ".join(f"b{i} = ?" for i in range(NUM_BANDS))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT chunk_id, simhash FROM chunk_signatures WHERE {where}", bands
+            ).fetchall()
+
+        excluded = set(exclude)
+        best = None
+        for chunk_id, stored in rows:
+            if chunk_id in excluded:
+                continue
+            distance = hamming_distance(signature, _to_unsigned(stored))
+            if distance <= max_distance and (best is None or distance < best[1]):
+                best = (chunk_id, distance)
+                if distance == 0:
+                    break
+        return best
+
+    def add(self, chunk_id: str, signature: int):
+        self.add_many([(chunk_id, signature)])
+
+    def add_many(self, items: Sequence[Tuple[str, Optional[int]]]):
+        """寫入簽名；簽名為 None（沒有特徵）的分塊略過"""
+        rows = [(cid, _to_signed(sig), *_bands(sig)) for cid, sig in items if sig is not None]
+        if not rows:
+            return
+        placeholders = ", ".join("?" * (2 + NUM_BANDS))
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO chunk_signatures VALUES ({placeholders})", rows
+            )
+            self._conn.commit()
+
+    def remove(self, chunk_ids: Sequence[str]):
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunk_signatures WHERE chunk_id = ?", [(cid,) for cid in chunk_ids]
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunk_signatures")
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunk_signatures").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
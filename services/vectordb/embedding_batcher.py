@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Embedding Micro-Batcher (跨請求嵌入合併)
+=============================================================================
+
+聊天高峰時，大量並發請求各自對短查詢呼叫 embed_query；query_targeted_dbs
+對每個 DB 都會嵌入同一段查詢，多位使用者點選同一個建議問題時也會重複。
+
+EmbeddingBatcher 包裝任一 EmbeddingProvider：
+- 收集 window_ms 內的待嵌入文本（或湊滿 max_batch 立即送出）
+- 相同文本只嵌入一次：排隊中或嵌入中的文本直接共用同一個 Future
+- 一次 aembed_documents() 取得整批向量，再分發給各呼叫者
+- 某個呼叫者取消不會影響共用同一文本的其他呼叫者
+
+統計：batch_fill（每批文本數）、batch_latency_ms（後端呼叫耗時）、
+wait_latency_ms（呼叫者從提交到取得向量的耗時）、去重命中數。
+
+使用方式：
+-----------
+batcher = EmbeddingBatcher(provider, window_ms=5, max_batch=64)
+vector = await batcher.aembed_query("查詢")
+batcher.get_stats()
+
+=============================================================================
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from services.metrics import Histogram, LATENCY_BUCKETS_MS
+from services.vectordb.embeddings import EmbeddingProvider
+
+logger = logging.getLogger(__name__)
+
+BATCH_FILL_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class EmbeddingBatcher(EmbeddingProvider):
+    """
+    跨請求合併嵌入呼叫的 EmbeddingProvider 包裝器
+
+    只合併非同步呼叫（aembed_*）；同步呼叫直接交給底層 provider。
+    批次狀態綁定在第一次使用的事件迴圈上，其他事件迴圈的呼叫直接繞過合併。
+
+    Args:
+        provider: 實際的嵌入後端
+        window_ms: 收集批次的時間窗口
+        max_batch: 每批最大（去重後）文本數，湊滿時立即送出
+    """
+
+    def __init__(self, provider: EmbeddingProvider, window_ms: float = 5.0, max_batch: int = 64):
+        super().__init__(provider.model_name)
+        self.provider = provider
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_batch = max(1, max_batch)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[str] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        self._requests = 0
+        self._dedup_hits = 0
+        self._batches = 0
+        self.batch_fill = Histogram(BATCH_FILL_BUCKETS)
+        self.batch_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.wait_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+
+    @property
+    def provider_name(self) -> str:
+        return self.provider.provider_name
+
+    @property
+    def model_id(self) -> str:
+        return self.provider.model_id
+
+    # ── 同步介面：不合併 ───────────────────────────────────────
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.provider.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.provider.embed_query(text)
+
+    def warm_up(self):
+        self.provider.warm_up()
+
+    def close(self):
+        self.provider.close()
+
+    # ── 非同步介面：合併 + 去重 ────────────────────────────────
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is None or self._loop.is_closed():
+                self._bind(loop)
+            else:
+                return await self.provider.aembed_documents(texts)
+
+        start = time.perf_counter()
+        futures = [self._enqueue(text) for text in texts]
+        # shield：取消的呼叫者只放棄等待，不取消其他人共用的 Future
+        vectors = [await asyncio.shield(f) for f in futures]
+        self.wait_latency_ms.observe((time.perf_counter() - start) * 1000)
+        return vectors
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._pending = []
+        self._inflight = {}
+        self._flush_handle = None
+
+    def _enqueue(self, text: str) -> asyncio.Future:
+        self._requests += 1
+        future = self._inflight.get(text)
+        if future is not None:
+            self._dedup_hits += 1
+            return future
+
+        future = self._loop.create_future()
+        self._inflight[text] = future
+        self._pending.append(text)
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self._loop.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[str]):
+        self._batches += 1
+        self.batch_fill.observe(len(batch))
+        start = time.perf_counter()
+        try:
+            vectors = await self.provider.aembed_documents(batch)
+        except BaseException as e:
+            self._fail(batch, e)
+            if not isinstance(e, Exception):
+                raise
+            logger.warning(f"[EmbeddingBatcher] Batch of {len(batch)} failed: {e}")
+            return
+        finally:
+            self.batch_latency_ms.observe((time.perf_counter() - start) * 1000)
+
+        if vectors is None or len(vectors) != len(batch):
+            # 數量不符時無法確定對應關係，整批失敗（否則等待者永遠不會被喚醒）
+            count = 0 if vectors is None else len(vectors)
+            logger.warning(f"[EmbeddingBatcher] Provider returned {count} vectors for {len(batch)} texts")
+            self._fail(batch, ValueError(f"Embedding provider returned {count} vectors for {len(batch)} texts"))
+            return
+
+        for text, vector in zip(batch, vectors):
+            future = self._inflight.pop(text, None)
+            if future is not None and not future.done():
+                future.set_result(vector)
+
+    def _fail(self, batch: List[str], error: BaseException):
+        """以 error 結束批次中尚未完成的 future"""
+        for text in batch:
+            future = self._inflight.pop(text, None)
+            if future is not None and not future.done():
+                future.set_exception(error)
+
+    # ── 統計 ──────────────────────────────────────────────────
+
+    def get_stats(self) -> Dict[str, object]:
+        embedded = self._requests - self._dedup_hits
+        return {
+            "model": self.model_id,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "requests": self._requests,
+            "dedup_hits": self._dedup_hits,
+            "dedup_rate": round(self._dedup_hits / self._requests, 4) if self._requests else 0.0,
+            "batches": self._batches,
+            "avg_batch_size": round(embedded / self._batches, 2) if self._batches else 0.0,
+            "batch_fill": self.batch_fill.snapshot(),
+            "batch_latency_ms": self.batch_latency_ms.snapshot(),
+            "wait_latency_ms": self.wait_latency_ms.snapshot(),
+            "pending": len(self._pending),
+            "inflight": len(self._inflight)
+        }
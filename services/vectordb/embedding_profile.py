@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Embedding Profiles (每個資料庫的嵌入設定 + 降維)
+=============================================================================
+
+每個資料庫都存完整維度（例如 1536 維）的向量，磁碟、記憶體與 HNSW 搜尋時間
+都由它主導。嵌入設定檔（embedding profile）記錄資料庫實際儲存的向量格式：
+
+- model      - 基礎嵌入模型（與 db_info["embedding_model"] 相同）
+- dimensions - 儲存的維度（None = 模型原生維度）
+- dtype      - 向量型別。Chroma 的 HNSW 一律以 float32 儲存，float16 只影響匯出
+- method     - full              - 模型原生輸出
+               native            - 模型原生縮短輸出（text-embedding-3-* 的 dimensions 參數，需重新嵌入）
+               pca               - 以資料庫樣本擬合的 PCA 投影（不需重新嵌入）
+               random_projection - 固定種子的高斯隨機投影（不需擬合、不需重新嵌入）
+
+pca / random_projection 的投影矩陣存於 <db_path>/projection_<dims>_<digest>.npz
+（digest 為矩陣內容雜湊，因此相同檔名 = 相同投影，可共用查詢向量）；
+查詢向量先以基礎模型嵌入，再以同一投影轉換。投影後的向量重新做 L2 正規化。
+
+使用方式：
+-----------
+profile = EmbeddingProfile.from_dict(db_info.get("embedding_profile"), default_model="openai:...")
+projector = Projector.fit_pca(sample_vectors, 256)
+projector.save(db_path / projector_filename(256, projector.digest))
+reduced = projector.transform(vectors)
+
+=============================================================================
+"""
+
+import hashlib
+import logging
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# numpy is required for projections (PCA / random projection)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+PROFILE_METHODS = ("full", "native", "pca", "random_projection")
+PROFILE_DTYPES = ("float32", "float16")
+PROJECTION_METHODS = ("pca", "random_projection")
+
+
+def projector_filename(dimensions: int, digest: str) -> str:
+    return f"projection_{dimensions}_{digest}.npz"
+
+
+@dataclass
+class EmbeddingProfile:
+    """資料庫儲存的向量格式"""
+
+    model: str
+    dimensions: Optional[int] = None
+    dtype: str = "float32"
+    method: str = "full"
+    projection_file: Optional[str] = None
+
+    def __post_init__(self):
+        if self.method not in PROFILE_METHODS:
+            raise ValueError(f"Unknown embedding profile method '{self.method}' {PROFILE_METHODS}")
+        if self.dtype not in PROFILE_DTYPES:
+            raise ValueError(f"Unknown embedding dtype '{self.dtype}' {PROFILE_DTYPES}")
+        if self.method in PROJECTION_METHODS and not self.projection_file:
+            raise ValueError(f"Method '{self.method}' needs a projection file")
+
+    @property
+    def profile_id(self) -> str:
+        """相同 profile_id 的資料庫可共用同一個查詢向量"""
+        if self.method == "full":
+            return self.model
+        suffix = self.projection_file if self.method in PROJECTION_METHODS else ""
+        return f"{self.model}@{self.method}:{self.dimensions}:{suffix}"
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], default_model: str) -> "EmbeddingProfile":
+        if not data:
+            return cls(model=default_model)
+        return cls(**{k: data.get(k) for k in ("model", "dimensions", "dtype", "method", "projection_file")
+                      if data.get(k) is not None})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _require_numpy():
+    if not HAS_NUMPY:
+        raise RuntimeError("numpy is required for embedding projections")
+
+
+class Projector:
+    """線性降維：y = normalize((x - mean) @ matrix)"""
+
+    def __init__(self, matrix, mean=None, method: str = "pca"):
+        _require_numpy()
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+        self.mean = np.asarray(mean, dtype=np.float32) if mean is not None else None
+        self.method = method
+
+    @property
+    def input_dim(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def output_dim(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def digest(self) -> str:
+        h = hashlib.md5(self.matrix.tobytes())
+        if self.mean is not None:
+            h.update(self.mean.tobytes())
+        return h.hexdigest()[:10]
+
+    @classmethod
+    def fit_pca(cls, samples: Sequence[Sequence[float]], dimensions: int) -> "Projector":
+        """以樣本向量擬合 PCA（樣本數需 >= dimensions）"""
+        _require_numpy()
+        x = np.asarray(samples, dtype=np.float64)
+        if x.shape[0] < dimensions:
+            raise ValueError(f"PCA to {dimensions} dims needs at least {dimensions} samples (got {x.shape[0]})")
+        mean = x.mean(axis=0)
+        # 右奇異向量 = 共變異矩陣的特徵向量（依變異量排序）
+        _, _, vt = np.linalg.svd(x - mean, full_matrices=False)
+        return cls(vt[:dimensions].T, mean, method="pca")
+
+    @classmethod
+    def random(cls, input_dim: int, dimensions: int, seed: int = 42) -> "Projector":
+        """高斯隨機投影（Johnson–Lindenstrauss），不需樣本"""
+        _require_numpy()
+        rng = np.random.default_rng(seed)
+        matrix = rng.standard_normal((input_dim, dimensions)) / np.sqrt(dimensions)
+        return cls(matrix, None, method="random_projection")
+
+    def transform(self, vectors: Sequence[Sequence[float]]) -> List[List[float]]:
+        x = np.asarray(vectors, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[None, :]
+        if x.shape[1] != self.input_dim:
+            raise ValueError(f"Projection expects {self.input_dim}-d vectors, got {x.shape[1]}-d")
+        if self.mean is not None:
+            x = x - self.mean
+        y = x @ self.matrix
+        norms = np.linalg.norm(y, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (y / norms).tolist()
+
+    def save(self, path: Path):
+        arrays = {"matrix": self.matrix, "method": np.array(self.method)}
+        if self.mean is not None:
+            arrays["mean"] = self.mean
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "Projector":
+        _require_numpy()
+        with np.load(str(path)) as data:
+            mean = data["mean"] if "mean" in data.files else None
+            return cls(data["matrix"], mean, method=str(data["method"]))
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Embedding Providers (可插拔嵌入後端)
+=============================================================================
+
+VectorDBManager 透過 EmbeddingProvider 介面取得向量，不再直接依賴
+OpenAIEmbeddings：
+
+- OpenAIEmbeddingProvider - 原本的 OpenAI 嵌入（每次查詢一次網路往返）
+- LocalEmbeddingProvider  - 本機 CPU 嵌入（sentence-transformers，可選 ONNX 後端）
+  由專用工作執行緒執行，並把多個並發呼叫者的文本合併成一次 encode()
+- RecordingEmbeddingProvider / ReplayEmbeddingProvider - PROVIDER_MODE=record / replay
+  時錄製真實向量、或離線回放（無錄製時產生確定性假向量，見 services/provider_replay.py）
+
+每個資料庫會記錄建立它的嵌入模型（model_id，例如 "openai:text-embedding-3-small"
+或 "local:paraphrase-multilingual-MiniLM-L12-v2"）；不同模型的向量空間不可比較，
+VectorDBManager 不會以不同模型查詢或混合查詢這些資料庫。
+
+使用方式：
+-----------
+provider = get_embedding_provider()           # 依 Config.EMBEDDING_PROVIDER（預設包裝 EmbeddingBatcher）
+vector = await provider.aembed_query("查詢")
+vectors = await provider.aembed_documents(["a", "b"])
+provider.model_id                              # "local:..." / "openai:..."
+
+=============================================================================
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Sequence
+
+from config.config import Config
+from services.provider_replay import ProviderReplay, get_provider_replay
+
+logger = logging.getLogger(__name__)
+
+LEGACY_MODEL_PREFIX = "openai"
+
+
+class EmbeddingModelMismatchError(ValueError):
+    """資料庫的嵌入模型與目前的嵌入後端不一致"""
+
+
+class EmbeddingProvider:
+    """
+    嵌入後端介面
+
+    子類別實作 embed_documents；其餘方法有預設實作。
+    """
+
+    provider_name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @property
+    def model_id(self) -> str:
+        """寫入資料庫 metadata 的模型標記"""
+        return f"{self.provider_name}:{self.model_name}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def warm_up(self):
+        """預先載入模型 / 建立連線（預設不做事）"""
+
+    def close(self):
+        """釋放資源（預設不做事）"""
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI 嵌入（langchain_openai.OpenAIEmbeddings）"""
+
+    provider_name = "openai"
+
+    def __init__(self, model_name: str, api_key: Optional[str] = None, dimensions: Optional[int] = None):
+        super().__init__(model_name)
+        from langchain_openai import OpenAIEmbeddings
+        # text-embedding-3-* 可原生輸出較短的向量（dimensions）；model_id 仍為基礎模型
+        self.dimensions = dimensions
+        kwargs = {"dimensions": dimensions} if dimensions else {}
+        self._client = OpenAIEmbeddings(api_key=api_key, model=model_name, **kwargs)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._client.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._client.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._client.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._client.aembed_query(text)
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    本機 CPU 嵌入（sentence-transformers）
+
+    所有呼叫者的請求進入同一個佇列，專用工作執行緒每次取出至多 batch_size
+    段文本（等待 max_wait_ms 收集更多請求），呼叫一次 encode()，再把結果
+    分發回各呼叫者的 Future。模型只在工作執行緒中載入與使用。
+
+    Args:
+        model_name: sentence-transformers 模型名稱或本機路徑
+        backend: "torch" 或 "onnx"（需 sentence-transformers >= 3.2 + optimum）
+        batch_size: 每次 encode() 的最大文本數
+        max_wait_ms: 收集批次的最長等待時間
+        device: 推論裝置（預設 cpu）
+    """
+
+    provider_name = "local"
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "torch",
+        batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        device: str = "cpu"
+    ):
+        super().__init__(model_name)
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.device = device
+        self._model = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.provider_name}:{self.model_name.rstrip('/').split('/')[-1]}"
+
+    # ── 工作執行緒 ─────────────────────────────────────────────
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+        logger.info(f"Loading local embedding model: {self.model_name} ({self.backend}, {self.device})")
+        kwargs = {"device": self.device}
+        if self.backend != "torch":
+            kwargs["backend"] = self.backend
+        self._model = SentenceTransformer(self.model_name, **kwargs)
+        logger.info("Local embedding model loaded")
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="local-embedding-worker", daemon=True
+            )
+            self._worker.start()
+
+    def _collect_batch(self, first) -> list:
+        """取出第一個請求後，在 max_wait 內盡量湊滿 batch_size 段文本"""
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.batch_size:
+            try:
+                timeout = deadline - time.monotonic()
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # 保留停止訊號給主迴圈
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect_batch(first)
+
+            if self._model is None:
+                try:
+                    self._load_model()
+                except Exception as e:
+                    # 載入失敗：本批次回報錯誤，下一批次會重新嘗試載入
+                    logger.error(f"Failed to load local embedding model: {e}")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+            texts = [text for texts, _ in batch for text in texts]
+            try:
+                vectors = self._model.encode(
+                    texts,
+                    batch_size=self.batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                ).tolist()
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            pos = 0
+            for texts, future in batch:
+                # 呼叫者已取消（例如請求逾時）時略過
+                if not future.done():
+                    future.set_result(vectors[pos:pos + len(texts)])
+                pos += len(texts)
+
+    def _submit(self, texts: Sequence[str]) -> Future:
+        future: Future = Future()
+        if not texts:
+            future.set_result([])
+            return future
+        self._ensure_worker()
+        self._queue.put((list(texts), future))
+        return future
+
+    # ── 公開介面 ──────────────────────────────────────────────
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._submit(texts).result()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # 直接等待工作執行緒的 Future，不佔用 to_thread 執行緒池
+        return await asyncio.wrap_future(self._submit(texts))
+
+    def warm_up(self):
+        """載入模型並執行一次推論"""
+        self.embed_query("warm up")
+
+    def close(self):
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join(timeout=5)
+        self._worker = None
+
+
+class RecordingEmbeddingProvider(EmbeddingProvider):
+    """包裝真實後端，把每次嵌入的 文本 → 向量 與延遲寫入錄製檔"""
+
+    def __init__(self, provider: EmbeddingProvider, replay: ProviderReplay, dimensions: Optional[int] = None):
+        super().__init__(provider.model_name)
+        self.provider = provider
+        self.replay = replay
+        # 原生縮短輸出的向量另外記錄，避免與完整維度的錄製混用
+        self._record_id = f"{provider.model_id}@{dimensions}" if dimensions else provider.model_id
+
+    @property
+    def model_id(self) -> str:
+        return self.provider.model_id
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        vectors = self.provider.embed_documents(texts)
+        self.replay.record_embeddings(self._record_id, texts, vectors, (time.perf_counter() - started) * 1000)
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        vectors = await self.provider.aembed_documents(texts)
+        self.replay.record_embeddings(self._record_id, texts, vectors, (time.perf_counter() - started) * 1000)
+        return vectors
+
+    def warm_up(self):
+        self.provider.warm_up()
+
+    def close(self):
+        self.provider.close()
+
+
+class ReplayEmbeddingProvider(EmbeddingProvider):
+    """
+    離線嵌入：回放錄製的向量（無錄製時產生特徵雜湊假向量）並模擬延遲
+
+    model_id 與被取代的真實後端相同，既有資料庫的模型相容檢查照常運作。
+    """
+
+    provider_name = "replay"
+
+    def __init__(self, model_id: str, replay: ProviderReplay, dimensions: Optional[int] = None):
+        super().__init__(model_id.split(":", 1)[-1])
+        self._model_id = model_id
+        self.replay = replay
+        self.dimensions = dimensions
+        self._record_id = f"{model_id}@{dimensions}" if dimensions else model_id
+
+    @property
+    def model_id(self) -> str:
+        return self._model_id
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors, delay_ms = self.replay.replay_embeddings(self._record_id, texts, self.dimensions)
+        time.sleep(delay_ms / 1000)
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors, delay_ms = self.replay.replay_embeddings(self._record_id, texts, self.dimensions)
+        await asyncio.sleep(delay_ms / 1000)
+        return vectors
+
+    def get_stats(self):
+        return self.replay.get_stats()["embeddings"]
+
+
+def get_embedding_provider(
+    provider: Optional[str] = None,
+    batching: Optional[bool] = None
+) -> EmbeddingProvider:
+    """
+    依設定建立嵌入後端
+
+    Args:
+        provider: "openai" / "local"（預設 Config.EMBEDDING_PROVIDER）
+        batching: 是否以 EmbeddingBatcher 包裝（預設 Config.EMBEDDING_BATCHING_ENABLED）
+    """
+    provider = (provider or Config.EMBEDDING_PROVIDER).lower()
+    replay = get_provider_replay()
+    if replay is not None and replay.mode == "replay":
+        # 離線：不建立真實後端（不需 API 金鑰 / 不載入模型）
+        if provider == "local":
+            model_id = LocalEmbeddingProvider(model_name=Config.LOCAL_EMBEDDING_MODEL).model_id
+        else:
+            model_id = f"openai:{Config.EMBEDDING_MODEL}"
+        backend: EmbeddingProvider = ReplayEmbeddingProvider(model_id, replay)
+    elif provider == "local":
+        backend: EmbeddingProvider = LocalEmbeddingProvider(
+            model_name=Config.LOCAL_EMBEDDING_MODEL,
+            backend=Config.LOCAL_EMBEDDING_BACKEND,
+            batch_size=Config.LOCAL_EMBEDDING_BATCH_SIZE,
+            max_wait_ms=Config.LOCAL_EMBEDDING_MAX_WAIT_MS
+        )
+    else:
+        if provider != "openai":
+            logger.warning(f"Unknown EMBEDDING_PROVIDER '{provider}', using openai")
+        backend = OpenAIEmbeddingProvider(model_name=Config.EMBEDDING_MODEL, api_key=Config.OPENAI_API_KEY)
+    if replay is not None and replay.mode == "record":
+        backend = RecordingEmbeddingProvider(backend, replay)
+
+    if batching if batching is not None else Config.EMBEDDING_BATCHING_ENABLED:
+        from services.vectordb.embedding_batcher import EmbeddingBatcher
+        return EmbeddingBatcher(
+            backend,
+            window_ms=Config.EMBEDDING_BATCH_WINDOW_MS,
+            max_batch=Config.EMBEDDING_BATCH_MAX_SIZE
+        )
+    return backend
+
+
+def get_native_embedding_provider(model_name: str, dimensions: int) -> EmbeddingProvider:
+    """原生縮短輸出的 OpenAI 嵌入（text-embedding-3 `dimensions`），遵循 PROVIDER_MODE"""
+    replay = get_provider_replay()
+    if replay is not None and replay.mode == "replay":
+        return ReplayEmbeddingProvider(f"openai:{model_name}", replay, dimensions=dimensions)
+    provider: EmbeddingProvider = OpenAIEmbeddingProvider(
+        model_name=model_name, api_key=Config.OPENAI_API_KEY, dimensions=dimensions
+    )
+    if replay is not None:
+        provider = RecordingEmbeddingProvider(provider, replay, dimensions=dimensions)
+    return provider
+
+
+def legacy_model_id(model_name: Optional[str] = None) -> str:
+    """未標記模型的舊資料庫一律視為以 OpenAI EMBEDDING_MODEL 建立"""
+    return f"{LEGACY_MODEL_PREFIX}:{model_name or Config.EMBEDDING_MODEL}"
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Metadata Filter Index (metadata 預過濾索引)
+=============================================================================
+
+query(filter_metadata=...) 原本把過濾條件直接交給 Chroma 的 where：常用的
+document_type / category / source 過濾要掃描 metadata 或在 HNSW 結果上後過濾，
+選擇性高的過濾常常回傳不足 n_results；tags 以逗號字串儲存，無法依單一標籤過濾。
+
+每個資料庫一個 SQLite 次要索引（<db_path>/filter_index.sqlite）：
+- docs(docid, chunk_id)               - 分塊的整數編號
+- postings(field, value, docid)       - 每個 (欄位, 值) 的倒排列表（WITHOUT ROWID，依鍵排序）
+- tags 為多值欄位：逗號字串中的每個標籤各一筆 posting
+
+查詢時先以索引計算候選數：
+- 0 筆              → 直接回傳空結果
+- <= exact_max 筆   → 依 ids 取回向量做精確搜尋（小集合暴力計算比 HNSW 過濾準確且快）
+- 更多              → HNSW + where，依選擇性放大 n_results（oversampling）後再過濾裁切；
+                      多值欄位（tags）無法交給 Chroma where，後過濾後不足 n_results 時
+                      改以全部符合的 ids 分頁精確搜尋
+
+可索引的條件：{field: value}、{field: {"$eq": v}}、{field: {"$in": [...]}} 與其 $and 組合；
+其他條件（$or、$gt、未索引欄位）照常交給 Chroma where。
+
+使用方式：
+-----------
+index = FilterIndex(db_path / FILTER_INDEX_FILENAME, fields=("source", "tags"))
+index.add_many([(chunk_id, metadata), ...])
+clauses, residual = split_filter({"$and": [{"tags": "urgent"}, {"page": {"$gt": 3}}]}, index.fields)
+count, ids = index.match(clauses, limit=2000)      # ids 為 None 表示超過 limit
+
+=============================================================================
+"""
+
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FILTER_INDEX_FILENAME = "filter_index.sqlite"
+MULTI_VALUE_FIELDS = ("tags",)
+
+# (field, values)：同一條件內 values 為 OR，條件之間為 AND
+Clause = Tuple[str, List[str]]
+
+
+def join_tags(tags: Any) -> str:
+    """標籤清單 → 儲存用逗號字串（去空白、去重、保留順序）"""
+    if tags is None:
+        return ""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    seen = []
+    for tag in tags:
+        tag = str(tag).strip()
+        if tag and tag not in seen:
+            seen.append(tag)
+    return ",".join(seen)
+
+
+def _norm(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def metadata_values(metadata: Optional[Dict[str, Any]], field: str) -> List[str]:
+    """分塊在某欄位的索引值（多值欄位拆開）"""
+    value = (metadata or {}).get(field)
+    if value is None or value == "":
+        return []
+    if field in MULTI_VALUE_FIELDS:
+        joined = join_tags(value)
+        return joined.split(",") if joined else []
+    return [_norm(value)]
+
+
+def _condition_values(condition: Any) -> Optional[List[str]]:
+    if isinstance(condition, (str, int, float, bool)):
+        return [_norm(condition)]
+    if isinstance(condition, dict) and len(condition) == 1:
+        op, value = next(iter(condition.items()))
+        if op == "$eq" and isinstance(value, (str, int, float, bool)):
+            return [_norm(value)]
+        if op == "$in" and isinstance(value, (list, tuple)):
+            return [_norm(v) for v in value]
+    return None
+
+
+def split_filter(
+    where: Optional[Dict[str, Any]], fields: Sequence[str]
+) -> Tuple[List[Clause], Optional[Dict[str, Any]]]:
+    """
+    拆出可由索引回答的條件
+
+    Returns:
+        (clauses, residual)；residual 為剩餘的 Chroma where（可能為 None）
+    """
+    if not where:
+        return [], None
+    if set(where) == {"$and"}:
+        parts = list(where["$and"])
+    elif any(key.startswith("$") for key in where):
+        return [], where
+    else:
+        parts = [{key: value} for key, value in where.items()]
+
+    clauses: List[Clause] = []
+    residual = []
+    for part in parts:
+        if isinstance(part, dict) and len(part) == 1:
+            field, condition = next(iter(part.items()))
+            if field in fields:
+                values = _condition_values(condition)
+                if values is not None:
+                    clauses.append((field, values))
+                    continue
+        residual.append(part)
+    if not residual:
+        return clauses, None
+    return clauses, residual[0] if len(residual) == 1 else {"$and": residual}
+
+
+def chroma_where(clauses: Sequence[Clause]) -> Optional[Dict[str, Any]]:
+    """單值欄位的條件轉回 Chroma where（多值欄位只能由索引 / 後過濾處理）"""
+    parts = []
+    for field, values in clauses:
+        if field in MULTI_VALUE_FIELDS:
+            continue
+        parts.append({field: {"$in": values}} if len(values) > 1 else {field: values[0]})
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else {"$and": parts}
+
+
+def matches(metadata: Optional[Dict[str, Any]], clauses: Sequence[Clause]) -> bool:
+    """分塊 metadata 是否符合所有條件（HNSW 結果的後過濾）"""
+    for field, values in clauses:
+        if not set(metadata_values(metadata, field)) & set(values):
+            return False
+    return True
+
+
+class FilterIndex:
+    """每個資料庫的 metadata 倒排索引（SQLite）"""
+
+    def __init__(self, path: Path, fields: Sequence[str]):
+        self.path = Path(path)
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    docid INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chunk_id TEXT NOT NULL UNIQUE
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    field TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    docid INTEGER NOT NULL,
+                    PRIMARY KEY (field, value, docid)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_docid ON postings(docid)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'fields'").fetchone()
+            if row and row[0] != ",".join(self.fields):
+                # 索引欄位設定變更：清空，由呼叫端重建
+                self._conn.execute("DELETE FROM postings")
+                self._conn.execute("DELETE FROM docs")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('fields', ?)", (",".join(self.fields),)
+            )
+            self._conn.commit()
+
+    # ── 寫入 ──────────────────────────────────────────────────
+
+    def add_many(self, items: Iterable[Tuple[str, Optional[Dict[str, Any]]]]):
+        """items: (chunk_id, metadata)；已存在的 chunk_id 會重新索引"""
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            cur = self._conn.cursor()
+            self._delete_postings(cur, [chunk_id for chunk_id, _ in items])
+            cur.executemany("INSERT OR IGNORE INTO docs (chunk_id) VALUES (?)", [(c,) for c, _ in items])
+            docids = self._docids(cur, [chunk_id for chunk_id, _ in items])
+            rows = [
+                (field, value, docids[chunk_id])
+                for chunk_id, metadata in items
+                for field in self.fields
+                for value in metadata_values(metadata, field)
+            ]
+            cur.executemany("INSERT OR IGNORE INTO postings (field, value, docid) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def remove(self, chunk_ids: Sequence[str]):
+        if not chunk_ids:
+            return
+        with self._lock:
+            cur = self._conn.cursor()
+            self._delete_postings(cur, chunk_ids)
+            cur.executemany("DELETE FROM docs WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.commit()
+
+    def _docids(self, cur, chunk_ids: Sequence[str]) -> Dict[str, int]:
+        found = {}
+        for start in range(0, len(chunk_ids), 500):
+            batch = list(chunk_ids[start:start + 500])
+            marks = ", ".join("?" * len(batch))
+            found.update(cur.execute(
+                f"SELECT chunk_id, docid FROM docs WHERE chunk_id IN ({marks})", batch
+            ).fetchall())
+        return found
+
+    def _delete_postings(self, cur, chunk_ids: Sequence[str]):
+        docids = list(self._docids(cur, chunk_ids).values())
+        if docids:
+            cur.executemany("DELETE FROM postings WHERE docid = ?", [(d,) for d in docids])
+
+    # ── 讀取 ──────────────────────────────────────────────────
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def match(self, clauses: Sequence[Clause], limit: Optional[int] = None) -> Tuple[int, Optional[List[str]]]:
+        """
+        符合所有條件的分塊
+
+        Returns:
+            (count, chunk_ids)；count > limit 時 chunk_ids 為 None（只需要選擇性）
+        """
+        if not clauses:
+            raise ValueError("match() needs at least one clause")
+        with self._lock:
+            # 從最短的倒排列表開始，其餘條件以主鍵查找驗證
+            sizes = [
+                self._conn.execute(
+                    f"SELECT COUNT(*) FROM postings WHERE field = ? AND value IN ({', '.join('?' * len(values))})",
+                    [field, *values]
+                ).fetchone()[0]
+                for field, values in clauses
+            ]
+            ordered = [clause for _, clause in sorted(zip(sizes, clauses), key=lambda x: x[0])]
+            (first_field, first_values), rest = ordered[0], ordered[1:]
+            matched = (f"SELECT DISTINCT p0.docid FROM postings p0 WHERE p0.field = ? "
+                       f"AND p0.value IN ({', '.join('?' * len(first_values))})")
+            params = [first_field, *first_values]
+            for i, (field, values) in enumerate(rest, 1):
+                matched += (f" AND EXISTS (SELECT 1 FROM postings p{i} WHERE p{i}.field = ? "
+                            f"AND p{i}.value IN ({', '.join('?' * len(values))}) AND p{i}.docid = p0.docid)")
+                params.extend([field, *values])
+            count = self._conn.execute(f"SELECT COUNT(*) FROM ({matched})", params).fetchone()[0]
+            if limit is not None and count > limit:
+                return count, None
+            ids = [r[0] for r in self._conn.execute(
+                f"SELECT chunk_id FROM docs WHERE docid IN ({matched})", params
+            ).fetchall()]
+        return count, ids
+
+    def value_counts(self, field: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """欄位最常見的值（供 UI 建立過濾選單）"""
+        if field not in self.fields:
+            raise ValueError(f"Field '{field}' is not indexed {self.fields}")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value, COUNT(*) AS n FROM postings WHERE field = ? GROUP BY value ORDER BY n DESC LIMIT ?",
+                (field, limit)
+            ).fetchall()
+        return [{"value": value, "chunks": n} for value, n in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
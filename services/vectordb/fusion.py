@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Result Fusion (多資料庫結果合併)
+=============================================================================
+
+各集合的 L2 距離尺度不同（嵌入分佈、文件長度、資料量），直接以
+1/(1+L2) 的原始 similarity 排序會讓某些 KB 長期佔據前段。
+
+合併前先在每個候選清單內正規化分數：
+- rrf    - Reciprocal Rank Fusion：score = Σ 1 / (k + rank)，只看名次，
+           完全不受各集合距離尺度影響；同一分塊出現在多個清單時分數累加
+- zscore - 每個清單內 (x - mean) / std；同一分塊取最高值
+- raw    - 舊版行為：直接比較原始分數
+
+每個清單的分數以陣列一次計算（有 numpy 時向量化），全域 top-k 以大小為 k
+的 min-heap 維護，不對全部候選做完整排序。
+
+使用方式：
+-----------
+fused = fuse_results(
+    {"db-a": results_a, "db-b": results_b},   # 各清單依相關度排序
+    top_k=15, method="rrf",
+    score_key="distance", higher_is_better=False
+)
+# 每筆結果附上 fused_score 與 fused_from（命中的清單鍵）
+
+=============================================================================
+"""
+
+import heapq
+import logging
+import math
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Optional numpy for vectorized per-list normalization
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+FUSION_METHODS = ("rrf", "zscore", "raw")
+DEFAULT_RRF_K = 60
+
+
+def _default_key(item: Dict[str, Any]) -> str:
+    return item.get("id") or item.get("content", "")[:50]
+
+
+def normalize_scores(
+    scores: Sequence[float],
+    method: str = "rrf",
+    higher_is_better: bool = True,
+    rrf_k: int = DEFAULT_RRF_K
+) -> List[float]:
+    """
+    單一候選清單的分數正規化（越大越好）
+
+    Args:
+        scores: 原始分數（similarity 或 distance）
+        method: rrf / zscore / raw
+        higher_is_better: False 表示分數為距離
+        rrf_k: RRF 平滑常數
+    """
+    n = len(scores)
+    if n == 0:
+        return []
+    if method == "raw":
+        return [float(s) if higher_is_better else -float(s) for s in scores]
+
+    if HAS_NUMPY:
+        values = np.asarray(scores, dtype=np.float64)
+        if not higher_is_better:
+            values = -values
+        if method == "rrf":
+            ranks = np.empty(n, dtype=np.float64)
+            ranks[np.argsort(-values, kind="stable")] = np.arange(1, n + 1)
+            return (1.0 / (rrf_k + ranks)).tolist()
+        std = values.std()
+        if std == 0:
+            return [0.0] * n
+        return ((values - values.mean()) / std).tolist()
+
+    values = [float(s) if higher_is_better else -float(s) for s in scores]
+    if method == "rrf":
+        order = sorted(range(n), key=lambda i: -values[i])
+        normalized = [0.0] * n
+        for rank, i in enumerate(order, start=1):
+            normalized[i] = 1.0 / (rrf_k + rank)
+        return normalized
+    mean = sum(values) / n
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / n)
+    if std == 0:
+        return [0.0] * n
+    return [(v - mean) / std for v in values]
+
+
+class TopK:
+    """大小為 k 的 min-heap：保留分數最高的 k 筆（堆頂是目前的門檻）"""
+
+    def __init__(self, k: int):
+        self.k = max(1, k)
+        self._heap: list = []
+        self._counter = 0  # 同分時的穩定順序
+
+    def push(self, score: float, item: Any):
+        entry = (score, -self._counter, item)
+        self._counter += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> List[Any]:
+        """由高到低"""
+        return [entry[2] for entry in sorted(self._heap, reverse=True)]
+
+
+def fuse_results(
+    result_lists: Dict[Hashable, List[Dict[str, Any]]],
+    top_k: int,
+    method: str = "rrf",
+    score_key: str = "similarity",
+    higher_is_better: bool = True,
+    rrf_k: int = DEFAULT_RRF_K,
+    key_fn: Optional[Callable[[Dict[str, Any]], Hashable]] = None
+) -> List[Dict[str, Any]]:
+    """
+    合併多個候選清單（每個 DB，或每個 (子查詢, DB)）
+
+    Args:
+        result_lists: 清單鍵 → 結果（需含 score_key）
+        top_k: 保留筆數
+        method: rrf / zscore / raw
+        score_key: 用於排序的欄位
+        higher_is_better: False 表示 score_key 為距離
+        rrf_k: RRF 平滑常數
+        key_fn: 分塊去重鍵（預設 id）
+
+    Returns:
+        依 fused_score 由高到低的結果；同一分塊只出現一次
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}' (rrf, zscore, raw)")
+    key_fn = key_fn or _default_key
+
+    fused: Dict[Hashable, float] = {}
+    best: Dict[Hashable, tuple] = {}  # chunk → (normalized, item) 保留正規化分數最高的副本
+    sources: Dict[Hashable, List[Hashable]] = {}
+    for list_key, items in result_lists.items():
+        if not items:
+            continue
+        raw = [item.get(score_key) for item in items]
+        known = [s for s in raw if s is not None]
+        # 缺分數的結果視為清單中最差的一筆
+        worst = (min(known) if higher_is_better else max(known)) if known else 0.0
+        normalized = normalize_scores(
+            [worst if s is None else s for s in raw], method, higher_is_better, rrf_k
+        )
+        for item, score in zip(items, normalized):
+            chunk = key_fn(item)
+            if chunk not in fused:
+                fused[chunk] = score
+                best[chunk] = (score, item)
+                sources[chunk] = [list_key]
+                continue
+            # RRF 累加（多個清單都認為相關）；z-score / raw 取最高
+            fused[chunk] = fused[chunk] + score if method == "rrf" else max(fused[chunk], score)
+            if score > best[chunk][0]:
+                best[chunk] = (score, item)
+            if list_key not in sources[chunk]:
+                sources[chunk].append(list_key)
+
+    heap = TopK(top_k)
+    for chunk, score in fused.items():
+        heap.push(score, chunk)
+
+    results = []
+    for chunk in heap.items():
+        item = best[chunk][1]
+        item["fused_score"] = round(fused[chunk], 6)
+        item["fused_from"] = sources[chunk]
+        results.append(item)
+    return results
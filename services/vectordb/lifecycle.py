@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Chunk Lifecycle (TTL / 軟刪除 / 壓縮)
+=============================================================================
+
+新聞摘要、每週營運筆記等內容會過期；逐筆硬刪除又會在 HNSW 索引留下空洞。
+
+分塊 metadata：
+- expires_at - 過期時間（epoch 秒，0 = 永不過期）。插入時可給
+               metadata["ttl_seconds"] 或 metadata["expires_at"]（epoch / ISO 字串）
+- deleted    - 軟刪除標記（True 後查詢立即看不到，由壓縮工作實際刪除）
+- deleted_at - 軟刪除時間（epoch 秒）
+
+查詢以 Chroma where 條件過濾（在 metadata 索引上完成，不需後處理）。
+只有曾經出現 TTL 或軟刪除的資料庫才加上過濾條件，其他資料庫查詢路徑不變。
+
+壓縮工作：
+1. 批次硬刪除過期與軟刪除的分塊
+2. 自上次重建以來的刪除比例（墓碑比例）超過門檻時，將集合複製到新集合再切換，
+   重建 HNSW 索引並丟棄舊分段檔案
+3. 回報回收的磁碟空間
+
+使用方式：
+-----------
+meta = apply_lifecycle_defaults({"source": "a.md", "ttl_seconds": 86400})
+where = merge_where(live_filter(), {"source": "a.md"})
+collection.query(query_embeddings=[...], where=where)
+
+=============================================================================
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EXPIRES_AT = "expires_at"
+DELETED = "deleted"
+DELETED_AT = "deleted_at"
+TTL_SECONDS = "ttl_seconds"
+
+COMPACTION_LOCK_FILENAME = "compaction.lock"
+_STALE_LOCK_SECONDS = 3600
+
+
+def resolve_expiry(metadata: Dict[str, Any], now: Optional[float] = None) -> int:
+    """由 ttl_seconds / expires_at 計算過期時間（epoch 秒，0 = 永不過期）"""
+    now = time.time() if now is None else now
+    ttl = metadata.get(TTL_SECONDS)
+    if ttl not in (None, "", 0, "0"):
+        return int(now + float(ttl))
+    expires = metadata.get(EXPIRES_AT)
+    if expires in (None, "", 0, "0"):
+        return 0
+    if isinstance(expires, (int, float)):
+        return int(expires)
+    try:
+        return int(float(expires))
+    except ValueError:
+        return int(datetime.fromisoformat(str(expires).replace("Z", "+00:00")).timestamp())
+
+
+def apply_lifecycle_defaults(metadata: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+    """正規化分塊 metadata：寫入 expires_at / deleted，移除 ttl_seconds"""
+    meta = dict(metadata or {})
+    meta[EXPIRES_AT] = resolve_expiry(meta, now)
+    meta.pop(TTL_SECONDS, None)
+    meta[DELETED] = bool(meta.get(DELETED, False))
+    return meta
+
+
+def live_filter(now: Optional[float] = None) -> Dict[str, Any]:
+    """未軟刪除且未過期"""
+    now = int(time.time() if now is None else now)
+    return {"$and": [
+        {DELETED: False},
+        {"$or": [{EXPIRES_AT: 0}, {EXPIRES_AT: {"$gt": now}}]}
+    ]}
+
+
+def expired_filter(now: Optional[float] = None) -> Dict[str, Any]:
+    now = int(time.time() if now is None else now)
+    return {"$and": [{EXPIRES_AT: {"$gt": 0}}, {EXPIRES_AT: {"$lte": now}}]}
+
+
+TOMBSTONE_FILTER = {DELETED: True}
+
+
+def merge_where(*clauses: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """以 $and 合併多個 where 條件（忽略空條件）"""
+    parts = [c for c in clauses if c]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return {"$and": parts}
+
+
+def is_live(metadata: Optional[Dict[str, Any]], now: Optional[float] = None) -> bool:
+    meta = metadata or {}
+    if meta.get(DELETED):
+        return False
+    expires = int(meta.get(EXPIRES_AT) or 0)
+    return expires == 0 or expires > (time.time() if now is None else now)
+
+
+class CompactionLock:
+    """
+    跨行程的壓縮鎖（多個 worker 共用同一資料庫目錄時只讓一個執行）
+
+    以 O_EXCL 建立鎖檔；超過一小時的鎖檔視為殘留並覆寫。
+    """
+
+    def __init__(self, db_path: Path):
+        self.path = Path(db_path) / COMPACTION_LOCK_FILENAME
+        self._fd = None
+
+    def acquire(self) -> bool:
+        try:
+            if self.path.exists() and time.time() - self.path.stat().st_mtime > _STALE_LOCK_SECONDS:
+                self.path.unlink()
+            self._fd = os.open(str(self.path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(self._fd, str(os.getpid()).encode("ascii"))
+            return True
+        except FileExistsError:
+            return False
+        except OSError as e:
+            logger.warning(f"[Compaction] Could not create lock {self.path}: {e}")
+            return False
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
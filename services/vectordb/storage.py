@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+Chroma Storage Pool (共用客戶端 + 有界客戶端池)
+=============================================================================
+
+原本每個資料庫目錄各自開一個 chromadb.PersistentClient：每個客戶端都有自己的
+SQLite 連線、HNSW 分段快取與 System 元件，記憶體與檔案描述符隨 KB 數量線性增長。
+
+新的儲存方式：
+-----------
+- shared    - 所有資料庫作為集合（kb_<db_name>）存放在同一個共用客戶端
+              （<CHROMA_DB_PATH>/_shared）。冷集合的 HNSW 索引由 Chroma 的
+              LRU 分段快取按 VECTORDB_SEGMENT_CACHE_BYTES 上限卸載。
+- dedicated - 舊版每個資料庫一個目錄的格式。仍可讀寫，但開啟的客戶端數量
+              受 VECTORDB_MAX_OPEN_CLIENTS 限制，閒置最久的客戶端會被釋放。
+
+資料庫目錄（db_info["path"]）在兩種模式下都保留，用於存放 dedup 索引等附屬檔案。
+
+使用方式：
+-----------
+pool = ChromaClientPool(base_path, max_dedicated=8)
+client = pool.shared_client()
+name = shared_collection_name("my-docs")          # "kb_my-docs"
+copied = copy_collection(old_collection, new_collection, page_size=1000)
+
+=============================================================================
+"""
+
+import hashlib
+import logging
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import chromadb
+    from chromadb.config import Settings
+    HAS_CHROMADB = True
+except ImportError:
+    chromadb = None
+    Settings = None
+    HAS_CHROMADB = False
+
+SHARED_DIRNAME = "_shared"
+STORAGE_SHARED = "shared"
+STORAGE_DEDICATED = "dedicated"
+
+# Chroma 集合名稱：3-63 字元，英數字開頭與結尾
+_MAX_COLLECTION_NAME = 63
+_UUID_DIR_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def shared_collection_name(db_name: str) -> str:
+    """資料庫在共用客戶端中的集合名稱"""
+    name = f"kb_{db_name}"
+    if len(name) <= _MAX_COLLECTION_NAME and name[-1].isalnum():
+        return name
+    digest = hashlib.md5(db_name.encode("utf-8")).hexdigest()[:8]
+    return f"kb_{db_name[:50].rstrip('-_')}_{digest}"
+
+
+def dir_size(path: Path) -> int:
+    """目錄總大小（bytes）"""
+    path = Path(path)
+    if not path.exists():
+        return 0
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def remove_chroma_files(db_path: Path) -> int:
+    """
+    刪除舊版專屬目錄中的 Chroma 資料（chroma.sqlite3 與分段目錄），保留附屬檔案
+
+    Returns:
+        釋放的 bytes
+    """
+    db_path = Path(db_path)
+    freed = 0
+    for entry in db_path.iterdir() if db_path.exists() else []:
+        if entry.is_dir() and _UUID_DIR_RE.match(entry.name):
+            freed += dir_size(entry)
+            shutil.rmtree(entry)
+        elif entry.is_file() and entry.name.startswith("chroma.sqlite3"):
+            freed += entry.stat().st_size
+            entry.unlink()
+    return freed
+
+
+def copy_collection(
+    source: Any,
+    target: Any,
+    page_size: int = 1000,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> int:
+    """
+    逐頁複製集合（含 embeddings，不重新嵌入）
+
+    Returns:
+        複製的分塊數
+    """
+    total = source.count()
+    copied = 0
+    while copied < total:
+        page = source.get(
+            limit=page_size, offset=copied,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        target.upsert(
+            ids=ids,
+            documents=page.get("documents"),
+            metadatas=page.get("metadatas"),
+            embeddings=page.get("embeddings")
+        )
+        copied += len(ids)
+        if progress:
+            progress(copied, total)
+    return copied
+
+
+def max_batch_size(client: Any, default: int = 5000) -> int:
+    """單次 add / upsert 的最大筆數（舊版客戶端沒有 get_max_batch_size）"""
+    getter = getattr(client, "get_max_batch_size", None)
+    try:
+        return int(getter()) if getter else default
+    except Exception:
+        return default
+
+
+def release_client(client: Any) -> bool:
+    """
+    釋放 PersistentClient 的 System（SQLite 連線、分段快取）
+
+    Chroma 依路徑快取 System，只刪除 client 參照不會釋放資源。Chroma 沒有
+    公開的單一客戶端釋放 API，依序嘗試：
+    1. client.close()（若該版本提供）
+    2. SharedSystemClient 的 System 快取（私有屬性，以 getattr 防護；
+       結構不符時放棄，資源保留到行程結束）
+
+    Returns:
+        是否成功釋放
+    """
+    close = getattr(client, "close", None)
+    if callable(close):
+        try:
+            close()
+            return True
+        except Exception as e:
+            logger.debug(f"[StoragePool] client.close() failed: {e}")
+
+    try:
+        from chromadb.api.client import SharedSystemClient
+    except ImportError:
+        return False
+    systems = getattr(SharedSystemClient, "_identifier_to_system", None)
+    identifier = getattr(client, "_identifier", None)
+    if not isinstance(systems, dict) or identifier is None:
+        logger.debug("[StoragePool] This Chroma version exposes no System cache; client not released")
+        return False
+    system = systems.pop(identifier, None)
+    if system is None:
+        return False
+    try:
+        system.stop()
+        return True
+    except Exception as e:
+        logger.debug(f"[StoragePool] Could not release client: {e}")
+        return False
+
+
+class ChromaClientPool:
+    """
+    共用客戶端 + 有界的舊版專屬客戶端池
+
+    Args:
+        base_path: CHROMA_DB_PATH
+        max_dedicated: 同時開啟的專屬客戶端上限
+        idle_seconds: 專屬客戶端閒置超過此秒數才可被釋放（避免釋放查詢中的客戶端）
+        segment_cache_bytes: 共用客戶端 HNSW 分段快取上限（0 = 不限制）
+    """
+
+    def __init__(
+        self,
+        base_path: Path,
+        max_dedicated: int = 8,
+        idle_seconds: float = 60.0,
+        segment_cache_bytes: int = 0
+    ):
+        self.base_path = Path(base_path)
+        self.max_dedicated = max(1, max_dedicated)
+        self.idle_seconds = idle_seconds
+        self.segment_cache_bytes = segment_cache_bytes
+        self._shared = None
+        self._lock = threading.RLock()
+        self._dedicated_lru: "OrderedDict[str, float]" = OrderedDict()  # db_name → last used
+
+    @property
+    def shared_path(self) -> Path:
+        return self.base_path / SHARED_DIRNAME
+
+    def shared_client(self):
+        """共用客戶端（首次使用時建立）"""
+        if self._shared is None:
+            with self._lock:
+                if self._shared is None:
+                    self.shared_path.mkdir(parents=True, exist_ok=True)
+                    self._shared = chromadb.PersistentClient(
+                        path=str(self.shared_path), settings=self._shared_settings()
+                    )
+        return self._shared
+
+    def _shared_settings(self):
+        if self.segment_cache_bytes > 0:
+            try:
+                return Settings(
+                    anonymized_telemetry=False,
+                    chroma_segment_cache_policy="LRU",
+                    chroma_memory_limit_bytes=self.segment_cache_bytes
+                )
+            except Exception as e:
+                logger.warning(f"[StoragePool] LRU segment cache not supported by this chromadb: {e}")
+        return Settings(anonymized_telemetry=False)
+
+    def open_dedicated(self, path: str):
+        """開啟舊版專屬目錄的客戶端"""
+        return chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+
+    # ── 專屬客戶端 LRU ─────────────────────────────────────────
+
+    def touch(self, db_name: str):
+        if db_name in self._dedicated_lru:
+            self._dedicated_lru[db_name] = time.monotonic()
+            try:
+                self._dedicated_lru.move_to_end(db_name)
+            except KeyError:
+                pass  # 同時被釋放
+
+    def register_dedicated(self, db_name: str):
+        with self._lock:
+            self._dedicated_lru[db_name] = time.monotonic()
+            self._dedicated_lru.move_to_end(db_name)
+
+    def forget(self, db_name: str):
+        with self._lock:
+            self._dedicated_lru.pop(db_name, None)
+
+    def eviction_candidates(self, protect: Optional[str] = None) -> List[str]:
+        """超出上限時，最久未使用且已閒置的專屬客戶端（不含 protect）"""
+        with self._lock:
+            excess = len(self._dedicated_lru) - self.max_dedicated
+            if excess <= 0:
+                return []
+            now = time.monotonic()
+            victims = []
+            for db_name, last_used in self._dedicated_lru.items():
+                if len(victims) >= excess:
+                    break
+                if db_name != protect and now - last_used >= self.idle_seconds:
+                    victims.append(db_name)
+            return victims
+
+    def stats(self) -> dict:
+        return {
+            "shared_client_open": self._shared is not None,
+            "shared_path": str(self.shared_path),
+            "dedicated_clients_open": len(self._dedicated_lru),
+            "max_dedicated_clients": self.max_dedicated,
+            "segment_cache_bytes": self.segment_cache_bytes
+        }
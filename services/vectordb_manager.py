@@ -15,12 +15,19 @@
 3. LLM 摘要後插入（可選）
 4. 全文檔插入和分塊處理
 5. 資料庫列表和狀態查詢
+6. 近似重複分塊抑制（SimHash，插入時略過 + 批次清理）
+7. 可插拔嵌入後端（OpenAI / 本機 CPU），每個資料庫標記建立時使用的嵌入模型
+8. 共用 Chroma 客戶端（每個 DB 為共用儲存根目錄中的一個集合），舊版專屬目錄
+   以有界 LRU 客戶端池開啟（services/vectordb/storage.py）
+9. 延遲建構 + 啟動預熱（LLM / 嵌入後端 / Chroma 客戶端按需建立，
+   warm_up() 在事件迴圈外開啟集合、載入 HNSW 索引與 reranker）
 
 技術架構：
 -----------
-- 存儲引擎：ChromaDB（持久化向量存儲）
-- 嵌入模型：OpenAI text-embedding-3-small (1536維)
-- 文本分割：LangChain RecursiveCharacterTextSplitter
+- 存儲引擎：ChromaDB（持久化向量存儲；新 DB 存於共用客戶端 <CHROMA_DB_PATH>/_shared）
+- 嵌入模型：EmbeddingProvider（預設 OpenAI text-embedding-3-small，1536維；
+  EMBEDDING_PROVIDER=local 時使用 sentence-transformers，services/vectordb/embeddings.py）
+- 文本分割：OffsetTextSplitter（單次掃描、偏移量父子分塊，services/vectordb/chunker.py）
 
 使用方式：
 -----------
@@ -44,16 +51,24 @@ databases = vectordb_manager.list_databases()
 
 import os
 import json
+import heapq
+import math
+import time
 import asyncio
 import logging
 import shutil
+import threading
 import zipfile
-from typing import Dict, Any, Optional, List
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Startup timing: import phase covers chromadb / langchain / sub-module imports below
+_IMPORT_STARTED = time.perf_counter()
+
 # Optional import for ChromaDB
 try:
     import chromadb
@@ -65,39 +80,84 @@ except ImportError:
     Settings = None
     logger.warning("ChromaDB not installed. Vector database features will be disabled.")
 
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+# numpy (installed with chromadb) speeds up exact pre-filtered search
 try:
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-except Exception:
-    # Fallback minimal implementation if langchain.text_splitter is not installed
-    class RecursiveCharacterTextSplitter:
-        def __init__(self, chunk_size=1000, chunk_overlap=200, length_function=len):
-            self.chunk_size = chunk_size
-            self.chunk_overlap = chunk_overlap
-            self.length_function = length_function
-
-        def split_text(self, text: str) -> list:
-            if not text:
-                return []
-            chunks = []
-            # compute step ensuring it's positive
-            step = self.chunk_size - self.chunk_overlap
-            if step <= 0:
-                step = self.chunk_size
-            start = 0
-            text_len = self.length_function(text)
-            while start < text_len:
-                end = min(start + self.chunk_size, text_len)
-                chunks.append(text[start:end])
-                start += step
-            return chunks
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
 
+from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document
 
 from config.config import Config
 from utils.path_security import validate_db_name, sanitize_path
+from services.llm_rate_limiter import Priority, with_priority
+from services.provider_replay import get_provider_replay
 from services.vectordb.skills import SkillsManager
 from services.vectordb.backup import VectorDBBackupManager
+from services.vectordb.chunker import OffsetTextSplitter, split_parent_child
+from services.vectordb.dedup import SimHashIndex, simhash64, INDEX_FILENAME as DEDUP_INDEX_FILENAME
+from services.vectordb.fusion import fuse_results
+from services.vectordb.embedding_profile import (
+    EmbeddingProfile,
+    Projector,
+    PROJECTION_METHODS,
+    projector_filename,
+)
+from services.vectordb.filter_index import (
+    FilterIndex,
+    FILTER_INDEX_FILENAME,
+    split_filter,
+    chroma_where,
+    matches,
+    join_tags,
+)
+from services.vectordb.columnar import (
+    ColumnarWriter,
+    ColumnarReader,
+    MANIFEST_FILENAME as EXPORT_MANIFEST_FILENAME,
+)
+from services.vectordb.lifecycle import (
+    apply_lifecycle_defaults,
+    live_filter,
+    expired_filter,
+    merge_where,
+    CompactionLock,
+    TOMBSTONE_FILTER,
+    EXPIRES_AT,
+    DELETED,
+    DELETED_AT,
+    is_live,
+)
+from services.vectordb.catalog import (
+    ChunkCatalog,
+    CATALOG_FILENAME,
+    GROUP_FIELDS,
+    entry_row,
+    id_checksum,
+    encode_cursor,
+    decode_cursor,
+)
+from services.vectordb.storage import (
+    ChromaClientPool,
+    STORAGE_SHARED,
+    STORAGE_DEDICATED,
+    shared_collection_name,
+    copy_collection,
+    release_client,
+    remove_chroma_files,
+    dir_size,
+    max_batch_size,
+)
+from services.vectordb.embeddings import (
+    EmbeddingProvider,
+    EmbeddingModelMismatchError,
+    get_embedding_provider,
+    get_native_embedding_provider,
+    legacy_model_id,
+)
 
 # Get config values from the Config class
 _config = Config()
@@ -138,6 +198,32 @@ class RerankerService:
             logger.warning(f"Failed to load reranker model: {e}. Reranking disabled.")
             self._enabled = False
     
+    def warm_up(self):
+        """Load the cross-encoder and run one prediction (blocking — call off-loop)."""
+        if not self._enabled:
+            return
+        self._load_model()
+        if self._model is not None:
+            self._model.predict([("warm up", "warm up")])
+    
+    def score_pairs(self, pairs: list) -> Optional[List[float]]:
+        """
+        Score (query, text) pairs in one batched cross-encoder call.
+        
+        Returns:
+            One score per pair, or None if reranking is disabled / unavailable
+        """
+        if not self._enabled or not pairs:
+            return None
+        self._load_model()
+        if self._model is None:
+            return None
+        try:
+            return [float(s) for s in self._model.predict([(q, (t or "")[:512]) for q, t in pairs])]
+        except Exception as e:
+            logger.warning(f"Reranking failed: {e}")
+            return None
+    
     def rerank(self, query: str, documents: list, top_k: int = 5) -> list:
         """
         Rerank documents using cross-encoder.
@@ -204,6 +290,28 @@ class VectorDBManager:
             return
         
         self._initialized = True
+        init_started = time.perf_counter()
+        
+        # Heavy clients are built on first use (see _llm / _embeddings / skills_mgr)
+        self._llm_instance = None
+        self._embedding_provider: Optional[EmbeddingProvider] = None
+        self._skills_mgr = None
+        self._lazy_lock = threading.RLock()  # skills_mgr → _llm nests
+        self._client_lock = threading.RLock()
+        self._storage: Optional[ChromaClientPool] = None
+        self._startup_timings: Dict[str, Any] = {"lazy_init_ms": {}, "warm_up": None}
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._projectors: Dict[str, Projector] = {}  # Projection matrices by file path
+        self._native_providers: Dict[int, EmbeddingProvider] = {}  # Shortened-output providers by dims
+        self._profile_migrations: Dict[str, str] = {}  # DBs being migrated → target method
+        self._profile_journals: Dict[str, set] = {}  # Chunk ids updated during a migration copy
+        self._write_lock = threading.RLock()  # Serializes metadata updates with migration start / swap
+        self._inserts_idle = threading.Condition(self._write_lock)  # Signalled when an insert finishes
+        self._inserts_in_flight: Dict[str, int] = {}  # Running insert_document / insert_hierarchical calls by DB
+        self._insert_barriers: set = set()  # DBs waiting for in-flight inserts to drain
+        self._catalog_jobs: Dict[str, threading.Thread] = {}  # Background catalog rebuilds by DB
+        self._catalog_verified: Dict[str, float] = {}  # Last id-fingerprint check by DB
+        self._catalog_jobs_lock = threading.Lock()
         
         # Check if ChromaDB is available
         if not HAS_CHROMADB:
@@ -212,10 +320,11 @@ class VectorDBManager:
             self._active_db = None
             self._clients = {}
             self._collections = {}
+            self._dedup_indexes = {}
+            self._catalogs = {}
+            self._filter_indexes = {}
             self._metadata = {}
             self.metadata_file = None
-            self._llm = None
-            self._embeddings = None
             self._text_splitter = None
             return
         
@@ -227,46 +336,40 @@ class VectorDBManager:
         self._active_db: Optional[str] = None
         self._clients: Dict[str, Any] = {}  # Changed from chromadb.Client to Any
         self._collections: Dict[str, Any] = {}  # Changed from chromadb.Collection to Any
+        self._dedup_indexes: Dict[str, SimHashIndex] = {}  # Near-duplicate signature index per DB
+        self._catalogs: Dict[str, ChunkCatalog] = {}  # Listing catalog per DB (keyset paging, previews)
+        self._filter_indexes: Dict[str, FilterIndex] = {}  # Metadata pre-filter index per DB
+        
+        # Shared client for collection-per-DB storage + bounded pool for legacy per-DB clients
+        self._storage = ChromaClientPool(
+            self.base_path,
+            max_dedicated=_config.VECTORDB_MAX_OPEN_CLIENTS,
+            idle_seconds=_config.VECTORDB_CLIENT_IDLE_SECONDS,
+            segment_cache_bytes=_config.VECTORDB_SEGMENT_CACHE_BYTES
+        )
         
         # Database metadata storage
         self.metadata_file = self.base_path / "db_metadata.json"
         self._metadata = self._load_metadata()
         
-        # LLM for summarization
-        self._llm = ChatOpenAI(
-            api_key=OPENAI_API_KEY,
-            model=DEFAULT_MODEL,
-            temperature=0
-        )
-        
-        # Embeddings
-        self._embeddings = OpenAIEmbeddings(
-            api_key=OPENAI_API_KEY,
-            model=EMBEDDING_MODEL
-        )
+        # LLM for summarization and embeddings (pluggable: OpenAI or local CPU
+        # backend) are created lazily — see the _llm / _embeddings properties
         
         # Text splitter for chunking (Phase 2: configurable sizes)
-        self._text_splitter = RecursiveCharacterTextSplitter(
+        # Offset-based: 分塊以 (start, end) 表示，字串只在嵌入/寫入時才切片
+        self._text_splitter = OffsetTextSplitter(
             chunk_size=_config.CHUNK_SIZE,
-            chunk_overlap=_config.CHUNK_OVERLAP,
-            length_function=len
+            chunk_overlap=_config.CHUNK_OVERLAP
         )
         
         # Parent chunk splitter (Phase 2: larger context windows)
-        self._parent_splitter = RecursiveCharacterTextSplitter(
+        self._parent_splitter = OffsetTextSplitter(
             chunk_size=_config.PARENT_CHUNK_SIZE,
-            chunk_overlap=400,
-            length_function=len
+            chunk_overlap=400
         )
 
         # ── Sub-modules (God Class 拆分) ──────────────────────────
-        # 技能管理器：生成/更新 KB 技能描述供 Agent 路由使用
-        self.skills_mgr = SkillsManager(
-            metadata=self._metadata,
-            llm=self._llm,
-            get_collection_fn=self._get_collection,
-            save_metadata_fn=self._save_metadata,
-        )
+        # 技能管理器：生成/更新 KB 技能描述供 Agent 路由使用（延遲建立，見 skills_mgr）
         # 備份管理器：建立/列出/還原 ZIP 備份
         self.backup_mgr = VectorDBBackupManager(
             base_path=self.base_path,
@@ -278,8 +381,67 @@ class VectorDBManager:
         )
         # ──────────────────────────────────────────────────────────
         
+        self._startup_timings["init_ms"] = round((time.perf_counter() - init_started) * 1000, 1)
         logger.info(f"VectorDBManager initialized. Base path: {self.base_path}")
     
+    # ============== Lazy Construction ==============
+    
+    def _build_lazy(self, attr: str, label: str, factory):
+        """Build a heavy dependency once (thread-safe) and record how long it took"""
+        value = getattr(self, attr)
+        if value is None:
+            with self._lazy_lock:
+                value = getattr(self, attr)
+                if value is None:
+                    started = time.perf_counter()
+                    value = factory()
+                    setattr(self, attr, value)
+                    self._startup_timings["lazy_init_ms"][label] = round(
+                        (time.perf_counter() - started) * 1000, 1
+                    )
+        return value
+    
+    @property
+    def _llm(self):
+        """LLM for summarization (ChatOpenAI, created on first use)"""
+        if not HAS_CHROMADB:
+            return None
+        return self._build_lazy("_llm_instance", "llm", self._create_llm)
+    
+    @staticmethod
+    def _create_llm():
+        """Summarization LLM; follows PROVIDER_MODE (offline replay model / recording callbacks)"""
+        replay = get_provider_replay()
+        if replay is not None and replay.mode == "replay":
+            return replay.chat_model(DEFAULT_MODEL, temperature=0)
+        return ChatOpenAI(
+            api_key=OPENAI_API_KEY,
+            model=DEFAULT_MODEL,
+            temperature=0,
+            callbacks=replay.callbacks() if replay is not None else None
+        )
+    
+    @property
+    def _embeddings(self) -> Optional[EmbeddingProvider]:
+        """Embedding provider (created on first use)"""
+        if not HAS_CHROMADB:
+            return None
+        return self._build_lazy("_embedding_provider", "embeddings", get_embedding_provider)
+    
+    @_embeddings.setter
+    def _embeddings(self, provider: Optional[EmbeddingProvider]):
+        self._embedding_provider = provider
+    
+    @property
+    def skills_mgr(self) -> SkillsManager:
+        """技能管理器（首次使用時建立，避免啟動時建構 LLM 客戶端）"""
+        return self._build_lazy("_skills_mgr", "skills_mgr", lambda: SkillsManager(
+            metadata=self._metadata,
+            llm=self._llm,
+            get_collection_fn=self._get_collection,
+            save_metadata_fn=self._save_metadata,
+        ))
+    
     def _load_metadata(self) -> Dict[str, Any]:
         """Load database metadata from file"""
         if not HAS_CHROMADB or not self.metadata_file:
@@ -331,22 +493,26 @@ class VectorDBManager:
         if safe_name in self._metadata["databases"]:
             raise ValueError(f"Database '{safe_name}' already exists")
         
-        # Create directory
+        # Create directory (holds the Chroma data for dedicated storage, side files for shared)
         db_path.mkdir(parents=True, exist_ok=True)
         
-        # Initialize ChromaDB client
-        client = chromadb.PersistentClient(
-            path=str(db_path),
-            settings=Settings(
-                anonymized_telemetry=False
+        storage = _config.VECTORDB_STORAGE_MODE
+        if storage == STORAGE_SHARED:
+            # One collection per DB inside the shared client
+            client = self._storage.shared_client()
+            collection_name = shared_collection_name(safe_name)
+            collection = client.create_collection(
+                name=collection_name,
+                metadata={"description": description, "kb": safe_name}
+            )
+        else:
+            storage = STORAGE_DEDICATED
+            collection_name = "documents"
+            client = self._storage.open_dedicated(str(db_path))
+            collection = client.create_collection(
+                name=collection_name,
+                metadata={"description": description}
             )
-        )
-        
-        # Create default collection
-        collection = client.create_collection(
-            name="documents",
-            metadata={"description": description}
-        )
         
         # Store metadata
         db_info = {
@@ -356,15 +522,20 @@ class VectorDBManager:
             "category": category,
             "created_at": datetime.now().isoformat(),
             "document_count": 0,
-            "collections": ["documents"]
+            "collections": [collection_name],
+            "storage": storage,
+            "embedding_model": self.embedding_model_id
         }
         
         self._metadata["databases"][safe_name] = db_info
         self._save_metadata()
         
         # Cache client
-        self._clients[safe_name] = client
-        self._collections[safe_name] = collection
+        with self._client_lock:
+            self._collections[safe_name] = collection
+            self._clients[safe_name] = client
+            if storage == STORAGE_DEDICATED:
+                self._storage.register_dedicated(safe_name)
         
         logger.info(f"Created database: {safe_name}")
         
@@ -392,10 +563,12 @@ class VectorDBManager:
         """Update the skills metadata for a knowledge base — delegates to SkillsManager"""
         return self.skills_mgr.update_skills(db_name, skills)
 
+    @with_priority(Priority.BACKGROUND)
     async def generate_skills_with_llm(self, db_name: str) -> Dict[str, Any]:
         """Use LLM to generate skills metadata — delegates to SkillsManager"""
         return await self.skills_mgr.generate_with_llm(db_name)
 
+    @with_priority(Priority.BACKGROUND)
     async def generate_all_skills(self) -> Dict[str, Any]:
         """Generate skills for ALL databases — delegates to SkillsManager"""
         return await self.skills_mgr.generate_all()
@@ -436,12 +609,24 @@ class VectorDBManager:
         if db_name not in self._metadata["databases"]:
             raise ValueError(f"Database '{db_name}' not found")
         
-        db_path = Path(self._metadata["databases"][db_name]["path"])
+        db_info = self._metadata["databases"][db_name]
+        db_path = Path(db_info["path"])
         
-        # Close client if open
-        if db_name in self._clients:
-            del self._clients[db_name]
-            del self._collections[db_name]
+        # Close client if open (shared storage: drop the DB's collection from the shared client)
+        if db_info.get("storage") == STORAGE_SHARED:
+            self._unload_client(db_name)
+            try:
+                self._storage.shared_client().delete_collection(db_info["collections"][0])
+            except Exception as e:
+                logger.warning(f"Could not delete shared collection for {db_name}: {e}")
+        else:
+            self._unload_client(db_name, release=True)
+        if db_name in self._dedup_indexes:
+            self._dedup_indexes.pop(db_name).close()
+        if db_name in self._catalogs:
+            self._catalogs.pop(db_name).close()
+        if db_name in self._filter_indexes:
+            self._filter_indexes.pop(db_name).close()
         
         # Remove directory
         import shutil
@@ -461,83 +646,948 @@ class VectorDBManager:
     def _get_client(self, db_name: str) -> chromadb.Client:
         """Get or create a ChromaDB client for a database"""
         if db_name not in self._clients:
-            db_info = self._metadata["databases"].get(db_name)
-            if not db_info:
-                raise ValueError(f"Database '{db_name}' not found")
-            
-            client = chromadb.PersistentClient(
-                path=db_info["path"],
-                settings=Settings(anonymized_telemetry=False)
-            )
+            with self._client_lock:
+                if db_name not in self._clients:
+                    self._open_client(db_name)
+                    self._evict_cold_clients(protect=db_name)
+        else:
+            self._storage.touch(db_name)
+        return self._clients[db_name]
+    
+    def _unload_client(self, db_name: str, release: bool = False):
+        """Forget a DB's cached client/collection; release=True also frees a dedicated client's System"""
+        with self._client_lock:
+            client = self._clients.pop(db_name, None)
+            self._collections.pop(db_name, None)
+            self._storage.forget(db_name)
+        if release and client is not None and client is not self._storage._shared:
+            release_client(client)
+    
+    def _evict_cold_clients(self, protect: Optional[str] = None):
+        """Release least-recently-used dedicated clients beyond VECTORDB_MAX_OPEN_CLIENTS"""
+        for victim in self._storage.eviction_candidates(protect=protect or self._active_db):
+            logger.info(f"[Storage] Releasing cold client for {victim}")
+            self._unload_client(victim, release=True)
+    
+    def _open_client(self, db_name: str):
+        """Open the client for a database and resolve its collection (holds _client_lock)"""
+        db_info = self._metadata["databases"].get(db_name)
+        if not db_info:
+            raise ValueError(f"Database '{db_name}' not found")
+        
+        if db_info.get("storage") == STORAGE_SHARED:
+            client = self._storage.shared_client()
+            self._collections[db_name] = client.get_or_create_collection(db_info["collections"][0])
             self._clients[db_name] = client
-            
-            # Get the correct collection - check metadata or find the one with documents
-            collection_names = db_info.get("collections", ["documents"])
-            collection_name = collection_names[0] if collection_names else "documents"
-            
-            # Helper to safely iterate collections (handles ChromaDB version differences)
-            def _iter_collections_safe(cli):
-                """Iterate collections yielding Collection objects, handles ChromaDB 0.5+ API"""
-                try:
-                    items = cli.list_collections()
-                    for item in items:
-                        try:
-                            if isinstance(item, str):
-                                yield cli.get_collection(item)
-                            elif hasattr(item, 'count'):
-                                yield item
-                            else:
-                                name = getattr(item, 'name', str(item))
-                                yield cli.get_collection(name)
-                        except Exception:
-                            continue
-                except (KeyError, Exception) as e:
-                    # ChromaDB 0.5+ may fail with '_type' KeyError on DBs created with older versions
-                    logger.debug(f"list_collections failed for {db_name}: {e}, using fallback")
-                    # Try common collection names directly
-                    for fallback_name in collection_names + ["documents", "default"]:
-                        try:
-                            coll = cli.get_or_create_collection(fallback_name)
-                            yield coll
-                        except Exception:
-                            continue
-            
-            # Try to get the collection with documents
+            return
+        
+        # Legacy dedicated directory (bounded LRU pool)
+        client = self._storage.open_dedicated(db_info["path"])
+        
+        # Get the correct collection - check metadata or find the one with documents
+        collection_names = db_info.get("collections", ["documents"])
+        collection_name = collection_names[0] if collection_names else "documents"
+        
+        # Helper to safely iterate collections (handles ChromaDB version differences)
+        def _iter_collections_safe(cli):
+            """Iterate collections yielding Collection objects, handles ChromaDB 0.5+ API"""
             try:
-                # First try the collection name from metadata
-                collection = client.get_collection(collection_name)
-                if collection.count() > 0:
-                    self._collections[db_name] = collection
-                    logger.info(f"Using collection '{collection_name}' for {db_name} ({collection.count()} docs)")
-                else:
-                    # Try to find a collection with documents
-                    for coll in _iter_collections_safe(client):
-                        if coll.count() > 0:
-                            self._collections[db_name] = coll
-                            logger.info(f"Found collection '{coll.name}' with {coll.count()} docs for {db_name}")
-                            break
-                    else:
-                        # Fall back to the named collection
-                        self._collections[db_name] = collection
-            except Exception as e:
-                logger.warning(f"Error getting collection for {db_name}: {e}")
-                # Try to find any collection with documents
+                items = cli.list_collections()
+                for item in items:
+                    try:
+                        if isinstance(item, str):
+                            yield cli.get_collection(item)
+                        elif hasattr(item, 'count'):
+                            yield item
+                        else:
+                            name = getattr(item, 'name', str(item))
+                            yield cli.get_collection(name)
+                    except Exception:
+                        continue
+            except (KeyError, Exception) as e:
+                # ChromaDB 0.5+ may fail with '_type' KeyError on DBs created with older versions
+                logger.debug(f"list_collections failed for {db_name}: {e}, using fallback")
+                # Try common collection names directly
+                for fallback_name in collection_names + ["documents", "default"]:
+                    try:
+                        coll = cli.get_or_create_collection(fallback_name)
+                        yield coll
+                    except Exception:
+                        continue
+        
+        # Try to get the collection with documents
+        try:
+            # First try the collection name from metadata
+            collection = client.get_collection(collection_name)
+            if collection.count() > 0:
+                self._collections[db_name] = collection
+                logger.info(f"Using collection '{collection_name}' for {db_name} ({collection.count()} docs)")
+            else:
+                # Try to find a collection with documents
                 for coll in _iter_collections_safe(client):
                     if coll.count() > 0:
                         self._collections[db_name] = coll
-                        logger.info(f"Fallback: using collection '{coll.name}' for {db_name}")
+                        logger.info(f"Found collection '{coll.name}' with {coll.count()} docs for {db_name}")
                         break
                 else:
-                    # Create documents collection as last resort
-                    self._collections[db_name] = client.get_or_create_collection("documents")
+                    # Fall back to the named collection
+                    self._collections[db_name] = collection
+        except Exception as e:
+            logger.warning(f"Error getting collection for {db_name}: {e}")
+            # Try to find any collection with documents
+            for coll in _iter_collections_safe(client):
+                if coll.count() > 0:
+                    self._collections[db_name] = coll
+                    logger.info(f"Fallback: using collection '{coll.name}' for {db_name}")
+                    break
+            else:
+                # Create documents collection as last resort
+                self._collections[db_name] = client.get_or_create_collection("documents")
         
-        return self._clients[db_name]
+        # Publish the client only after its collection is resolved (readers check _clients lock-free)
+        self._clients[db_name] = client
+        self._storage.register_dedicated(db_name)
     
     def _get_collection(self, db_name: str) -> chromadb.Collection:
         """Get collection for a database"""
         self._get_client(db_name)  # Ensure client is loaded
         return self._collections[db_name]
     
+    async def _aget_collection(self, db_name: str) -> chromadb.Collection:
+        """Get collection for a database, opening the client off the event loop on first use"""
+        if db_name in self._clients:
+            return self._collections[db_name]
+        return await asyncio.to_thread(self._get_collection, db_name)
+    
+    def _get_snapshot(self, db_name: str) -> tuple:
+        """(collection, embedding profile) read together - a profile migration swaps both under _client_lock"""
+        with self._client_lock:
+            return self._get_collection(db_name), self.get_embedding_profile(db_name)
+    
+    async def _aget_snapshot(self, db_name: str) -> tuple:
+        if db_name in self._clients:
+            return self._get_snapshot(db_name)
+        return await asyncio.to_thread(self._get_snapshot, db_name)
+    
+    # ============== Storage Layout ==============
+    
+    def get_storage_stats(self) -> Dict[str, Any]:
+        """Open clients / collections per storage mode"""
+        databases = self._metadata.get("databases", {})
+        shared = [n for n, i in databases.items() if i.get("storage") == STORAGE_SHARED]
+        return {
+            **(self._storage.stats() if self._storage else {}),
+            "databases_shared": len(shared),
+            "databases_dedicated": len(databases) - len(shared),
+            "collections_open": len(self._collections)
+        }
+    
+    def migrate_to_shared_storage(
+        self,
+        db_names: Optional[List[str]] = None,
+        page_size: int = 1000,
+        remove_old: bool = False,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Move legacy per-directory databases into the shared client as collections.
+        
+        Embeddings are copied as-is (no re-embedding). The DB metadata is switched
+        only after the copied count matches the source; old Chroma files are kept
+        unless remove_old=True (side files such as the dedup index always stay).
+        
+        Args:
+            db_names: Databases to migrate (default: all dedicated DBs)
+            page_size: Chunks copied per page
+            remove_old: Delete the old chroma.sqlite3 / segment directories afterwards
+            dry_run: Only report what would be migrated
+        """
+        if not HAS_CHROMADB:
+            raise RuntimeError("ChromaDB is not installed.")
+        
+        databases = self._metadata["databases"]
+        targets = db_names or [n for n, i in databases.items() if i.get("storage") != STORAGE_SHARED]
+        report = {"migrated": [], "skipped": [], "failed": [], "dry_run": dry_run}
+        
+        for db_name in targets:
+            db_info = databases.get(db_name)
+            if not db_info:
+                report["skipped"].append({"database": db_name, "reason": "not found"})
+                continue
+            if db_info.get("storage") == STORAGE_SHARED:
+                report["skipped"].append({"database": db_name, "reason": "already shared"})
+                continue
+            
+            started = time.perf_counter()
+            try:
+                source = self._get_collection(db_name)
+                total = source.count()
+                collection_name = shared_collection_name(db_name)
+                if dry_run:
+                    report["migrated"].append({
+                        "database": db_name, "collection": collection_name, "chunks": total,
+                        "bytes_on_disk": dir_size(Path(db_info["path"]))
+                    })
+                    continue
+                
+                shared = self._storage.shared_client()
+                try:
+                    shared.delete_collection(collection_name)  # Leftover from an interrupted run
+                except Exception:
+                    pass
+                target = shared.create_collection(
+                    name=collection_name,
+                    metadata={"description": db_info.get("description", ""), "kb": db_name}
+                )
+                copied = copy_collection(source, target, page_size=page_size)
+                if target.count() != total:
+                    shared.delete_collection(collection_name)
+                    raise RuntimeError(f"copied {target.count()} of {total} chunks")
+                
+                # Swap atomically from the readers' point of view
+                with self._client_lock:
+                    self._unload_client(db_name, release=True)
+                    db_info["storage"] = STORAGE_SHARED
+                    db_info["collections"] = [collection_name]
+                    db_info["migrated_at"] = datetime.now().isoformat()
+                    self._save_metadata()
+                
+                freed = remove_chroma_files(Path(db_info["path"])) if remove_old else 0
+                report["migrated"].append({
+                    "database": db_name,
+                    "collection": collection_name,
+                    "chunks": copied,
+                    "bytes_freed": freed,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+                })
+                logger.info(f"[Storage] Migrated {db_name} → shared/{collection_name} ({copied} chunks)")
+            except Exception as e:
+                logger.error(f"[Storage] Migration failed for {db_name}: {e}")
+                report["failed"].append({"database": db_name, "error": str(e)})
+        
+        return report
+    
+    # ============== Startup Warm-up ==============
+    
+    def _resolve_warmup_targets(self, db_names: Optional[List[str]]) -> List[str]:
+        """None → VECTORDB_WARMUP_DBS ('' = active DB, '*' = all non-empty, or a comma list)"""
+        databases = self._metadata.get("databases", {})
+        if db_names is None:
+            spec = _config.VECTORDB_WARMUP_DBS.strip()
+            if spec == "*":
+                db_names = [n for n, info in databases.items() if info.get("document_count", 0) > 0]
+            elif spec:
+                db_names = [n.strip() for n in spec.split(",") if n.strip()]
+            else:
+                active = self.get_active_database()
+                db_names = [active] if active else []
+        missing = [n for n in db_names if n not in databases]
+        if missing:
+            logger.warning(f"[WarmUp] Unknown databases skipped: {missing}")
+        return [n for n in db_names if n in databases]
+    
+    def _warm_database_sync(self, db_name: str) -> Dict[str, Any]:
+        """Open the collection and run one nearest-neighbour query so the HNSW index is loaded"""
+        started = time.perf_counter()
+        collection = self._get_collection(db_name)
+        opened_ms = (time.perf_counter() - started) * 1000
+        count = collection.count()
+        if count:
+            sample = collection.get(limit=1, include=["embeddings"])
+            embeddings = sample.get("embeddings")
+            if embeddings is not None and len(embeddings) > 0:
+                collection.query(query_embeddings=[list(embeddings[0])], n_results=1, include=[])
+        return {
+            "status": "ok",
+            "documents": count,
+            "open_ms": round(opened_ms, 1),
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    
+    async def warm_up(
+        self,
+        db_names: Optional[List[str]] = None,
+        load_reranker: Optional[bool] = None,
+        warm_embeddings: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Pre-warm chosen databases, the embedding backend and the reranker (off-loop).
+        
+        Intended for the FastAPI lifespan so the first user request does not pay
+        for opening Chroma clients, loading HNSW indexes or the cross-encoder.
+        
+        Args:
+            db_names: Databases to warm (default: Config.VECTORDB_WARMUP_DBS)
+            load_reranker: Load the cross-encoder (default: Config.VECTORDB_WARMUP_RERANKER)
+            warm_embeddings: Build the embedding provider / load a local model
+            
+        Returns:
+            Per-component timings (ms)
+        """
+        if not HAS_CHROMADB:
+            return {"status": "skipped", "reason": "chromadb not installed"}
+        
+        load_reranker = _config.VECTORDB_WARMUP_RERANKER if load_reranker is None else load_reranker
+        targets = self._resolve_warmup_targets(db_names)
+        report: Dict[str, Any] = {"databases": {}}
+        started = time.perf_counter()
+        
+        async def _timed(label: str, fn):
+            t0 = time.perf_counter()
+            try:
+                await asyncio.to_thread(fn)
+                report[label] = round((time.perf_counter() - t0) * 1000, 1)
+            except Exception as e:
+                logger.warning(f"[WarmUp] {label} failed: {e}")
+                report[label] = {"status": "error", "error": str(e)}
+        
+        async def _warm_db(name: str):
+            try:
+                report["databases"][name] = await asyncio.to_thread(self._warm_database_sync, name)
+            except Exception as e:
+                logger.warning(f"[WarmUp] {name} failed: {e}")
+                report["databases"][name] = {"status": "error", "error": str(e)}
+        
+        tasks = [_warm_db(name) for name in targets]
+        tasks.append(_timed("llm_client_ms", lambda: self._llm))
+        if warm_embeddings:
+            tasks.append(_timed("embeddings_ms", lambda: self._embeddings.warm_up()))
+        if load_reranker:
+            tasks.append(_timed("reranker_ms", _reranker.warm_up))
+        await asyncio.gather(*tasks)
+        
+        report["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self._startup_timings["warm_up"] = report
+        logger.info(f"[WarmUp] {len(targets)} DB(s) warmed in {report['total_ms']}ms")
+        return report
+    
+    def get_startup_report(self) -> Dict[str, Any]:
+        """Startup timings: module import, __init__, lazy construction and warm-up phases (ms)"""
+        return {
+            "import_ms": _IMPORT_MS,
+            "init_ms": self._startup_timings.get("init_ms"),
+            "lazy_init_ms": dict(self._startup_timings["lazy_init_ms"]),
+            "warm_up": self._startup_timings["warm_up"],
+            "open_databases": list(self._clients.keys()),
+            "storage": self.get_storage_stats()
+        }
+    
+    def _get_dedup_index(self, db_name: str) -> SimHashIndex:
+        """Get the near-duplicate signature index for a database"""
+        if db_name not in self._dedup_indexes:
+            db_info = self._metadata["databases"].get(db_name)
+            if not db_info:
+                raise ValueError(f"Database '{db_name}' not found")
+            self._dedup_indexes[db_name] = SimHashIndex(Path(db_info["path"]) / DEDUP_INDEX_FILENAME)
+        return self._dedup_indexes[db_name]
+
+    def _get_catalog(self, db_name: str) -> ChunkCatalog:
+        """Get the listing catalog (chunk ids, previews, source / content_hash) for a database"""
+        if db_name not in self._catalogs:
+            db_info = self._metadata["databases"].get(db_name)
+            if not db_info:
+                raise ValueError(f"Database '{db_name}' not found")
+            db_path = Path(db_info["path"])
+            db_path.mkdir(parents=True, exist_ok=True)
+            self._catalogs[db_name] = ChunkCatalog(db_path / CATALOG_FILENAME)
+        return self._catalogs[db_name]
+
+    def _sync_catalog(self, db_name: str, collection, page_size: int = 1000) -> ChunkCatalog:
+        """
+        Keep the catalog in step with the collection without blocking the listing.
+
+        A count mismatch, or an id fingerprint mismatch found by the periodic check
+        (VECTORDB_CATALOG_VERIFY_SECONDS), schedules a background reconcile; the
+        current catalog keeps serving pages meanwhile. Only an empty catalog - when
+        there is nothing to serve yet - waits for the build.
+        """
+        catalog = self._get_catalog(db_name)
+        total = collection.count()
+        have = catalog.count()
+        if have == 0 and total:
+            self._schedule_catalog_rebuild(db_name, collection, page_size, verify=False).join()
+        elif have != total:
+            self._schedule_catalog_rebuild(db_name, collection, page_size, verify=False)
+        else:
+            interval = _config.VECTORDB_CATALOG_VERIFY_SECONDS
+            if interval > 0 and time.time() - self._catalog_verified.get(db_name, 0) >= interval:
+                self._schedule_catalog_rebuild(db_name, collection, page_size, verify=True)
+        return catalog
+
+    def _schedule_catalog_rebuild(
+        self, db_name: str, collection, page_size: int, verify: bool
+    ) -> threading.Thread:
+        """Start (or join) the single background catalog job for a database"""
+        with self._catalog_jobs_lock:
+            job = self._catalog_jobs.get(db_name)
+            if job is not None and job.is_alive():
+                return job
+            # Stamp now so concurrent listings don't queue the same check again
+            self._catalog_verified[db_name] = time.time()
+            job = threading.Thread(
+                target=self._rebuild_catalog, args=(db_name, collection, page_size, verify),
+                name=f"catalog-{db_name}", daemon=True
+            )
+            self._catalog_jobs[db_name] = job
+            job.start()
+            return job
+
+    def _collection_fingerprint(self, collection, page_size: int = 5000) -> str:
+        """Id fingerprint of the collection (ids only - no documents or metadata)"""
+        ids: List[str] = []
+        offset = 0
+        while True:
+            page_ids = collection.get(limit=page_size, offset=offset, include=[]).get("ids") or []
+            ids.extend(page_ids)
+            if len(page_ids) < page_size:
+                return id_checksum(ids)
+            offset += page_size
+
+    def _rebuild_catalog(self, db_name: str, collection, page_size: int, verify: bool):
+        """Background job: compare id fingerprints (verify=True) and reconcile on drift"""
+        try:
+            catalog = self._get_catalog(db_name)
+            if verify and self._collection_fingerprint(collection) == catalog.id_checksum():
+                return
+            started = time.perf_counter()
+
+            def pages():
+                offset = 0
+                while True:
+                    page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+                    page_ids = page.get("ids") or []
+                    page_docs = page.get("documents") or [""] * len(page_ids)
+                    page_metas = page.get("metadatas") or [{}] * len(page_ids)
+                    yield [entry_row(*row) for row in zip(page_ids, page_metas, page_docs)]
+                    if len(page_ids) < page_size:
+                        return
+                    offset += page_size
+
+            result = catalog.reconcile(pages())
+            logger.info(f"[Catalog] Reconciled {db_name}: {result['upserted']} chunks, "
+                        f"{result['removed']} stale rows removed in "
+                        f"{(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            logger.warning(f"[Catalog] Rebuild of {db_name} failed: {e}")
+            self._catalog_verified.pop(db_name, None)
+        finally:
+            with self._catalog_jobs_lock:
+                if self._catalog_jobs.get(db_name) is threading.current_thread():
+                    self._catalog_jobs.pop(db_name, None)
+
+    def _get_filter_index(self, db_name: str) -> FilterIndex:
+        """Get the metadata pre-filter index (field/value → chunk ids) for a database"""
+        if db_name not in self._filter_indexes:
+            db_info = self._metadata["databases"].get(db_name)
+            if not db_info:
+                raise ValueError(f"Database '{db_name}' not found")
+            db_path = Path(db_info["path"])
+            db_path.mkdir(parents=True, exist_ok=True)
+            fields = [f.strip() for f in _config.VECTORDB_FILTER_FIELDS.split(",") if f.strip()]
+            self._filter_indexes[db_name] = FilterIndex(db_path / FILTER_INDEX_FILENAME, fields)
+        return self._filter_indexes[db_name]
+
+    def _sync_filter_index(self, db_name: str, collection, page_size: int = 1000) -> FilterIndex:
+        """Rebuild the filter index from the collection when it is missing or out of step (one-time scan)"""
+        index = self._get_filter_index(db_name)
+        total = collection.count()
+        if index.count() == total:
+            return index
+        started = time.perf_counter()
+        index.clear()
+        for offset in range(0, total, page_size):
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            page_ids = page.get("ids") or []
+            index.add_many(zip(page_ids, page.get("metadatas") or [{}] * len(page_ids)))
+        logger.info(f"[FilterIndex] Rebuilt {db_name}: {total} chunks in "
+                    f"{(time.perf_counter() - started) * 1000:.0f}ms")
+        return index
+
+    def get_filter_values(self, db_name: str, field: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most common values of an indexed metadata field (tags are counted one by one)"""
+        index = self._sync_filter_index(db_name, self._get_collection(db_name))
+        return index.value_counts(field, limit=limit)
+
+    # ============== Document Listing ==============
+
+    async def list_documents(
+        self,
+        db_name: str,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        fields: str = "preview",
+        metadata_fields: Optional[List[str]] = None,
+        group_by: Optional[str] = None,
+        where: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Page through a database's chunks (or documents) without loading full chunk text.
+
+        Pages are served from the listing catalog with keyset pagination, so every
+        page costs the same regardless of depth. Only the "metadata" and "full"
+        projections touch the collection, and only for the ids on the page.
+
+        Args:
+            db_name: Target database
+            cursor: Opaque cursor from the previous page's next_cursor
+            limit: Page size
+            offset: Legacy offset paging (ignored when a cursor is given)
+            fields: Projection - "ids", "preview", "metadata" (preview + metadata) or "full" (+ content)
+            metadata_fields: Metadata keys to return (default: all; "metadata" drops parent_content)
+            group_by: "source" or "content_hash" to list documents instead of chunks
+            where: Equality filters on source / content_hash / chunk_type
+
+        Returns:
+            Page with documents (or groups), next_cursor and total_chunks
+        """
+        return await asyncio.to_thread(
+            self._list_documents_sync, db_name, cursor, limit, offset,
+            fields, metadata_fields, group_by, where
+        )
+
+    def _list_documents_sync(
+        self,
+        db_name: str,
+        cursor: Optional[str],
+        limit: int,
+        offset: int,
+        fields: str,
+        metadata_fields: Optional[List[str]],
+        group_by: Optional[str],
+        where: Optional[Dict[str, str]]
+    ) -> Dict[str, Any]:
+        if fields not in ("ids", "preview", "metadata", "full"):
+            raise ValueError(f"Unknown projection '{fields}' (ids, preview, metadata, full)")
+        if group_by and group_by not in GROUP_FIELDS:
+            raise ValueError(f"group_by must be one of {GROUP_FIELDS}")
+        collection = self._get_collection(db_name)
+        catalog = self._sync_catalog(db_name, collection)
+        after = decode_cursor(cursor)
+
+        if group_by:
+            if after is not None and not isinstance(after, str):
+                raise ValueError("Cursor does not belong to a grouped listing")
+            groups, next_key = catalog.groups(group_by, after=after, limit=limit)
+            return {
+                "database": db_name,
+                "group_by": group_by,
+                "groups": groups,
+                "next_cursor": encode_cursor(next_key) if next_key is not None else None,
+                "total_chunks": catalog.count()
+            }
+
+        if after is not None and not isinstance(after, int):
+            raise ValueError("Cursor does not belong to a chunk listing")
+        rows, next_seq = catalog.page(after=after, limit=limit, offset=offset, where=where)
+
+        if fields == "ids":
+            documents = [{"id": row["chunk_id"]} for row in rows]
+        else:
+            documents = [{
+                "id": row["chunk_id"],
+                "preview": row["preview"],
+                "title": row["title"],
+                "source": row["source"],
+                "content_hash": row["content_hash"],
+                "chunk_type": row["chunk_type"],
+                "char_len": row["char_len"]
+            } for row in rows]
+
+        if fields in ("metadata", "full") and documents:
+            include = ["metadatas", "documents"] if fields == "full" else ["metadatas"]
+            page = collection.get(ids=[doc["id"] for doc in documents], include=include)
+            by_id = {}
+            page_docs = page.get("documents") or [None] * len(page["ids"])
+            for chunk_id, meta, text in zip(page["ids"], page.get("metadatas") or [], page_docs):
+                by_id[chunk_id] = (meta or {}, text)
+            for doc in documents:
+                meta, text = by_id.get(doc["id"], ({}, None))
+                if metadata_fields:
+                    doc["metadata"] = {k: meta[k] for k in metadata_fields if k in meta}
+                elif fields == "metadata":
+                    doc["metadata"] = {k: v for k, v in meta.items() if k != "parent_content"}
+                else:
+                    doc["metadata"] = meta
+                if fields == "full":
+                    doc["content"] = text or ""
+
+        return {
+            "database": db_name,
+            "fields": fields,
+            "documents": documents,
+            "next_cursor": encode_cursor(next_seq) if next_seq is not None else None,
+            "total_chunks": catalog.count()
+        }
+
+    # ============== Embedding Provider ==============
+    
+    @property
+    def embedding_model_id(self) -> Optional[str]:
+        """Model tag of the active embedding provider (e.g. 'local:all-MiniLM-L6-v2')"""
+        return self._embeddings.model_id if self._embeddings else None
+    
+    def set_embedding_provider(self, provider: EmbeddingProvider):
+        """Swap the embedding backend (closes the previous one)"""
+        previous, self._embeddings = self._embedding_provider, provider
+        if previous is not None and previous is not provider:
+            previous.close()
+        logger.info(f"Embedding provider set to {provider.model_id}")
+    
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        """Embedding backend statistics (batching / dedup / latency histograms when available)"""
+        if self._embeddings is None:
+            return {"enabled": False}
+        stats_fn = getattr(self._embeddings, "get_stats", None)
+        stats = stats_fn() if stats_fn else {}
+        return {"enabled": True, "model": self.embedding_model_id, **stats}
+    
+    def get_database_embedding_model(self, db_name: str) -> str:
+        """Embedding model that built a database (untagged DBs predate tagging → legacy OpenAI model)"""
+        db_info = self._metadata["databases"].get(db_name)
+        if not db_info:
+            raise ValueError(f"Database '{db_name}' not found")
+        return db_info.get("embedding_model") or legacy_model_id(EMBEDDING_MODEL)
+    
+    def is_embedding_compatible(self, db_name: str) -> bool:
+        """True if the database can be queried / written with the active embedding provider"""
+        db_info = self._metadata["databases"].get(db_name)
+        if not db_info:
+            return False
+        if not db_info.get("embedding_model") and db_info.get("document_count", 0) == 0:
+            return True  # Empty, untagged DB: adopts the active model on first insert
+        return self.get_database_embedding_model(db_name) == self.embedding_model_id
+    
+    def _check_embedding_model(self, db_name: str):
+        """Raise if the DB was built with a different embedding model; tag empty untagged DBs"""
+        if self.is_embedding_compatible(db_name):
+            db_info = self._metadata["databases"][db_name]
+            if not db_info.get("embedding_model"):
+                db_info["embedding_model"] = self.embedding_model_id
+                self._save_metadata()
+            return
+        raise EmbeddingModelMismatchError(
+            f"Database '{db_name}' was built with embedding model "
+            f"'{self.get_database_embedding_model(db_name)}', but the active provider is "
+            f"'{self.embedding_model_id}'. Re-embed the database or switch EMBEDDING_PROVIDER."
+        )
+
+    # ============== Embedding Profiles ==============
+
+    def get_embedding_profile(self, db_name: str) -> EmbeddingProfile:
+        """Stored vector format of a database (model, dimensions, dtype, reduction method)"""
+        db_info = self._metadata["databases"].get(db_name)
+        if not db_info:
+            raise ValueError(f"Database '{db_name}' not found")
+        return EmbeddingProfile.from_dict(
+            db_info.get("embedding_profile"), default_model=self.get_database_embedding_model(db_name)
+        )
+
+    def _get_projector(self, db_name: str, profile: EmbeddingProfile) -> Projector:
+        path = Path(self._metadata["databases"][db_name]["path"]) / profile.projection_file
+        key = str(path)
+        if key not in self._projectors:
+            self._projectors[key] = Projector.load(path)
+        return self._projectors[key]
+
+    def _native_provider(self, dimensions: int) -> EmbeddingProvider:
+        """Provider emitting natively shortened vectors (OpenAI text-embedding-3 `dimensions`)"""
+        if dimensions not in self._native_providers:
+            model = (self.embedding_model_id or "").split(":", 1)[-1]
+            self._native_providers[dimensions] = get_native_embedding_provider(model, dimensions)
+        return self._native_providers[dimensions]
+
+    async def _aembed_for(
+        self, db_name: str, texts: List[str], profile: Optional[EmbeddingProfile] = None
+    ) -> List[List[float]]:
+        """Embed texts in the vector format the database stores"""
+        profiles = {db_name: profile} if profile is not None else None
+        return (await self._aembed_for_dbs(texts, [db_name], profiles))[db_name]
+
+    async def _aembed_for_dbs(
+        self,
+        texts: List[str],
+        db_names: List[str],
+        profiles: Optional[Dict[str, EmbeddingProfile]] = None
+    ) -> Dict[str, List[List[float]]]:
+        """
+        Embed texts once per distinct profile: the base model output is shared by
+        full and projected DBs, natively shortened profiles get their own batch.
+
+        profiles pins the profile read with each collection (see _get_snapshot);
+        missing entries are read from the metadata.
+        """
+        profiles = {db: (profiles or {}).get(db) or self.get_embedding_profile(db) for db in db_names}
+        needs_base = any(p.method != "native" for p in profiles.values())
+        native_dims = sorted({p.dimensions for p in profiles.values() if p.method == "native"})
+        batches = await asyncio.gather(
+            *([self._embeddings.aembed_documents(texts)] if needs_base else []),
+            *(self._native_provider(d).aembed_documents(texts) for d in native_dims)
+        )
+        base = batches[0] if needs_base else None
+        native = dict(zip(native_dims, batches[1:] if needs_base else batches))
+
+        vectors: Dict[str, List[List[float]]] = {}
+        by_profile: Dict[str, List[List[float]]] = {}
+        for db_name, profile in profiles.items():
+            if profile.profile_id not in by_profile:
+                if profile.method == "native":
+                    by_profile[profile.profile_id] = native[profile.dimensions]
+                elif profile.method in PROJECTION_METHODS:
+                    by_profile[profile.profile_id] = self._get_projector(db_name, profile).transform(base)
+                else:
+                    by_profile[profile.profile_id] = base
+            vectors[db_name] = by_profile[profile.profile_id]
+        return vectors
+
+    async def migrate_embedding_profile(
+        self,
+        db_name: str,
+        dimensions: Optional[int] = None,
+        method: str = "auto",
+        dtype: str = "float32",
+        sample_size: int = 5000,
+        page_size: int = 500,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Re-project or re-embed a database into a new embedding profile.
+
+        The new vectors are written to a fresh collection while reads keep using
+        the old one; the collection and profile are swapped in one step once the
+        copy is verified. Inserts, hard deletes and dedup are refused while it
+        migrates; soft deletes are journaled and replayed onto the copy before the swap.
+
+        Args:
+            db_name: Target database
+            dimensions: Target dimensions (None with method="full" restores the model's native output)
+            method: auto / full / native / pca / random_projection
+                (auto: native for OpenAI text-embedding-3 models, pca otherwise)
+            dtype: Recorded vector dtype (Chroma's HNSW always stores float32)
+            sample_size: Vectors sampled to fit the PCA projection
+            page_size: Chunks copied per page
+            dry_run: Only report the size estimate
+        """
+        started = time.perf_counter()
+        db_info = self._metadata["databases"].get(db_name)
+        if not db_info:
+            raise ValueError(f"Database '{db_name}' not found")
+        if db_name in self._profile_migrations:
+            raise ValueError(f"Database '{db_name}' is already migrating")
+        self._check_embedding_model(db_name)
+        old_profile = self.get_embedding_profile(db_name)
+
+        model = old_profile.model
+        if method == "auto":
+            method = "native" if model.startswith("openai:text-embedding-3") else "pca"
+        if method != "full" and not dimensions:
+            raise ValueError(f"Method '{method}' needs target dimensions")
+        if method == "native" and not model.startswith("openai:text-embedding-3"):
+            raise ValueError(f"Model '{model}' does not support native shortened embeddings")
+        if method in PROJECTION_METHODS and old_profile.method != "full":
+            raise ValueError("Projections are fitted on full-dimension vectors; migrate with method='full' first")
+
+        collection = await self._aget_collection(db_name)
+        total = await asyncio.to_thread(collection.count)
+        sample = await asyncio.to_thread(collection.get, limit=1, include=["embeddings"])
+        embeddings = sample.get("embeddings")
+        old_dims = len(embeddings[0]) if embeddings is not None and len(embeddings) > 0 else (old_profile.dimensions or 0)
+        new_dims = dimensions or (old_dims if method == "full" and old_profile.method == "full" else None)
+        report = {
+            "database": db_name,
+            "dry_run": dry_run,
+            "chunks": total,
+            "method": method,
+            "old_profile": {**old_profile.to_dict(), "dimensions": old_dims},
+            "vector_bytes_before": total * old_dims * 4,
+            "vector_bytes_after": total * new_dims * 4 if new_dims else None
+        }
+        if dry_run:
+            return report
+
+        path = Path(db_info["path"])
+        lock = CompactionLock(path)
+        if not lock.acquire():
+            raise ValueError(f"Database '{db_name}' is being compacted or migrated by another worker")
+        # In-flight metadata updates and inserts finish first; later updates are
+        # journaled and later inserts are refused until the swap
+        await asyncio.to_thread(self._begin_profile_migration, db_name, method)
+        total = report["chunks"] = await asyncio.to_thread(collection.count)
+        storage_path = self._storage.shared_path if db_info.get("storage") == STORAGE_SHARED else path
+        bytes_before = dir_size(storage_path)
+        client, new_name, swapped, projection_file = None, None, False, None
+        try:
+            client = self._get_client(db_name)
+            suffix = f"p{int(time.time())}"
+            if db_info.get("storage") == STORAGE_SHARED:
+                new_name = shared_collection_name(f"{db_name}-{suffix}")
+            else:
+                new_name = f"documents_{suffix}"
+            fresh = await asyncio.to_thread(
+                client.create_collection, name=new_name, metadata=collection.metadata or None
+            )
+
+            projector = None
+            if method in PROJECTION_METHODS:
+                if method == "pca":
+                    page = await asyncio.to_thread(collection.get, limit=sample_size, include=["embeddings"])
+                    projector = await asyncio.to_thread(Projector.fit_pca, page["embeddings"], dimensions)
+                else:
+                    projector = Projector.random(old_dims, dimensions)
+                projection_file = projector_filename(dimensions, projector.digest)
+                await asyncio.to_thread(projector.save, path / projection_file)
+
+            copied = 0
+            while copied < total:
+                include = ["documents", "metadatas", "embeddings"] if projector else ["documents", "metadatas"]
+                page = await asyncio.to_thread(collection.get, limit=page_size, offset=copied, include=include)
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                if projector is not None:
+                    vectors = projector.transform(page["embeddings"])
+                elif method == "native":
+                    vectors = await self._native_provider(dimensions).aembed_documents(page["documents"])
+                else:
+                    vectors = await self._embeddings.aembed_documents(page["documents"])
+                await asyncio.to_thread(
+                    fresh.add, ids=ids, embeddings=vectors,
+                    documents=page.get("documents"), metadatas=page.get("metadatas")
+                )
+                copied += len(ids)
+                logger.info(f"[Profile] {db_name}: {copied}/{total} chunks → {method}:{dimensions or 'native'}")
+
+            if await asyncio.to_thread(fresh.count) != total:
+                raise RuntimeError(f"Migration of {db_name} copied {copied}/{total} chunks; keeping the old profile")
+
+            new_profile = EmbeddingProfile(
+                model=model, dimensions=dimensions, dtype=dtype, method=method, projection_file=projection_file
+            )
+            report["updates_replayed"] = await asyncio.to_thread(
+                self._swap_profile_collection, db_name, collection, fresh, new_name, new_profile
+            )
+            swapped = True
+            await asyncio.to_thread(client.delete_collection, collection.name)
+            if old_profile.projection_file and old_profile.projection_file != projection_file:
+                self._projectors.pop(str(path / old_profile.projection_file), None)
+                (path / old_profile.projection_file).unlink(missing_ok=True)
+        finally:
+            if not swapped and new_name is not None:
+                # Failed or interrupted: drop the partial copy, the old profile stays live
+                try:
+                    await asyncio.to_thread(client.delete_collection, new_name)
+                except Exception:
+                    pass
+            if not swapped and projection_file:
+                self._projectors.pop(str(path / projection_file), None)
+                (path / projection_file).unlink(missing_ok=True)
+            with self._write_lock:
+                self._profile_migrations.pop(db_name, None)
+                self._profile_journals.pop(db_name, None)
+            lock.release()
+
+        report.update({
+            "new_profile": new_profile.to_dict(),
+            "storage_bytes_before": bytes_before,
+            "storage_bytes_after": dir_size(storage_path),
+            "duration_seconds": round(time.perf_counter() - started, 2)
+        })
+        logger.info(f"[Profile] Migrated {db_name} to {new_profile.profile_id} ({total} chunks)")
+        return report
+
+    def _begin_profile_migration(self, db_name: str, method: str):
+        with self._write_lock:
+            self._profile_migrations[db_name] = method
+            self._profile_journals[db_name] = set()
+            self._drain_inserts(db_name)
+
+    # ============== In-flight Inserts ==============
+
+    def _enter_insert(self, db_name: str):
+        """Register an in-flight insert (refused while the database migrates)"""
+        with self._inserts_idle:
+            while db_name in self._insert_barriers:
+                self._inserts_idle.wait()
+            if db_name in self._profile_migrations:
+                raise ValueError(f"Database '{db_name}' is migrating to a new embedding profile; retry when it finishes")
+            self._inserts_in_flight[db_name] = self._inserts_in_flight.get(db_name, 0) + 1
+
+    def _exit_insert(self, db_name: str):
+        with self._inserts_idle:
+            remaining = self._inserts_in_flight.get(db_name, 0) - 1
+            if remaining > 0:
+                self._inserts_in_flight[db_name] = remaining
+            else:
+                self._inserts_in_flight.pop(db_name, None)
+            self._inserts_idle.notify_all()
+
+    def _drain_inserts(self, db_name: str):
+        """
+        Wait for in-flight inserts into db_name to finish (caller holds _write_lock).
+
+        New inserts wait until the caller releases _write_lock, so nothing lands
+        between the caller's final count check and its collection swap / delete.
+        """
+        with self._inserts_idle:
+            self._insert_barriers.add(db_name)
+            try:
+                while self._inserts_in_flight.get(db_name):
+                    self._inserts_idle.wait()
+            finally:
+                self._insert_barriers.discard(db_name)
+                # Inserts that queued behind the barrier proceed once the caller releases the lock
+                self._inserts_idle.notify_all()
+
+    @asynccontextmanager
+    async def _insert_scope(self, db_name: str):
+        """Hold an in-flight insert slot for db_name (migration and compaction swaps wait for it)"""
+        entering = asyncio.ensure_future(asyncio.to_thread(self._enter_insert, db_name))
+
+        def _release_late(future):
+            if not future.cancelled() and future.exception() is None:
+                self._exit_insert(db_name)
+
+        try:
+            await asyncio.shield(entering)
+        except asyncio.CancelledError:
+            # Cancelled while waiting: hand the slot back once the thread has taken it
+            entering.add_done_callback(_release_late)
+            raise
+        try:
+            yield
+        finally:
+            await asyncio.shield(asyncio.to_thread(self._exit_insert, db_name))
+
+    def _journal_updates(self, db_name: str, ids: List[str]):
+        """Record metadata updates made while a profile migration copies the collection"""
+        journal = self._profile_journals.get(db_name)
+        if journal is not None:
+            journal.update(ids)
+
+    def _swap_profile_collection(
+        self, db_name: str, old, fresh, new_name: str, new_profile: EmbeddingProfile, page_size: int = 500
+    ) -> int:
+        """
+        Replay journaled metadata updates onto the copy, then swap the collection
+        and profile. Holding _write_lock keeps new updates out until the swap.
+        """
+        db_info = self._metadata["databases"][db_name]
+        with self._write_lock:
+            journal = sorted(self._profile_journals.get(db_name) or ())
+            for i in range(0, len(journal), page_size):
+                page = old.get(ids=journal[i:i + page_size], include=["metadatas"])
+                if page.get("ids"):
+                    fresh.update(ids=page["ids"], metadatas=page["metadatas"])
+            # Atomic swap: readers see either the old collection + profile or the new pair
+            with self._client_lock:
+                self._collections[db_name] = fresh
+                db_info["collections"] = [new_name]
+                db_info["embedding_profile"] = new_profile.to_dict()
+                self._save_metadata()
+        if journal:
+            logger.info(f"[Profile] {db_name}: replayed {len(journal)} metadata updates made during the copy")
+        return len(journal)
+
     # ============== Document Insertion ==============
     
     async def summarize_document(self, content: str, max_length: int = 500) -> str:
@@ -559,10 +1609,13 @@ Document:
 
 Summary:"""
         
-        response = await asyncio.to_thread(
-            self._llm.invoke,
-            prompt
-        )
+        # 與 LLMService 共用速率限制（優先級取自呼叫端 context，階層式摘要為背景）
+        from services.llm_service import get_llm_service
+        async with get_llm_service().admission(prompt, max_tokens=max_length * 2):
+            response = await asyncio.to_thread(
+                self._llm.invoke,
+                prompt
+            )
         
         return response.content
     
@@ -572,7 +1625,8 @@ Summary:"""
         content: str,
         metadata: Dict[str, Any] = None,
         summarize: bool = False,
-        chunk: bool = True
+        chunk: bool = True,
+        dedup: bool = None
     ) -> Dict[str, Any]:
         """
         Insert a document into a vector database.
@@ -586,17 +1640,35 @@ Summary:"""
         Summarizing domain documents (medical, legal, accounting) destroys precision.
         Use summarize=True only for general/overview documents.
         
+        Near-duplicate suppression: chunks whose SimHash is within
+        DEDUP_HAMMING_THRESHOLD bits of an existing chunk are not embedded.
+        In "link" mode the existing chunk records this document's source.
+        
         Args:
             db_name: Target database name
             content: Document content
             metadata: Additional metadata
             summarize: Whether to summarize before embedding
             chunk: Whether to chunk the document
+            dedup: Override near-duplicate suppression (default: DEDUP_MODE != "off")
             
         Returns:
             Insertion result
         """
-        collection = self._get_collection(db_name)
+        async with self._insert_scope(db_name):
+            return await self._insert_document_locked(db_name, content, metadata, summarize, chunk, dedup)
+
+    async def _insert_document_locked(
+        self,
+        db_name: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]],
+        summarize: bool,
+        chunk: bool,
+        dedup: Optional[bool]
+    ) -> Dict[str, Any]:
+        collection = await self._aget_collection(db_name)
+        self._check_embedding_model(db_name)
         metadata = metadata or {}
         
         # Phase 2.4: Auto-enhance metadata
@@ -607,6 +1679,13 @@ Summary:"""
             metadata["content_length"] = len(content)
         if "inserted_at" not in metadata:
             metadata["inserted_at"] = datetime.now().isoformat()
+        # tags are a multi-value field: stored comma-joined, indexed tag by tag
+        if isinstance(metadata.get("tags"), (list, tuple, set)):
+            metadata["tags"] = join_tags(metadata["tags"])
+        # TTL / soft-delete fields (ttl_seconds → expires_at epoch, 0 = never)
+        metadata = apply_lifecycle_defaults(metadata)
+        if metadata[EXPIRES_AT]:
+            await asyncio.to_thread(self._activate_lifecycle, db_name, collection)
         # Auto-detect document type from source path if available
         source = metadata.get("source", "")
         if source and "document_type" not in metadata:
@@ -620,6 +1699,8 @@ Summary:"""
             }
             metadata["document_type"] = type_map.get(ext, "unknown")
         
+        # 每個待插入項目只記錄 (source_text, start, end) 偏移量，
+        # 字串切片延後到嵌入/寫入時才做
         documents_to_insert = []
         
         if summarize:
@@ -630,55 +1711,83 @@ Summary:"""
             
             # Use summary as document
             if chunk:
-                chunks = self._text_splitter.split_text(summary)
-                for i, chunk_text in enumerate(chunks):
+                spans = self._text_splitter.split_offsets(summary)
+                for i, (start, end) in enumerate(spans):
                     documents_to_insert.append({
-                        "content": chunk_text,
+                        "source_text": summary,
+                        "span": (start, end),
                         "metadata": {**metadata, "chunk_index": i, "is_summary": True}
                     })
             else:
                 documents_to_insert.append({
-                    "content": summary,
+                    "source_text": summary,
+                    "span": (0, len(summary)),
                     "metadata": {**metadata, "is_summary": True}
                 })
         else:
             # Phase 2: Parent-child chunking for better context
             if chunk:
-                # Step 1: Create parent chunks (large context windows)
-                parent_chunks = self._parent_splitter.split_text(content)
+                # Parent and child spans are computed over the same document offsets
+                tree = split_parent_child(content, self._parent_splitter, self._text_splitter)
                 
                 child_index = 0
-                for parent_idx, parent_text in enumerate(parent_chunks):
-                    # Step 2: Split each parent into child chunks (for search)
-                    child_chunks = self._text_splitter.split_text(parent_text)
-                    
-                    for child_offset, child_text in enumerate(child_chunks):
+                for parent_idx, ((parent_start, parent_end), child_spans) in enumerate(tree):
+                    for child_offset, (start, end) in enumerate(child_spans):
                         documents_to_insert.append({
-                            "content": child_text,
+                            "source_text": content,
+                            "span": (start, end),
+                            "parent_span": (parent_start, parent_end),
                             "metadata": {
                                 **metadata,
                                 "chunk_index": child_index,
                                 "parent_index": parent_idx,
                                 "child_offset": child_offset,
-                                "parent_content": parent_text[:_config.PARENT_CHUNK_SIZE],
+                                "char_start": start,
+                                "char_end": end,
+                                "parent_start": parent_start,
+                                "parent_end": parent_end,
                                 "chunk_type": "child"
                             }
                         })
                         child_index += 1
             else:
                 documents_to_insert.append({
-                    "content": content,
+                    "source_text": content,
+                    "span": (0, len(content)),
                     "metadata": metadata
                 })
         
+        should_dedup = dedup if dedup is not None else _config.DEDUP_MODE != "off"
+        dedup_index = self._get_dedup_index(db_name) if should_dedup else None
+        duplicates = []
+        
         # Generate embeddings and insert
         ids = []
+        catalog_rows = []
+        filter_items = []
         for i, doc in enumerate(documents_to_insert):
             doc_id = f"{db_name}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{i}"
-            embedding = await asyncio.to_thread(
-                self._embeddings.embed_query,
-                doc["content"]
-            )
+            start, end = doc["span"]
+            doc_text = doc["source_text"][start:end]
+            
+            signature = None
+            if dedup_index is not None and len(doc_text) >= _config.DEDUP_MIN_CHARS:
+                signature = simhash64(doc_text)
+                existing_id = (
+                    self._find_live_duplicate(collection, dedup_index, signature)
+                    if signature is not None else None
+                )
+                if existing_id:
+                    if _config.DEDUP_MODE == "link":
+                        self._link_duplicate(collection, existing_id, doc["metadata"])
+                    duplicates.append({"chunk_index": i, "duplicate_of": existing_id})
+                    continue
+            if "parent_span" in doc:
+                parent_start, parent_end = doc["parent_span"]
+                doc["metadata"]["parent_content"] = doc["source_text"][
+                    parent_start:min(parent_end, parent_start + _config.PARENT_CHUNK_SIZE)
+                ]
+            embedding = (await self._aembed_for(db_name, [doc_text]))[0]
             
             # Sanitize metadata: ChromaDB only accepts str, int, float, bool
             clean_meta = {}
@@ -693,25 +1802,493 @@ Summary:"""
             collection.add(
                 ids=[doc_id],
                 embeddings=[embedding],
-                documents=[doc["content"]],
+                documents=[doc_text],
                 metadatas=[clean_meta]
             )
             ids.append(doc_id)
+            catalog_rows.append(entry_row(doc_id, clean_meta, doc_text))
+            filter_items.append((doc_id, clean_meta))
+            if signature is not None:
+                dedup_index.add(doc_id, signature)
+        
+        self._get_catalog(db_name).add_many(catalog_rows)
+        self._get_filter_index(db_name).add_many(filter_items)
         
         # Update document count
         self._metadata["databases"][db_name]["document_count"] = collection.count()
         self._save_metadata()
         
-        logger.info(f"Inserted {len(ids)} chunks into {db_name}")
+        logger.info(f"Inserted {len(ids)} chunks into {db_name} ({len(duplicates)} near-duplicates skipped)")
         
         return {
             "success": True,
             "database": db_name,
-            "document_ids": ids,
-            "chunks_created": len(ids),
-            "summarized": summarize
+            "document_ids": ids,
+            "chunks_created": len(ids),
+            "duplicates_skipped": len(duplicates),
+            "duplicates": duplicates,
+            "summarized": summarize
+        }
+    
+    # ============== Near-Duplicate Suppression ==============
+    
+    def _find_live_duplicate(self, collection, dedup_index: SimHashIndex, signature: int) -> Optional[str]:
+        """Find a near-duplicate chunk that is still live (not deleted, soft-deleted or expired)"""
+        exclude = []
+        while True:
+            match = dedup_index.find_near_duplicate(
+                signature, _config.DEDUP_HAMMING_THRESHOLD, exclude=exclude
+            )
+            if not match:
+                return None
+            existing_id = match[0]
+            existing = collection.get(ids=[existing_id], include=["metadatas"])
+            if existing["ids"] and is_live((existing.get("metadatas") or [None])[0]):
+                return existing_id
+            # Stale signature: the chunk was deleted outside the manager, or is a
+            # tombstone / expired chunk that the next compaction will remove
+            dedup_index.remove([existing_id])
+            exclude.append(existing_id)
+    
+    def _link_duplicate(self, collection, existing_id: str, metadata: Dict[str, Any]):
+        """Record the duplicate's source on the chunk that was kept"""
+        source = metadata.get("source") or metadata.get("title") or ""
+        try:
+            existing = collection.get(ids=[existing_id], include=["metadatas"])
+            meta = dict(existing["metadatas"][0] or {}) if existing.get("metadatas") else {}
+            linked = [s for s in str(meta.get("duplicate_sources", "")).split(",") if s]
+            if source and source != meta.get("source") and source not in linked and len(linked) < 20:
+                linked.append(source)
+            meta["duplicate_sources"] = ",".join(linked)
+            meta["duplicate_count"] = int(meta.get("duplicate_count", 0) or 0) + 1
+            collection.update(ids=[existing_id], metadatas=[meta])
+        except Exception as e:
+            logger.warning(f"Failed to link duplicate to {existing_id}: {e}")
+    
+    async def dedup_database(self, db_name: str, dry_run: bool = False, page_size: int = 1000) -> Dict[str, Any]:
+        """
+        Bulk near-duplicate cleanup for an existing database.
+        
+        Rebuilds the SimHash index from scratch, keeps the first chunk of
+        each near-duplicate group and deletes the rest.
+        
+        Args:
+            db_name: Target database
+            dry_run: Only report what would be removed
+            page_size: Chunks read per page
+            
+        Returns:
+            Report with vectors removed and bytes saved
+        """
+        return await asyncio.to_thread(self._dedup_database_sync, db_name, dry_run, page_size)
+    
+    def _dedup_database_sync(self, db_name: str, dry_run: bool, page_size: int) -> Dict[str, Any]:
+        if dry_run:
+            return self._dedup_database_locked(db_name, dry_run, page_size)
+        with self._write_lock:
+            if db_name in self._profile_migrations:
+                raise ValueError(f"Database '{db_name}' is migrating to a new embedding profile; retry when it finishes")
+            return self._dedup_database_locked(db_name, dry_run, page_size)
+
+    def _dedup_database_locked(self, db_name: str, dry_run: bool, page_size: int) -> Dict[str, Any]:
+        started = datetime.now()
+        collection = self._get_collection(db_name)
+        total = collection.count()
+        
+        # Embedding dimension for the bytes-saved estimate (float32 per dimension)
+        dimension = 0
+        if total:
+            sample = collection.get(limit=1, include=["embeddings"])
+            embeddings = sample.get("embeddings")
+            if embeddings is not None and len(embeddings) > 0:
+                dimension = len(embeddings[0])
+        
+        if dry_run:
+            index = SimHashIndex(":memory:")
+        else:
+            index = self._get_dedup_index(db_name)
+            index.clear()
+        
+        duplicate_ids = []
+        links: Dict[str, List[Dict[str, Any]]] = {}
+        bytes_documents = 0
+        bytes_metadata = 0
+        scanned = 0
+        
+        for offset in range(0, total, page_size):
+            page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            page_ids = page.get("ids") or []
+            page_docs = page.get("documents") or [""] * len(page_ids)
+            page_metas = page.get("metadatas") or [{}] * len(page_ids)
+            scanned += len(page_ids)
+            
+            for chunk_id, text, meta in zip(page_ids, page_docs, page_metas):
+                text = text or ""
+                # Tombstones / expired chunks are left to compaction: never keep one
+                # as the canonical copy of a live duplicate
+                if len(text) < _config.DEDUP_MIN_CHARS or not is_live(meta):
+                    continue
+                signature = simhash64(text)
+                if signature is None:
+                    continue
+                match = index.find_near_duplicate(signature, _config.DEDUP_HAMMING_THRESHOLD)
+                if match:
+                    duplicate_ids.append(chunk_id)
+                    links.setdefault(match[0], []).append(meta or {})
+                    bytes_documents += len(text.encode("utf-8"))
+                    bytes_metadata += len(json.dumps(meta or {}, ensure_ascii=False).encode("utf-8"))
+                else:
+                    index.add(chunk_id, signature)
+        
+        if not dry_run and duplicate_ids:
+            if _config.DEDUP_MODE == "link":
+                for kept_id, dup_metas in links.items():
+                    for meta in dup_metas:
+                        self._link_duplicate(collection, kept_id, meta)
+            for i in range(0, len(duplicate_ids), 500):
+                collection.delete(ids=duplicate_ids[i:i + 500])
+            self._get_catalog(db_name).remove(duplicate_ids)
+            self._get_filter_index(db_name).remove(duplicate_ids)
+            self._record_hard_deletes(db_name, len(duplicate_ids))
+            self._metadata["databases"][db_name]["document_count"] = collection.count()
+            self._save_metadata()
+        
+        if dry_run:
+            index.close()
+        
+        bytes_embeddings = len(duplicate_ids) * dimension * 4
+        report = {
+            "database": db_name,
+            "dry_run": dry_run,
+            "chunks_scanned": scanned,
+            "duplicates_found": len(duplicate_ids),
+            "vectors_removed": 0 if dry_run else len(duplicate_ids),
+            "bytes_saved": {
+                "documents": bytes_documents,
+                "metadata": bytes_metadata,
+                "embeddings": bytes_embeddings,
+                "total": bytes_documents + bytes_metadata + bytes_embeddings
+            },
+            "duration_seconds": round((datetime.now() - started).total_seconds(), 2)
+        }
+        logger.info(f"[Dedup] {db_name}: {report['duplicates_found']}/{scanned} near-duplicates "
+                    f"({report['bytes_saved']['total']} bytes, dry_run={dry_run})")
+        return report
+    
+    async def dedup_all_databases(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Run near-duplicate cleanup on every database"""
+        reports = []
+        for db_name in list(self._metadata["databases"].keys()):
+            try:
+                reports.append(await self.dedup_database(db_name, dry_run=dry_run))
+            except Exception as e:
+                logger.warning(f"[Dedup] Skipping {db_name}: {e}")
+                reports.append({"database": db_name, "error": str(e)})
+        
+        ok = [r for r in reports if "error" not in r]
+        return {
+            "dry_run": dry_run,
+            "databases": reports,
+            "vectors_removed": sum(r["vectors_removed"] for r in ok),
+            "duplicates_found": sum(r["duplicates_found"] for r in ok),
+            "bytes_saved": sum(r["bytes_saved"]["total"] for r in ok)
+        }
+
+    # ============== TTL / Soft-Delete / Compaction ==============
+
+    def _lifecycle_where(self, db_name: str, filter_metadata: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """Query filter hiding expired / soft-deleted chunks (only for DBs that have ever used TTL or soft delete)"""
+        db_info = self._metadata["databases"].get(db_name) or {}
+        if not db_info.get("lifecycle", {}).get("active"):
+            return filter_metadata
+        return merge_where(live_filter(), filter_metadata)
+
+    def _activate_lifecycle(self, db_name: str, collection, page_size: int = 1000):
+        """
+        Turn on lifecycle filtering for a database.
+
+        Chroma where-clauses only match chunks that have the key, so chunks
+        inserted before TTL support are backfilled with expires_at=0 / deleted=False
+        first (one-time scan).
+        """
+        db_info = self._metadata["databases"][db_name]
+        lifecycle = db_info.setdefault("lifecycle", {})
+        if lifecycle.get("active"):
+            return
+        backfilled = 0
+        total = collection.count()
+        for offset in range(0, total, page_size):
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            ids, metas = [], []
+            for chunk_id, meta in zip(page.get("ids") or [], page.get("metadatas") or []):
+                meta = meta or {}
+                if EXPIRES_AT in meta and DELETED in meta:
+                    continue
+                ids.append(chunk_id)
+                metas.append({**meta, EXPIRES_AT: int(meta.get(EXPIRES_AT) or 0), DELETED: bool(meta.get(DELETED, False))})
+            if ids:
+                with self._write_lock:
+                    collection.update(ids=ids, metadatas=metas)
+                    self._journal_updates(db_name, ids)
+                backfilled += len(ids)
+        lifecycle["active"] = True
+        lifecycle.setdefault("deleted_since_rebuild", 0)
+        self._save_metadata()
+        logger.info(f"[Lifecycle] Enabled TTL / soft-delete filtering for {db_name} ({backfilled} chunks backfilled)")
+
+    def _record_hard_deletes(self, db_name: str, count: int):
+        """Track hard deletes since the last index rebuild (HNSW keeps deleted slots until rebuilt)"""
+        if count:
+            lifecycle = self._metadata["databases"][db_name].setdefault("lifecycle", {})
+            lifecycle["deleted_since_rebuild"] = lifecycle.get("deleted_since_rebuild", 0) + count
+
+    async def delete_documents(self, db_name: str, ids: List[str], hard: bool = False) -> Dict[str, Any]:
+        """
+        Delete chunks in bulk.
+
+        Soft delete (default) marks the chunks deleted: queries and listings stop
+        returning them immediately and the next compaction removes them.
+        hard=True removes them from the collection now.
+        """
+        return await asyncio.to_thread(self._delete_documents_sync, db_name, list(dict.fromkeys(ids)), hard)
+
+    def _delete_documents_sync(self, db_name: str, ids: List[str], hard: bool) -> Dict[str, Any]:
+        with self._write_lock:
+            if hard and db_name in self._profile_migrations:
+                # Removing rows would shift the offsets the migration copy pages through
+                raise ValueError(f"Database '{db_name}' is migrating to a new embedding profile; "
+                                 f"hard deletes are refused until it finishes")
+            return self._delete_documents_locked(db_name, ids, hard)
+
+    def _delete_documents_locked(self, db_name: str, ids: List[str], hard: bool) -> Dict[str, Any]:
+        collection = self._get_collection(db_name)
+        existing = []
+        for i in range(0, len(ids), 500):
+            existing.extend(collection.get(ids=ids[i:i + 500], include=[])["ids"])
+
+        if hard:
+            for i in range(0, len(existing), 500):
+                collection.delete(ids=existing[i:i + 500])
+            self._get_catalog(db_name).remove(existing)
+            self._get_filter_index(db_name).remove(existing)
+            self._record_hard_deletes(db_name, len(existing))
+            self._metadata["databases"][db_name]["document_count"] = collection.count()
+        else:
+            self._activate_lifecycle(db_name, collection)
+            now = int(time.time())
+            for i in range(0, len(existing), 500):
+                batch = existing[i:i + 500]
+                page = collection.get(ids=batch, include=["metadatas"])
+                metas = [{**(m or {}), DELETED: True, DELETED_AT: now} for m in page.get("metadatas") or []]
+                collection.update(ids=page["ids"], metadatas=metas)
+                self._journal_updates(db_name, page["ids"])
+            self._get_catalog(db_name).mark_deleted(existing)
+            lifecycle = self._metadata["databases"][db_name]["lifecycle"]
+            lifecycle["tombstones"] = lifecycle.get("tombstones", 0) + len(existing)
+        # Deleted chunks must not absorb future near-duplicates
+        self._get_dedup_index(db_name).remove(existing)
+        self._save_metadata()
+
+        return {
+            "database": db_name,
+            "deleted": existing,
+            "not_found": [i for i in ids if i not in set(existing)],
+            "hard": hard
+        }
+
+    async def compact_database(
+        self,
+        db_name: str,
+        rebuild_ratio: float = None,
+        force_rebuild: bool = False,
+        dry_run: bool = False,
+        page_size: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Compaction job for one database.
+
+        1. Bulk-delete expired and soft-deleted chunks
+        2. Rebuild the collection (fresh HNSW index) when deletes since the last
+           rebuild exceed rebuild_ratio of the stored vectors
+        3. Report reclaimed disk space
+
+        Args:
+            db_name: Target database
+            rebuild_ratio: Tombstone ratio that triggers a rebuild (default: config)
+            force_rebuild: Rebuild regardless of the ratio
+            dry_run: Only report what would be removed
+            page_size: Chunks copied per page during a rebuild
+        """
+        return await asyncio.to_thread(
+            self._compact_database_sync, db_name, rebuild_ratio, force_rebuild, dry_run, page_size
+        )
+
+    def _compact_database_sync(
+        self,
+        db_name: str,
+        rebuild_ratio: Optional[float],
+        force_rebuild: bool,
+        dry_run: bool,
+        page_size: int
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        db_info = self._metadata["databases"].get(db_name)
+        if not db_info:
+            raise ValueError(f"Database '{db_name}' not found")
+        rebuild_ratio = rebuild_ratio if rebuild_ratio is not None else _config.VECTORDB_TOMBSTONE_REBUILD_RATIO
+        lifecycle = db_info.setdefault("lifecycle", {})
+        storage_path = self._storage.shared_path if db_info.get("storage") == STORAGE_SHARED else Path(db_info["path"])
+
+        report = {
+            "database": db_name,
+            "dry_run": dry_run,
+            "expired_removed": 0,
+            "tombstones_removed": 0,
+            "rebuilt": False
         }
-    
+        with CompactionLock(Path(db_info["path"])) as locked:
+            if not locked:
+                return {**report, "skipped": "compaction already running in another worker"}
+            bytes_before = dir_size(storage_path)
+            collection = self._get_collection(db_name)
+
+            expired, tombstones = [], []
+            if lifecycle.get("active"):
+                expired = collection.get(where=expired_filter(), include=[])["ids"]
+                tombstones = collection.get(where=TOMBSTONE_FILTER, include=[])["ids"]
+            doomed = list(dict.fromkeys(expired + tombstones))
+            report["expired_removed"] = len(expired)
+            report["tombstones_removed"] = len(set(tombstones) - set(expired))
+
+            deleted = lifecycle.get("deleted_since_rebuild", 0) + len(doomed)
+            live = collection.count() - len(doomed)
+            ratio = deleted / (live + deleted) if live + deleted else 0.0
+            report["tombstone_ratio"] = round(ratio, 4)
+            should_rebuild = live > 0 and (force_rebuild or (deleted > 0 and ratio >= rebuild_ratio))
+
+            if dry_run:
+                report["would_rebuild"] = should_rebuild
+                report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                return report
+
+            for i in range(0, len(doomed), 500):
+                collection.delete(ids=doomed[i:i + 500])
+            self._get_catalog(db_name).remove(doomed)
+            self._get_filter_index(db_name).remove(doomed)
+            self._get_dedup_index(db_name).remove(doomed)
+            lifecycle["deleted_since_rebuild"] = deleted
+            lifecycle["tombstones"] = 0
+
+            if should_rebuild:
+                self._rebuild_collection(db_name, collection, page_size)
+                lifecycle["deleted_since_rebuild"] = 0
+                lifecycle["last_rebuild"] = datetime.now().isoformat()
+                report["rebuilt"] = True
+
+            lifecycle["last_compaction"] = datetime.now().isoformat()
+            db_info["document_count"] = self._get_collection(db_name).count()
+            self._save_metadata()
+
+            bytes_after = dir_size(storage_path)
+            report.update({
+                "storage_path": str(storage_path),
+                "bytes_before": bytes_before,
+                "bytes_after": bytes_after,
+                "bytes_reclaimed": max(0, bytes_before - bytes_after),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+        logger.info(f"[Compaction] {db_name}: removed {len(doomed)} chunks "
+                    f"(expired={report['expired_removed']}, tombstones={report['tombstones_removed']}), "
+                    f"rebuilt={report['rebuilt']}, reclaimed={report['bytes_reclaimed']} bytes")
+        return report
+
+    def _rebuild_collection(self, db_name: str, collection, page_size: int):
+        """
+        Copy live chunks into a fresh collection and swap it in.
+
+        Reads keep using the old collection until the swap; the old collection
+        (and its HNSW segment files) is dropped afterwards.
+        """
+        db_info = self._metadata["databases"][db_name]
+        client = self._get_client(db_name)
+        if db_info.get("storage") == STORAGE_SHARED:
+            names = (shared_collection_name(db_name), shared_collection_name(f"{db_name}-compacted"))
+        else:
+            names = ("documents", "documents_compacted")
+        new_name = names[1] if collection.name == names[0] else names[0]
+        try:
+            client.delete_collection(new_name)  # Leftover from an interrupted rebuild
+        except Exception:
+            pass
+        fresh = client.create_collection(name=new_name, metadata=collection.metadata or None)
+        copied = copy_collection(collection, fresh, page_size=page_size)
+        # Inserts that land after this check would be dropped with the old
+        # collection: hold them off until the swap and delete are done
+        with self._write_lock:
+            self._drain_inserts(db_name)
+            if copied != collection.count():
+                client.delete_collection(new_name)
+                raise RuntimeError(f"Rebuild of {db_name} copied {copied}/{collection.count()} chunks; keeping the old index")
+
+            with self._client_lock:
+                self._collections[db_name] = fresh
+                db_info["collections"] = [new_name]
+                self._save_metadata()
+            client.delete_collection(collection.name)
+        logger.info(f"[Compaction] Rebuilt {db_name}: {copied} chunks → collection '{new_name}'")
+
+    async def compact_all_databases(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Run the compaction job on every database"""
+        reports = []
+        for db_name in list(self._metadata["databases"].keys()):
+            try:
+                reports.append(await self.compact_database(db_name, dry_run=dry_run))
+            except Exception as e:
+                logger.warning(f"[Compaction] Skipping {db_name}: {e}")
+                reports.append({"database": db_name, "error": str(e)})
+
+        ok = [r for r in reports if "error" not in r]
+        return {
+            "dry_run": dry_run,
+            "databases": reports,
+            "expired_removed": sum(r["expired_removed"] for r in ok),
+            "tombstones_removed": sum(r["tombstones_removed"] for r in ok),
+            "rebuilt": [r["database"] for r in ok if r.get("rebuilt")],
+            "bytes_reclaimed": sum(r.get("bytes_reclaimed", 0) for r in ok)
+        }
+
+    def start_compaction_scheduler(self, interval_seconds: float = None) -> Optional[asyncio.Task]:
+        """Run compact_all_databases periodically on the running event loop (0 disables)"""
+        interval = interval_seconds if interval_seconds is not None else _config.VECTORDB_COMPACTION_INTERVAL_SECONDS
+        if interval <= 0 or not HAS_CHROMADB:
+            return None
+        if self._compaction_task is not None and not self._compaction_task.done():
+            return self._compaction_task
+
+        async def _loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    result = await self.compact_all_databases()
+                    logger.info(f"[Compaction] Scheduled run: {result['expired_removed']} expired, "
+                                f"{result['tombstones_removed']} tombstones removed, "
+                                f"{result['bytes_reclaimed']} bytes reclaimed")
+                except Exception as e:
+                    logger.error(f"[Compaction] Scheduled run failed: {e}")
+
+        self._compaction_task = asyncio.create_task(_loop())
+        logger.info(f"[Compaction] Scheduler started (every {interval}s)")
+        return self._compaction_task
+
+    async def stop_compaction_scheduler(self):
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            try:
+                await self._compaction_task
+            except asyncio.CancelledError:
+                pass
+            self._compaction_task = None
+
     async def insert_full_text(
         self,
         db_name: str,
@@ -719,7 +2296,8 @@ Summary:"""
         title: str = "",
         source: str = "",
         category: str = "general",
-        tags: List[str] = None
+        tags: List[str] = None,
+        ttl_seconds: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Insert full text document without chunking.
@@ -731,6 +2309,7 @@ Summary:"""
             source: Document source
             category: Document category
             tags: Document tags
+            ttl_seconds: Expire the document after this many seconds (None = never)
             
         Returns:
             Insertion result
@@ -739,8 +2318,9 @@ Summary:"""
             "title": title,
             "source": source,
             "category": category,
-            "tags": ",".join(tags) if tags else "",
+            "tags": join_tags(tags),
             "inserted_at": datetime.now().isoformat(),
+            "ttl_seconds": ttl_seconds,
             "content_length": len(content)
         }
         
@@ -759,7 +2339,8 @@ Summary:"""
         title: str = "",
         source: str = "",
         category: str = "general",
-        tags: List[str] = None
+        tags: List[str] = None,
+        ttl_seconds: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Insert document with LLM summarization first.
@@ -771,6 +2352,7 @@ Summary:"""
             source: Document source
             category: Document category
             tags: Document tags
+            ttl_seconds: Expire the document after this many seconds (None = never)
             
         Returns:
             Insertion result with summary
@@ -779,8 +2361,9 @@ Summary:"""
             "title": title,
             "source": source,
             "category": category,
-            "tags": ",".join(tags) if tags else "",
-            "inserted_at": datetime.now().isoformat()
+            "tags": join_tags(tags),
+            "inserted_at": datetime.now().isoformat(),
+            "ttl_seconds": ttl_seconds
         }
         
         return await self.insert_document(
@@ -791,6 +2374,7 @@ Summary:"""
             chunk=True
         )
     
+    @with_priority(Priority.BACKGROUND)
     async def insert_hierarchical(
         self,
         db_name: str,
@@ -827,11 +2411,12 @@ Summary:"""
             "title": title,
             "source": source,
             "category": category,
-            "tags": ",".join(tags) if tags else "",
+            "tags": join_tags(tags),
             "inserted_at": datetime.now().isoformat(),
             "content_length": len(content)
         }
         
+        self._check_embedding_model(db_name)
         all_ids = []
         
         # Split into sections if not provided
@@ -842,52 +2427,54 @@ Summary:"""
                        for i, s in enumerate(section_texts)]
         
         # Layer 1: Generate and store section summaries
-        for i, section in enumerate(sections):
-            section_content = section.get("content", "")
-            section_title = section.get("title", f"Section {i+1}")
+        # (released before Layer 2: insert_document takes its own in-flight slot)
+        async with self._insert_scope(db_name):
+            for i, section in enumerate(sections):
+                section_content = section.get("content", "")
+                section_title = section.get("title", f"Section {i+1}")
             
-            if len(section_content) < 100:
-                continue
+                if len(section_content) < 100:
+                    continue
             
-            try:
-                # Generate section summary  
-                summary = await self.summarize_document(section_content, max_length=200)
+                try:
+                    # Generate section summary  
+                    summary = await self.summarize_document(section_content, max_length=200)
                 
-                summary_meta = {
-                    **metadata,
-                    "chunk_type": "summary_index",
-                    "section_index": i,
-                    "section_title": section_title,
-                    "is_summary": True,
-                    "original_section_length": len(section_content)
-                }
+                    summary_meta = {
+                        **apply_lifecycle_defaults(metadata),
+                        "chunk_type": "summary_index",
+                        "section_index": i,
+                        "section_title": section_title,
+                        "is_summary": True,
+                        "original_section_length": len(section_content)
+                    }
                 
-                # Insert summary as Layer 1 index entry
-                summary_id = f"{db_name}_summary_{datetime.now().strftime('%Y%m%d%H%M%S')}_{i}"
-                embedding = await asyncio.to_thread(
-                    self._embeddings.embed_query, summary
-                )
+                    # Insert summary as Layer 1 index entry
+                    summary_id = f"{db_name}_summary_{datetime.now().strftime('%Y%m%d%H%M%S')}_{i}"
+                    embedding = (await self._aembed_for(db_name, [summary]))[0]
                 
-                collection = self._get_collection(db_name)
-                clean_meta = {}
-                for k, v in summary_meta.items():
-                    if v is None:
-                        clean_meta[k] = ""
-                    elif isinstance(v, (str, int, float, bool)):
-                        clean_meta[k] = v
-                    else:
-                        clean_meta[k] = str(v)
+                    collection = self._get_collection(db_name)
+                    clean_meta = {}
+                    for k, v in summary_meta.items():
+                        if v is None:
+                            clean_meta[k] = ""
+                        elif isinstance(v, (str, int, float, bool)):
+                            clean_meta[k] = v
+                        else:
+                            clean_meta[k] = str(v)
                 
-                collection.add(
-                    ids=[summary_id],
-                    embeddings=[embedding],
-                    documents=[summary],
-                    metadatas=[clean_meta]
-                )
-                all_ids.append(summary_id)
+                    collection.add(
+                        ids=[summary_id],
+                        embeddings=[embedding],
+                        documents=[summary],
+                        metadatas=[clean_meta]
+                    )
+                    self._get_catalog(db_name).add_many([entry_row(summary_id, clean_meta, summary)])
+                    self._get_filter_index(db_name).add_many([(summary_id, clean_meta)])
+                    all_ids.append(summary_id)
                 
-            except Exception as e:
-                logger.warning(f"Failed to create summary for section {i}: {e}")
+                except Exception as e:
+                    logger.warning(f"Failed to create summary for section {i}: {e}")
         
         # Layer 2: Insert original content with parent-child chunking
         result = await self.insert_document(
@@ -922,7 +2509,8 @@ Summary:"""
         query: str,
         db_name: str = None,
         n_results: int = 5,
-        filter_metadata: Dict[str, Any] = None
+        filter_metadata: Dict[str, Any] = None,
+        include_embeddings: bool = False
     ) -> Dict[str, Any]:
         """
         Query a vector database.
@@ -932,6 +2520,8 @@ Summary:"""
             db_name: Database to query (uses active if not specified)
             n_results: Number of results (must be > 0)
             filter_metadata: Metadata filters
+            include_embeddings: Also return each result's stored embedding and
+                the query embedding (used by the context packer for MMR)
             
         Returns:
             Query results
@@ -949,7 +2539,7 @@ Summary:"""
         if not target_db:
             raise ValueError("No database specified and no active database set")
         
-        collection = self._get_collection(target_db)
+        collection, profile = await self._aget_snapshot(target_db)
         
         # Check if collection has documents
         doc_count = collection.count()
@@ -965,36 +2555,197 @@ Summary:"""
         # Adjust n_results if it exceeds document count
         n_results = min(n_results, doc_count)
         
-        # Generate query embedding
-        query_embedding = await asyncio.to_thread(
-            self._embeddings.embed_query,
-            query
-        )
+        # Generate query embedding (never against a DB built with another model)
+        self._check_embedding_model(target_db)
+        query_embedding = (await self._aembed_for(target_db, [query], profile))[0]
         
-        # Query
+        if filter_metadata:
+            formatted, filter_plan = await asyncio.to_thread(
+                self._filtered_search, target_db, collection, query_embedding, n_results,
+                filter_metadata, include_embeddings
+            )
+        else:
+            formatted, filter_plan = await asyncio.to_thread(
+                self._search_collection, collection, query_embedding, n_results,
+                self._lifecycle_where(target_db), include_embeddings
+            ), None
+        
+        response = {
+            "database": target_db,
+            "query": query,
+            "results": formatted,
+            "total_results": len(formatted)
+        }
+        if filter_plan:
+            response["filter_plan"] = filter_plan
+        if include_embeddings:
+            response["query_embedding"] = query_embedding
+        return response
+    
+    @staticmethod
+    def _search_collection(
+        collection,
+        query_embedding: List[float],
+        n_results: int,
+        filter_metadata: Dict[str, Any] = None,
+        include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Nearest-neighbour search for one precomputed query embedding (blocking)"""
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
         results = collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results,
-            where=filter_metadata
+            where=filter_metadata,
+            include=include
         )
         
         # Format results
         formatted = []
+        embeddings = results.get("embeddings") if include_embeddings else None
         if results["documents"] and results["documents"][0]:
             for i, doc in enumerate(results["documents"][0]):
-                formatted.append({
+                item = {
                     "content": doc,
                     "id": results["ids"][0][i] if results["ids"] else None,
                     "distance": results["distances"][0][i] if results["distances"] else None,
                     "metadata": results["metadatas"][0][i] if results["metadatas"] else {}
-                })
+                }
+                if embeddings is not None and len(embeddings) > 0:
+                    item["embedding"] = embeddings[0][i]
+                formatted.append(item)
+        return formatted
+    
+    def _filtered_search(
+        self,
+        db_name: str,
+        collection,
+        query_embedding: List[float],
+        n_results: int,
+        filter_metadata: Dict[str, Any],
+        include_embeddings: bool = False
+    ) -> tuple:
+        """
+        Filtered search planned on the metadata pre-filter index (blocking).
+
+        - no match               → empty result without touching the vectors
+        - <= PREFILTER_EXACT_MAX → exact search over the matching chunk ids
+        - otherwise              → HNSW with the where clause, n_results scaled by
+                                   the filter's selectivity, then post-filtered
+        - HNSW short             → exact search over every matching id, paged. Multi-value
+                                   fields (tags) can't be pushed into the Chroma where,
+                                   so a rare tag can miss the oversampled candidates
+
+        Returns:
+            (results, plan)
+        """
+        started = time.perf_counter()
+        index = self._sync_filter_index(db_name, collection)
+        clauses, residual = split_filter(filter_metadata, index.fields)
+        if not clauses:
+            results = self._search_collection(
+                collection, query_embedding, n_results, self._lifecycle_where(db_name, filter_metadata),
+                include_embeddings
+            )
+            return results, {"strategy": "where"}
+
+        matched, ids = index.match(clauses, limit=_config.VECTORDB_PREFILTER_EXACT_MAX)
+        plan = {"indexed_fields": [field for field, _ in clauses], "matched": matched}
+        where = self._lifecycle_where(db_name, residual)
+        if matched == 0:
+            results = []
+            plan["strategy"] = "empty"
+        elif ids is not None:
+            results = self._exact_search(collection, query_embedding, ids, n_results, where, include_embeddings)
+            plan["strategy"] = "exact"
+        else:
+            total = collection.count()
+            oversample = min(_config.VECTORDB_FILTER_OVERSAMPLE_MAX, max(1.0, total / matched))
+            fetch = min(total, int(math.ceil(n_results * oversample)))
+            candidates = self._search_collection(
+                collection, query_embedding, fetch, merge_where(where, chroma_where(clauses)), include_embeddings
+            )
+            results = [r for r in candidates if matches(r.get("metadata"), clauses)][:n_results]
+            plan.update({"strategy": "hnsw", "oversample": round(oversample, 2), "fetched": len(candidates)})
+            if len(results) < min(n_results, matched):
+                # The matching chunks nearest the query were not all among the candidates
+                _, ids = index.match(clauses)
+                results = self._exact_search(collection, query_embedding, ids, n_results, where, include_embeddings)
+                plan["strategy"] = "hnsw+exact"
+        plan["ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return results, plan
+
+    @staticmethod
+    def _exact_search(
+        collection,
+        query_embedding: List[float],
+        ids: List[str],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Brute-force squared-L2 search over an id set (same distance as Chroma's l2 space).
+        Pages of 500 ids; only the running top n_results are kept between pages.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32) if HAS_NUMPY else None
+        best: List[tuple] = []
+        for i in range(0, len(ids), 500):
+            page = collection.get(
+                ids=ids[i:i + 500], where=where, include=["documents", "metadatas", "embeddings"]
+            )
+            embeddings = page.get("embeddings")
+            rows = list(zip(page.get("ids") or [], page.get("documents") or [],
+                            page.get("metadatas") or [], embeddings if embeddings is not None else []))
+            if not rows:
+                continue
+            if HAS_NUMPY:
+                vectors = np.asarray([row[3] for row in rows], dtype=np.float32)
+                distances = ((vectors - query) ** 2).sum(axis=1).tolist()
+            else:
+                distances = [sum((a - b) ** 2 for a, b in zip(row[3], query_embedding)) for row in rows]
+            best = heapq.nsmallest(n_results, best + list(zip(distances, rows)), key=lambda x: x[0])
+        formatted = []
+        for distance, (chunk_id, doc, meta, embedding) in best:
+            item = {"content": doc, "id": chunk_id, "distance": float(distance), "metadata": meta or {}}
+            if include_embeddings:
+                item["embedding"] = embedding
+            formatted.append(item)
+        return formatted
+
+    @staticmethod
+    def _score_filter(results: List[Dict[str, Any]], min_similarity: float) -> List[Dict[str, Any]]:
+        """Attach similarity = 1/(1+L2) and drop results below min_similarity (keeps top 3 as fallback)"""
+        filtered = []
+        for r in results:
+            distance = r.get("distance", 0)
+            # ChromaDB L2 distance → similarity: sim = 1 / (1 + distance)
+            similarity = 1.0 / (1.0 + distance) if distance is not None else 0.5
+            r["similarity"] = similarity
+            if similarity >= min_similarity:
+                filtered.append(r)
         
-        return {
-            "database": target_db,
-            "query": query,
-            "results": formatted,
-            "total_results": len(formatted)
-        }
+        if not filtered:
+            # Fallback: keep top 3 even if below threshold
+            results.sort(key=lambda x: x.get("distance", 999))
+            filtered = results[:3]
+            for r in filtered:
+                r["similarity"] = 1.0 / (1.0 + r.get("distance", 0))
+        return filtered
+    
+    @staticmethod
+    def _expand_parents(results: List[Dict[str, Any]]):
+        """Parent context expansion (Phase 2): swap child chunks for their stored parent_content"""
+        for r in results:
+            meta = r.get("metadata", {})
+            parent_content = meta.get("parent_content", "")
+            if parent_content and meta.get("chunk_type") == "child":
+                # Store original child content for reference
+                r["child_content"] = r.get("content", "")
+                # Expand content to parent chunk for better context
+                r["content"] = parent_content
+                r["metadata"]["context_expanded"] = True
     
     async def query_with_rerank(
         self,
@@ -1004,7 +2755,8 @@ Summary:"""
         candidates: int = None,
         min_similarity: float = None,
         filter_metadata: Dict[str, Any] = None,
-        rerank: bool = None
+        rerank: bool = None,
+        include_embeddings: bool = False
     ) -> Dict[str, Any]:
         """
         Enhanced query with reranking and score filtering (Phase 1).
@@ -1019,6 +2771,7 @@ Summary:"""
             min_similarity: Minimum similarity threshold (default: config.MIN_SIMILARITY)
             filter_metadata: ChromaDB metadata filter
             rerank: Override reranking enabled/disabled
+            include_embeddings: Return stored embeddings and the query embedding
         """
         candidates = candidates or _config.TOP_K_CANDIDATES
         min_similarity = min_similarity if min_similarity is not None else _config.MIN_SIMILARITY
@@ -1029,7 +2782,8 @@ Summary:"""
             query=query,
             db_name=db_name,
             n_results=candidates,
-            filter_metadata=filter_metadata
+            filter_metadata=filter_metadata,
+            include_embeddings=include_embeddings
         )
         
         results = raw_result.get("results", [])
@@ -1038,21 +2792,7 @@ Summary:"""
             return raw_result
         
         # Step 2: Score filtering — convert distance to similarity
-        filtered = []
-        for r in results:
-            distance = r.get("distance", 0)
-            # ChromaDB L2 distance → similarity: sim = 1 / (1 + distance)
-            similarity = 1.0 / (1.0 + distance) if distance is not None else 0.5
-            r["similarity"] = similarity
-            if similarity >= min_similarity:
-                filtered.append(r)
-        
-        if not filtered:
-            # Fallback: keep top 3 even if below threshold
-            results.sort(key=lambda x: x.get("distance", 999))
-            filtered = results[:3]
-            for r in filtered:
-                r["similarity"] = 1.0 / (1.0 + r.get("distance", 0))
+        filtered = self._score_filter(results, min_similarity)
         
         logger.info(f"[Query+Rerank] {len(results)} candidates → {len(filtered)} after score filter (min_sim={min_similarity})")
         
@@ -1067,17 +2807,9 @@ Summary:"""
         
         # Step 4: Parent context expansion (Phase 2)
         # If child chunks have parent_content in metadata, use it for richer context
-        for r in filtered:
-            meta = r.get("metadata", {})
-            parent_content = meta.get("parent_content", "")
-            if parent_content and meta.get("chunk_type") == "child":
-                # Store original child content for reference
-                r["child_content"] = r.get("content", "")
-                # Expand content to parent chunk for better context
-                r["content"] = parent_content
-                r["metadata"]["context_expanded"] = True
+        self._expand_parents(filtered)
         
-        return {
+        response = {
             "database": raw_result.get("database"),
             "query": query,
             "results": filtered,
@@ -1085,6 +2817,9 @@ Summary:"""
             "candidates_evaluated": len(results),
             "reranked": should_rerank
         }
+        if include_embeddings:
+            response["query_embedding"] = raw_result.get("query_embedding")
+        return response
     
     async def query_targeted_dbs(
         self,
@@ -1092,7 +2827,8 @@ Summary:"""
         db_names: List[str],
         top_k: int = 5,
         min_similarity: float = None,
-        rerank: bool = None
+        rerank: bool = None,
+        include_embeddings: bool = False
     ) -> Dict[str, Any]:
         """
         Query specific databases only (Phase 1: Skills-based routing).
@@ -1100,7 +2836,15 @@ Summary:"""
         Instead of querying ALL databases, only query the ones
         identified as relevant by KB Skills routing.
         """
-        all_results = []
+        per_db: Dict[str, List[Dict[str, Any]]] = {}
+        query_embedding = None
+        query_profile = None
+        
+        # Vectors from different embedding models are not comparable — never merge them
+        skipped = [db for db in db_names if not self.is_embedding_compatible(db)]
+        if skipped:
+            logger.warning(f"Skipping DBs built with another embedding model: {skipped}")
+            db_names = [db for db in db_names if db not in skipped]
         candidates_per_db = max(10, _config.TOP_K_CANDIDATES // max(len(db_names), 1))
         
         for db_name in db_names:
@@ -1110,31 +2854,210 @@ Summary:"""
                     db_name=db_name,
                     top_k=candidates_per_db,
                     min_similarity=min_similarity,
-                    rerank=False  # Rerank after merging all results
+                    rerank=False,  # Rerank after merging all results
+                    include_embeddings=include_embeddings
                 )
+                profile_id = self.get_embedding_profile(db_name).profile_id
+                if query_embedding is None and result.get("query_embedding") is not None:
+                    query_embedding, query_profile = result["query_embedding"], profile_id
                 for r in result.get("results", []):
                     r["metadata"] = r.get("metadata", {})
                     r["metadata"]["source_db"] = db_name
-                    all_results.append(r)
+                    if include_embeddings and profile_id != query_profile:
+                        r.pop("embedding", None)  # Different vector space than query_embedding
+                per_db[db_name] = result.get("results", [])
             except Exception as e:
                 logger.warning(f"Error querying {db_name}: {e}")
         
-        # Merge and rerank across all targeted DBs
+        # Fuse per-DB lists on normalized scores (L2 scales differ per collection),
+        # then rerank only the fused pool
         should_rerank = rerank if rerank is not None else _config.RERANK_ENABLED
+        candidates = sum(len(results) for results in per_db.values())
+        pool = top_k * max(1, _config.RAG_FUSION_RERANK_POOL) if should_rerank else top_k
+        all_results = fuse_results(
+            per_db, top_k=pool, method=_config.RAG_FUSION_METHOD, rrf_k=_config.RAG_RRF_K
+        )
         if should_rerank and len(all_results) > 1:
             all_results = _reranker.rerank(query, all_results, top_k=top_k)
         else:
-            all_results.sort(key=lambda x: x.get("similarity", 0), reverse=True)
             all_results = all_results[:top_k]
         
-        return {
+        response = {
             "query": query,
             "databases_queried": db_names,
             "results": all_results,
             "total_results": len(all_results),
+            "candidates_evaluated": candidates,
+            "fusion": _config.RAG_FUSION_METHOD,
             "reranked": should_rerank
         }
-    
+        if skipped:
+            response["databases_skipped"] = skipped
+        if include_embeddings:
+            response["query_embedding"] = query_embedding
+        return response
+
+    async def query_multi(
+        self,
+        queries: List[str],
+        db_names: List[str],
+        top_k: int = 5,
+        min_similarity: float = None,
+        rerank: bool = None
+    ) -> Dict[str, Any]:
+        """
+        Batched retrieval for several sub-queries of one decomposed question.
+
+        Pipeline:
+        1. Embed all sub-queries in one batch
+        2. Run every (sub-query, DB) search concurrently
+        3. Fuse the (sub-query, DB) lists on normalized scores, deduplicating
+           by chunk id across sub-queries
+        4. Rerank all (sub-query, chunk) pairs of the fused pool in one
+           cross-encoder call; a chunk keeps its best score over the
+           sub-queries that retrieved it
+
+        Args:
+            queries: Sub-queries (duplicates are dropped)
+            db_names: Databases to search
+            top_k: Final number of results
+            min_similarity: Minimum similarity threshold (default: config.MIN_SIMILARITY)
+            rerank: Override reranking enabled/disabled
+        """
+        started = time.perf_counter()
+        queries = list(dict.fromkeys(q for q in queries if q and q.strip()))
+        min_similarity = min_similarity if min_similarity is not None else _config.MIN_SIMILARITY
+        should_rerank = rerank if rerank is not None else _config.RERANK_ENABLED
+
+        skipped = [db for db in db_names if not self.is_embedding_compatible(db)]
+        if skipped:
+            logger.warning(f"Skipping DBs built with another embedding model: {skipped}")
+            db_names = [db for db in db_names if db not in skipped]
+        response = {
+            "queries": queries,
+            "databases_queried": db_names,
+            "results": [],
+            "total_results": 0,
+            "reranked": should_rerank
+        }
+        if skipped:
+            response["databases_skipped"] = skipped
+        if not queries or not db_names:
+            return response
+
+        # Open collections (each with the profile it was written in), then embed
+        # all sub-queries once per profile
+        profiles: Dict[str, EmbeddingProfile] = {}
+
+        async def _open(db_name: str):
+            collection, profiles[db_name] = await self._aget_snapshot(db_name)
+            return db_name, collection, await asyncio.to_thread(collection.count)
+
+        opened = await asyncio.gather(*(_open(db) for db in db_names), return_exceptions=True)
+        targets = []
+        for item in opened:
+            if isinstance(item, Exception):
+                logger.warning(f"Error opening database: {item}")
+            elif item[2] > 0:
+                targets.append(item)
+        target_dbs = [db_name for db_name, _, _ in targets]
+
+        try:
+            vectors = await self._aembed_for_dbs(queries, target_dbs, profiles)
+        except Exception as e:
+            # Batch failed: embed sub-queries one by one, logging and skipping failures
+            logger.warning(f"Batched sub-query embedding failed ({e}); retrying one by one")
+            singles = await asyncio.gather(
+                *(self._aembed_for_dbs([q], target_dbs, profiles) for q in queries), return_exceptions=True
+            )
+            failed = []
+            for q, v in zip(queries, singles):
+                if isinstance(v, Exception):
+                    logger.warning(f"Skipping sub-query {q[:60]!r}: {v}")
+                    failed.append(q)
+            embedded_ok = [(q, v) for q, v in zip(queries, singles) if not isinstance(v, Exception)]
+            queries = [q for q, _ in embedded_ok]
+            vectors = {db: [v[db][0] for _, v in embedded_ok] for db in target_dbs}
+            response["queries"] = queries
+            response["queries_failed"] = failed
+            if not queries:
+                return response
+        embedded = time.perf_counter()
+
+        # Every (sub-query, DB) search in parallel
+        candidates_per_db = max(10, _config.TOP_K_CANDIDATES // max(len(targets), 1))
+        searches = [
+            (qi, db_name, asyncio.to_thread(
+                self._search_collection, collection, vectors[db_name][qi], min(candidates_per_db, count),
+                self._lifecycle_where(db_name)
+            ))
+            for qi in range(len(queries))
+            for db_name, collection, count in targets
+        ]
+        outcomes = await asyncio.gather(*(task for _, _, task in searches), return_exceptions=True)
+        searched = time.perf_counter()
+
+        # Fuse the (sub-query, DB) lists on normalized scores; chunks hit by
+        # several sub-queries are merged and remember which ones matched
+        lists: Dict[tuple, List[Dict[str, Any]]] = {}
+        evaluated = 0
+        for (qi, db_name, _), outcome in zip(searches, outcomes):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Error querying {db_name}: {outcome}")
+                continue
+            evaluated += len(outcome)
+            filtered = self._score_filter(outcome, min_similarity)
+            for r in filtered:
+                r["metadata"] = r.get("metadata") or {}
+                r["metadata"]["source_db"] = db_name
+            lists[(qi, db_name)] = filtered
+        unique = len({r.get("id") or r.get("content", "")[:50] for rs in lists.values() for r in rs})
+        pool = top_k * max(1, _config.RAG_FUSION_RERANK_POOL) if should_rerank else top_k
+        results = fuse_results(lists, top_k=pool, method=_config.RAG_FUSION_METHOD, rrf_k=_config.RAG_RRF_K)
+        for r in results:
+            matched = list(dict.fromkeys(qi for qi, _ in r["fused_from"]))
+            r["matched_queries"] = [queries[qi] for qi in matched]
+            r["fused_from"] = list(dict.fromkeys(db for _, db in r["fused_from"]))
+
+        # One cross-encoder call for every (sub-query, chunk) pair in the fused pool
+        scores = None
+        if should_rerank and len(results) > 1:
+            pairs, owners = [], []
+            for r in results:
+                for q in r["matched_queries"]:
+                    pairs.append((q, r.get("content", "")))
+                    owners.append(r)
+            scores = await asyncio.to_thread(_reranker.score_pairs, pairs)
+            response["pairs_scored"] = len(pairs) if scores is not None else 0
+            if scores is not None:
+                for r, score in zip(owners, scores):
+                    if r.get("rerank_score") is None or score > r["rerank_score"]:
+                        r["rerank_score"] = score
+                results.sort(key=lambda r: r.get("rerank_score", -999), reverse=True)
+        results = results[:top_k]
+        self._expand_parents(results)
+
+        done = time.perf_counter()
+        response.update({
+            "databases_queried": [db for db, _, _ in targets],
+            "results": results,
+            "total_results": len(results),
+            "candidates_evaluated": evaluated,
+            "unique_candidates": unique,
+            "fusion": _config.RAG_FUSION_METHOD,
+            "reranked": scores is not None,
+            "timings_ms": {
+                "embed": round((embedded - started) * 1000, 1),
+                "search": round((searched - embedded) * 1000, 1),
+                "rerank": round((done - searched) * 1000, 1),
+                "total": round((done - started) * 1000, 1)
+            }
+        })
+        logger.info(f"[QueryMulti] {len(queries)} sub-queries × {len(targets)} DBs: "
+                    f"{evaluated} candidates → {unique} unique → {len(results)} "
+                    f"in {response['timings_ms']['total']}ms")
+        return response
+
     async def query_all(
         self,
         query: str,
@@ -1158,6 +3081,10 @@ Summary:"""
             # Skip empty databases if requested
             if skip_empty and db_info.get("document_count", 0) == 0:
                 continue
+            # Results from different embedding models are not comparable
+            if not self.is_embedding_compatible(db_name):
+                logger.debug(f"Skipping {db_name}: built with {self.get_database_embedding_model(db_name)}")
+                continue
                 
             try:
                 result = await self.query(query, db_name, n_results)
@@ -1328,6 +3255,275 @@ Rules:
         
         return result
     
+    # ============== Columnar Export / Import ==============
+
+    def _get_export_dir(self) -> Path:
+        export_dir = Path(_config.VECTORDB_EXPORT_PATH)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        return export_dir
+
+    def _resolve_export(self, export: Union[str, Path]) -> Path:
+        """Export name under VECTORDB_EXPORT_PATH, or an explicit directory (CLI tools)"""
+        if isinstance(export, Path):
+            return export
+        return self._get_export_dir() / validate_db_name(export)
+
+    def list_exports(self) -> List[Dict[str, Any]]:
+        """List columnar exports in the export directory"""
+        exports = []
+        for entry in sorted(self._get_export_dir().iterdir()):
+            manifest_path = entry / EXPORT_MANIFEST_FILENAME
+            if not manifest_path.exists():
+                continue
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            exports.append({
+                "name": entry.name,
+                "database": manifest.get("database", {}).get("name"),
+                "count": manifest.get("count"),
+                "dimensions": manifest.get("dimensions"),
+                "dtype": manifest.get("dtype"),
+                "table_format": manifest.get("table_format"),
+                "exported_at": manifest.get("exported_at"),
+                "size_bytes": dir_size(entry)
+            })
+        return exports
+
+    async def export_database(
+        self,
+        db_name: str,
+        export: Union[str, Path, None] = None,
+        table_format: str = None,
+        dtype: str = None,
+        include_deleted: bool = False,
+        page_size: int = 2000
+    ) -> Dict[str, Any]:
+        """
+        Export a database as Parquet / Arrow (ids, texts, metadata) + embeddings.npy.
+
+        Pages are streamed from the collection straight to disk; only one page
+        is held in memory. Expired and soft-deleted chunks are skipped unless
+        include_deleted is set.
+
+        Args:
+            db_name: Database to export
+            export: Export name under VECTORDB_EXPORT_PATH or a directory path
+                (default: <db_name>-<timestamp>)
+            table_format: parquet / arrow (default: VECTORDB_EXPORT_FORMAT)
+            dtype: float32 / float16 for embeddings.npy (default: the profile's dtype)
+            include_deleted: Keep tombstoned and expired chunks
+            page_size: Chunks read per page
+        """
+        return await asyncio.to_thread(
+            self._export_database_sync, db_name, export, table_format, dtype, include_deleted, page_size
+        )
+
+    def _export_database_sync(
+        self,
+        db_name: str,
+        export: Union[str, Path, None],
+        table_format: Optional[str],
+        dtype: Optional[str],
+        include_deleted: bool,
+        page_size: int
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        db_info = self._metadata["databases"].get(db_name)
+        if not db_info:
+            raise ValueError(f"Database '{db_name}' not found")
+        profile = self.get_embedding_profile(db_name)
+        out_dir = self._resolve_export(export or f"{db_name}-{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        if out_dir.exists() and any(out_dir.iterdir()):
+            raise ValueError(f"Export '{out_dir.name}' already exists")
+
+        # Compaction / profile migration swap the collection; keep them out while paging
+        lock = CompactionLock(Path(db_info["path"]))
+        if not lock.acquire():
+            raise ValueError(f"Database '{db_name}' is being compacted or migrated; retry later")
+        try:
+            collection = self._get_collection(db_name)
+            total = collection.count()
+            skipped = 0
+            writer = ColumnarWriter(
+                out_dir, total,
+                table_format=table_format or _config.VECTORDB_EXPORT_FORMAT,
+                dtype=dtype or profile.dtype
+            )
+            with writer:
+                offset = 0
+                while offset < total:
+                    page = collection.get(
+                        limit=page_size, offset=offset, include=["documents", "metadatas", "embeddings"]
+                    )
+                    ids = page.get("ids") or []
+                    if not ids:
+                        break
+                    offset += len(ids)
+                    documents = page.get("documents") or [""] * len(ids)
+                    metadatas = page.get("metadatas") or [{}] * len(ids)
+                    embeddings = page.get("embeddings")
+                    if not include_deleted:
+                        keep = [i for i, meta in enumerate(metadatas) if is_live(meta)]
+                        skipped += len(ids) - len(keep)
+                        if len(keep) < len(ids):
+                            ids = [ids[i] for i in keep]
+                            documents = [documents[i] for i in keep]
+                            metadatas = [metadatas[i] for i in keep]
+                            embeddings = [embeddings[i] for i in keep]
+                    if ids:
+                        writer.write_page(ids, documents, metadatas, embeddings)
+                    logger.info(f"[Export] {db_name}: {offset}/{total} chunks read")
+            if profile.projection_file:
+                shutil.copy2(Path(db_info["path"]) / profile.projection_file, out_dir / profile.projection_file)
+            manifest = writer.write_manifest({
+                "database": {k: db_info.get(k) for k in ("name", "description", "category", "embedding_model")},
+                "embedding_profile": profile.to_dict(),
+                "lifecycle_active": bool(db_info.get("lifecycle", {}).get("active"))
+            })
+        except Exception:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            raise
+        finally:
+            lock.release()
+
+        duration = time.perf_counter() - started
+        logger.info(f"[Export] {db_name} → {out_dir} ({manifest['count']} chunks in {duration:.1f}s)")
+        return {
+            "database": db_name,
+            "export": out_dir.name,
+            "path": str(out_dir),
+            "chunks": manifest["count"],
+            "skipped_deleted_or_expired": skipped,
+            "dimensions": manifest["dimensions"],
+            "dtype": manifest["dtype"],
+            "table_format": manifest["table_format"],
+            "size_bytes": dir_size(out_dir),
+            "duration_seconds": round(duration, 2)
+        }
+
+    async def import_database(
+        self,
+        export: Union[str, Path],
+        db_name: Optional[str] = None,
+        description: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        index_signatures: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """
+        Bulk-load a columnar export without re-embedding.
+
+        A new database takes the export's embedding model and profile (projection
+        matrices are copied along). Importing into an existing database requires
+        the same embedding profile; chunks with existing ids are overwritten.
+
+        Args:
+            export: Export name under VECTORDB_EXPORT_PATH or a directory path
+            db_name: Target database (default: the exported database's name)
+            description: Description for a newly created database
+            batch_size: Chunks per upsert (default: the client's max batch size)
+            index_signatures: Add SimHash signatures for near-duplicate checks
+                (default: DEDUP_MODE != "off")
+        """
+        return await asyncio.to_thread(
+            self._import_database_sync, export, db_name, description, batch_size, index_signatures
+        )
+
+    def _import_database_sync(
+        self,
+        export: Union[str, Path],
+        db_name: Optional[str],
+        description: Optional[str],
+        batch_size: Optional[int],
+        index_signatures: Optional[bool]
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        export_dir = self._resolve_export(export)
+        reader = ColumnarReader(export_dir)
+        manifest = reader.manifest
+        source = manifest.get("database", {})
+        target = validate_db_name(db_name or source.get("name", ""))
+        profile = EmbeddingProfile.from_dict(
+            manifest.get("embedding_profile"), default_model=source.get("embedding_model") or self.embedding_model_id
+        )
+
+        created = target not in self._metadata["databases"]
+        if created:
+            self.create_database(
+                target,
+                description=description if description is not None else source.get("description", ""),
+                category=source.get("category", "general")
+            )
+            db_info = self._metadata["databases"][target]
+            db_info["embedding_model"] = profile.model
+            if profile.method != "full":
+                db_info["embedding_profile"] = profile.to_dict()
+            if profile.projection_file:
+                shutil.copy2(export_dir / profile.projection_file, Path(db_info["path"]) / profile.projection_file)
+            if manifest.get("lifecycle_active"):
+                db_info["lifecycle"] = {"active": True, "deleted_since_rebuild": 0}
+            self._save_metadata()
+        else:
+            if target in self._profile_migrations:
+                raise ValueError(f"Database '{target}' is migrating to a new embedding profile; retry when it finishes")
+            db_info = self._metadata["databases"][target]
+
+        # Compaction / profile migration swap the collection; keep them out while writing
+        lock = CompactionLock(Path(db_info["path"]))
+        if not lock.acquire():
+            raise ValueError(f"Database '{target}' is being compacted or migrated; retry later")
+        try:
+            if not created:
+                existing = self.get_embedding_profile(target)
+                if existing.profile_id != profile.profile_id:
+                    raise ValueError(
+                        f"Export uses embedding profile '{profile.profile_id}' but '{target}' stores "
+                        f"'{existing.profile_id}'; import into a new database instead"
+                    )
+            if profile.model != self.embedding_model_id:
+                logger.warning(f"[Import] {target} uses '{profile.model}' but the active provider is "
+                               f"'{self.embedding_model_id}'; queries need a matching provider")
+
+            collection = self._get_collection(target)
+            batch_size = batch_size or max_batch_size(self._get_client(target))
+            lifecycle_active = db_info.get("lifecycle", {}).get("active")
+            if index_signatures is None:
+                index_signatures = _config.DEDUP_MODE != "off"
+            dedup_index = self._get_dedup_index(target) if index_signatures else None
+            catalog = self._get_catalog(target)
+            filter_index = self._get_filter_index(target)
+
+            imported = 0
+            for ids, documents, metadatas, embeddings in reader.iter_pages(batch_size):
+                if lifecycle_active:
+                    # Chunks without lifecycle keys would not match the live filter
+                    metadatas = [
+                        {**meta, EXPIRES_AT: int(meta.get(EXPIRES_AT) or 0), DELETED: bool(meta.get(DELETED, False))}
+                        for meta in metadatas
+                    ]
+                collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+                catalog.add_many(entry_row(*row) for row in zip(ids, metadatas, documents))
+                filter_index.add_many(zip(ids, metadatas))
+                if dedup_index is not None:
+                    dedup_index.add_many([(chunk_id, simhash64(text or "")) for chunk_id, text in zip(ids, documents)])
+                imported += len(ids)
+                logger.info(f"[Import] {target}: {imported}/{reader.count} chunks")
+
+            db_info["document_count"] = collection.count()
+            self._save_metadata()
+        finally:
+            lock.release()
+        duration = time.perf_counter() - started
+        logger.info(f"[Import] {export_dir.name} → {target} ({imported} chunks in {duration:.1f}s)")
+        return {
+            "database": target,
+            "export": export_dir.name,
+            "created": created,
+            "chunks_imported": imported,
+            "document_count": db_info["document_count"],
+            "embedding_profile": profile.to_dict(),
+            "duration_seconds": round(duration, 2)
+        }
+
     # ============== Backup & Consolidation ==============
     
     # ── Backup 方法 → 委派至 VectorDBBackupManager ════════════════════════════
@@ -1355,6 +3551,55 @@ Rules:
         self._active_db = self._metadata.get("active")
         return result
     
+    def _merge_into_sync(self, source_db: str, target: str) -> int:
+        """
+        Copy a source DB's live chunks (with embeddings) into the target.
+
+        Metadata goes through the same normalization as insert / import, and the
+        target's listing catalog, filter index and dedup signatures are updated
+        alongside. Soft-deleted and expired chunks are not carried over.
+        """
+        migrating = [db for db in (source_db, target) if db in self._profile_migrations]
+        if migrating:
+            raise ValueError(f"Database '{migrating[0]}' is migrating to a new embedding profile")
+        source_collection = self._get_collection(source_db)
+        target_collection = self._get_collection(target)
+        batch_size = max_batch_size(self._get_client(target))
+        dedup_index = self._get_dedup_index(target) if _config.DEDUP_MODE != "off" else None
+        catalog = self._get_catalog(target)
+        filter_index = self._get_filter_index(target)
+
+        copied = 0
+        total = source_collection.count()
+        for offset in range(0, total, batch_size):
+            page = source_collection.get(
+                limit=batch_size, offset=offset, include=["documents", "metadatas", "embeddings"]
+            )
+            page_ids = page.get("ids") or []
+            documents = page.get("documents") or [""] * len(page_ids)
+            metadatas = page.get("metadatas") or [{}] * len(page_ids)
+            embeddings = page.get("embeddings")
+            if embeddings is None:
+                embeddings = [None] * len(page_ids)
+            rows = [
+                (f"{target}_{source_db}_{offset + i}", doc, apply_lifecycle_defaults(meta or {}), emb)
+                for i, (doc, meta, emb) in enumerate(zip(documents, metadatas, embeddings))
+                if is_live(meta)
+            ]
+            if not rows:
+                continue
+            ids, docs, metas, embs = (list(col) for col in zip(*rows))
+            if any(meta[EXPIRES_AT] for meta in metas):
+                self._activate_lifecycle(target, target_collection)
+            target_collection.add(ids=ids, documents=docs, metadatas=metas, embeddings=embs)
+            catalog.add_many(entry_row(*row) for row in zip(ids, metas, docs))
+            filter_index.add_many(zip(ids, metas))
+            if dedup_index is not None:
+                dedup_index.add_many([(chunk_id, simhash64(text or "")) for chunk_id, text in zip(ids, docs)])
+            copied += len(ids)
+        logger.info(f"[Consolidate] {source_db} → {target}: {copied}/{total} chunks")
+        return copied
+
     async def consolidate_databases(self) -> Dict[str, Any]:
         """
         Use LLM to identify related databases, merge them.
@@ -1440,25 +3685,19 @@ Return ONLY the JSON object."""
                         pass
                     continue
                 
+                # Embeddings can only be copied between DBs with the same model and profile
+                source_model = self.get_embedding_profile(source_db).profile_id
+                target_model = self.get_embedding_profile(target).profile_id
+                if source_model != target_model:
+                    merge_results.append({
+                        "source": source_db, "target": target, "status": "skipped",
+                        "reason": f"Embedding model mismatch ({source_model} vs {target_model})"
+                    })
+                    continue
+                
                 # Copy documents from source to target
                 try:
-                    source_collection = self._get_collection(source_db)
-                    target_collection = self._get_collection(target)
-                    
-                    # Get all docs from source
-                    all_docs = source_collection.get(include=["documents", "metadatas", "embeddings"])
-                    
-                    if all_docs and all_docs.get("ids"):
-                        # Add to target with new IDs
-                        new_ids = [f"{target}_{source_db}_{i}" for i in range(len(all_docs["ids"]))]
-                        
-                        target_collection.add(
-                            ids=new_ids,
-                            documents=all_docs.get("documents", []),
-                            metadatas=all_docs.get("metadatas", []),
-                            embeddings=all_docs.get("embeddings")
-                        )
-                        merged_docs += len(new_ids)
+                    merged_docs += await asyncio.to_thread(self._merge_into_sync, source_db, target)
                     
                     # Delete source DB
                     self.delete_database(source_db)
@@ -1474,10 +3713,19 @@ Return ONLY the JSON object."""
             self._metadata["databases"][target]["document_count"] = self._get_collection(target).count()
             self._save_metadata()
             
+            # Merged DBs often overlap — drop near-duplicate chunks in the target
+            dedup_report = None
+            if merged_docs and _config.DEDUP_MODE != "off":
+                try:
+                    dedup_report = await self.dedup_database(target)
+                except Exception as e:
+                    logger.warning(f"Post-merge dedup failed for {target}: {e}")
+            
             merge_results.append({
                 "target": target,
                 "sources": sources,
                 "docs_merged": merged_docs,
+                "dedup": dedup_report,
                 "status": "success"
             })
         
@@ -1493,5 +3741,7 @@ Return ONLY the JSON object."""
         return self._active_db or self._metadata.get("active")
 
 
-# Singleton instance
+_IMPORT_MS = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+
+# Singleton instance (cheap: heavy clients are built lazily or by warm_up())
 vectordb_manager = VectorDBManager()
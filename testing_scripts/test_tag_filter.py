@@ -0,0 +1,89 @@
+"""
+標籤過濾查詢測試
+
+tags 為多值欄位，無法交給 Chroma where；符合的分塊超過 VECTORDB_PREFILTER_EXACT_MAX
+時走 HNSW + 後過濾。標籤只佔不到 1/8 的分塊、且都離查詢很遠時，放大 8 倍的候選中
+一個都沒有 —— 應改以精確搜尋補上，結果與暴力計算一致。
+
+需要 chromadb 與 numpy；使用暫存目錄，不影響 rag-database。
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 暫存資料庫 + 較小的精確搜尋門檻（需在載入 config 前設定）
+_tmp = tempfile.mkdtemp(prefix="tag_filter_")
+os.environ["CHROMA_DB_PATH"] = str(Path(_tmp) / "vectordb")
+os.environ["VECTORDB_PREFILTER_EXACT_MAX"] = "200"
+os.environ["VECTORDB_FILTER_OVERSAMPLE_MAX"] = "8"
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from services.vectordb_manager import VectorDBManager
+
+TOTAL = 4000
+RARE = 300          # 7.5% < 1/8，且 > EXACT_MAX
+DIMS = 8
+N_RESULTS = 5
+
+
+def test_rare_tag_beyond_exact_max():
+    """稀有標籤（> EXACT_MAX 且 < 1/8）仍回傳最近的 n_results 個符合分塊"""
+    print("=" * 60)
+    print("🧪 稀有標籤過濾（HNSW 不足 → 精確搜尋）")
+    print("=" * 60)
+
+    mgr = VectorDBManager()
+    db_name = "tag-filter-test"
+    mgr.create_database(db_name, description="tag filter test")
+    collection = mgr._get_collection(db_name)
+
+    rng = np.random.default_rng(7)
+    query = np.zeros(DIMS, dtype=np.float32)
+    ids, vectors, metadatas = [], [], []
+    for i in range(TOTAL):
+        rare = i < RARE
+        # 一般分塊靠近查詢，稀有標籤的分塊都在遠處
+        center = 10.0 if rare else 0.0
+        ids.append(f"chunk-{i}")
+        vectors.append((rng.normal(size=DIMS) + center).astype(np.float32).tolist())
+        metadatas.append({"tags": "rare,news" if rare else "common", "source": f"doc-{i % 40}.md"})
+    for start in range(0, TOTAL, 500):
+        collection.add(
+            ids=ids[start:start + 500],
+            embeddings=vectors[start:start + 500],
+            documents=[f"text {i}" for i in range(start, min(start + 500, TOTAL))],
+            metadatas=metadatas[start:start + 500]
+        )
+    mgr._get_filter_index(db_name).add_many(zip(ids, metadatas))
+    print(f"\n1️⃣ 已寫入 {TOTAL} 個分塊，其中 {RARE} 個標記 'rare'")
+
+    results, plan = mgr._filtered_search(
+        db_name, collection, query.tolist(), N_RESULTS, {"tags": "rare"}
+    )
+    print(f"\n2️⃣ 查詢計畫: {plan}")
+    assert plan["matched"] == RARE, plan
+    assert plan["strategy"] == "hnsw+exact", plan
+
+    rare_vectors = np.asarray(vectors[:RARE], dtype=np.float32)
+    distances = ((rare_vectors - query) ** 2).sum(axis=1)
+    expected = [ids[i] for i in np.argsort(distances)[:N_RESULTS]]
+    got = [r["id"] for r in results]
+    print(f"   預期: {expected}")
+    print(f"   實際: {got}")
+    assert got == expected, "tag filter returned the wrong chunks"
+    assert all("rare" in r["metadata"]["tags"].split(",") for r in results)
+    print("\n   ✓ 結果與暴力計算一致")
+
+    mgr.delete_database(db_name)
+
+
+if __name__ == "__main__":
+    test_rare_tag_beyond_exact_max()
+    print("\n✅ 測試通過")